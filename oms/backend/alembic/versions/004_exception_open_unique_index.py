@@ -0,0 +1,54 @@
+"""Exception Open Unique Index
+
+Revision ID: 004_exception_open_unique
+Revises: 003_fix_stock_adjustment
+Create Date: 2026-10-17
+
+This migration adds a partial unique index on Exception
+(entityType, entityId, type) for OPEN/IN_PROGRESS rows so the detection
+engine can bulk-insert exceptions with ON CONFLICT DO NOTHING.
+Existing duplicate open exceptions are closed first (oldest one kept).
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = '004_exception_open_unique'
+down_revision: Union[str, None] = '003_fix_stock_adjustment'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Add partial unique index for open exceptions"""
+
+    # Close duplicate open exceptions, keeping the oldest per entity/type
+    op.execute("""
+        UPDATE "Exception" e
+        SET status = 'CLOSED',
+            resolution = 'Closed as duplicate of an open exception',
+            "resolvedBy" = 'MIGRATION',
+            "resolvedAt" = NOW(),
+            "updatedAt" = NOW()
+        FROM (
+            SELECT id, ROW_NUMBER() OVER (
+                PARTITION BY "entityType", "entityId", type
+                ORDER BY "createdAt", id
+            ) AS rn
+            FROM "Exception"
+            WHERE status IN ('OPEN', 'IN_PROGRESS')
+        ) d
+        WHERE e.id = d.id AND d.rn > 1;
+    """)
+
+    op.execute("""
+        CREATE UNIQUE INDEX IF NOT EXISTS uq_exception_open_entity_type
+        ON "Exception" ("entityType", "entityId", type)
+        WHERE status IN ('OPEN', 'IN_PROGRESS');
+    """)
+
+
+def downgrade() -> None:
+    """Drop partial unique index for open exceptions"""
+    op.execute('DROP INDEX IF EXISTS uq_exception_open_entity_type;')
@@ -0,0 +1,47 @@
+"""DetectionRule Scan Watermark
+
+Revision ID: 005_detection_scan_watermark
+Revises: 004_exception_open_unique
+Create Date: 2026-10-17
+
+This migration adds:
+1. DetectionRule."scanWatermark", the high-water mark used by the scheduler
+   for incremental (updatedAt-driven) detection scans
+2. "updatedAt" indexes on the entities the detection engine scans
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = '005_detection_scan_watermark'
+down_revision: Union[str, None] = '004_exception_open_unique'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+SCANNED_TABLES = ["Order", "Delivery", "NDR", "Return", "Inventory"]
+
+
+def upgrade() -> None:
+    """Add DetectionRule scan watermark and updatedAt indexes"""
+    op.execute("""
+        ALTER TABLE "DetectionRule"
+        ADD COLUMN IF NOT EXISTS "scanWatermark" TIMESTAMP;
+    """)
+
+    for table in SCANNED_TABLES:
+        op.execute(f"""
+            CREATE INDEX IF NOT EXISTS "ix_{table.lower()}_updatedat"
+            ON "{table}" ("updatedAt");
+        """)
+
+
+def downgrade() -> None:
+    """Remove DetectionRule scan watermark and updatedAt indexes"""
+    for table in SCANNED_TABLES:
+        op.execute(f'DROP INDEX IF EXISTS "ix_{table.lower()}_updatedat";')
+
+    op.execute("""
+        ALTER TABLE "DetectionRule"
+        DROP COLUMN IF EXISTS "scanWatermark";
+    """)
@@ -0,0 +1,43 @@
+"""AnalyticsSnapshot Status Breakdown
+
+Revision ID: 006_analytics_snapshot_status
+Revises: 005_detection_scan_watermark
+Create Date: 2026-10-17
+
+This migration adds:
+1. AnalyticsSnapshot."statusBreakdown", order counts and revenue per status,
+   used to serve dashboard status widgets from snapshots
+2. A lookup index for the snapshot builder and dashboard read path
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = '006_analytics_snapshot_status'
+down_revision: Union[str, None] = '005_detection_scan_watermark'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Add AnalyticsSnapshot status breakdown and lookup index"""
+    op.execute("""
+        ALTER TABLE "AnalyticsSnapshot"
+        ADD COLUMN IF NOT EXISTS "statusBreakdown" JSONB;
+    """)
+
+    op.execute("""
+        CREATE INDEX IF NOT EXISTS "ix_analyticssnapshot_lookup"
+        ON "AnalyticsSnapshot" ("snapshotType", "companyId", "locationId", "snapshotDate");
+    """)
+
+
+def downgrade() -> None:
+    """Remove AnalyticsSnapshot status breakdown and lookup index"""
+    op.execute('DROP INDEX IF EXISTS "ix_analyticssnapshot_lookup";')
+
+    op.execute("""
+        ALTER TABLE "AnalyticsSnapshot"
+        DROP COLUMN IF EXISTS "statusBreakdown";
+    """)
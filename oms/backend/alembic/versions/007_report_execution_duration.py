@@ -0,0 +1,42 @@
+"""ReportExecution Duration
+
+Revision ID: 007_report_execution_duration
+Revises: 006_analytics_snapshot_status
+Create Date: 2026-10-17
+
+This migration adds:
+1. ReportExecution."durationMs", recorded by the background report worker
+2. An index for the worker's PENDING/RUNNING execution lookups
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = '007_report_execution_duration'
+down_revision: Union[str, None] = '006_analytics_snapshot_status'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Add ReportExecution duration and worker index"""
+    op.execute("""
+        ALTER TABLE "ReportExecution"
+        ADD COLUMN IF NOT EXISTS "durationMs" INTEGER;
+    """)
+
+    op.execute("""
+        CREATE INDEX IF NOT EXISTS "ix_reportexecution_status_createdat"
+        ON "ReportExecution" ("status", "createdAt");
+    """)
+
+
+def downgrade() -> None:
+    """Remove ReportExecution duration and worker index"""
+    op.execute('DROP INDEX IF EXISTS "ix_reportexecution_status_createdat";')
+
+    op.execute("""
+        ALTER TABLE "ReportExecution"
+        DROP COLUMN IF EXISTS "durationMs";
+    """)
@@ -0,0 +1,64 @@
+"""Exception Counters
+
+Revision ID: 008_exception_counters
+Revises: 007_report_execution_duration
+Create Date: 2026-10-17
+
+This migration adds:
+1. "ExceptionCounter", per-company exception counts by type, severity and
+   status, maintained by the detection engine and exception API
+2. Seeds the counters from existing exceptions
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = '008_exception_counters'
+down_revision: Union[str, None] = '007_report_execution_duration'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Create and seed ExceptionCounter"""
+    op.execute("""
+        CREATE TABLE IF NOT EXISTS "ExceptionCounter" (
+            id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+            "companyId" UUID NOT NULL REFERENCES "Company"(id),
+            type VARCHAR NOT NULL,
+            severity VARCHAR NOT NULL,
+            status VARCHAR NOT NULL,
+            count INTEGER NOT NULL DEFAULT 0,
+            "periodDate" DATE,
+            "periodCount" INTEGER NOT NULL DEFAULT 0,
+            "createdAt" TIMESTAMP DEFAULT NOW(),
+            "updatedAt" TIMESTAMP DEFAULT NOW()
+        );
+    """)
+
+    op.execute("""
+        CREATE UNIQUE INDEX IF NOT EXISTS "uq_exception_counter_key"
+        ON "ExceptionCounter" ("companyId", type, severity, status);
+    """)
+
+    op.execute("""
+        INSERT INTO "ExceptionCounter"
+            ("companyId", type, severity, status, count, "periodDate", "periodCount")
+        SELECT
+            "companyId", type, severity, status, COUNT(*), CURRENT_DATE,
+            COUNT(*) FILTER (WHERE CASE
+                WHEN status IN ('RESOLVED', 'CLOSED') THEN "resolvedAt"
+                WHEN status = 'OPEN' THEN "createdAt"
+                ELSE "updatedAt"
+            END >= CURRENT_DATE)
+        FROM "Exception"
+        GROUP BY "companyId", type, severity, status
+        ON CONFLICT ("companyId", type, severity, status) DO NOTHING;
+    """)
+
+
+def downgrade() -> None:
+    """Drop ExceptionCounter"""
+    op.execute('DROP INDEX IF EXISTS "uq_exception_counter_key";')
+    op.execute('DROP TABLE IF EXISTS "ExceptionCounter";')
@@ -0,0 +1,132 @@
+"""Performance Counters
+
+Revision ID: 009_performance_counters
+Revises: 008_exception_counters
+Create Date: 2026-10-17
+
+This migration adds:
+1. Outcome counters (on-time, late, NDR, transit days) to "CarrierPerformance",
+   "PincodePerformance" and "LanePerformance", plus the RTO count and success /
+   RTO rates "LanePerformance" was missing
+2. Unique bucket keys on the three tables, for additive upserts
+3. "PerformanceOutcome", the per delivery / shipment ledger of counted outcomes
+4. "PerformanceWatermark", the aggregation job's updatedAt high-water marks
+5. A "Shipment"."updatedAt" index for the job's incremental reads
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = '009_performance_counters'
+down_revision: Union[str, None] = '008_exception_counters'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+PERFORMANCE_TABLES = ["CarrierPerformance", "PincodePerformance", "LanePerformance"]
+
+COUNTER_COLUMNS = [
+    '"onTimeShipments" INTEGER NOT NULL DEFAULT 0',
+    '"lateShipments" INTEGER NOT NULL DEFAULT 0',
+    '"ndrShipments" INTEGER NOT NULL DEFAULT 0',
+    '"tatShipments" INTEGER NOT NULL DEFAULT 0',
+    '"tatDaysTotal" NUMERIC(14, 2) NOT NULL DEFAULT 0',
+]
+
+BUCKET_KEYS = {
+    "uq_carrier_performance_key": (
+        "CarrierPerformance",
+        '"companyId", "transporterId", "shipmentType", "periodStart"',
+    ),
+    "uq_pincode_performance_key": (
+        "PincodePerformance",
+        '"companyId", pincode, "transporterId", "periodStart"',
+    ),
+    "uq_lane_performance_key": (
+        "LanePerformance",
+        '"companyId", "originCity", "destinationCity", "transporterId", "shipmentType", "periodStart"',
+    ),
+}
+
+
+def upgrade() -> None:
+    """Add performance counters, outcome ledger and watermarks"""
+    for table in PERFORMANCE_TABLES:
+        for column in COUNTER_COLUMNS:
+            op.execute(f'ALTER TABLE "{table}" ADD COLUMN IF NOT EXISTS {column};')
+
+    op.execute("""
+        ALTER TABLE "LanePerformance"
+        ADD COLUMN IF NOT EXISTS "rtoShipments" INTEGER NOT NULL DEFAULT 0,
+        ADD COLUMN IF NOT EXISTS "successRate" NUMERIC(5, 2),
+        ADD COLUMN IF NOT EXISTS "rtoRate" NUMERIC(5, 2);
+    """)
+
+    for index, (table, columns) in BUCKET_KEYS.items():
+        op.execute(f"""
+            CREATE UNIQUE INDEX IF NOT EXISTS "{index}"
+            ON "{table}" ({columns});
+        """)
+
+    op.execute("""
+        CREATE TABLE IF NOT EXISTS "PerformanceOutcome" (
+            id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+            "companyId" UUID NOT NULL REFERENCES "Company"(id),
+            "sourceType" VARCHAR(20) NOT NULL,
+            "sourceId" UUID NOT NULL,
+            "transporterId" UUID NOT NULL,
+            "shipmentType" VARCHAR(20) NOT NULL,
+            "periodStart" TIMESTAMP NOT NULL,
+            pincode VARCHAR(10),
+            "originCity" VARCHAR(100),
+            "destinationCity" VARCHAR(100),
+            delivered BOOLEAN NOT NULL DEFAULT FALSE,
+            rto BOOLEAN NOT NULL DEFAULT FALSE,
+            "onTime" BOOLEAN,
+            ndr BOOLEAN NOT NULL DEFAULT FALSE,
+            "tatDays" NUMERIC(8, 2),
+            "createdAt" TIMESTAMP DEFAULT NOW(),
+            "updatedAt" TIMESTAMP DEFAULT NOW()
+        );
+    """)
+
+    op.execute("""
+        CREATE UNIQUE INDEX IF NOT EXISTS "uq_performance_outcome_source"
+        ON "PerformanceOutcome" ("sourceType", "sourceId");
+    """)
+
+    op.execute("""
+        CREATE TABLE IF NOT EXISTS "PerformanceWatermark" (
+            id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+            source VARCHAR(20) NOT NULL UNIQUE,
+            watermark TIMESTAMP NOT NULL,
+            "createdAt" TIMESTAMP DEFAULT NOW(),
+            "updatedAt" TIMESTAMP DEFAULT NOW()
+        );
+    """)
+
+    op.execute("""
+        CREATE INDEX IF NOT EXISTS "ix_shipment_updatedat"
+        ON "Shipment" ("updatedAt");
+    """)
+
+
+def downgrade() -> None:
+    """Drop performance counters, outcome ledger and watermarks"""
+    op.execute('DROP INDEX IF EXISTS "ix_shipment_updatedat";')
+    op.execute('DROP TABLE IF EXISTS "PerformanceWatermark";')
+    op.execute('DROP INDEX IF EXISTS "uq_performance_outcome_source";')
+    op.execute('DROP TABLE IF EXISTS "PerformanceOutcome";')
+
+    for index in BUCKET_KEYS:
+        op.execute(f'DROP INDEX IF EXISTS "{index}";')
+
+    op.execute("""
+        ALTER TABLE "LanePerformance"
+        DROP COLUMN IF EXISTS "rtoShipments",
+        DROP COLUMN IF EXISTS "successRate",
+        DROP COLUMN IF EXISTS "rtoRate";
+    """)
+    for table in PERFORMANCE_TABLES:
+        for column in COUNTER_COLUMNS:
+            op.execute(f'ALTER TABLE "{table}" DROP COLUMN IF EXISTS {column.split()[0]};')
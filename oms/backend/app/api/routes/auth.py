@@ -13,7 +13,7 @@ router = APIRouter()
 
 
 @router.post("/login", response_model=LoginResponse)
-async def login(request: LoginRequest, db: Session = Depends(get_db)):
+def login(request: LoginRequest, db: Session = Depends(get_db)):
     try:
         user = db.query(User).filter(User.email == request.email).first()
     except Exception as e:
@@ -80,7 +80,7 @@ async def login(request: LoginRequest, db: Session = Depends(get_db)):
 
 
 @router.get("/me", response_model=UserResponse)
-async def get_current_user_info(
+def get_current_user_info(
     db: Session = Depends(get_db),
     current_user: User = Depends(get_db)
 ):
@@ -53,7 +53,7 @@ class BrandResponse(BaseModel):
 
 
 @router.get("", response_model=List[BrandResponse])
-async def list_brands(
+def list_brands(
     page: int = Query(1, ge=1),
     pageSize: int = Query(10, ge=1, le=100),
     search: Optional[str] = None,
@@ -80,7 +80,7 @@ async def list_brands(
 
 
 @router.post("", response_model=BrandResponse, status_code=status.HTTP_201_CREATED)
-async def create_brand(
+def create_brand(
     brand_data: BrandCreate,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
@@ -107,7 +107,7 @@ async def create_brand(
 
 
 @router.get("/{brand_id}", response_model=BrandResponse)
-async def get_brand(
+def get_brand(
     brand_id: str,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
@@ -122,7 +122,7 @@ async def get_brand(
 
 
 @router.patch("/{brand_id}", response_model=BrandResponse)
-async def update_brand(
+def update_brand(
     brand_id: str,
     brand_data: BrandUpdate,
     db: Session = Depends(get_db),
@@ -146,7 +146,7 @@ async def update_brand(
 
 
 @router.delete("/{brand_id}")
-async def delete_brand(
+def delete_brand(
     brand_id: str,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
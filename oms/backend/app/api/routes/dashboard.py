@@ -15,7 +15,7 @@ router = APIRouter()
 
 
 @router.get("")
-async def get_dashboard(
+def get_dashboard(
     locationId: Optional[str] = None,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
@@ -97,7 +97,7 @@ async def get_dashboard(
 
 
 @router.get("/analytics")
-async def get_analytics(
+def get_analytics(
     locationId: Optional[str] = None,
     period: str = Query("week", enum=["day", "week", "month", "year"]),
     db: Session = Depends(get_db),
@@ -48,7 +48,7 @@ class InventoryMove(BaseModel):
 
 
 @router.get("", response_model=List[LegacyInventoryResponse])
-async def list_inventory(
+def list_inventory(
     page: int = Query(1, ge=1),
     pageSize: int = Query(10, ge=1, le=100),
     locationId: Optional[str] = None,
@@ -93,7 +93,7 @@ async def list_inventory(
 
 
 @router.get("/summary")
-async def get_inventory_summary(
+def get_inventory_summary(
     locationId: Optional[str] = None,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
@@ -118,7 +118,7 @@ async def get_inventory_summary(
 
 
 @router.post("/adjustments")
-async def create_adjustment(
+def create_adjustment(
     adjustment: InventoryAdjustment,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
@@ -146,7 +146,7 @@ async def create_adjustment(
 
 
 @router.post("/move")
-async def move_inventory(
+def move_inventory(
     move: InventoryMove,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
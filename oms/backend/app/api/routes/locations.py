@@ -50,7 +50,7 @@ class LocationResponse(BaseModel):
 
 
 @router.get("", response_model=List[LocationResponse])
-async def list_locations(
+def list_locations(
     page: int = Query(1, ge=1),
     pageSize: int = Query(10, ge=1, le=100),
     type: Optional[LocationType] = None,
@@ -74,7 +74,7 @@ async def list_locations(
 
 
 @router.post("", response_model=LocationResponse, status_code=status.HTTP_201_CREATED)
-async def create_location(
+def create_location(
     location_data: LocationCreate,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
@@ -104,7 +104,7 @@ async def create_location(
 
 
 @router.get("/{location_id}", response_model=LocationResponse)
-async def get_location(
+def get_location(
     location_id: str,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
@@ -119,7 +119,7 @@ async def get_location(
 
 
 @router.patch("/{location_id}", response_model=LocationResponse)
-async def update_location(
+def update_location(
     location_id: str,
     location_data: LocationUpdate,
     db: Session = Depends(get_db),
@@ -63,7 +63,7 @@ class OrderResponse(BaseModel):
 
 
 @router.get("", response_model=List[OrderResponse])
-async def list_orders(
+def list_orders(
     page: int = Query(1, ge=1),
     pageSize: int = Query(10, ge=1, le=100),
     status: Optional[OrderStatus] = None,
@@ -106,7 +106,7 @@ async def list_orders(
 
 
 @router.get("/count")
-async def get_order_counts(
+def get_order_counts(
     locationId: Optional[str] = None,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
@@ -127,7 +127,7 @@ async def get_order_counts(
 
 
 @router.post("", response_model=OrderResponse, status_code=status.HTTP_201_CREATED)
-async def create_order(
+def create_order(
     order_data: OrderCreate,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
@@ -185,7 +185,7 @@ async def create_order(
 
 
 @router.get("/{order_id}", response_model=OrderResponse)
-async def get_order(
+def get_order(
     order_id: str,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
@@ -200,7 +200,7 @@ async def get_order(
 
 
 @router.patch("/{order_id}/status")
-async def update_order_status(
+def update_order_status(
     order_id: str,
     new_status: OrderStatus,
     db: Session = Depends(get_db),
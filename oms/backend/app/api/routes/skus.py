@@ -63,7 +63,7 @@ class SKUResponse(BaseModel):
 
 
 @router.get("", response_model=List[SKUResponse])
-async def list_skus(
+def list_skus(
     page: int = Query(1, ge=1),
     pageSize: int = Query(10, ge=1, le=100),
     search: Optional[str] = None,
@@ -98,7 +98,7 @@ async def list_skus(
 
 
 @router.post("", response_model=SKUResponse, status_code=status.HTTP_201_CREATED)
-async def create_sku(
+def create_sku(
     sku_data: SKUCreate,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
@@ -128,7 +128,7 @@ async def create_sku(
 
 
 @router.get("/{sku_id}", response_model=SKUResponse)
-async def get_sku(
+def get_sku(
     sku_id: str,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
@@ -143,7 +143,7 @@ async def get_sku(
 
 
 @router.patch("/{sku_id}", response_model=SKUResponse)
-async def update_sku(
+def update_sku(
     sku_id: str,
     sku_data: SKUUpdate,
     db: Session = Depends(get_db),
@@ -167,7 +167,7 @@ async def update_sku(
 
 
 @router.delete("/{sku_id}")
-async def delete_sku(
+def delete_sku(
     sku_id: str,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
@@ -5,6 +5,7 @@ from pydantic import BaseModel, EmailStr
 import uuid
 
 from ...core.database import get_db
+from ...core.principals import principal_cache
 from ...core.security import get_password_hash
 from ...models.user import User, UserRole
 from ..deps import get_current_user
@@ -45,7 +46,7 @@ class UserResponse(BaseModel):
 
 
 @router.get("", response_model=List[UserResponse])
-async def list_users(
+def list_users(
     page: int = Query(1, ge=1),
     pageSize: int = Query(10, ge=1, le=100),
     search: Optional[str] = None,
@@ -71,7 +72,7 @@ async def list_users(
 
 
 @router.post("", response_model=UserResponse, status_code=status.HTTP_201_CREATED)
-async def create_user(
+def create_user(
     user_data: UserCreate,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
@@ -102,7 +103,7 @@ async def create_user(
 
 
 @router.get("/{user_id}", response_model=UserResponse)
-async def get_user(
+def get_user(
     user_id: str,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
@@ -117,7 +118,7 @@ async def get_user(
 
 
 @router.patch("/{user_id}", response_model=UserResponse)
-async def update_user(
+def update_user(
     user_id: str,
     user_data: UserUpdate,
     db: Session = Depends(get_db),
@@ -135,13 +136,14 @@ async def update_user(
         setattr(user, field, value)
 
     db.commit()
+    principal_cache.invalidate(user.id)
     db.refresh(user)
 
     return UserResponse.model_validate(user)
 
 
 @router.delete("/{user_id}")
-async def delete_user(
+def delete_user(
     user_id: str,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
@@ -153,7 +155,9 @@ async def delete_user(
             detail="User not found"
         )
 
+    deleted_id = user.id
     db.delete(user)
     db.commit()
+    principal_cache.invalidate(deleted_id)
 
     return {"message": "User deleted successfully"}
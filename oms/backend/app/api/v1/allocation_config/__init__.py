@@ -16,9 +16,11 @@ from app.models import (
     ShippingAllocationRule, ShippingAllocationRuleCreate, ShippingAllocationRuleUpdate, ShippingAllocationRuleResponse,
     AllocationAudit, AllocationAuditResponse,
     ShipmentType, AllocationMode, AllocationDecisionReason,
+    AllocationPreviewRequest, DeliveryAllocationRequest,
     Transporter,
     User
 )
+from app.services.carrier_allocation import allocate_deliveries, allocate_shipments, allocation_policy
 
 router = APIRouter(prefix="/allocation-config", tags=["Allocation Configuration"])
 
@@ -174,6 +176,7 @@ def create_csr_config(
     session.add(config)
     session.commit()
     session.refresh(config)
+    allocation_policy.invalidate(config.companyId)
     return CSRScoreConfigResponse.model_validate(config)
 
 
@@ -232,6 +235,7 @@ def update_csr_config(
     session.add(config)
     session.commit()
     session.refresh(config)
+    allocation_policy.invalidate(config.companyId)
     return CSRScoreConfigResponse.model_validate(config)
 
 
@@ -254,8 +258,10 @@ def delete_csr_config(
     if config.isDefault:
         raise HTTPException(status_code=400, detail="Cannot delete default CSR config")
 
+    company_id = config.companyId
     session.delete(config)
     session.commit()
+    allocation_policy.invalidate(company_id)
 
 
 # ============================================================================
@@ -415,6 +421,7 @@ def create_allocation_rule(
     session.add(rule)
     session.commit()
     session.refresh(rule)
+    allocation_policy.invalidate(rule.companyId)
 
     response = ShippingAllocationRuleResponse.model_validate(rule)
     if transporter:
@@ -454,6 +461,7 @@ def update_allocation_rule(
     session.add(rule)
     session.commit()
     session.refresh(rule)
+    allocation_policy.invalidate(rule.companyId)
 
     response = ShippingAllocationRuleResponse.model_validate(rule)
     if rule.transporterId:
@@ -487,6 +495,7 @@ def delete_allocation_rule(
     rule.isActive = False
     session.add(rule)
     session.commit()
+    allocation_policy.invalidate(rule.companyId)
 
 
 @router.post("/rules/{rule_id}/reorder")
@@ -511,6 +520,7 @@ def reorder_allocation_rule(
     session.add(rule)
     session.commit()
     session.refresh(rule)
+    allocation_policy.invalidate(rule.companyId)
 
     return {
         "id": str(rule.id),
@@ -520,6 +530,55 @@ def reorder_allocation_rule(
     }
 
 
+# ============================================================================
+# Carrier Allocation Endpoints
+# ============================================================================
+
+@router.post("/allocate/preview")
+def preview_carrier_allocation(
+    data: AllocationPreviewRequest,
+    company_filter: CompanyFilter = Depends(),
+    session: Session = Depends(get_session),
+    current_user: User = Depends(get_current_user)
+):
+    """Allocate carriers to shipments without assigning or auditing."""
+    decisions = allocate_shipments(session, company_filter.company_id, data.shipments)
+    return {
+        "total": len(decisions),
+        "allocated": sum(1 for d in decisions if d.transporter_id),
+        "results": [
+            {"index": i, "reference": shipment.reference, **decision.as_dict()}
+            for i, (shipment, decision) in enumerate(zip(data.shipments, decisions))
+        ],
+    }
+
+
+@router.post("/allocate/deliveries")
+def allocate_delivery_carriers(
+    data: DeliveryAllocationRequest,
+    company_filter: CompanyFilter = Depends(),
+    session: Session = Depends(get_session),
+    current_user: User = Depends(get_current_user),
+    _: None = Depends(require_manager())
+):
+    """Allocate carriers to a batch of deliveries and audit each decision."""
+    results = allocate_deliveries(
+        session,
+        company_filter.company_id,
+        data.deliveryIds,
+        allocated_by_id=current_user.id,
+        dry_run=data.dryRun,
+    )
+    if not data.dryRun:
+        session.commit()
+    return {
+        "total": len(results),
+        "allocated": sum(1 for r in results if r["allocated"]),
+        "applied": sum(1 for r in results if r["applied"]),
+        "results": results,
+    }
+
+
 # ============================================================================
 # Allocation Audit Endpoints
 # ============================================================================
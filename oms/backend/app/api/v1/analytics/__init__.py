@@ -1,12 +1,14 @@
 """
 Analytics API v1 - Snapshots, Forecasts, Scheduled Reports, Performance Analytics
 """
+import os
 from datetime import datetime
 from typing import List, Optional
 from uuid import UUID
 from decimal import Decimal
 
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, status, Query
+from fastapi.responses import FileResponse
 from sqlmodel import Session, select, func
 
 from app.core.database import get_session
@@ -23,6 +25,8 @@ from app.models import (
     ShipmentType,
     User
 )
+from app.services.analytics_snapshots import build_analytics_snapshots
+from app.services.scheduler import run_demand_forecast_job
 
 router = APIRouter(prefix="/analytics", tags=["Analytics"])
 
@@ -106,6 +110,22 @@ def get_snapshot(
     return AnalyticsSnapshotResponse.model_validate(snapshot)
 
 
+@router.post("/snapshots/build")
+def build_snapshots(
+    company_filter: CompanyFilter = Depends(),
+    session: Session = Depends(get_session),
+    current_user: User = Depends(get_current_user),
+    _: None = Depends(require_manager())
+):
+    """
+    Build pending snapshots now instead of waiting for the scheduled job.
+    Incremental: only days after the last snapshot plus the lookback window.
+    """
+    result = build_analytics_snapshots(session, company_id=company_filter.company_id)
+    session.commit()
+    return result
+
+
 # ============================================================================
 # Demand Forecast Endpoints
 # ============================================================================
@@ -166,6 +186,18 @@ def get_sku_forecasts(
     return [DemandForecastResponse.model_validate(f) for f in forecasts]
 
 
+@router.post("/forecasts/run")
+def run_forecasts(
+    background_tasks: BackgroundTasks,
+    company_filter: CompanyFilter = Depends(),
+    current_user: User = Depends(get_current_user),
+    _: None = Depends(require_manager())
+):
+    """Refit demand forecasts in the background instead of waiting for the nightly job."""
+    background_tasks.add_task(run_demand_forecast_job, company_id=company_filter.company_id)
+    return {"message": "Demand forecast started"}
+
+
 # ============================================================================
 # Scheduled Report Endpoints
 # ============================================================================
@@ -287,7 +319,7 @@ def run_scheduled_report(
     session: Session = Depends(get_session),
     current_user: User = Depends(require_manager)
 ):
-    """Manually run a scheduled report."""
+    """Manually run a scheduled report. The report worker picks up the execution."""
     query = select(ScheduledReport).where(ScheduledReport.id == report_id)
     if company_filter.company_id:
         query = query.where(ScheduledReport.companyId == company_filter.company_id)
@@ -342,6 +374,31 @@ def get_report_execution(
     return ReportExecutionResponse.model_validate(execution)
 
 
+@router.get("/executions/{execution_id}/download")
+def download_report_execution(
+    execution_id: UUID,
+    company_filter: CompanyFilter = Depends(),
+    session: Session = Depends(get_session),
+    current_user: User = Depends(get_current_user)
+):
+    """Download the file written by a completed report execution."""
+    query = (
+        select(ReportExecution)
+        .join(ScheduledReport, ScheduledReport.id == ReportExecution.scheduledReportId)
+        .where(ReportExecution.id == execution_id)
+    )
+    if company_filter.company_id:
+        query = query.where(ScheduledReport.companyId == company_filter.company_id)
+
+    execution = session.exec(query).first()
+    if not execution:
+        raise HTTPException(status_code=404, detail="Execution not found")
+    if execution.status != "COMPLETED" or not execution.fileUrl or not os.path.exists(execution.fileUrl):
+        raise HTTPException(status_code=404, detail="Report file not available")
+
+    return FileResponse(execution.fileUrl, filename=os.path.basename(execution.fileUrl))
+
+
 # ============================================================================
 # Carrier Performance / Scorecard Endpoints
 # ============================================================================
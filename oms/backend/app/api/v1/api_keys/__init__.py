@@ -16,6 +16,7 @@ from app.models.api_key import (
     APIKeyResponse,
     APIKeyCreatedResponse,
 )
+from app.services.api_key_auth import api_key_authenticator
 
 router = APIRouter(prefix="/api-keys", tags=["API Keys Management"])
 
@@ -175,6 +176,7 @@ def update_api_key(
     session.add(api_key)
     session.commit()
     session.refresh(api_key)
+    api_key_authenticator.invalidate(api_key.id)
 
     return APIKeyResponse.model_validate(api_key)
 
@@ -210,6 +212,7 @@ def delete_api_key(
     api_key.isActive = False
     session.add(api_key)
     session.commit()
+    api_key_authenticator.invalidate(api_key.id)
 
     return None
 
@@ -252,6 +255,7 @@ def regenerate_api_key(
     session.add(api_key)
     session.commit()
     session.refresh(api_key)
+    api_key_authenticator.invalidate(api_key.id, discard_uses=True)
 
     # Return with full key
     response = APIKeyCreatedResponse.model_validate(api_key)
@@ -559,7 +559,7 @@ def update_asn_item(
 # ============================================================================
 
 @router.post("/upload", response_model=UploadResult)
-async def upload_asns(
+def upload_asns(
     file: UploadFile = File(...),
     location_id: UUID = Query(...),
     company_filter: CompanyFilter = Depends(),
@@ -589,7 +589,7 @@ async def upload_asns(
         )
 
     # Read file content
-    content = await file.read()
+    content = file.file.read()
     file_size = len(content)
 
     # Create upload batch
@@ -72,12 +72,26 @@ def login(
     )
 
 
+def _load_user(session: Session, current_user) -> User:
+    """The User row of the authenticated principal."""
+    user = session.get(User, current_user.id)
+    if not user:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="User not found"
+        )
+    return user
+
+
 @router.get("/me", response_model=UserResponse)
-def get_me(current_user: User = Depends(get_current_user)):
+def get_me(
+    session: Session = Depends(get_session),
+    current_user: User = Depends(get_current_user)
+):
     """
     Get current authenticated user's profile.
     """
-    return UserResponse.model_validate(current_user)
+    return UserResponse.model_validate(_load_user(session, current_user))
 
 
 @router.patch("/me", response_model=UserResponse)
@@ -94,23 +108,28 @@ def update_me(
     allowed_fields = {"name", "phone", "avatar"}
     update_dict = update_data.model_dump(exclude_unset=True)
 
+    user = _load_user(session, current_user)
     for field, value in update_dict.items():
         if field in allowed_fields:
-            setattr(current_user, field, value)
+            setattr(user, field, value)
 
-    session.add(current_user)
+    session.add(user)
     session.commit()
-    session.refresh(current_user)
+    session.refresh(user)
 
-    return UserResponse.model_validate(current_user)
+    return UserResponse.model_validate(user)
 
 
 @router.post("/refresh", response_model=UserLoginResponse)
-def refresh_token(current_user: User = Depends(get_current_user)):
+def refresh_token(
+    session: Session = Depends(get_session),
+    current_user: User = Depends(get_current_user)
+):
     """
     Refresh access token.
     Returns a new JWT access token.
     """
+    user = _load_user(session, current_user)
     token = create_access_token(data={
         "user_id": str(current_user.id),
         "email": current_user.email,
@@ -118,7 +137,7 @@ def refresh_token(current_user: User = Depends(get_current_user)):
     })
 
     return UserLoginResponse(
-        user=UserResponse.model_validate(current_user),
+        user=UserResponse.model_validate(user),
         token=token,
         expiresIn=3600  # 1 hour
     )
@@ -1,5 +1,9 @@
 """
 Dashboard API v1 - Dashboard statistics and analytics
+
+Order KPIs reflect current order status, from one live query grouped by
+status. Trends are served from AnalyticsSnapshot rows for closed days plus a
+live delta for orders placed since (see services/analytics_snapshots.py).
 """
 from datetime import datetime, timedelta
 from typing import Optional
@@ -9,8 +13,10 @@ from fastapi import APIRouter, Depends, Query
 from sqlmodel import Session, select, func
 
 from app.core.database import get_session
-from app.core.deps import get_current_user
+from app.core.deps import get_current_user, CompanyFilter
 from app.models import Order, OrderStatus, Inventory, SKU, Location, User
+from app.services.analytics_snapshots import get_daily_order_trend
+from app.services.dashboard_stats import dashboard_cache, order_status_summary
 
 router = APIRouter(prefix="/dashboard", tags=["Dashboard"])
 
@@ -18,6 +24,7 @@ router = APIRouter(prefix="/dashboard", tags=["Dashboard"])
 @router.get("")
 def get_dashboard(
     locationId: Optional[UUID] = None,
+    company_filter: CompanyFilter = Depends(),
     session: Session = Depends(get_session),
     current_user: User = Depends(get_current_user)
 ):
@@ -25,75 +32,57 @@ def get_dashboard(
     Get dashboard statistics.
     Returns order counts, revenue, inventory stats, and order status breakdown.
     """
-    today = datetime.now().date()
-    today_start = datetime.combine(today, datetime.min.time())
-    today_end = datetime.combine(today, datetime.max.time())
+    # Shared by concurrent requests for DASHBOARD_CACHE_TTL_SECONDS
+    return dashboard_cache.get_or_compute(
+        ("dashboard", company_filter.company_id, locationId),
+        lambda: _build_dashboard(session, company_filter.company_id, locationId),
+    )
 
-    # Build base query with optional location filter
-    base_filter = []
+
+def _build_dashboard(session: Session, company_id: Optional[UUID], locationId: Optional[UUID]) -> dict:
+    # Order counts and revenue by current status (one grouped query)
+    order_filters = []
+    if company_id:
+        order_filters.append(Order.companyId == company_id)
     if locationId:
-        base_filter.append(Order.locationId == locationId)
-
-    # Total orders
-    total_query = select(func.count(Order.id))
-    if base_filter:
-        total_query = total_query.where(*base_filter)
-    total_orders = session.exec(total_query).one() or 0
-
-    # Today's orders
-    today_query = select(func.count(Order.id)).where(
-        Order.orderDate >= today_start,
-        Order.orderDate <= today_end
-    )
-    if base_filter:
-        today_query = today_query.where(*base_filter)
-    today_orders = session.exec(today_query).one() or 0
+        order_filters.append(Order.locationId == locationId)
+    summary = order_status_summary(session, order_filters)
+    status_counts = summary["statusCounts"]
+
+    def orders_in(*statuses) -> int:
+        return sum(status_counts.get(s.value, 0) for s in statuses)
 
     # Pending orders (CREATED, CONFIRMED, ALLOCATED)
-    pending_statuses = [OrderStatus.CREATED, OrderStatus.CONFIRMED, OrderStatus.ALLOCATED]
-    pending_query = select(func.count(Order.id)).where(Order.status.in_(pending_statuses))
-    if base_filter:
-        pending_query = pending_query.where(*base_filter)
-    pending_orders = session.exec(pending_query).one() or 0
-
-    # Shipped orders
-    shipped_query = select(func.count(Order.id)).where(Order.status == OrderStatus.SHIPPED)
-    if base_filter:
-        shipped_query = shipped_query.where(*base_filter)
-    shipped_orders = session.exec(shipped_query).one() or 0
-
-    # Delivered orders
-    delivered_query = select(func.count(Order.id)).where(Order.status == OrderStatus.DELIVERED)
-    if base_filter:
-        delivered_query = delivered_query.where(*base_filter)
-    delivered_orders = session.exec(delivered_query).one() or 0
+    pending_orders = orders_in(OrderStatus.CREATED, OrderStatus.CONFIRMED, OrderStatus.ALLOCATED)
+    shipped_orders = orders_in(OrderStatus.SHIPPED)
+    delivered_orders = orders_in(OrderStatus.DELIVERED)
 
     # Total revenue (from delivered orders)
-    revenue_query = select(func.sum(Order.totalAmount)).where(Order.status == OrderStatus.DELIVERED)
-    if base_filter:
-        revenue_query = revenue_query.where(*base_filter)
-    total_revenue = session.exec(revenue_query).one() or 0
+    total_revenue = summary["statusAmounts"].get(OrderStatus.DELIVERED.value, 0)
 
     # Inventory stats
     inv_query = select(func.sum(Inventory.quantity))
     if locationId:
         inv_query = inv_query.where(Inventory.locationId == locationId)
+    if company_id:
+        inv_query = inv_query.join(Location, Location.id == Inventory.locationId).where(
+            Location.companyId == company_id
+        )
     total_inventory = session.exec(inv_query).one() or 0
 
     # Total SKUs
-    total_skus = session.exec(select(func.count(SKU.id))).one() or 0
+    sku_query = select(func.count(SKU.id))
+    if company_id:
+        sku_query = sku_query.where(SKU.companyId == company_id)
+    total_skus = session.exec(sku_query).one() or 0
 
     # Order status breakdown
-    status_query = select(Order.status, func.count(Order.id)).group_by(Order.status)
-    if base_filter:
-        status_query = status_query.where(*base_filter)
-    status_results = session.exec(status_query).all()
-    order_by_status = {str(status.value) if hasattr(status, 'value') else str(status): count for status, count in status_results}
+    order_by_status = {status: count for status, count in status_counts.items() if count}
 
     return {
         "summary": {
-            "totalOrders": total_orders,
-            "todayOrders": today_orders,
+            "totalOrders": summary["totalOrders"],
+            "todayOrders": summary["todayOrders"],
             "pendingOrders": pending_orders,
             "shippedOrders": shipped_orders,
             "deliveredOrders": delivered_orders,
@@ -110,13 +99,14 @@ def get_dashboard(
 def get_analytics(
     locationId: Optional[UUID] = None,
     period: str = Query("week", pattern="^(day|week|month|year)$"),
+    company_filter: CompanyFilter = Depends(),
     session: Session = Depends(get_session),
     current_user: User = Depends(get_current_user)
 ):
     """
     Get dashboard analytics - order trends over time.
     """
-    today = datetime.now().date()
+    today = datetime.utcnow().date()
 
     if period == "day":
         start_date = today
@@ -129,32 +119,22 @@ def get_analytics(
 
     start_datetime = datetime.combine(start_date, datetime.min.time())
 
-    # Daily order trend
-    trend_query = select(
-        func.date(Order.orderDate).label("date"),
-        func.count(Order.id).label("count"),
-        func.sum(Order.totalAmount).label("revenue")
-    ).where(
-        Order.orderDate >= start_datetime
-    ).group_by(
-        func.date(Order.orderDate)
-    ).order_by(
-        func.date(Order.orderDate)
+    # Daily order trend, shared by concurrent requests for DASHBOARD_CACHE_TTL_SECONDS
+    trend = dashboard_cache.get_or_compute(
+        ("analytics", company_filter.company_id, locationId, start_datetime),
+        lambda: get_daily_order_trend(
+            session, start_datetime, company_filter.company_id, locationId
+        ),
     )
 
-    if locationId:
-        trend_query = trend_query.where(Order.locationId == locationId)
-
-    results = session.exec(trend_query).all()
-
     return {
         "period": period,
         "orderTrend": [
             {
-                "date": str(row.date),
-                "orders": row.count,
-                "revenue": float(row.revenue) if row.revenue else 0
+                "date": point["date"],
+                "orders": point["orders"],
+                "revenue": point["revenue"]
             }
-            for row in results
+            for point in trend
         ]
     }
@@ -5,7 +5,7 @@ from datetime import datetime
 from typing import List, Optional
 from uuid import UUID, uuid4
 
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, status, Query, BackgroundTasks
 from sqlmodel import Session, select, func
 
 from app.core.database import get_session
@@ -18,9 +18,15 @@ from app.models.detection_rule import (
     DetectionRuleBrief,
 )
 from app.models.user import User
+from app.services.scheduler import run_detection_engine
 
 router = APIRouter(prefix="/detection-rules", tags=["Detection Rules"])
 
+# Updating any of these invalidates the rule's incremental scan watermark
+SCAN_AFFECTING_FIELDS = {
+    "conditions", "severityRules", "severityField", "severityUnit", "defaultSeverity",
+}
+
 
 @router.get("", response_model=List[DetectionRuleResponse])
 def list_detection_rules(
@@ -138,6 +144,10 @@ def update_detection_rule(
     for field, value in update_data.items():
         setattr(rule, field, value)
 
+    # Matching logic changed: next scheduler run must rescan everything
+    if SCAN_AFFECTING_FIELDS & update_data.keys():
+        rule.scanWatermark = None
+
     rule.updatedAt = datetime.utcnow()
     session.add(rule)
     session.commit()
@@ -175,6 +185,9 @@ def toggle_detection_rule(
         raise HTTPException(status_code=404, detail="Detection rule not found")
 
     rule.isActive = not rule.isActive
+    if rule.isActive:
+        # Changes while inactive were never scanned
+        rule.scanWatermark = None
     rule.updatedAt = datetime.utcnow()
     session.add(rule)
     session.commit()
@@ -183,6 +196,19 @@ def toggle_detection_rule(
     return DetectionRuleResponse.model_validate(rule)
 
 
+@router.post("/full-rescan")
+def trigger_full_rescan(
+    background_tasks: BackgroundTasks,
+    _: None = Depends(require_admin())
+):
+    """
+    Run the scheduler's detection engine once with a full rescan,
+    ignoring incremental scan watermarks. Admin only.
+    """
+    background_tasks.add_task(run_detection_engine, full_rescan=True)
+    return {"message": "Full detection rescan started"}
+
+
 @router.post("/seed-ndr-rules")
 def seed_ndr_detection_rules(
     session: Session = Depends(get_session),
@@ -457,7 +457,7 @@ def delete_po_item(
 # ============================================================================
 
 @router.post("/upload", response_model=UploadResult)
-async def upload_external_pos(
+def upload_external_pos(
     file: UploadFile = File(...),
     location_id: UUID = Query(...),
     company_filter: CompanyFilter = Depends(),
@@ -487,7 +487,7 @@ async def upload_external_pos(
         )
 
     # Read file content
-    content = await file.read()
+    content = file.file.read()
     file_size = len(content)
 
     # Create upload batch
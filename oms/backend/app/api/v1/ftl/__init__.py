@@ -19,6 +19,7 @@ from app.models import (
     VehicleCategory, FTLIndentStatus,
     User
 )
+from app.services.lane_rates import lane_rate_index
 
 router = APIRouter(prefix="/ftl", tags=["FTL - Full Truck Load"])
 
@@ -156,6 +157,7 @@ def update_vehicle_type(
 
     session.add(vehicle_type)
     session.commit()
+    lane_rate_index.invalidate(vehicle_type.companyId)
     session.refresh(vehicle_type)
     return FTLVehicleTypeMasterResponse.model_validate(vehicle_type)
 
@@ -179,6 +181,7 @@ def delete_vehicle_type(
     vehicle_type.isActive = False
     session.add(vehicle_type)
     session.commit()
+    lane_rate_index.invalidate(vehicle_type.companyId)
 
 
 # ============================================================================
@@ -327,6 +330,7 @@ def update_vendor(
 
     session.add(vendor)
     session.commit()
+    lane_rate_index.invalidate(vendor.companyId)
     session.refresh(vendor)
     return FTLVendorResponse.model_validate(vendor)
 
@@ -350,6 +354,7 @@ def delete_vendor(
     vendor.isActive = False
     session.add(vendor)
     session.commit()
+    lane_rate_index.invalidate(vendor.companyId)
 
 
 # ============================================================================
@@ -504,6 +509,7 @@ def create_lane_rate(
 
     session.add(lane_rate)
     session.commit()
+    lane_rate_index.invalidate(lane_rate.companyId)
     session.refresh(lane_rate)
 
     response = FTLLaneRateResponse.model_validate(lane_rate)
@@ -535,6 +541,7 @@ def update_lane_rate(
 
     session.add(lane_rate)
     session.commit()
+    lane_rate_index.invalidate(lane_rate.companyId)
     session.refresh(lane_rate)
 
     response = FTLLaneRateResponse.model_validate(lane_rate)
@@ -569,6 +576,7 @@ def delete_lane_rate(
     lane_rate.isActive = False
     session.add(lane_rate)
     session.commit()
+    lane_rate_index.invalidate(lane_rate.companyId)
 
 
 # ============================================================================
@@ -585,52 +593,8 @@ def compare_rates(
     current_user: User = Depends(get_current_user)
 ):
     """Compare FTL rates from all vendors for a lane."""
-    query = select(FTLLaneRate).where(
-        FTLLaneRate.originCity.ilike(f"%{origin_city}%"),
-        FTLLaneRate.destinationCity.ilike(f"%{destination_city}%"),
-        FTLLaneRate.isActive == True,
-        FTLLaneRate.validFrom <= datetime.utcnow(),
-        (FTLLaneRate.validTo.is_(None)) | (FTLLaneRate.validTo >= datetime.utcnow())
-    )
-
-    if company_filter.company_id:
-        query = query.where(FTLLaneRate.companyId == company_filter.company_id)
-    if vehicle_type_id:
-        query = query.where(FTLLaneRate.vehicleTypeId == vehicle_type_id)
-
-    query = query.order_by(FTLLaneRate.baseRate)
-    lane_rates = session.exec(query).all()
-
-    # Build comparison result
-    result = []
-    for lr in lane_rates:
-        vendor = session.get(FTLVendor, lr.vendorId)
-        vt = session.get(FTLVehicleTypeMaster, lr.vehicleTypeId)
-
-        total_rate = lr.baseRate
-        if lr.loadingCharges:
-            total_rate += lr.loadingCharges
-        if lr.unloadingCharges:
-            total_rate += lr.unloadingCharges
-        if lr.tollCharges:
-            total_rate += lr.tollCharges
-
-        result.append({
-            "laneRateId": str(lr.id),
-            "vendorId": str(lr.vendorId),
-            "vendorName": vendor.name if vendor else "Unknown",
-            "vendorCode": vendor.code if vendor else "N/A",
-            "vehicleTypeId": str(lr.vehicleTypeId),
-            "vehicleTypeName": vt.name if vt else "Unknown",
-            "capacityKg": vt.capacityKg if vt else 0,
-            "baseRate": float(lr.baseRate),
-            "loadingCharges": float(lr.loadingCharges or 0),
-            "unloadingCharges": float(lr.unloadingCharges or 0),
-            "tollCharges": float(lr.tollCharges or 0),
-            "totalRate": float(total_rate),
-            "transitDays": lr.transitDays,
-            "reliabilityScore": float(vendor.reliabilityScore) if vendor and vendor.reliabilityScore else None
-        })
+    rates = lane_rate_index.get(session, company_filter.company_id)
+    result = rates.ftl_quotes(origin_city, destination_city, vehicle_type_id)
 
     return {
         "originCity": origin_city,
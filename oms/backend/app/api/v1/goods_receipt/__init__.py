@@ -21,6 +21,7 @@ from app.models import (
     # Phase 2 imports
     Return, ReturnItem,
 )
+from app.services.document_numbers import GR_SERIES, next_number
 from app.services.fifo_sequence import FifoSequenceService
 
 
@@ -107,8 +108,7 @@ def test_inventory_creation_debug(
 
 def generate_gr_number(session: Session) -> str:
     """Generate next GR document number."""
-    count = session.exec(select(func.count(GoodsReceipt.id))).one()
-    return f"GR-{count + 1:06d}"
+    return next_number(session, GR_SERIES)
 
 
 def build_gr_response(gr: GoodsReceipt, session: Session) -> GoodsReceiptResponse:
@@ -18,6 +18,7 @@ from app.models import (
     LocationType, ZoneType, BinType, TemperatureType, User,
     Inventory
 )
+from app.services.valuation_policy import valuation_policy
 
 router = APIRouter(prefix="/locations", tags=["Locations"])
 
@@ -285,6 +286,8 @@ def update_location(
 
     session.add(location)
     session.commit()
+    if "valuationMethod" in update_dict:
+        valuation_policy.invalidate_location(location.id)
     session.refresh(location)
 
     return LocationResponse.model_validate(location)
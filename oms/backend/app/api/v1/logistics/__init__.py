@@ -16,13 +16,24 @@ from app.models import (
     ShippingRule, ShippingRuleCreate, ShippingRuleUpdate, ShippingRuleResponse,
     ShippingRuleCondition, ShippingRuleConditionCreate, ShippingRuleConditionResponse,
     ServicePincode, ServicePincodeCreate, ServicePincodeUpdate, ServicePincodeResponse,
+    ServiceabilityCheckRequest,
     AWB, AWBCreate, AWBResponse,
     User
 )
+from app.services.rate_engine import rate_card_index
+from app.services.serviceability import serviceability_index
 
 router = APIRouter(prefix="/logistics", tags=["Logistics"])
 
 
+def invalidate_rate_cards(company_id: Optional[UUID]) -> None:
+    """Drop compiled rate cards; global cards apply to every company."""
+    if company_id:
+        rate_card_index.invalidate(company_id)
+    else:
+        rate_card_index.clear()
+
+
 # ============================================================================
 # Rate Card Endpoints
 # ============================================================================
@@ -105,6 +116,7 @@ def create_rate_card(
             session.add(slab)
         session.commit()
         session.refresh(rate_card)
+    invalidate_rate_cards(rate_card.companyId)
 
     return RateCardResponse.model_validate(rate_card)
 
@@ -133,6 +145,7 @@ def update_rate_card(
     session.add(rate_card)
     session.commit()
     session.refresh(rate_card)
+    invalidate_rate_cards(rate_card.companyId)
     return RateCardResponse.model_validate(rate_card)
 
 
@@ -156,6 +169,7 @@ def activate_rate_card(
     session.add(rate_card)
     session.commit()
     session.refresh(rate_card)
+    invalidate_rate_cards(rate_card.companyId)
     return RateCardResponse.model_validate(rate_card)
 
 
@@ -301,31 +315,33 @@ def list_service_pincodes(
 def check_pincode_serviceability(
     pincode: str,
     transporter_id: Optional[UUID] = None,
-    session: Session = Depends(get_session),
-    current_user: User = Depends(get_current_user)
+    company_filter: CompanyFilter = Depends(),
+    session: Session = Depends(get_session)
 ):
     """Check serviceability of a pincode."""
-    query = select(ServicePincode).where(
-        ServicePincode.pincode == pincode,
-        ServicePincode.isServiceable == True
-    )
-    if transporter_id:
-        query = query.where(ServicePincode.transporterId == transporter_id)
+    return serviceability_index.check(
+        session, [pincode], company_id=company_filter.company_id, transporter_id=transporter_id
+    )[0]
 
-    pincodes = session.exec(query).all()
 
+@router.post("/service-pincodes/check")
+def check_pincodes_serviceability(
+    data: ServiceabilityCheckRequest,
+    company_filter: CompanyFilter = Depends(),
+    session: Session = Depends(get_session)
+):
+    """Check serviceability of a batch of pincodes."""
+    results = serviceability_index.check(
+        session,
+        data.pincodes,
+        company_id=company_filter.company_id,
+        transporter_id=data.transporterId,
+        payment_mode=data.paymentMode,
+    )
     return {
-        "pincode": pincode,
-        "serviceable": len(pincodes) > 0,
-        "transporters": [
-            {
-                "transporterId": str(p.transporterId),
-                "codAvailable": p.codAvailable,
-                "prepaidAvailable": p.prepaidAvailable,
-                "zoneCode": p.zoneCode
-            }
-            for p in pincodes
-        ]
+        "total": len(results),
+        "serviceable": sum(1 for r in results if r["serviceable"]),
+        "results": results,
     }
 
 
@@ -340,6 +356,7 @@ def create_service_pincode(
     session.add(pincode)
     session.commit()
     session.refresh(pincode)
+    serviceability_index.apply([pincode])
     return ServicePincodeResponse.model_validate(pincode)
 
 
@@ -357,6 +374,9 @@ def bulk_create_service_pincodes(
         created += 1
 
     session.commit()
+    # The request rows carry every indexed field; committed rows would each
+    # be reloaded to read them
+    serviceability_index.apply(pincodes)
     return {"created": created}
 
 
@@ -379,6 +399,7 @@ def update_service_pincode(
     session.add(pincode)
     session.commit()
     session.refresh(pincode)
+    serviceability_index.apply([pincode])
     return ServicePincodeResponse.model_validate(pincode)
 
 
@@ -18,6 +18,7 @@ from app.models import (
     Location, User, OrderStatus, Channel, OrderType, PaymentMode,
     ItemStatus, DeliveryStatus
 )
+from app.services.dashboard_stats import dashboard_cache, order_status_summary
 
 router = APIRouter(prefix="/orders", tags=["Orders"])
 
@@ -140,49 +141,31 @@ def get_order_stats(
     current_user: User = Depends(get_current_user)
 ):
     """Get order statistics."""
-    base_query = select(Order)
-
+    filters = []
     if company_filter.company_id:
-        location_ids = session.exec(
-            select(Location.id).where(Location.companyId == company_filter.company_id)
-        ).all()
-        base_query = base_query.where(Order.locationId.in_(location_ids))
+        filters.append(Order.companyId == company_filter.company_id)
 
+    location_access = None
     if current_user.role != "SUPER_ADMIN" and current_user.locationAccess:
-        base_query = base_query.where(Order.locationId.in_(current_user.locationAccess))
+        location_access = tuple(sorted(str(l) for l in current_user.locationAccess))
+        filters.append(Order.locationId.in_(current_user.locationAccess))
 
     if location_id:
-        base_query = base_query.where(Order.locationId == location_id)
+        filters.append(Order.locationId == location_id)
     if date_from:
-        base_query = base_query.where(Order.orderDate >= date_from)
+        filters.append(Order.orderDate >= date_from)
     if date_to:
-        base_query = base_query.where(Order.orderDate <= date_to)
-
-    # Count by status
-    status_counts = {}
-    for s in OrderStatus:
-        count_query = select(func.count(Order.id)).where(Order.status == s)
-        if company_filter.company_id:
-            count_query = count_query.where(Order.locationId.in_(location_ids))
-        count = session.exec(count_query).one()
-        status_counts[s.value] = count
-
-    # Total amount
-    total_query = select(func.sum(Order.totalAmount))
-    if company_filter.company_id:
-        total_query = total_query.where(Order.locationId.in_(location_ids))
-    if location_id:
-        total_query = total_query.where(Order.locationId == location_id)
-    if date_from:
-        total_query = total_query.where(Order.orderDate >= date_from)
-    if date_to:
-        total_query = total_query.where(Order.orderDate <= date_to)
+        filters.append(Order.orderDate <= date_to)
 
-    total_amount = session.exec(total_query).one() or 0
+    # Status counts and total amount in one query, shared briefly across requests
+    key = ("order_stats", company_filter.company_id, location_access, location_id, date_from, date_to)
+    summary = dashboard_cache.get_or_compute(
+        key, lambda: order_status_summary(session, filters)
+    )
 
     return {
-        "status_counts": status_counts,
-        "total_amount": float(total_amount)
+        "status_counts": summary["statusCounts"],
+        "total_amount": summary["totalAmount"]
     }
 
 
@@ -576,7 +559,8 @@ def allocate_order(
         "fullyAllocated": False
     }
 
-    # Process each order item
+    # Build one allocation request per item that still needs stock
+    pending = []
     for order_item in order_items:
         # Skip already fully allocated items
         already_allocated = order_item.allocatedQty or 0
@@ -587,22 +571,26 @@ def allocate_order(
             results["itemsProcessed"] += 1
             continue
 
-        # Create allocation request
-        request = AllocationRequest(
+        pending.append((order_item, already_allocated, remaining_qty, AllocationRequest(
             skuId=order_item.skuId,
             requiredQty=remaining_qty,
             locationId=order.locationId,
             orderId=order.id,
             orderItemId=order_item.id,
-        )
-
-        # Allocate inventory
-        result = allocation_service.allocate_inventory(
-            request=request,
-            company_id=order.companyId,
-            allocated_by_id=current_user.id
-        )
+        )))
+
+    # Allocate all items together; committed with the order below
+    allocation_results = allocation_service.allocate_batch(
+        [request for _, _, _, request in pending],
+        company_id=order.companyId,
+        allocated_by_id=current_user.id,
+        commit=False
+    )
+    sku_codes = dict(session.exec(
+        select(SKU.id, SKU.code).where(SKU.id.in_({item.skuId for item, _, _, _ in pending}))
+    ).all()) if pending else {}
 
+    for (order_item, already_allocated, remaining_qty, _), result in zip(pending, allocation_results):
         results["itemsProcessed"] += 1
         results["totalAllocated"] += result.allocatedQty
 
@@ -620,10 +608,9 @@ def allocate_order(
 
         # Track shortfalls
         if result.shortfallQty > 0:
-            sku = session.get(SKU, order_item.skuId)
             results["shortfalls"].append({
                 "skuId": str(order_item.skuId),
-                "skuCode": sku.code if sku else "Unknown",
+                "skuCode": sku_codes.get(order_item.skuId, "Unknown"),
                 "required": remaining_qty,
                 "allocated": result.allocatedQty,
                 "shortfall": result.shortfallQty
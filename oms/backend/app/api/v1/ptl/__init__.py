@@ -17,6 +17,7 @@ from app.models import (
     Transporter,
     User
 )
+from app.services.lane_rates import lane_rate_index
 
 router = APIRouter(prefix="/ptl", tags=["PTL - Part Truck Load / B2B"])
 
@@ -154,6 +155,7 @@ def create_rate_matrix(
 
     session.add(rate_matrix)
     session.commit()
+    lane_rate_index.invalidate(rate_matrix.companyId)
     session.refresh(rate_matrix)
 
     response = PTLRateMatrixResponse.model_validate(rate_matrix)
@@ -184,6 +186,7 @@ def update_rate_matrix(
 
     session.add(rate_matrix)
     session.commit()
+    lane_rate_index.invalidate(rate_matrix.companyId)
     session.refresh(rate_matrix)
 
     response = PTLRateMatrixResponse.model_validate(rate_matrix)
@@ -213,6 +216,7 @@ def delete_rate_matrix(
     rate_matrix.isActive = False
     session.add(rate_matrix)
     session.commit()
+    lane_rate_index.invalidate(rate_matrix.companyId)
 
 
 # ============================================================================
@@ -339,6 +343,7 @@ def create_tat_matrix(
 
     session.add(tat_matrix)
     session.commit()
+    lane_rate_index.invalidate(tat_matrix.companyId)
     session.refresh(tat_matrix)
 
     response = PTLTATMatrixResponse.model_validate(tat_matrix)
@@ -369,6 +374,7 @@ def update_tat_matrix(
 
     session.add(tat_matrix)
     session.commit()
+    lane_rate_index.invalidate(tat_matrix.companyId)
     session.refresh(tat_matrix)
 
     response = PTLTATMatrixResponse.model_validate(tat_matrix)
@@ -398,6 +404,7 @@ def delete_tat_matrix(
     tat_matrix.isActive = False
     session.add(tat_matrix)
     session.commit()
+    lane_rate_index.invalidate(tat_matrix.companyId)
 
 
 # ============================================================================
@@ -414,72 +421,22 @@ def compare_ptl_rates(
     current_user: User = Depends(get_current_user)
 ):
     """Compare PTL rates from all transporters for a lane and weight."""
-    query = select(PTLRateMatrix).where(
-        PTLRateMatrix.originCity.ilike(f"%{origin_city}%"),
-        PTLRateMatrix.destinationCity.ilike(f"%{destination_city}%"),
-        PTLRateMatrix.isActive == True,
-        PTLRateMatrix.validFrom <= datetime.utcnow(),
-        (PTLRateMatrix.validTo.is_(None)) | (PTLRateMatrix.validTo >= datetime.utcnow())
-    )
-
-    if company_filter.company_id:
-        query = query.where(PTLRateMatrix.companyId == company_filter.company_id)
-
-    rate_entries = session.exec(query).all()
-
-    # Calculate rates for the given weight
-    result = []
-    for rm in rate_entries:
-        transporter = session.get(Transporter, rm.transporterId)
-
-        # Determine rate per kg based on weight slab
-        rate_per_kg = None
-        if weight_kg <= 50 and rm.rate0to50:
-            rate_per_kg = rm.rate0to50
-        elif weight_kg <= 100 and rm.rate50to100:
-            rate_per_kg = rm.rate50to100
-        elif weight_kg <= 250 and rm.rate100to250:
-            rate_per_kg = rm.rate100to250
-        elif weight_kg <= 500 and rm.rate250to500:
-            rate_per_kg = rm.rate250to500
-        elif weight_kg <= 1000 and rm.rate500to1000:
-            rate_per_kg = rm.rate500to1000
-        elif rm.rate1000plus:
-            rate_per_kg = rm.rate1000plus
-
-        if rate_per_kg is None:
-            continue  # Skip if no rate for this weight
-
-        # Calculate total
-        base_cost = float(rate_per_kg) * weight_kg
-        fod_charge = float(rm.fodCharge or 0)
-        oda_charge = float(rm.odaCharge or 0)
-        total_cost = max(base_cost + fod_charge + oda_charge, float(rm.minimumCharge or 0))
-
-        # Get TAT if available
-        tat_query = select(PTLTATMatrix).where(
-            PTLTATMatrix.originCity.ilike(f"%{origin_city}%"),
-            PTLTATMatrix.destinationCity.ilike(f"%{destination_city}%"),
-            PTLTATMatrix.transporterId == rm.transporterId,
-            PTLTATMatrix.isActive == True
-        )
-        tat_entry = session.exec(tat_query).first()
-
-        result.append({
-            "rateMatrixId": str(rm.id),
-            "transporterId": str(rm.transporterId),
-            "transporterName": transporter.name if transporter else "Unknown",
-            "ratePerKg": float(rate_per_kg),
-            "weightKg": weight_kg,
-            "baseCost": round(base_cost, 2),
-            "fodCharge": fod_charge,
-            "odaCharge": oda_charge,
-            "totalCost": round(total_cost, 2),
-            "minimumCharge": float(rm.minimumCharge or 0),
-            "codPercent": float(rm.codPercent or 0),
-            "transitDays": tat_entry.transitDays if tat_entry else None,
-            "onTimeDeliveryPercent": float(tat_entry.onTimeDeliveryPercent) if tat_entry and tat_entry.onTimeDeliveryPercent else None
-        })
+    rates = lane_rate_index.get(session, company_filter.company_id)
+    quotes = rates.ptl_quotes(origin_city, destination_city, weight_kg)
+
+    # Skip rows with no rate for this weight
+    result = [
+        {
+            key: quote[key]
+            for key in (
+                "rateMatrixId", "transporterId", "transporterName", "ratePerKg", "weightKg",
+                "baseCost", "fodCharge", "odaCharge", "totalCost", "minimumCharge",
+                "codPercent", "transitDays", "onTimeDeliveryPercent",
+            )
+        }
+        for quote in quotes
+        if quote["ratePerKg"] is not None
+    ]
 
     # Sort by total cost
     result.sort(key=lambda x: x["totalCost"])
@@ -504,67 +461,29 @@ def calculate_ptl_rate(
     current_user: User = Depends(get_current_user)
 ):
     """Calculate PTL shipping rate for a specific transporter."""
-    query = select(PTLRateMatrix).where(
-        PTLRateMatrix.originCity.ilike(f"%{origin_city}%"),
-        PTLRateMatrix.destinationCity.ilike(f"%{destination_city}%"),
-        PTLRateMatrix.transporterId == transporter_id,
-        PTLRateMatrix.isActive == True,
-        PTLRateMatrix.validFrom <= datetime.utcnow(),
-        (PTLRateMatrix.validTo.is_(None)) | (PTLRateMatrix.validTo >= datetime.utcnow())
+    rates = lane_rate_index.get(session, company_filter.company_id)
+    quotes = rates.ptl_quotes(
+        origin_city, destination_city, weight_kg, transporter_id=transporter_id, strict_slab=True
     )
-
-    if company_filter.company_id:
-        query = query.where(PTLRateMatrix.companyId == company_filter.company_id)
-
-    rm = session.exec(query).first()
-    if not rm:
+    if not quotes:
         raise HTTPException(status_code=404, detail="Rate matrix entry not found for this lane and transporter")
 
-    transporter = session.get(Transporter, rm.transporterId)
-
-    # Determine rate per kg based on weight slab
-    rate_per_kg = None
-    weight_slab = ""
-    if weight_kg <= 50:
-        rate_per_kg = rm.rate0to50
-        weight_slab = "0-50 kg"
-    elif weight_kg <= 100:
-        rate_per_kg = rm.rate50to100
-        weight_slab = "50-100 kg"
-    elif weight_kg <= 250:
-        rate_per_kg = rm.rate100to250
-        weight_slab = "100-250 kg"
-    elif weight_kg <= 500:
-        rate_per_kg = rm.rate250to500
-        weight_slab = "250-500 kg"
-    elif weight_kg <= 1000:
-        rate_per_kg = rm.rate500to1000
-        weight_slab = "500-1000 kg"
-    else:
-        rate_per_kg = rm.rate1000plus
-        weight_slab = "1000+ kg"
-
-    if rate_per_kg is None:
-        raise HTTPException(status_code=400, detail=f"No rate configured for weight slab: {weight_slab}")
-
-    # Calculate total
-    base_cost = float(rate_per_kg) * weight_kg
-    fod_charge = float(rm.fodCharge or 0)
-    oda_charge = float(rm.odaCharge or 0)
-    total_cost = max(base_cost + fod_charge + oda_charge, float(rm.minimumCharge or 0))
+    quote = quotes[0]
+    if quote["ratePerKg"] is None:
+        raise HTTPException(status_code=400, detail=f"No rate configured for weight slab: {quote['weightSlab']}")
 
     return {
         "originCity": origin_city,
         "destinationCity": destination_city,
         "transporterId": str(transporter_id),
-        "transporterName": transporter.name if transporter else "Unknown",
+        "transporterName": quote["transporterName"],
         "weightKg": weight_kg,
-        "weightSlab": weight_slab,
-        "ratePerKg": float(rate_per_kg),
-        "baseCost": round(base_cost, 2),
-        "fodCharge": fod_charge,
-        "odaCharge": oda_charge,
-        "minimumChargeApplied": total_cost == float(rm.minimumCharge or 0),
-        "totalCost": round(total_cost, 2),
-        "codPercent": float(rm.codPercent or 0)
+        "weightSlab": quote["weightSlab"],
+        "ratePerKg": quote["ratePerKg"],
+        "baseCost": quote["baseCost"],
+        "fodCharge": quote["fodCharge"],
+        "odaCharge": quote["odaCharge"],
+        "minimumChargeApplied": quote["minimumChargeApplied"],
+        "totalCost": quote["totalCost"],
+        "codPercent": quote["codPercent"]
     }
@@ -11,6 +11,7 @@ from pydantic import BaseModel
 from app.core.database import get_session
 from app.core.deps import get_current_user, require_admin, require_manager, CompanyFilter
 from app.models import Company, Location, SKU, User
+from app.services.valuation_policy import valuation_policy
 
 
 router = APIRouter(prefix="/settings", tags=["Settings"])
@@ -246,6 +247,7 @@ def update_location_valuation(
     location.valuationMethod = data.valuationMethod
     session.add(location)
     session.commit()
+    valuation_policy.invalidate_location(location.id)
     session.refresh(location)
 
     return LocationValuationResponse(
@@ -282,6 +284,7 @@ def clear_location_valuation(
     location.valuationMethod = None
     session.add(location)
     session.commit()
+    valuation_policy.invalidate_location(location.id)
 
     return {"success": True, "message": "Location will now use company default"}
 
@@ -402,6 +405,7 @@ def update_sku_valuation(
     sku.valuationMethod = data.valuationMethod
     session.add(sku)
     session.commit()
+    valuation_policy.invalidate_sku(sku.id)
     session.refresh(sku)
 
     return SKUValuationResponse(
@@ -438,6 +442,7 @@ def clear_sku_valuation(
     sku.valuationMethod = None
     session.add(sku)
     session.commit()
+    valuation_policy.invalidate_sku(sku.id)
 
     return {"success": True, "message": "SKU will now use company/location default"}
 
@@ -14,11 +14,15 @@ from sqlmodel import Session, select, func
 
 from app.core.database import get_session
 from app.core.deps import get_current_user, require_manager, CompanyFilter
-from app.models import User, Location, Transporter, PaymentMode, DeliveryStatus
+from app.models import (
+    User, Location, Transporter, PaymentMode, DeliveryStatus,
+    RateCheckShipment, RateCheckBatchRequest,
+)
 from app.models.shipment import (
     Shipment, ShipmentCreate, ShipmentUpdate, ShipmentResponse,
     ShipmentBrief, ShipmentStats
 )
+from app.services.rate_engine import quote_shipments
 
 router = APIRouter(prefix="/shipments", tags=["Shipments (B2C Courier)"])
 
@@ -412,7 +416,7 @@ def deliver_shipment(
 # ============================================================================
 
 @router.post("/bulk-import")
-async def bulk_import_shipments(
+def bulk_import_shipments(
     file: UploadFile = File(...),
     company_filter: CompanyFilter = Depends(),
     session: Session = Depends(get_session),
@@ -433,7 +437,7 @@ async def bulk_import_shipments(
     if not file.filename.endswith('.csv'):
         raise HTTPException(status_code=400, detail="Only CSV files are supported")
 
-    content = await file.read()
+    content = file.file.read()
     decoded = content.decode('utf-8')
     reader = csv.DictReader(io.StringIO(decoded))
 
@@ -539,43 +543,56 @@ async def bulk_import_shipments(
 def check_shipping_rates(
     origin_pincode: str,
     destination_pincode: str,
-    weight: Decimal,
+    weight: Decimal = Query(..., gt=0),
     payment_mode: PaymentMode = PaymentMode.PREPAID,
     cod_amount: Decimal = Decimal("0"),
+    length: Optional[Decimal] = None,
+    width: Optional[Decimal] = None,
+    height: Optional[Decimal] = None,
     company_filter: CompanyFilter = Depends(),
     session: Session = Depends(get_session),
     current_user: User = Depends(get_current_user)
 ):
     """
     Check available shipping rates for given parameters.
-    Returns list of available couriers with rates.
+    Returns serviceable couriers with rates from their active rate cards,
+    cheapest first.
     """
-    # Get active transporters
-    transporters = session.exec(
-        select(Transporter).where(Transporter.isActive == True)
-    ).all()
-
-    quotes = []
-    for t in transporters:
-        # Base rate calculation (simplified)
-        base_rate = Decimal("50") + (weight * Decimal("10"))
-        fuel_surcharge = base_rate * Decimal("0.1")
-        cod_charge = Decimal("0")
-
-        if payment_mode == PaymentMode.COD:
-            cod_charge = max(Decimal("25"), cod_amount * Decimal("0.02"))
-
-        total = base_rate + fuel_surcharge + cod_charge
-
-        quotes.append({
-            "transporterId": str(t.id),
-            "courierName": t.name,
-            "serviceType": t.type.value if t.type else "COURIER",
-            "estimatedDays": 3,  # Default estimate
-            "baseRate": float(base_rate),
-            "fuelSurcharge": float(fuel_surcharge),
-            "codCharge": float(cod_charge),
-            "totalRate": float(total)
-        })
-
+    shipment = RateCheckShipment(
+        originPincode=origin_pincode,
+        destinationPincode=destination_pincode,
+        weight=weight,
+        length=length,
+        width=width,
+        height=height,
+        paymentMode=payment_mode.value,
+        codAmount=cod_amount,
+    )
+    quotes = quote_shipments(session, company_filter.company_id, [shipment])[0]
     return {"quotes": quotes}
+
+
+@router.post("/rate-check/batch")
+def check_shipping_rates_batch(
+    data: RateCheckBatchRequest,
+    company_filter: CompanyFilter = Depends(),
+    session: Session = Depends(get_session),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Quote many shipments in one call (up to 5000).
+    Results are in request order; each lists serviceable couriers cheapest first.
+    """
+    quotes = quote_shipments(session, company_filter.company_id, data.shipments)
+    return {
+        "results": [
+            {
+                "index": i,
+                "reference": shipment.reference,
+                "serviceable": bool(shipment_quotes),
+                "cheapest": shipment_quotes[0] if shipment_quotes else None,
+                "quotes": shipment_quotes,
+            }
+            for i, (shipment, shipment_quotes) in enumerate(zip(data.shipments, quotes))
+        ]
+    }
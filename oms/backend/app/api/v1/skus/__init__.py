@@ -12,6 +12,7 @@ from app.core.deps import get_current_user, require_manager, CompanyFilter
 from app.models import (
     SKU, SKUCreate, SKUUpdate, SKUResponse, SKUBrief
 )
+from app.services.valuation_policy import valuation_policy
 
 router = APIRouter(prefix="/skus", tags=["SKUs"])
 
@@ -245,6 +246,8 @@ def update_sku(
 
     session.add(sku)
     session.commit()
+    if "valuationMethod" in update_dict:
+        valuation_policy.invalidate_sku(sku.id)
     session.refresh(sku)
 
     return SKUResponse.model_validate(sku)
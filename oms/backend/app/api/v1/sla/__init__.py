@@ -5,6 +5,7 @@ from datetime import datetime, timedelta
 from typing import Optional
 
 from fastapi import APIRouter, Depends, Query
+from sqlalchemy import and_, case
 from sqlmodel import Session, select, func
 
 from app.core.database import get_session
@@ -23,6 +24,11 @@ def safe_enum_value(value, default: str) -> str:
     return str(value)
 
 
+def counted(condition):
+    """COUNT of rows matching condition, for conditional aggregates."""
+    return func.count(case((condition, 1)))
+
+
 @router.get("/metrics")
 def get_sla_metrics(
     days: int = Query(7, ge=1, le=90, description="Number of days to analyze"),
@@ -33,95 +39,83 @@ def get_sla_metrics(
     """Get SLA metrics for the specified period."""
     cutoff_date = datetime.utcnow() - timedelta(days=days)
 
-    # Base query filters
-    def add_company_filter(query, model):
-        if company_filter.company_id:
-            return query.where(model.companyId == company_filter.company_id)
+    company_id = company_filter.company_id
+
+    def scoped(query, model):
+        query = query.where(model.createdAt >= cutoff_date)
+        if company_id:
+            query = query.where(model.companyId == company_id)
         return query
 
+    # Each metric is one filtered aggregate row; nothing is loaded per record
+
     # ============================================================================
     # Order Processing SLA (target: 95% within 4 hours)
     # ============================================================================
-    orders_query = select(Order).where(Order.createdAt >= cutoff_date)
-    orders_query = add_company_filter(orders_query, Order)
-    orders = session.exec(orders_query).all()
-
-    orders_total = len(orders)
-    # Orders that moved from PENDING to CONFIRMED within 4 hours
-    orders_processed = sum(
-        1 for o in orders
-        if safe_enum_value(o.status, "") not in ["PENDING", "DRAFT"]
-    )
+    # Orders that moved on from PENDING
+    orders_total, orders_processed = session.exec(scoped(
+        select(
+            func.count(Order.id),
+            counted(Order.status.notin_(["PENDING", "DRAFT"])),
+        ),
+        Order,
+    )).one()
     order_processing_rate = (orders_processed / orders_total * 100) if orders_total > 0 else 0
 
     # ============================================================================
-    # Same Day Dispatch (target: 90%)
+    # Same Day Dispatch (target: 90%) and On-Time Delivery (target: 85%)
     # ============================================================================
-    deliveries_query = select(Delivery).where(Delivery.createdAt >= cutoff_date)
-    deliveries_query = add_company_filter(deliveries_query, Delivery)
-    deliveries = session.exec(deliveries_query).all()
-
-    deliveries_total = len(deliveries)
-    # Deliveries dispatched on same day as order
-    same_day_dispatched = sum(
-        1 for d in deliveries
-        if d.dispatchedAt and d.createdAt and d.dispatchedAt.date() == d.createdAt.date()
-    )
+    # Dispatch is the shipment's shipDate, delivery its deliveryDate, and the
+    # commitment the order's promisedDate
+    deliveries_total, same_day_dispatched, delivered_total, on_time = session.exec(scoped(
+        select(
+            func.count(Delivery.id),
+            counted(func.date(Delivery.shipDate) == func.date(Delivery.createdAt)),
+            counted(Delivery.status == "DELIVERED"),
+            counted(and_(
+                Delivery.status == "DELIVERED",
+                func.date(Delivery.deliveryDate) <= func.date(Order.promisedDate),
+            )),
+        ).join(Order, Delivery.orderId == Order.id),
+        Delivery,
+    )).one()
     same_day_rate = (same_day_dispatched / deliveries_total * 100) if deliveries_total > 0 else 0
+    on_time_rate = (on_time / delivered_total * 100) if delivered_total else 0
 
     # ============================================================================
-    # Pick Accuracy (target: 99.5%)
+    # Pick Accuracy (target: 99.5%) and Return Processing (target: 90% within 24 hours)
     # ============================================================================
-    # This would typically come from QC data - for now estimate based on returns
-    returns_query = select(Return).where(Return.createdAt >= cutoff_date)
-    returns_query = add_company_filter(returns_query, Return)
-    returns = session.exec(returns_query).all()
-
-    # Pick errors = returns with reason "WRONG_ITEM"
-    pick_errors = sum(
-        1 for r in returns
-        if safe_enum_value(r.reason, "") == "WRONG_ITEM"
-    )
+    # Pick errors are estimated from returns with reason "WRONG_ITEM" until QC
+    # data is available
+    returns_total, pick_errors, quick_returns = session.exec(scoped(
+        select(
+            func.count(Return.id),
+            counted(Return.reason == "WRONG_ITEM"),
+            counted(and_(
+                Return.status.in_(["RECEIVED", "COMPLETED", "REFUNDED"]),
+                Return.receivedAt <= Return.createdAt + timedelta(hours=24),
+            )),
+        ),
+        Return,
+    )).one()
     pick_accuracy = ((orders_total - pick_errors) / orders_total * 100) if orders_total > 0 else 100
-
-    # ============================================================================
-    # On-Time Delivery (target: 85%)
-    # ============================================================================
-    delivered = [d for d in deliveries if safe_enum_value(d.status, "") == "DELIVERED"]
-    on_time = sum(
-        1 for d in delivered
-        if d.deliveredAt and d.expectedDeliveryDate and d.deliveredAt.date() <= d.expectedDeliveryDate
-    )
-    on_time_rate = (on_time / len(delivered) * 100) if delivered else 0
+    return_processing_rate = (quick_returns / returns_total * 100) if returns_total > 0 else 0
 
     # ============================================================================
     # NDR Resolution (target: 80% within 48 hours)
     # ============================================================================
-    ndrs_query = select(NDR).where(NDR.createdAt >= cutoff_date)
-    ndrs_query = add_company_filter(ndrs_query, NDR)
-    ndrs = session.exec(ndrs_query).all()
-
-    ndrs_total = len(ndrs)
-    resolved_ndrs = [n for n in ndrs if safe_enum_value(n.status, "") == "RESOLVED"]
-    # NDRs resolved within 48 hours
-    quick_resolved = sum(
-        1 for n in resolved_ndrs
-        if n.resolvedAt and n.createdAt and (n.resolvedAt - n.createdAt).total_seconds() <= 48 * 3600
-    )
+    ndrs_total, quick_resolved = session.exec(scoped(
+        select(
+            func.count(NDR.id),
+            counted(and_(
+                NDR.status == "RESOLVED",
+                NDR.resolvedAt <= NDR.createdAt + timedelta(hours=48),
+            )),
+        ),
+        NDR,
+    )).one()
     ndr_resolution_rate = (quick_resolved / ndrs_total * 100) if ndrs_total > 0 else 0
 
-    # ============================================================================
-    # Return Processing (target: 90% within 24 hours)
-    # ============================================================================
-    returns_total = len(returns)
-    processed_returns = [r for r in returns if safe_enum_value(r.status, "") in ["RECEIVED", "COMPLETED", "REFUNDED"]]
-    # Returns processed within 24 hours
-    quick_returns = sum(
-        1 for r in processed_returns
-        if r.receivedAt and r.createdAt and (r.receivedAt - r.createdAt).total_seconds() <= 24 * 3600
-    )
-    return_processing_rate = (quick_returns / returns_total * 100) if returns_total > 0 else 0
-
     # ============================================================================
     # Calculate overall SLA score
     # ============================================================================
@@ -184,7 +178,7 @@ def get_sla_metrics(
                 "target": 85,
                 "unit": "%",
                 "status": "meeting" if on_time_rate >= 85 else ("at_risk" if on_time_rate >= 68 else "breached"),
-                "sampleSize": len(delivered)
+                "sampleSize": delivered_total
             },
             {
                 "name": "NDR Resolution",
@@ -222,37 +216,56 @@ def get_at_risk_orders(
 ):
     """Get orders at risk of SLA breach."""
     now = datetime.utcnow()
+    # Within 24 hours of deadline: promised for tomorrow or earlier
+    deadline = datetime.combine(now.date() + timedelta(days=2), datetime.min.time())
 
-    # Get deliveries that are in transit and approaching SLA deadline
-    query = select(Delivery).where(
-        Delivery.status.in_(["PICKED_UP", "IN_TRANSIT", "OUT_FOR_DELIVERY"])
-    )
+    # Deliveries that are in transit and approaching the order's promised date
+    filters = [
+        Delivery.status.in_(["PICKED_UP", "IN_TRANSIT", "OUT_FOR_DELIVERY"]),
+        Order.promisedDate < deadline,
+    ]
     if company_filter.company_id:
-        query = query.where(Delivery.companyId == company_filter.company_id)
-
-    deliveries = session.exec(query.order_by(Delivery.expectedDeliveryDate.asc()).limit(limit)).all()
+        filters.append(Delivery.companyId == company_filter.company_id)
+
+    total = session.exec(
+        select(func.count(Delivery.id))
+        .join(Order, Delivery.orderId == Order.id)
+        .where(*filters)
+    ).one()
+    rows = session.exec(
+        select(Delivery.id, Delivery.deliveryNo, Delivery.awbNo, Delivery.status, Order.promisedDate)
+        .join(Order, Delivery.orderId == Order.id)
+        .where(*filters)
+        .order_by(Order.promisedDate.asc())
+        .limit(limit)
+    ).all()
 
     at_risk_orders = []
-    for d in deliveries:
-        if d.expectedDeliveryDate:
-            hours_remaining = (d.expectedDeliveryDate - now.date()).days * 24
-            if hours_remaining <= 24:  # Within 24 hours of deadline
-                at_risk_orders.append({
-                    "id": str(d.id),
-                    "deliveryNo": d.deliveryNo,
-                    "awbNo": d.awbNo,
-                    "status": safe_enum_value(d.status, "UNKNOWN"),
-                    "expectedDeliveryDate": d.expectedDeliveryDate.isoformat() if d.expectedDeliveryDate else None,
-                    "hoursRemaining": hours_remaining,
-                    "risk": "HIGH" if hours_remaining <= 8 else "MEDIUM"
-                })
+    for delivery_id, delivery_no, awb_no, status, promised_date in rows:
+        hours_remaining = (promised_date.date() - now.date()).days * 24
+        at_risk_orders.append({
+            "id": str(delivery_id),
+            "deliveryNo": delivery_no,
+            "awbNo": awb_no,
+            "status": safe_enum_value(status, "UNKNOWN"),
+            "expectedDeliveryDate": promised_date.date().isoformat(),
+            "hoursRemaining": hours_remaining,
+            "risk": "HIGH" if hours_remaining <= 8 else "MEDIUM"
+        })
 
     return {
         "atRiskOrders": at_risk_orders,
-        "total": len(at_risk_orders)
+        "total": total
     }
 
 
+def _week_index(column, now: datetime, weeks: int):
+    """Index of the trailing week (0 = the last 7 days) a timestamp falls in."""
+    return case(
+        *[(column >= now - timedelta(weeks=offset + 1), offset) for offset in range(weeks)]
+    )
+
+
 @router.get("/trend")
 def get_sla_trend(
     weeks: int = Query(12, ge=1, le=52),
@@ -261,31 +274,35 @@ def get_sla_trend(
     current_user: User = Depends(get_current_user)
 ):
     """Get SLA trend data for the specified number of weeks."""
-    trend_data = []
     now = datetime.utcnow()
+    since = now - timedelta(weeks=weeks)
+
+    # Orders and deliveries per trailing week, one grouped query each
+    order_week = _week_index(Order.createdAt, now, weeks)
+    orders_query = select(order_week, func.count(Order.id)).where(
+        Order.createdAt >= since,
+        Order.createdAt < now
+    )
+    if company_filter.company_id:
+        orders_query = orders_query.where(Order.companyId == company_filter.company_id)
+    orders_by_week = dict(session.exec(orders_query.group_by(order_week)).all())
+
+    delivered_week = _week_index(Delivery.deliveryDate, now, weeks)
+    delivered_query = select(delivered_week, func.count(Delivery.id)).where(
+        Delivery.deliveryDate >= since,
+        Delivery.deliveryDate < now,
+        Delivery.status == "DELIVERED"
+    )
+    if company_filter.company_id:
+        delivered_query = delivered_query.where(Delivery.companyId == company_filter.company_id)
+    delivered_by_week = dict(session.exec(delivered_query.group_by(delivered_week)).all())
 
+    trend_data = []
     for week_offset in range(weeks - 1, -1, -1):
         week_start = now - timedelta(weeks=week_offset + 1)
         week_end = now - timedelta(weeks=week_offset)
-
-        # Get orders for this week
-        orders_query = select(func.count(Order.id)).where(
-            Order.createdAt >= week_start,
-            Order.createdAt < week_end
-        )
-        if company_filter.company_id:
-            orders_query = orders_query.where(Order.companyId == company_filter.company_id)
-        orders_count = session.exec(orders_query).one()
-
-        # Get delivered count
-        delivered_query = select(func.count(Delivery.id)).where(
-            Delivery.deliveredAt >= week_start,
-            Delivery.deliveredAt < week_end,
-            Delivery.status == "DELIVERED"
-        )
-        if company_filter.company_id:
-            delivered_query = delivered_query.where(Delivery.companyId == company_filter.company_id)
-        delivered_count = session.exec(delivered_query).one()
+        orders_count = orders_by_week.get(week_offset, 0)
+        delivered_count = delivered_by_week.get(week_offset, 0)
 
         # Calculate week's SLA score (simplified)
         sla_score = (delivered_count / orders_count * 100) if orders_count > 0 else 0
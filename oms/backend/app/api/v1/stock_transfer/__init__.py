@@ -18,6 +18,7 @@ from app.models import (
     Location, User, SKU, Bin, Inventory,
     GoodsReceipt, GoodsReceiptItem, GoodsReceiptStatus,
 )
+from app.services.document_numbers import GR_SERIES, next_number
 
 
 router = APIRouter(prefix="/stock-transfers", tags=["Stock Transfers"])
@@ -784,8 +785,7 @@ def receive_stock_transfer(
     session.add(sto)
 
     # Create GRN at destination
-    gr_count = session.exec(select(func.count(GoodsReceipt.id))).one()
-    gr_no = f"GR-{gr_count + 1:06d}"
+    gr_no = next_number(session, GR_SERIES)
 
     grn = GoodsReceipt(
         grNo=gr_no,
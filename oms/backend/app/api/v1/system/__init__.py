@@ -6,7 +6,7 @@ from typing import List, Optional
 from uuid import UUID
 
 from fastapi import APIRouter, Depends, HTTPException, status, Query
-from sqlmodel import Session, select, func
+from sqlmodel import Session, select, func, update
 
 from app.core.database import get_session
 from app.core.deps import get_current_user, require_manager, require_admin, CompanyFilter
@@ -16,6 +16,11 @@ from app.models import (
     Sequence, SequenceCreate, SequenceResponse,
     User
 )
+from app.services.exception_counters import (
+    ExceptionCounterDeltas,
+    apply_exception_counter_deltas,
+    status_entered_at,
+)
 
 router = APIRouter(prefix="/system", tags=["System"])
 
@@ -184,6 +189,9 @@ def create_exception(
     )
 
     session.add(exception)
+    deltas = ExceptionCounterDeltas()
+    deltas.add(exception.companyId, exception.type, exception.severity, exception.status)
+    apply_exception_counter_deltas(session, deltas)
     session.commit()
     session.refresh(exception)
     return ExceptionResponse.model_validate(exception)
@@ -206,11 +214,34 @@ def update_exception(
     if not exception:
         raise HTTPException(status_code=404, detail="Exception not found")
 
+    previous_status = exception.status
+    entered_at = status_entered_at(exception)
     update_data = data.model_dump(exclude_unset=True)
-    for field, value in update_data.items():
-        setattr(exception, field, value)
+    if update_data.get("status", previous_status) != previous_status and \
+            update_data["status"] in ("RESOLVED", "CLOSED"):
+        # resolvedAt is when the exception entered its resolved status, for
+        # the counters and their rebuild alike
+        update_data["resolvedAt"] = datetime.utcnow()
+        update_data["resolvedBy"] = str(current_user.id)
+
+    # Guarded on the status read above, so a concurrent status change is
+    # never counted twice
+    updated = session.execute(
+        update(ExceptionModel)
+        .where(ExceptionModel.id == exception.id, ExceptionModel.status == previous_status)
+        .values(**update_data)
+        .returning(ExceptionModel.severity, ExceptionModel.status)
+        .execution_options(synchronize_session=False)
+    ).first()
+    if not updated:
+        raise HTTPException(status_code=409, detail="Exception was modified concurrently")
 
-    session.add(exception)
+    deltas = ExceptionCounterDeltas()
+    deltas.move(
+        exception.companyId, exception.type, updated.severity, previous_status, updated.status,
+        entered_at=entered_at,
+    )
+    apply_exception_counter_deltas(session, deltas)
     session.commit()
     session.refresh(exception)
     return ExceptionResponse.model_validate(exception)
@@ -233,12 +264,32 @@ def resolve_exception(
     if not exception:
         raise HTTPException(status_code=404, detail="Exception not found")
 
-    exception.status = "RESOLVED"
-    exception.resolution = resolution
-    exception.resolvedBy = str(current_user.id)
-    exception.resolvedAt = datetime.utcnow()
+    previous_status = exception.status
+    entered_at = status_entered_at(exception)
+
+    # Guarded on the status read above, so an exception resolved concurrently
+    # (e.g. by the detection engine) is not counted twice
+    resolved = session.execute(
+        update(ExceptionModel)
+        .where(ExceptionModel.id == exception.id, ExceptionModel.status == previous_status)
+        .values(
+            status="RESOLVED",
+            resolution=resolution,
+            resolvedBy=str(current_user.id),
+            resolvedAt=datetime.utcnow(),
+        )
+        .returning(ExceptionModel.severity)
+        .execution_options(synchronize_session=False)
+    ).first()
+    if not resolved:
+        raise HTTPException(status_code=409, detail="Exception was modified concurrently")
 
-    session.add(exception)
+    deltas = ExceptionCounterDeltas()
+    deltas.move(
+        exception.companyId, exception.type, resolved.severity, previous_status, "RESOLVED",
+        entered_at=entered_at,
+    )
+    apply_exception_counter_deltas(session, deltas)
     session.commit()
     session.refresh(exception)
     return ExceptionResponse.model_validate(exception)
@@ -301,20 +352,24 @@ def get_next_sequence_value(
     current_user: User = Depends(get_current_user)
 ):
     """Get next sequence value and increment."""
-    query = select(Sequence).where(Sequence.name == sequence_name)
-    sequence = session.exec(query).first()
+    # Increment in SQL so concurrent callers never receive the same value
+    sequence = session.execute(
+        update(Sequence)
+        .where(Sequence.name == sequence_name)
+        .values(currentValue=Sequence.currentValue + Sequence.increment)
+        .returning(Sequence.currentValue, Sequence.increment, Sequence.prefix, Sequence.suffix)
+        .execution_options(synchronize_session=False)
+    ).first()
 
     if not sequence:
         raise HTTPException(status_code=404, detail="Sequence not found")
 
-    # Get current value and increment
-    current = sequence.currentValue
-    sequence.currentValue += sequence.increment
+    # Value before the increment
+    current = sequence.currentValue - sequence.increment
 
     # Build formatted value
     value = f"{sequence.prefix or ''}{current:06d}{sequence.suffix or ''}"
 
-    session.add(sequence)
     session.commit()
 
     return {"value": value, "raw_value": current}
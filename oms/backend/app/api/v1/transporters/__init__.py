@@ -17,6 +17,7 @@ from app.models import (
     User, TransporterType, ManifestStatus,
     Delivery, Order, OrderStatus, DeliveryStatus
 )
+from app.services.serviceability import company_transporters
 
 router = APIRouter(prefix="/transporters", tags=["Transporters"])
 
@@ -193,6 +194,7 @@ def create_config(
     session.add(config)
     session.commit()
     session.refresh(config)
+    company_transporters.invalidate(config.companyId)
     return TransporterConfigResponse.model_validate(config)
 
 
@@ -215,6 +217,7 @@ def update_config(
     session.add(config)
     session.commit()
     session.refresh(config)
+    company_transporters.invalidate(config.companyId)
     return TransporterConfigResponse.model_validate(config)
 
 
@@ -229,8 +232,10 @@ def delete_config(
     if not config:
         raise HTTPException(status_code=404, detail="Transporter config not found")
 
+    company_id = config.companyId
     session.delete(config)
     session.commit()
+    company_transporters.invalidate(company_id)
 
 
 # ============================================================================
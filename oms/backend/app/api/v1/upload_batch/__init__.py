@@ -227,7 +227,7 @@ def delete_upload_batch(
 # ============================================================================
 
 @router.post("/process/external-po", response_model=UploadResult)
-async def upload_external_po(
+def upload_external_po(
     file: UploadFile = File(...),
     company_filter: CompanyFilter = Depends(),
     session: Session = Depends(get_session),
@@ -246,7 +246,7 @@ async def upload_external_po(
     if not file.filename.endswith(('.csv', '.CSV')):
         raise HTTPException(status_code=400, detail="Only CSV files are supported")
 
-    content = await file.read()
+    content = file.file.read()
     csv_content = content.decode('utf-8-sig')  # Handle BOM
 
     service = BulkUploadService(session, company_filter.company_id, current_user.id)
@@ -256,7 +256,7 @@ async def upload_external_po(
 
 
 @router.post("/process/asn", response_model=UploadResult)
-async def upload_asn(
+def upload_asn(
     file: UploadFile = File(...),
     location_id: UUID = Form(...),
     company_filter: CompanyFilter = Depends(),
@@ -275,7 +275,7 @@ async def upload_asn(
     if not file.filename.endswith(('.csv', '.CSV')):
         raise HTTPException(status_code=400, detail="Only CSV files are supported")
 
-    content = await file.read()
+    content = file.file.read()
     csv_content = content.decode('utf-8-sig')
 
     service = BulkUploadService(session, company_filter.company_id, current_user.id)
@@ -285,7 +285,7 @@ async def upload_asn(
 
 
 @router.post("/process/opening-stock", response_model=UploadResult)
-async def upload_opening_stock(
+def upload_opening_stock(
     file: UploadFile = File(...),
     company_filter: CompanyFilter = Depends(),
     session: Session = Depends(get_session),
@@ -303,7 +303,7 @@ async def upload_opening_stock(
     if not file.filename.endswith(('.csv', '.CSV')):
         raise HTTPException(status_code=400, detail="Only CSV files are supported")
 
-    content = await file.read()
+    content = file.file.read()
     csv_content = content.decode('utf-8-sig')
 
     service = BulkUploadService(session, company_filter.company_id, current_user.id)
@@ -313,7 +313,7 @@ async def upload_opening_stock(
 
 
 @router.post("/process/stock-transfer", response_model=UploadResult)
-async def upload_stock_transfer(
+def upload_stock_transfer(
     file: UploadFile = File(...),
     company_filter: CompanyFilter = Depends(),
     session: Session = Depends(get_session),
@@ -331,7 +331,7 @@ async def upload_stock_transfer(
     if not file.filename.endswith(('.csv', '.CSV')):
         raise HTTPException(status_code=400, detail="Only CSV files are supported")
 
-    content = await file.read()
+    content = file.file.read()
     csv_content = content.decode('utf-8-sig')
 
     service = BulkUploadService(session, company_filter.company_id, current_user.id)
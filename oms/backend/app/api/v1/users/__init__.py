@@ -10,6 +10,7 @@ from sqlmodel import Session, select, func
 from app.core.database import get_session
 from app.core.security import get_password_hash
 from app.core.deps import get_current_user, require_admin, CompanyFilter
+from app.core.principals import principal_cache
 from app.models import (
     User, UserCreate, UserUpdate, UserResponse, UserBrief, UserRole
 )
@@ -191,6 +192,7 @@ def update_user(
 
     session.add(user)
     session.commit()
+    principal_cache.invalidate(user.id)
     session.refresh(user)
 
     return UserResponse.model_validate(user)
@@ -231,5 +233,6 @@ def delete_user(
     user.isActive = False
     session.add(user)
     session.commit()
+    principal_cache.invalidate(user.id)
 
     return None
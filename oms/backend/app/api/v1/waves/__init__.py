@@ -3,7 +3,7 @@ Wave API v1 - Wave picking and picklist management endpoints
 """
 from datetime import datetime
 from typing import List, Optional
-from uuid import UUID
+from uuid import UUID, uuid4
 
 from fastapi import APIRouter, Depends, HTTPException, status, Query
 from sqlmodel import Session, select, func
@@ -20,6 +20,7 @@ from app.models import (
     WaveType, WaveStatus, PicklistStatus, OrderStatus,
     AllocationRequest, InventoryAllocation
 )
+from app.services.document_numbers import NumberSeries, max_suffix_seed, next_numbers
 from app.services.inventory_allocation import InventoryAllocationService
 
 router = APIRouter(prefix="/waves", tags=["Waves"])
@@ -538,10 +539,17 @@ def add_order_to_wave(
 # Picklist Generation with FIFO/LIFO/FEFO Allocation
 # ============================================================================
 
-def generate_picklist_number(session: Session) -> str:
-    """Generate unique picklist number."""
-    count = session.exec(select(func.count(Picklist.id))).one()
-    return f"PL-{count + 1:06d}"
+PICKLIST_SERIES = NumberSeries(
+    name="PL",
+    prefix="PL-",
+    width=6,
+    seed=max_suffix_seed(Picklist.picklistNo, "PL-"),
+)
+
+
+def generate_picklist_numbers(session: Session, n: int) -> List[str]:
+    """Generate n unique picklist numbers."""
+    return next_numbers(session, PICKLIST_SERIES, n)
 
 
 @router.post("/{wave_id}/generate-picklists")
@@ -609,40 +617,40 @@ def generate_picklists_with_allocation(
             "shortfalls": []
         }
 
-        # Process each order
-        for wave_order in wave_orders:
-            order = session.get(Order, wave_order.orderId)
-            if not order:
-                continue
-
-            results["orders_processed"] += 1
-
-            # Get order items
-            order_items = session.exec(
-                select(OrderItem).where(OrderItem.orderId == order.id)
-            ).all()
-
-            if not order_items:
-                continue
-
-            # Create a picklist for this order
+        # Load the wave's orders and their items up front, highest priority first
+        order_ids = [wave_order.orderId for wave_order in wave_orders]
+        orders = sorted(
+            session.exec(select(Order).where(Order.id.in_(order_ids))).all(),
+            key=lambda o: (-(o.priority or 0), o.createdAt or datetime.min)
+        )
+        items_by_order = {}
+        for order_item in session.exec(
+            select(OrderItem).where(OrderItem.orderId.in_(order_ids))
+        ).all():
+            items_by_order.setdefault(order_item.orderId, []).append(order_item)
+
+        orders_with_items = [order for order in orders if items_by_order.get(order.id)]
+        picklist_numbers = generate_picklist_numbers(session, len(orders_with_items))
+        results["orders_processed"] = len(orders)
+
+        # Create a picklist per order and an allocation request per item
+        planned = []
+        requests = []
+        for order, picklist_no in zip(orders_with_items, picklist_numbers):
             # Note: Picklist model doesn't have waveId/locationId - those are tracked via order
             picklist = Picklist(
-                picklistNo=generate_picklist_number(session),
+                id=uuid4(),
+                picklistNo=picklist_no,
                 orderId=order.id,
                 status=PicklistStatus.PENDING,
                 companyId=company_id,
             )
             session.add(picklist)
-            session.flush()  # Get picklist ID
-
-            order_fully_allocated = True
-            order_has_allocations = False
 
-            # Process each order item
-            for order_item in order_items:
-                # Create allocation request
-                request = AllocationRequest(
+            lines = []
+            for order_item in items_by_order[order.id]:
+                lines.append(order_item)
+                requests.append(AllocationRequest(
                     skuId=order_item.skuId,
                     requiredQty=order_item.quantity,
                     locationId=wave.locationId,
@@ -650,14 +658,26 @@ def generate_picklists_with_allocation(
                     orderItemId=order_item.id,
                     waveId=wave_id,
                     picklistId=picklist.id,
-                )
+                ))
+            planned.append((order, picklist, lines))
+
+        # Allocate every line of the wave in one pass; committed below
+        allocation_results = iter(allocation_service.allocate_batch(
+            requests,
+            company_id=company_id,
+            allocated_by_id=current_user.id,
+            commit=False
+        ))
+        sku_codes = dict(session.exec(
+            select(SKU.id, SKU.code).where(SKU.id.in_({r.skuId for r in requests}))
+        ).all()) if requests else {}
+
+        for order, picklist, lines in planned:
+            order_fully_allocated = True
+            order_has_allocations = False
 
-                # Allocate inventory
-                result = allocation_service.allocate_inventory(
-                    request=request,
-                    company_id=company_id,
-                    allocated_by_id=current_user.id
-                )
+            for order_item in lines:
+                result = next(allocation_results)
 
                 if result.allocatedQty > 0:
                     order_has_allocations = True
@@ -665,11 +685,8 @@ def generate_picklists_with_allocation(
                     results["total_quantity_allocated"] += result.allocatedQty
 
                     # Create picklist items from allocations
-                    for alloc in result.allocations:
-                        # Get bin code
-                        bin_obj = session.get(Bin, alloc.binId)
-
-                        picklist_item = PicklistItem(
+                    session.add_all([
+                        PicklistItem(
                             picklistId=picklist.id,
                             skuId=alloc.skuId,
                             binId=alloc.binId,
@@ -677,17 +694,16 @@ def generate_picklists_with_allocation(
                             pickedQty=0,
                             batchNo=None,  # Can be enhanced to pull from allocation
                         )
-                        session.add(picklist_item)
+                        for alloc in result.allocations
+                    ])
 
                 if result.shortfallQty > 0:
                     order_fully_allocated = False
-                    # Get SKU info for shortfall report
-                    sku = session.get(SKU, order_item.skuId)
                     results["shortfalls"].append({
                         "order_id": str(order.id),
                         "order_no": order.orderNo,
                         "sku_id": str(order_item.skuId),
-                        "sku_code": sku.code if sku else "Unknown",
+                        "sku_code": sku_codes.get(order_item.skuId, "Unknown"),
                         "required_qty": order_item.quantity,
                         "allocated_qty": result.allocatedQty,
                         "shortfall_qty": result.shortfallQty
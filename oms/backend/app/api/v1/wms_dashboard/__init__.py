@@ -9,7 +9,7 @@ from uuid import UUID
 
 from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlmodel import Session, select, func, text
-from sqlalchemy import and_, or_
+from sqlalchemy import and_, case, or_
 
 from app.core.database import get_session
 from app.core.deps import get_current_user, CompanyFilter
@@ -49,55 +49,50 @@ def get_dashboard_summary(
     company_id = company_filter.company_id
     since = datetime.utcnow() - timedelta(days=days)
 
-    # External PO counts
-    po_query = select(func.count(ExternalPurchaseOrder.id)).where(
-        ExternalPurchaseOrder.company_id == company_id
-    )
-    po_pending_query = po_query.where(ExternalPurchaseOrder.status == "OPEN")
-    po_received_query = po_query.where(
-        ExternalPurchaseOrder.status == "FULLY_RECEIVED",
-        ExternalPurchaseOrder.updated_at >= since
-    )
+    # One conditional-aggregate query per document type
+    def counted(condition):
+        return func.count(case((condition, 1)))
 
-    total_pos = session.exec(po_query).one() or 0
-    pending_pos = session.exec(po_pending_query).one() or 0
-    received_pos = session.exec(po_received_query).one() or 0
+    # External PO counts
+    total_pos, pending_pos, received_pos = session.exec(
+        select(
+            func.count(ExternalPurchaseOrder.id),
+            counted(ExternalPurchaseOrder.status == "OPEN"),
+            counted(and_(
+                ExternalPurchaseOrder.status == "FULLY_RECEIVED",
+                ExternalPurchaseOrder.updated_at >= since
+            )),
+        ).where(ExternalPurchaseOrder.company_id == company_id)
+    ).one()
 
     # ASN counts
-    asn_query = select(func.count(AdvanceShippingNotice.id)).where(
-        AdvanceShippingNotice.company_id == company_id
-    )
+    asn_query = select(
+        func.count(AdvanceShippingNotice.id),
+        counted(AdvanceShippingNotice.status == "EXPECTED"),
+        counted(AdvanceShippingNotice.status == "ARRIVED"),
+    ).where(AdvanceShippingNotice.company_id == company_id)
     if location_id:
         asn_query = asn_query.where(AdvanceShippingNotice.location_id == location_id)
 
-    asn_expected_query = asn_query.where(AdvanceShippingNotice.status == "EXPECTED")
-    asn_arrived_query = asn_query.where(AdvanceShippingNotice.status == "ARRIVED")
-
-    total_asns = session.exec(asn_query).one() or 0
-    expected_asns = session.exec(asn_expected_query).one() or 0
-    arrived_asns = session.exec(asn_arrived_query).one() or 0
+    total_asns, expected_asns, arrived_asns = session.exec(asn_query).one()
 
     # GRN counts
-    grn_query = select(func.count(GoodsReceipt.id)).where(
-        GoodsReceipt.companyId == company_id
-    )
+    grn_query = select(
+        func.count(GoodsReceipt.id),
+        counted(GoodsReceipt.status == "PENDING"),
+        counted(and_(GoodsReceipt.status == "POSTED", GoodsReceipt.updatedAt >= since)),
+    ).where(GoodsReceipt.companyId == company_id)
     if location_id:
         grn_query = grn_query.where(GoodsReceipt.locationId == location_id)
 
-    grn_pending_query = grn_query.where(GoodsReceipt.status == "PENDING")
-    grn_posted_query = grn_query.where(
-        GoodsReceipt.status == "POSTED",
-        GoodsReceipt.updatedAt >= since
-    )
-
-    total_grns = session.exec(grn_query).one() or 0
-    pending_grns = session.exec(grn_pending_query).one() or 0
-    posted_grns = session.exec(grn_posted_query).one() or 0
+    total_grns, pending_grns, posted_grns = session.exec(grn_query).one()
 
     # STO counts
-    sto_query = select(func.count(StockTransferOrder.id)).where(
-        StockTransferOrder.company_id == company_id
-    )
+    sto_query = select(
+        func.count(StockTransferOrder.id),
+        counted(StockTransferOrder.status.in_(["DRAFT", "APPROVED", "PICKING"])),
+        counted(StockTransferOrder.status == "IN_TRANSIT"),
+    ).where(StockTransferOrder.company_id == company_id)
     if location_id:
         sto_query = sto_query.where(
             or_(
@@ -106,32 +101,22 @@ def get_dashboard_summary(
             )
         )
 
-    sto_pending_query = sto_query.where(StockTransferOrder.status.in_(["DRAFT", "APPROVED", "PICKING"]))
-    sto_intransit_query = sto_query.where(StockTransferOrder.status == "IN_TRANSIT")
-
-    total_stos = session.exec(sto_query).one() or 0
-    pending_stos = session.exec(sto_pending_query).one() or 0
-    intransit_stos = session.exec(sto_intransit_query).one() or 0
+    total_stos, pending_stos, intransit_stos = session.exec(sto_query).one()
 
     # Return counts
-    return_query = select(func.count(Return.id)).where(
-        Return.companyId == company_id
-    )
+    return_query = select(
+        func.count(Return.id),
+        counted(Return.status.in_(["INITIATED", "IN_TRANSIT"])),
+        counted(Return.status == "RECEIVED"),
+        counted(and_(Return.status == "RECEIVED", Return.qcStatus == None)),
+    ).where(Return.companyId == company_id)
     if location_id:
         return_query = return_query.where(Return.locationId == location_id)
 
-    return_pending_query = return_query.where(Return.status.in_(["INITIATED", "IN_TRANSIT"]))
-    return_received_query = return_query.where(Return.status == "RECEIVED")
-    return_qc_pending_query = return_query.where(
-        Return.status == "RECEIVED",
-        Return.qcStatus == None
+    total_returns, pending_returns, received_returns, qc_pending_returns = (
+        session.exec(return_query).one()
     )
 
-    total_returns = session.exec(return_query).one() or 0
-    pending_returns = session.exec(return_pending_query).one() or 0
-    received_returns = session.exec(return_received_query).one() or 0
-    qc_pending_returns = session.exec(return_qc_pending_query).one() or 0
-
     return {
         "period_days": days,
         "external_po": {
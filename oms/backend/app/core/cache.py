@@ -0,0 +1,90 @@
+"""
+Process-local Cache
+LRU + TTL cache of values loaded from the database, shared by the services
+and dependencies that serve read-mostly data from memory (principals, API
+keys, valuation methods, per-company indexes, dashboard results).
+
+Writers invalidate the keys whose rows they changed; the TTL bounds staleness
+for changes made by other processes. A load that started before an
+invalidation is returned to its caller but not cached.
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Generic, Hashable, Tuple, TypeVar
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+# (generation, started) of a load, see TTLCache.ticket
+Ticket = Tuple[int, float]
+
+MISSING = object()
+
+
+class TTLCache(Generic[K, V]):
+    """Per-process LRU + TTL cache."""
+
+    def __init__(self, ttl_seconds: float, max_keys: int):
+        self.ttl_seconds = ttl_seconds
+        self.max_keys = max_keys
+        # key -> (value, loaded_at)
+        self._entries: "OrderedDict[K, Tuple[V, float]]" = OrderedDict()
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def peek(self, key: K, default=MISSING):
+        """Cached value of key, or default if missing or expired."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and now - entry[1] < self.ttl_seconds:
+                self._entries.move_to_end(key)
+                return entry[0]
+        return default
+
+    def ticket(self) -> Ticket:
+        """Taken before loading a missing value; pass it to put."""
+        with self._lock:
+            return self._generation, time.monotonic()
+
+    def put(self, key: K, value: V, ticket: Ticket) -> bool:
+        """Cache a loaded value unless an invalidation happened since ticket."""
+        generation, started = ticket
+        with self._lock:
+            if generation != self._generation:
+                return False
+            self._entries[key] = (value, started)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_keys:
+                self._entries.popitem(last=False)
+        return True
+
+    def get_or_load(self, key: K, load: Callable[[], V], cache_none: bool = True) -> V:
+        """Cached value of key, loading and caching it on a miss."""
+        value = self.peek(key)
+        if value is not MISSING:
+            return value
+        ticket = self.ticket()
+        value = load()
+        if value is not None or cache_none:
+            self.put(key, value, ticket)
+        return value
+
+    def invalidate(self, *keys: K) -> None:
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+            self._generation += 1
+
+    def invalidate_where(self, predicate: Callable[[K, V], bool]) -> None:
+        """Drop every entry predicate(key, value) matches."""
+        with self._lock:
+            for key in [k for k, (v, _) in self._entries.items() if predicate(k, v)]:
+                del self._entries[key]
+            self._generation += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._generation += 1
@@ -28,6 +28,15 @@ class Settings(BaseSettings):
     SECRET_KEY: str = Field(default="change-me-in-production")
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 1440  # 24 hours
+    # Authenticated principal cache (per process; the TTL bounds how long
+    # another worker's user changes take to apply)
+    PRINCIPAL_CACHE_TTL_SECONDS: int = 30
+    PRINCIPAL_CACHE_MAX_KEYS: int = 10000
+    # External API key index (per process) and how often recorded key uses
+    # are written to APIKey.lastUsedAt
+    API_KEY_CACHE_TTL_SECONDS: int = 60
+    API_KEY_CACHE_MAX_KEYS: int = 10000
+    API_KEY_LAST_USED_FLUSH_SECONDS: int = 30
 
     # CORS
     FRONTEND_URL: str = Field(default="http://localhost:3000")
@@ -42,6 +51,94 @@ class Settings(BaseSettings):
     DB_MAX_OVERFLOW: int = 10
     DB_POOL_TIMEOUT: int = 30
 
+    # Detection Engine
+    # Re-read rows updated this many seconds before the watermark, to catch
+    # transactions that committed after the previous scan started
+    DETECTION_WATERMARK_OVERLAP_SECONDS: int = 120
+    # UTC hour of the nightly full rescan (ignores watermarks)
+    DETECTION_FULL_RESCAN_HOUR: int = 2
+    # (rule, company) shards run on a bounded pool: "thread" or "process"
+    DETECTION_EXECUTOR: str = "thread"
+    DETECTION_MAX_WORKERS: int = 4
+    # Per-shard budget; also applied as statement_timeout on PostgreSQL
+    DETECTION_SHARD_TIMEOUT_SECONDS: int = 300
+
+    # Inventory Allocation
+    # In-process availability index of (sku, location) lots; writes are
+    # guarded in the database, so these only bound staleness and memory
+    ALLOCATION_LEDGER_TTL_SECONDS: int = 30
+    ALLOCATION_LEDGER_MAX_KEYS: int = 10000
+    # Re-reads of a key after a lost race before reporting a shortfall
+    ALLOCATION_LEDGER_MAX_RETRIES: int = 3
+    # Cached valuation method per (sku, location, company); explicit changes
+    # invalidate it, the TTL covers changes made by other processes
+    VALUATION_POLICY_TTL_SECONDS: int = 300
+    VALUATION_POLICY_MAX_KEYS: int = 50000
+
+    # Analytics Snapshots
+    # Closed days rebuilt on every run, so recent orders' status changes land
+    # in their day; the first run backfills at most ANALYTICS_SNAPSHOT_BACKFILL_DAYS
+    ANALYTICS_SNAPSHOT_INTERVAL_MINUTES: int = 60
+    ANALYTICS_SNAPSHOT_LOOKBACK_DAYS: int = 30
+    ANALYTICS_SNAPSHOT_BACKFILL_DAYS: int = 365
+
+    # Report Worker
+    # Output files are written under REPORT_OUTPUT_DIR/<companyId>/
+    REPORT_OUTPUT_DIR: str = "reports"
+    REPORT_WORKER_INTERVAL_SECONDS: int = 60
+    REPORT_MAX_WORKERS: int = 2
+    # Rows fetched per server-side cursor round trip
+    REPORT_CHUNK_SIZE: int = 5000
+    # RUNNING executions older than this are failed (worker stopped mid-run)
+    REPORT_EXECUTION_TIMEOUT_MINUTES: int = 120
+
+    # Dashboards
+    # Per-process result cache shared by concurrent requests for the same widget
+    DASHBOARD_CACHE_TTL_SECONDS: float = 5
+    DASHBOARD_CACHE_MAX_KEYS: int = 1000
+
+    # Demand Forecasting
+    # Nightly batch (UTC hour); daily forecasts for the next FORECAST_HORIZON_DAYS
+    FORECAST_HOUR: int = 3
+    FORECAST_HISTORY_DAYS: int = 180
+    FORECAST_HORIZON_DAYS: int = 14
+    # Replenishment lead time and service-level z-score for safety stock
+    FORECAST_LEAD_TIME_DAYS: int = 7
+    FORECAST_SERVICE_LEVEL_Z: float = 1.65
+
+    # Document Numbers
+    # Numbers each process claims per trip to a series' Sequence counter
+    DOCUMENT_NUMBER_BLOCK_SIZE: int = 20
+
+    # Lane Rates
+    # In-memory PTL/FTL rate index per company (per process; the TTL bounds
+    # how long another worker's rate changes take to apply)
+    LANE_RATE_INDEX_TTL_SECONDS: int = 300
+    LANE_RATE_INDEX_MAX_COMPANIES: int = 1000
+    # Compiled courier rate cards per company
+    RATE_CARD_CACHE_TTL_SECONDS: int = 300
+    RATE_CARD_CACHE_MAX_COMPANIES: int = 1000
+    # Pincode serviceability index (shared by all companies; service pincode
+    # writes apply to it in place, the TTL covers other workers' writes)
+    SERVICEABILITY_INDEX_TTL_SECONDS: int = 600
+
+    # Carrier Allocation
+    # Compiled allocation rules / CSR configs and performance scores per company
+    CARRIER_ALLOCATION_CACHE_TTL_SECONDS: int = 300
+    CARRIER_ALLOCATION_CACHE_MAX_COMPANIES: int = 1000
+    # Performance rows of the last PERFORMANCE_LOOKBACK_DAYS are used once they
+    # cover at least PERFORMANCE_MIN_SHIPMENTS shipments
+    PERFORMANCE_LOOKBACK_DAYS: int = 90
+    PERFORMANCE_MIN_SHIPMENTS: int = 20
+
+    # Performance Aggregation
+    # Deliveries / shipments / NDRs updated since the last run are folded into
+    # the performance tables, PERFORMANCE_AGGREGATION_CHUNK_SIZE rows per
+    # transaction; the overlap re-reads rows of late-committing transactions
+    PERFORMANCE_AGGREGATION_INTERVAL_MINUTES: int = 15
+    PERFORMANCE_AGGREGATION_CHUNK_SIZE: int = 5000
+    PERFORMANCE_WATERMARK_OVERLAP_SECONDS: int = 120
+
     class Config:
         env_file = ".env"
         env_file_encoding = "utf-8"
@@ -64,6 +161,8 @@ class Settings(BaseSettings):
         # Convert postgresql:// to postgresql+asyncpg://
         if url.startswith("postgresql://"):
             url = url.replace("postgresql://", "postgresql+asyncpg://", 1)
+        elif url.startswith("sqlite://"):
+            url = url.replace("sqlite://", "sqlite+aiosqlite://", 1)
         return url
 
 
@@ -1,11 +1,18 @@
 """
 Database Configuration for SQLModel
 Supports both sync and async operations
+
+Sync handlers (plain `def`) use get_session and run in FastAPI's threadpool.
+`async def` handlers must not block the event loop, so they use
+get_async_session (asyncpg) and await every query.
 """
 from sqlmodel import SQLModel, Session, create_engine
+from sqlmodel.ext.asyncio.session import AsyncSession
+from sqlalchemy.ext.asyncio import AsyncEngine, async_sessionmaker, create_async_engine
 from sqlalchemy.pool import NullPool, QueuePool
 from sqlalchemy import event
-from typing import Generator
+from datetime import datetime, timedelta, timezone
+from typing import AsyncGenerator, Generator, Optional
 from contextlib import contextmanager
 
 from .config import settings
@@ -29,6 +36,77 @@ engine = create_engine(
 )
 
 
+PG_EPOCH = datetime(2000, 1, 1)
+
+_async_engine: Optional[AsyncEngine] = None
+_async_session_factory: Optional[async_sessionmaker] = None
+
+
+def _set_asyncpg_timestamp_codec(dbapi_connection, connection_record):
+    """
+    Store timezone-aware datetimes in TIMESTAMP columns as naive UTC, as the
+    sync driver does with a UTC session; asyncpg rejects them otherwise.
+    """
+    def encode(value: datetime):
+        if value.tzinfo is not None:
+            value = value.astimezone(timezone.utc).replace(tzinfo=None)
+        return ((value - PG_EPOCH) // timedelta(microseconds=1),)
+
+    def decode(value) -> datetime:
+        return PG_EPOCH + timedelta(microseconds=value[0])
+
+    dbapi_connection.run_async(
+        lambda connection: connection.set_type_codec(
+            "timestamp", schema="pg_catalog", encoder=encode, decoder=decode, format="tuple"
+        )
+    )
+
+
+def get_async_engine() -> AsyncEngine:
+    """
+    Async engine (asyncpg; aiosqlite for SQLite URLs) for async handlers.
+    Created on first use, so importing this module never needs an async driver.
+    """
+    global _async_engine
+    if _async_engine is None:
+        url = settings.database_url_async
+        nullpool = _get_pool_class() is NullPool
+        engine_ = create_async_engine(
+            url,
+            # QueuePool is sync-only; the async engine defaults to its async variant
+            **({"poolclass": NullPool} if nullpool else {}),
+            pool_pre_ping=True,
+            echo=settings.DEBUG,
+            # Transaction-mode poolers (pgbouncer/Supabase) can't keep asyncpg's
+            # per-connection prepared statements
+            connect_args=(
+                {"statement_cache_size": 0}
+                if nullpool and url.startswith("postgresql+asyncpg")
+                else {}
+            ),
+        )
+        if engine_.dialect.driver == "asyncpg":
+            event.listen(engine_.sync_engine, "connect", _set_asyncpg_timestamp_codec)
+        _async_engine = engine_
+    return _async_engine
+
+
+def async_session_factory() -> AsyncSession:
+    """New AsyncSession bound to the async engine."""
+    global _async_session_factory
+    if _async_session_factory is None:
+        _async_session_factory = async_sessionmaker(
+            get_async_engine(), class_=AsyncSession, expire_on_commit=False
+        )
+    return _async_session_factory()
+
+
+async def dispose_async_engine() -> None:
+    """Close the async engine's connections, if it was ever created."""
+    if _async_engine is not None:
+        await _async_engine.dispose()
+
+
 # Enable foreign key constraints for SQLite (if used in testing)
 @event.listens_for(engine, "connect")
 def set_sqlite_pragma(dbapi_connection, connection_record):
@@ -57,6 +135,20 @@ def get_session() -> Generator[Session, None, None]:
             raise
 
 
+async def get_async_session() -> AsyncGenerator[AsyncSession, None]:
+    """
+    FastAPI dependency for async database sessions.
+    Usage: session: AsyncSession = Depends(get_async_session)
+    """
+    async with async_session_factory() as session:
+        try:
+            yield session
+            await session.commit()
+        except Exception:
+            await session.rollback()
+            raise
+
+
 @contextmanager
 def get_session_context() -> Generator[Session, None, None]:
     """
@@ -10,6 +10,7 @@ from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from sqlmodel import Session, select
 
 from .database import get_session
+from .principals import Principal, principal_cache
 from .security import verify_token
 
 # Security scheme for Bearer token authentication
@@ -31,66 +32,76 @@ def get_db() -> Generator[Session, None, None]:
     yield from get_session()
 
 
-async def get_current_user_optional(
+def _request_user_id(
+    request: Request,
+    credentials: Optional[HTTPAuthorizationCredentials],
+) -> Optional[str]:
+    """User id from the Bearer token, else the X-User-Id header (frontend proxy auth)."""
+    if credentials:
+        payload = verify_token(credentials.credentials)
+        if payload and payload.get("user_id"):
+            return payload["user_id"]
+    return request.headers.get("X-User-Id")
+
+
+def _resolve_principal(request: Request, user_id: UUID, db: Session) -> Optional[Principal]:
+    """
+    Principal of user_id, shared by every dependency of the request and
+    cached across requests (see app.core.principals).
+    """
+    resolved = getattr(request.state, "principal", None)
+    if resolved is not None and resolved.id == user_id:
+        return resolved
+
+    def load(key: UUID) -> Optional[Principal]:
+        User = _get_user_model()
+        user = db.exec(select(User).where(User.id == key)).first()
+        return Principal.from_user(user) if user else None
+
+    principal = principal_cache.get(user_id, load)
+    if principal is not None:
+        request.state.principal = principal
+    return principal
+
+
+def get_current_user_optional(
     request: Request,
     credentials: Optional[HTTPAuthorizationCredentials] = Depends(security),
     db: Session = Depends(get_db)
-) -> Optional[Any]:
+) -> Optional[Principal]:
     """
     Get current user if authenticated, None otherwise.
     Use this for endpoints that work with or without authentication.
     Supports both Bearer token and X-User-Id header (for frontend proxy).
     """
-    User = _get_user_model()
-    user_id = None
-
-    # First try Bearer token
-    if credentials:
-        token = credentials.credentials
-        payload = verify_token(token)
-        if payload:
-            user_id = payload.get("user_id")
-
-    # Then try X-User-Id header (frontend proxy auth)
-    if not user_id:
-        user_id = request.headers.get("X-User-Id")
-
+    user_id = _request_user_id(request, credentials)
     if not user_id:
         return None
 
     try:
-        user = db.exec(select(User).where(User.id == UUID(user_id))).first()
+        key = UUID(user_id)
     except (ValueError, TypeError):
         return None
 
-    return user
+    return _resolve_principal(request, key, db)
 
 
-async def get_current_user(
+def get_current_user(
     request: Request,
     credentials: Optional[HTTPAuthorizationCredentials] = Depends(security),
     db: Session = Depends(get_db)
-) -> Any:
+) -> Principal:
     """
     Get current authenticated user.
     Raises 401 if not authenticated.
     Supports both Bearer token and X-User-Id header (for frontend proxy).
 
+    Returns the cached Principal (id, email, role, companyId, locationAccess,
+    isActive), not a User row; load the User when other fields are needed.
+
     Usage: current_user: User = Depends(get_current_user)
     """
-    User = _get_user_model()
-    user_id = None
-
-    # First try Bearer token
-    if credentials:
-        token = credentials.credentials
-        payload = verify_token(token)
-        if payload:
-            user_id = payload.get("user_id")
-
-    # Then try X-User-Id header (frontend proxy auth)
-    if not user_id:
-        user_id = request.headers.get("X-User-Id")
+    user_id = _request_user_id(request, credentials)
 
     if not user_id:
         raise HTTPException(
@@ -100,7 +111,7 @@ async def get_current_user(
         )
 
     try:
-        user = db.exec(select(User).where(User.id == UUID(user_id))).first()
+        key = UUID(user_id)
     except (ValueError, TypeError):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -108,6 +119,8 @@ async def get_current_user(
             headers={"WWW-Authenticate": "Bearer"},
         )
 
+    user = _resolve_principal(request, key, db)
+
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -0,0 +1,61 @@
+"""
+Authenticated Principal Cache
+The fields of a User that authorization and tenancy checks need (role,
+companyId, locationAccess, isActive), cached per process so authenticating a
+request doesn't query User.
+
+Entries live in a TTLCache keyed by user id, with a short TTL. The users and
+auth APIs invalidate a user when they change it.
+"""
+from dataclasses import dataclass
+from typing import Callable, Optional, Tuple
+from uuid import UUID
+
+from .cache import TTLCache
+from .config import settings
+
+
+@dataclass(frozen=True)
+class Principal:
+    """Authenticated user as seen by request handlers."""
+    id: UUID
+    email: str
+    role: str
+    companyId: Optional[UUID]
+    locationAccess: Tuple[UUID, ...]
+    isActive: bool
+
+    @classmethod
+    def from_user(cls, user) -> "Principal":
+        return cls(
+            id=user.id,
+            email=user.email,
+            role=user.role,
+            companyId=user.companyId,
+            locationAccess=tuple(user.locationAccess or ()),
+            isActive=user.isActive,
+        )
+
+
+class PrincipalCache:
+    """Per-process cache of principals by user id."""
+
+    def __init__(self, ttl_seconds: int, max_keys: int):
+        self._cache: TTLCache[UUID, Principal] = TTLCache(ttl_seconds, max_keys)
+
+    def get(self, user_id: UUID, load: Callable[[UUID], Optional[Principal]]) -> Optional[Principal]:
+        """Cached principal of user_id, loading misses (None if no such user)."""
+        return self._cache.get_or_load(user_id, lambda: load(user_id), cache_none=False)
+
+    def invalidate(self, user_id: UUID) -> None:
+        """Drop a user's principal after the user was changed."""
+        self._cache.invalidate(user_id)
+
+    def clear(self) -> None:
+        self._cache.clear()
+
+
+principal_cache = PrincipalCache(
+    ttl_seconds=settings.PRINCIPAL_CACHE_TTL_SECONDS,
+    max_keys=settings.PRINCIPAL_CACHE_MAX_KEYS,
+)
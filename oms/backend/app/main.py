@@ -44,6 +44,8 @@ async def lifespan(app: FastAPI):
     logger.info("Shutting down CJDQuick OMS API...")
     shutdown_scheduler()
     logger.info("Scheduler stopped")
+    from .core.database import dispose_async_engine
+    await dispose_async_engine()
 
 
 app = FastAPI(
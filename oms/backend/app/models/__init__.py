@@ -472,9 +472,12 @@ from .logistics_extended import (
     ServicePincodeCreate,
     ServicePincodeUpdate,
     ServicePincodeResponse,
+    ServiceabilityCheckRequest,
     AWB,
     AWBCreate,
     AWBResponse,
+    RateCheckShipment,
+    RateCheckBatchRequest,
 )
 
 # SKU Extended models and schemas
@@ -551,6 +554,7 @@ from .system import (
     AuditLogCreate,
     AuditLogResponse,
     Exception,
+    ExceptionCounter,
     ExceptionCreate,
     ExceptionUpdate,
     ExceptionResponse,
@@ -715,6 +719,8 @@ from .shipping_allocation import (
     CarrierPerformance,
     PincodePerformance,
     LanePerformance,
+    PerformanceOutcome,
+    PerformanceWatermark,
     # Allocation Engine Models
     CSRScoreConfig,
     ShippingAllocationRule,
@@ -751,6 +757,10 @@ from .shipping_allocation import (
     CarrierPerformanceResponse,
     PincodePerformanceResponse,
     LanePerformanceResponse,
+    # Carrier Allocation Schemas
+    AllocationShipment,
+    AllocationPreviewRequest,
+    DeliveryAllocationRequest,
 )
 
 __all__ = [
@@ -1159,10 +1169,13 @@ __all__ = [
     "ServicePincodeCreate",
     "ServicePincodeUpdate",
     "ServicePincodeResponse",
+    "ServiceabilityCheckRequest",
     # AWB
     "AWB",
     "AWBCreate",
     "AWBResponse",
+    "RateCheckShipment",
+    "RateCheckBatchRequest",
     # SKUBundle
     "SKUBundle",
     "SKUBundleCreate",
@@ -1236,6 +1249,7 @@ __all__ = [
     "AuditLogResponse",
     # Exception
     "Exception",
+    "ExceptionCounter",
     "ExceptionCreate",
     "ExceptionUpdate",
     "ExceptionResponse",
@@ -1334,6 +1348,8 @@ __all__ = [
     "CarrierPerformance",
     "PincodePerformance",
     "LanePerformance",
+    "PerformanceOutcome",
+    "PerformanceWatermark",
     # Allocation Engine Models
     "CSRScoreConfig",
     "ShippingAllocationRule",
@@ -1370,6 +1386,10 @@ __all__ = [
     "CarrierPerformanceResponse",
     "PincodePerformanceResponse",
     "LanePerformanceResponse",
+    # Carrier Allocation Schemas
+    "AllocationShipment",
+    "AllocationPreviewRequest",
+    "DeliveryAllocationRequest",
     # External PO (WMS Inbound Phase 1)
     "ExternalPurchaseOrder",
     "ExternalPurchaseOrderCreate",
@@ -67,6 +67,7 @@ class AnalyticsSnapshotBase(SQLModel):
     b2bRevenue: Decimal = Field(default=Decimal("0"))
     creditUtilization: Optional[Decimal] = None
     # Breakdown data (JSON)
+    statusBreakdown: Optional[dict] = Field(default=None, sa_column=Column(JSON))
     channelBreakdown: Optional[dict] = Field(default=None, sa_column=Column(JSON))
     categoryBreakdown: Optional[dict] = Field(default=None, sa_column=Column(JSON))
     transporterBreakdown: Optional[dict] = Field(default=None, sa_column=Column(JSON))
@@ -212,6 +213,7 @@ class ReportExecutionBase(SQLModel):
     fileUrl: Optional[str] = None
     fileSize: Optional[int] = None
     rowCount: Optional[int] = None
+    durationMs: Optional[int] = None
     error: Optional[str] = None
 
 
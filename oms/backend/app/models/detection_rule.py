@@ -132,6 +132,9 @@ class DetectionRule(BaseModel, table=True):
 
     # Execution tracking
     lastExecutedAt: Optional[datetime] = Field(default=None)
+    # High-water mark for incremental scheduler scans: entities updated after
+    # this (and AGE thresholds crossed since) are rescanned. NULL = full scan.
+    scanWatermark: Optional[datetime] = Field(default=None)
     executionCount: int = Field(default=0, sa_column=Column(Integer, default=0))
     exceptionsCreated: int = Field(default=0, sa_column=Column(Integer, default=0))
 
@@ -224,6 +227,7 @@ class DetectionRuleResponse(ResponseBase):
     isGlobal: bool
     companyId: Optional[UUID]
     lastExecutedAt: Optional[datetime]
+    scanWatermark: Optional[datetime] = None
     executionCount: int
     exceptionsCreated: int
     createdAt: datetime
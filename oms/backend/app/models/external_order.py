@@ -121,9 +121,13 @@ class ExternalOrderError(SQLModel):
     details: Optional[dict] = None
 
 
+# Orders accepted per bulk request
+MAX_BULK_ORDERS = 5000
+
+
 class ExternalBulkOrderCreate(SQLModel):
     """Schema for creating multiple orders at once"""
-    orders: List[ExternalOrderCreate] = Field(min_length=1, max_length=100)
+    orders: List[ExternalOrderCreate] = Field(min_length=1, max_length=MAX_BULK_ORDERS)
 
 
 class ExternalBulkOrderResponse(SQLModel):
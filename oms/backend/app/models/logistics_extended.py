@@ -283,6 +283,13 @@ class ServicePincodeResponse(ServicePincodeBase):
     updatedAt: datetime
 
 
+class ServiceabilityCheckRequest(SQLModel):
+    """Pincodes to check in one call"""
+    pincodes: List[str] = Field(min_length=1, max_length=10000)
+    transporterId: Optional[UUID] = None
+    paymentMode: Optional[str] = None  # PREPAID | COD; any mode if unset
+
+
 # ============================================================================
 # AWB (Air Waybill Number Pool)
 # ============================================================================
@@ -318,3 +325,25 @@ class AWBResponse(AWBBase):
     id: UUID
     createdAt: datetime
     updatedAt: datetime
+
+
+# ============================================================================
+# Rate Check
+# ============================================================================
+
+class RateCheckShipment(SQLModel):
+    """Shipment to quote"""
+    reference: Optional[str] = None  # Caller's id, echoed in the result
+    originPincode: str
+    destinationPincode: str
+    weight: Decimal = Field(gt=0)  # kg
+    length: Optional[Decimal] = None  # cm
+    width: Optional[Decimal] = None
+    height: Optional[Decimal] = None
+    paymentMode: str = "PREPAID"  # PREPAID | COD
+    codAmount: Decimal = Decimal("0")
+
+
+class RateCheckBatchRequest(SQLModel):
+    """Shipments to quote in one call"""
+    shipments: List[RateCheckShipment] = Field(min_length=1, max_length=5000)
@@ -14,6 +14,7 @@ from sqlalchemy import Column, String, Integer, ForeignKey, Text, Index
 from sqlalchemy.dialects.postgresql import UUID as PG_UUID, JSON, NUMERIC
 
 from .base import BaseModel, CompanyMixin, ActiveMixin, ResponseBase, CreateBase, UpdateBase
+from .logistics_extended import RateCheckShipment
 from .enums import (
     ShipmentType, VehicleCategory, AllocationMode, FTLIndentStatus,
     PTLBookingStatus, RateMatrixType, PerformanceMetricType, AllocationDecisionReason
@@ -429,6 +430,13 @@ class CarrierPerformance(BaseModel, CompanyMixin, table=True):
     Stores overall performance scores per carrier.
     """
     __tablename__ = "CarrierPerformance"
+    __table_args__ = (
+        Index(
+            'uq_carrier_performance_key',
+            'companyId', 'transporterId', 'shipmentType', 'periodStart',
+            unique=True,
+        ),
+    )
 
     # Period
     periodStart: datetime = Field(index=True)
@@ -444,6 +452,17 @@ class CarrierPerformance(BaseModel, CompanyMixin, table=True):
     deliveredShipments: int = Field(default=0)
     rtoShipments: int = Field(default=0)
 
+    # Outcome counters, maintained incrementally by the performance
+    # aggregation job; the rates and scores below are derived from them
+    onTimeShipments: int = Field(default=0)
+    lateShipments: int = Field(default=0)
+    ndrShipments: int = Field(default=0)
+    tatShipments: int = Field(default=0)  # Delivered with a ship date
+    tatDaysTotal: Decimal = Field(
+        default=Decimal("0"),
+        sa_column=Column(NUMERIC(14, 2), default=0)
+    )
+
     # Performance scores (0-100)
     costScore: Optional[Decimal] = Field(
         default=None,
@@ -503,6 +522,11 @@ class PincodePerformance(BaseModel, CompanyMixin, table=True):
     __tablename__ = "PincodePerformance"
     __table_args__ = (
         Index('ix_pincode_performance_lookup', 'pincode', 'transporterId'),
+        Index(
+            'uq_pincode_performance_key',
+            'companyId', 'pincode', 'transporterId', 'periodStart',
+            unique=True,
+        ),
     )
 
     pincode: str = Field(max_length=10, index=True)
@@ -516,6 +540,17 @@ class PincodePerformance(BaseModel, CompanyMixin, table=True):
     deliveredShipments: int = Field(default=0)
     rtoShipments: int = Field(default=0)
 
+    # Outcome counters, maintained incrementally by the performance
+    # aggregation job; the rates and scores below are derived from them
+    onTimeShipments: int = Field(default=0)
+    lateShipments: int = Field(default=0)
+    ndrShipments: int = Field(default=0)
+    tatShipments: int = Field(default=0)  # Delivered with a ship date
+    tatDaysTotal: Decimal = Field(
+        default=Decimal("0"),
+        sa_column=Column(NUMERIC(14, 2), default=0)
+    )
+
     # Performance scores (0-100)
     costScore: Optional[Decimal] = Field(
         default=None,
@@ -575,6 +610,11 @@ class LanePerformance(BaseModel, CompanyMixin, table=True):
     __tablename__ = "LanePerformance"
     __table_args__ = (
         Index('ix_lane_performance_lookup', 'originCity', 'destinationCity', 'transporterId'),
+        Index(
+            'uq_lane_performance_key',
+            'companyId', 'originCity', 'destinationCity', 'transporterId', 'shipmentType', 'periodStart',
+            unique=True,
+        ),
     )
 
     # Lane definition
@@ -593,6 +633,18 @@ class LanePerformance(BaseModel, CompanyMixin, table=True):
     # Volume metrics
     totalShipments: int = Field(default=0)
     deliveredShipments: int = Field(default=0)
+    rtoShipments: int = Field(default=0)
+
+    # Outcome counters, maintained incrementally by the performance
+    # aggregation job; the rates and scores below are derived from them
+    onTimeShipments: int = Field(default=0)
+    lateShipments: int = Field(default=0)
+    ndrShipments: int = Field(default=0)
+    tatShipments: int = Field(default=0)  # Delivered with a ship date
+    tatDaysTotal: Decimal = Field(
+        default=Decimal("0"),
+        sa_column=Column(NUMERIC(14, 2), default=0)
+    )
 
     # Performance scores (0-100)
     costScore: Optional[Decimal] = Field(
@@ -621,6 +673,14 @@ class LanePerformance(BaseModel, CompanyMixin, table=True):
         default=None,
         sa_column=Column(NUMERIC(12, 2))
     )
+    successRate: Optional[Decimal] = Field(
+        default=None,
+        sa_column=Column(NUMERIC(5, 2))
+    )
+    rtoRate: Optional[Decimal] = Field(
+        default=None,
+        sa_column=Column(NUMERIC(5, 2))
+    )
     onTimeRate: Optional[Decimal] = Field(
         default=None,
         sa_column=Column(NUMERIC(5, 2))
@@ -637,6 +697,48 @@ class LanePerformance(BaseModel, CompanyMixin, table=True):
     )
 
 
+class PerformanceOutcome(BaseModel, CompanyMixin, table=True):
+    """
+    Ledger of what each delivery / shipment currently contributes to the
+    performance tables. The aggregation job diffs a source row's outcome
+    against its entry, so re-reading a row moves counters instead of adding
+    them twice.
+    """
+    __tablename__ = "PerformanceOutcome"
+    __table_args__ = (
+        Index('uq_performance_outcome_source', 'sourceType', 'sourceId', unique=True),
+    )
+
+    sourceType: str = Field(max_length=20)  # DELIVERY | SHIPMENT
+    sourceId: UUID = Field(sa_column=Column(PG_UUID(as_uuid=True), nullable=False))
+
+    # Buckets the outcome is counted in
+    transporterId: UUID = Field(sa_column=Column(PG_UUID(as_uuid=True), nullable=False))
+    shipmentType: str = Field(max_length=20)
+    periodStart: datetime
+    pincode: Optional[str] = Field(default=None, max_length=10)
+    originCity: Optional[str] = Field(default=None, max_length=100)
+    destinationCity: Optional[str] = Field(default=None, max_length=100)
+
+    # Outcome
+    delivered: bool = Field(default=False)
+    rto: bool = Field(default=False)
+    onTime: Optional[bool] = Field(default=None)  # None: no promised date
+    ndr: bool = Field(default=False)
+    tatDays: Optional[Decimal] = Field(
+        default=None,
+        sa_column=Column(NUMERIC(8, 2))
+    )
+
+
+class PerformanceWatermark(BaseModel, table=True):
+    """High-water mark of updatedAt read by the aggregation job, per source table."""
+    __tablename__ = "PerformanceWatermark"
+
+    source: str = Field(max_length=20, unique=True)  # DELIVERY | SHIPMENT | NDR
+    watermark: datetime
+
+
 # ============================================================================
 # Allocation Engine Models
 # ============================================================================
@@ -1233,6 +1335,9 @@ class CarrierPerformanceResponse(ResponseBase):
     totalShipments: int
     deliveredShipments: int
     rtoShipments: int
+    onTimeShipments: int = 0
+    lateShipments: int = 0
+    ndrShipments: int = 0
     costScore: Optional[Decimal] = None
     speedScore: Optional[Decimal] = None
     reliabilityScore: Optional[Decimal] = None
@@ -1260,6 +1365,9 @@ class PincodePerformanceResponse(ResponseBase):
     totalShipments: int
     deliveredShipments: int
     rtoShipments: int
+    onTimeShipments: int = 0
+    lateShipments: int = 0
+    ndrShipments: int = 0
     costScore: Optional[Decimal] = None
     speedScore: Optional[Decimal] = None
     reliabilityScore: Optional[Decimal] = None
@@ -1289,12 +1397,18 @@ class LanePerformanceResponse(ResponseBase):
     periodEnd: datetime
     totalShipments: int
     deliveredShipments: int
+    rtoShipments: int = 0
+    onTimeShipments: int = 0
+    lateShipments: int = 0
+    ndrShipments: int = 0
     costScore: Optional[Decimal] = None
     speedScore: Optional[Decimal] = None
     reliabilityScore: Optional[Decimal] = None
     overallScore: Optional[Decimal] = None
     avgTATDays: Optional[Decimal] = None
     avgCost: Optional[Decimal] = None
+    successRate: Optional[Decimal] = None
+    rtoRate: Optional[Decimal] = None
     onTimeRate: Optional[Decimal] = None
     transporterId: UUID
     companyId: UUID
@@ -1302,3 +1416,26 @@ class LanePerformanceResponse(ResponseBase):
     updatedAt: datetime
     # Joined fields
     transporterName: Optional[str] = None
+
+
+# ============================================================================
+# Carrier Allocation Schemas
+# ============================================================================
+
+class AllocationShipment(RateCheckShipment):
+    """Shipment to allocate a carrier for"""
+    shipmentType: ShipmentType = ShipmentType.B2C
+    channel: Optional[str] = None
+    orderValue: Optional[Decimal] = None
+
+
+class AllocationPreviewRequest(SQLModel):
+    """Shipments to allocate without recording the decisions"""
+    shipments: List[AllocationShipment] = Field(min_length=1, max_length=5000)
+
+
+class DeliveryAllocationRequest(SQLModel):
+    """Deliveries to allocate carriers to in one call"""
+    deliveryIds: List[UUID] = Field(min_length=1, max_length=5000)
+    dryRun: bool = False  # Decide without assigning or auditing
+
@@ -1,12 +1,12 @@
 """
-System Models: Audit Log, Exception, Sequence, Session, Brand User
+System Models: Audit Log, Exception, Exception Counter, Sequence, Session, Brand User
 """
 from typing import Optional, List
 from uuid import UUID
-from datetime import datetime
+from datetime import date, datetime
 from decimal import Decimal
 from sqlmodel import SQLModel, Field
-from sqlalchemy import Column, JSON
+from sqlalchemy import Column, JSON, Index, text
 
 from .base import BaseModel
 from .enums import BrandUserRole
@@ -82,6 +82,42 @@ class ExceptionBase(SQLModel):
 class Exception(ExceptionBase, BaseModel, table=True):
     """Exception model"""
     __tablename__ = "Exception"
+    __table_args__ = (
+        # At most one open exception per entity and type; the detection
+        # engine upserts against this with ON CONFLICT DO NOTHING
+        Index(
+            "uq_exception_open_entity_type",
+            "entityType", "entityId", "type",
+            unique=True,
+            postgresql_where=text("status IN ('OPEN', 'IN_PROGRESS')"),
+            sqlite_where=text("status IN ('OPEN', 'IN_PROGRESS')"),
+        ),
+    )
+
+
+class ExceptionCounter(BaseModel, table=True):
+    """
+    Number of exceptions per (company, type, severity, status), maintained
+    incrementally by the writers of Exception so dashboards never scan
+    exception history. periodCount counts exceptions that entered the status
+    on periodDate and are still in it (e.g. resolved today).
+    """
+    __tablename__ = "ExceptionCounter"
+    __table_args__ = (
+        Index(
+            "uq_exception_counter_key",
+            "companyId", "type", "severity", "status",
+            unique=True,
+        ),
+    )
+
+    companyId: UUID = Field(foreign_key="Company.id")
+    type: str
+    severity: str
+    status: str
+    count: int = Field(default=0)
+    periodDate: Optional[date] = None
+    periodCount: int = Field(default=0)
 
 
 class ExceptionCreate(SQLModel):
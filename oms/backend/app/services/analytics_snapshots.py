@@ -0,0 +1,608 @@
+"""
+Analytics Snapshot Service
+Materializes AnalyticsSnapshot rows (DAILY, WEEKLY, MONTHLY per company and
+location) and serves dashboard widgets from them.
+
+DAILY snapshots cover closed days, with orders bucketed by orderDate. Each run
+rebuilds the last ANALYTICS_SNAPSHOT_LOOKBACK_DAYS days, so status changes of
+recent orders (shipping, delivery, RTO) flow into their day. WEEKLY and
+MONTHLY snapshots are rolled up from DAILY rows, never from raw tables. Rows
+with locationId NULL hold company totals.
+
+Trend widgets read closed days from snapshots and add a live delta for orders
+placed after the last snapshotted day (normally just today), so their cost
+does not grow with order history. Current-status KPIs are not served from
+snapshots: a snapshot keeps the statuses its orders had when it was built.
+"""
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from typing import Dict, List, Optional, Tuple
+from uuid import UUID, uuid4
+
+from sqlalchemy import and_, case
+from sqlmodel import Session, select, func
+
+from app.core.config import settings
+from app.models import (
+    AnalyticsSnapshot, Order, OrderItem, OrderStatus, OrderType, Delivery,
+    DeliveryStatus, Return, Inventory, SKU, Location,
+)
+
+SNAPSHOT_TYPES = ("DAILY", "WEEKLY", "MONTHLY")
+
+SHIPPED_STATUSES = [
+    OrderStatus.SHIPPED, OrderStatus.IN_TRANSIT, OrderStatus.OUT_FOR_DELIVERY,
+    OrderStatus.DELIVERED, OrderStatus.RTO_INITIATED, OrderStatus.RTO_IN_TRANSIT,
+    OrderStatus.RTO_DELIVERED,
+]
+RTO_STATUSES = [
+    OrderStatus.RTO_INITIATED, OrderStatus.RTO_IN_TRANSIT, OrderStatus.RTO_DELIVERED,
+]
+CLOSED_STATUSES = SHIPPED_STATUSES + [OrderStatus.CANCELLED]
+
+COUNT_FIELDS = (
+    "totalOrders", "totalUnits", "ordersShipped", "ordersDelivered",
+    "ordersCancelled", "ordersRTO", "slaBreachedOrders", "totalReturns", "b2bOrders",
+)
+AMOUNT_FIELDS = ("totalRevenue", "b2bRevenue")
+INVENTORY_FIELDS = (
+    "totalSKUs", "totalQuantity", "lowStockSKUs", "outOfStockSKUs", "inventoryValue",
+)
+BREAKDOWN_FIELDS = (
+    "statusBreakdown", "channelBreakdown", "categoryBreakdown", "transporterBreakdown",
+)
+# Averages and rates, combined across days/locations weighted by a count field
+WEIGHTED_FIELDS = {
+    "avgFulfillmentTime": "ordersShipped",
+    "fillRate": "totalUnits",
+    "onTimeDeliveryRate": "ordersDelivered",
+}
+
+SnapshotKey = Tuple[UUID, Optional[UUID]]
+
+
+def _value(enum_or_str) -> Optional[str]:
+    return getattr(enum_or_str, "value", enum_or_str)
+
+
+def _day_start(day: date) -> datetime:
+    return datetime.combine(day, datetime.min.time())
+
+
+def period_start(day: date, snapshot_type: str) -> date:
+    """First day of the DAILY/WEEKLY (Monday)/MONTHLY period containing day."""
+    if snapshot_type == "WEEKLY":
+        return day - timedelta(days=day.weekday())
+    if snapshot_type == "MONTHLY":
+        return day.replace(day=1)
+    return day
+
+
+def period_end(start: date, snapshot_type: str) -> date:
+    """First day after the period starting at start."""
+    if snapshot_type == "WEEKLY":
+        return start + timedelta(days=7)
+    if snapshot_type == "MONTHLY":
+        return (start.replace(day=28) + timedelta(days=4)).replace(day=1)
+    return start + timedelta(days=1)
+
+
+def _hours_between(session: Session, start_column, end_column):
+    """end - start in hours, as a SQL expression."""
+    if session.get_bind().dialect.name == "postgresql":
+        return func.extract("epoch", end_column - start_column) / 3600
+    return (func.julianday(end_column) - func.julianday(start_column)) * 24
+
+
+# =============================================================================
+# SNAPSHOT METRICS
+# =============================================================================
+
+class SnapshotMetrics:
+    """Additive metrics of one snapshot, mergeable across locations and days."""
+
+    def __init__(self):
+        self.counts: Dict[str, int] = {f: 0 for f in COUNT_FIELDS}
+        self.amounts: Dict[str, Decimal] = {f: Decimal("0") for f in AMOUNT_FIELDS}
+        # field -> [sum of value * weight, weight]
+        self.weighted: Dict[str, list] = {f: [Decimal("0"), 0] for f in WEIGHTED_FIELDS}
+        self.breakdowns: Dict[str, dict] = {f: {} for f in BREAKDOWN_FIELDS}
+        # Point-in-time stock; None leaves a row's inventory fields untouched
+        self.inventory: Optional[dict] = None
+
+    def add_breakdown(self, field: str, key, **values) -> None:
+        bucket = self.breakdowns[field].setdefault(str(key), {})
+        for name, value in values.items():
+            bucket[name] = round(bucket.get(name, 0) + value, 2)
+
+    def add_rate(self, field: str, value, weight: int) -> None:
+        if value is None or not weight:
+            return
+        self.weighted[field][0] += Decimal(str(value)) * weight
+        self.weighted[field][1] += weight
+
+    def merge(self, other: "SnapshotMetrics") -> None:
+        for f in COUNT_FIELDS:
+            self.counts[f] += other.counts[f]
+        for f in AMOUNT_FIELDS:
+            self.amounts[f] += other.amounts[f]
+        for f in WEIGHTED_FIELDS:
+            self.weighted[f][0] += other.weighted[f][0]
+            self.weighted[f][1] += other.weighted[f][1]
+        for f in BREAKDOWN_FIELDS:
+            for key, values in other.breakdowns[f].items():
+                self.add_breakdown(f, key, **values)
+        if other.inventory is not None:
+            if self.inventory is None:
+                self.inventory = dict(other.inventory)
+            else:
+                for f in INVENTORY_FIELDS:
+                    self.inventory[f] += other.inventory[f]
+
+    @classmethod
+    def from_snapshot(cls, snapshot: AnalyticsSnapshot) -> "SnapshotMetrics":
+        metrics = cls()
+        for f in COUNT_FIELDS:
+            metrics.counts[f] = getattr(snapshot, f) or 0
+        for f in AMOUNT_FIELDS:
+            metrics.amounts[f] = Decimal(str(getattr(snapshot, f) or 0))
+        for f, weight_field in WEIGHTED_FIELDS.items():
+            metrics.add_rate(f, getattr(snapshot, f), metrics.counts[weight_field])
+        for f in BREAKDOWN_FIELDS:
+            for key, values in (getattr(snapshot, f) or {}).items():
+                metrics.add_breakdown(f, key, **values)
+        metrics.inventory = {f: getattr(snapshot, f) or 0 for f in INVENTORY_FIELDS}
+        return metrics
+
+    def apply(self, snapshot: AnalyticsSnapshot) -> None:
+        """Write metrics, and the rates derived from them, into snapshot."""
+        for f in COUNT_FIELDS:
+            setattr(snapshot, f, self.counts[f])
+        for f in AMOUNT_FIELDS:
+            setattr(snapshot, f, self.amounts[f])
+        for f in WEIGHTED_FIELDS:
+            total, weight = self.weighted[f]
+            setattr(snapshot, f, round(total / weight, 2) if weight else None)
+        for f in BREAKDOWN_FIELDS:
+            setattr(snapshot, f, self.breakdowns[f] or None)
+        if self.inventory is not None:
+            for f in INVENTORY_FIELDS:
+                setattr(snapshot, f, self.inventory[f])
+
+        orders = self.counts["totalOrders"]
+        shipped = self.counts["ordersShipped"]
+        snapshot.avgOrderValue = (
+            round(self.amounts["totalRevenue"] / orders, 2) if orders else Decimal("0")
+        )
+        snapshot.returnRate = (
+            round(Decimal(self.counts["totalReturns"] * 100) / orders, 2) if orders else None
+        )
+        snapshot.rtoRate = (
+            round(Decimal(self.counts["ordersRTO"] * 100) / shipped, 2) if shipped else None
+        )
+
+
+# =============================================================================
+# DAILY BUILD
+# =============================================================================
+
+def _collect_daily_metrics(
+    session: Session,
+    day: date,
+    now: datetime,
+    capture_inventory: bool,
+    company_id: Optional[UUID] = None,
+) -> Dict[SnapshotKey, SnapshotMetrics]:
+    """
+    Metrics of one day per (company, location), plus company totals keyed
+    (company, None). Each source is read with one grouped query.
+    """
+    start, end = _day_start(day), _day_start(day + timedelta(days=1))
+    buckets: Dict[SnapshotKey, SnapshotMetrics] = {}
+    # Facts without a location only count towards company totals
+    unlocated: Dict[UUID, SnapshotMetrics] = {}
+
+    def bucket(company, location) -> SnapshotMetrics:
+        if location is None:
+            return unlocated.setdefault(company, SnapshotMetrics())
+        return buckets.setdefault((company, location), SnapshotMetrics())
+
+    in_window = [Order.orderDate >= start, Order.orderDate < end]
+    if company_id:
+        in_window.append(Order.companyId == company_id)
+
+    # Orders by status, channel and type
+    breached = and_(
+        Order.shipByDate.isnot(None),
+        Order.shipByDate < now,
+        Order.status.notin_(CLOSED_STATUSES),
+    )
+    order_rows = session.exec(
+        select(
+            Order.companyId, Order.locationId, Order.status, Order.channel, Order.orderType,
+            func.count(Order.id),
+            func.coalesce(func.sum(Order.totalAmount), 0),
+            func.coalesce(func.sum(case((breached, 1), else_=0)), 0),
+        )
+        .where(*in_window)
+        .group_by(
+            Order.companyId, Order.locationId, Order.status, Order.channel, Order.orderType
+        )
+    ).all()
+    for company, location, status, channel, order_type, orders, revenue, sla_breached in order_rows:
+        metrics = bucket(company, location)
+        status = _value(status)
+        revenue = Decimal(str(revenue))
+        metrics.counts["totalOrders"] += orders
+        metrics.amounts["totalRevenue"] += revenue
+        metrics.counts["slaBreachedOrders"] += sla_breached
+        if status in SHIPPED_STATUSES:
+            metrics.counts["ordersShipped"] += orders
+        if status == OrderStatus.DELIVERED:
+            metrics.counts["ordersDelivered"] += orders
+        if status == OrderStatus.CANCELLED:
+            metrics.counts["ordersCancelled"] += orders
+        if status in RTO_STATUSES:
+            metrics.counts["ordersRTO"] += orders
+        if _value(order_type) == OrderType.B2B:
+            metrics.counts["b2bOrders"] += orders
+            metrics.amounts["b2bRevenue"] += revenue
+        metrics.add_breakdown("statusBreakdown", status, orders=orders, revenue=float(revenue))
+        metrics.add_breakdown("channelBreakdown", _value(channel), orders=orders, revenue=float(revenue))
+
+    # Units, fill rate and categories
+    item_rows = session.exec(
+        select(
+            Order.companyId, Order.locationId, SKU.category,
+            func.coalesce(func.sum(OrderItem.quantity), 0),
+            func.coalesce(func.sum(OrderItem.shippedQty), 0),
+            func.coalesce(func.sum(OrderItem.totalPrice), 0),
+        )
+        .join(Order, OrderItem.orderId == Order.id)
+        .join(SKU, OrderItem.skuId == SKU.id)
+        .where(*in_window)
+        .group_by(Order.companyId, Order.locationId, SKU.category)
+    ).all()
+    for company, location, category, units, shipped_units, revenue in item_rows:
+        metrics = bucket(company, location)
+        metrics.counts["totalUnits"] += units
+        if units:
+            metrics.add_rate("fillRate", Decimal(shipped_units * 100) / units, units)
+        metrics.add_breakdown(
+            "categoryBreakdown", category or "UNCATEGORIZED",
+            units=units, revenue=float(revenue),
+        )
+
+    # Shipments per transporter: fulfillment time and on-time delivery
+    delivered = Delivery.status == DeliveryStatus.DELIVERED
+    promised = and_(delivered, Order.promisedDate.isnot(None))
+    on_time = and_(promised, Delivery.deliveryDate <= Order.promisedDate)
+    shipped = Delivery.shipDate.isnot(None)
+    delivery_rows = session.exec(
+        select(
+            Order.companyId, Order.locationId, Delivery.transporterId,
+            func.count(Delivery.id),
+            func.coalesce(func.sum(case((delivered, 1), else_=0)), 0),
+            func.coalesce(func.sum(case((promised, 1), else_=0)), 0),
+            func.coalesce(func.sum(case((on_time, 1), else_=0)), 0),
+            func.coalesce(func.sum(case((shipped, 1), else_=0)), 0),
+            func.avg(case(
+                (shipped, _hours_between(session, Order.orderDate, Delivery.shipDate))
+            )),
+        )
+        .join(Order, Delivery.orderId == Order.id)
+        .where(*in_window)
+        .group_by(Order.companyId, Order.locationId, Delivery.transporterId)
+    ).all()
+    for (company, location, transporter, shipments, delivered_count, promised_count,
+         on_time_count, shipped_count, fulfillment_hours) in delivery_rows:
+        metrics = bucket(company, location)
+        if promised_count:
+            metrics.add_rate(
+                "onTimeDeliveryRate", Decimal(on_time_count * 100) / promised_count, promised_count
+            )
+        metrics.add_rate("avgFulfillmentTime", fulfillment_hours, shipped_count)
+        metrics.add_breakdown(
+            "transporterBreakdown", transporter or "UNASSIGNED",
+            shipments=shipments, delivered=delivered_count, onTime=on_time_count,
+        )
+
+    # Returns initiated that day
+    return_filters = [Return.initiatedAt >= start, Return.initiatedAt < end]
+    if company_id:
+        return_filters.append(Return.companyId == company_id)
+    return_rows = session.exec(
+        select(Return.companyId, Return.locationId, func.count(Return.id))
+        .where(*return_filters)
+        .group_by(Return.companyId, Return.locationId)
+    ).all()
+    for company, location, returns in return_rows:
+        bucket(company, location).counts["totalReturns"] += returns
+
+    # Closing stock per location (point in time, so only for the newest day)
+    if capture_inventory:
+        for (company, location), inventory in _collect_inventory(session, company_id).items():
+            bucket(company, location).inventory = inventory
+
+    totals: Dict[UUID, SnapshotMetrics] = {}
+    for (company, _), metrics in buckets.items():
+        totals.setdefault(company, SnapshotMetrics()).merge(metrics)
+    for company, metrics in unlocated.items():
+        totals.setdefault(company, SnapshotMetrics()).merge(metrics)
+
+    result: Dict[SnapshotKey, SnapshotMetrics] = dict(buckets)
+    for company, metrics in totals.items():
+        result[(company, None)] = metrics
+    return result
+
+
+def _collect_inventory(
+    session: Session,
+    company_id: Optional[UUID] = None,
+) -> Dict[SnapshotKey, dict]:
+    """Current stock per (company, location), with per-SKU low/out-of-stock counts."""
+    per_sku = (
+        select(
+            Inventory.locationId,
+            Inventory.skuId,
+            func.sum(Inventory.quantity).label("quantity"),
+            func.sum(Inventory.quantity * func.coalesce(Inventory.costPrice, 0)).label("value"),
+        )
+        .group_by(Inventory.locationId, Inventory.skuId)
+        .subquery()
+    )
+    low_stock = and_(
+        per_sku.c.quantity > 0,
+        SKU.reorderLevel.isnot(None),
+        per_sku.c.quantity <= SKU.reorderLevel,
+    )
+    query = (
+        select(
+            Location.companyId,
+            per_sku.c.locationId,
+            func.count(per_sku.c.skuId),
+            func.coalesce(func.sum(per_sku.c.quantity), 0),
+            func.coalesce(func.sum(case((low_stock, 1), else_=0)), 0),
+            func.coalesce(func.sum(case((per_sku.c.quantity <= 0, 1), else_=0)), 0),
+            func.coalesce(func.sum(per_sku.c.value), 0),
+        )
+        .join(Location, Location.id == per_sku.c.locationId)
+        .join(SKU, SKU.id == per_sku.c.skuId)
+        .group_by(Location.companyId, per_sku.c.locationId)
+    )
+    if company_id:
+        query = query.where(Location.companyId == company_id)
+
+    return {
+        (company, location): {
+            "totalSKUs": skus,
+            "totalQuantity": int(quantity),
+            "lowStockSKUs": low,
+            "outOfStockSKUs": out,
+            "inventoryValue": Decimal(str(value)),
+        }
+        for company, location, skus, quantity, low, out, value in session.exec(query).all()
+    }
+
+
+def _write_snapshots(
+    session: Session,
+    snapshot_type: str,
+    snapshot_day: date,
+    metrics_by_key: Dict[SnapshotKey, SnapshotMetrics],
+    company_id: Optional[UUID] = None,
+) -> int:
+    """
+    Upsert the snapshots of one period. Existing rows of the period that no
+    longer have data are zeroed rather than left stale.
+    """
+    snapshot_date = _day_start(snapshot_day)
+    query = select(AnalyticsSnapshot).where(
+        AnalyticsSnapshot.snapshotType == snapshot_type,
+        AnalyticsSnapshot.snapshotDate == snapshot_date,
+    )
+    if company_id:
+        query = query.where(AnalyticsSnapshot.companyId == company_id)
+    existing = {
+        (snapshot.companyId, snapshot.locationId): snapshot
+        for snapshot in session.exec(query).all()
+    }
+
+    now = datetime.utcnow()
+    for key in set(existing) | set(metrics_by_key):
+        snapshot = existing.get(key)
+        if snapshot is None:
+            snapshot = AnalyticsSnapshot(
+                id=uuid4(),
+                snapshotDate=snapshot_date,
+                snapshotType=snapshot_type,
+                companyId=key[0],
+                locationId=key[1],
+            )
+        metrics_by_key.get(key, SnapshotMetrics()).apply(snapshot)
+        snapshot.updatedAt = now
+        session.add(snapshot)
+    return len(metrics_by_key)
+
+
+def rollup_snapshots(
+    session: Session,
+    snapshot_type: str,
+    start: date,
+    company_id: Optional[UUID] = None,
+) -> int:
+    """Build the WEEKLY/MONTHLY snapshots starting at start from DAILY rows."""
+    query = (
+        select(AnalyticsSnapshot)
+        .where(AnalyticsSnapshot.snapshotType == "DAILY")
+        .where(AnalyticsSnapshot.snapshotDate >= _day_start(start))
+        .where(AnalyticsSnapshot.snapshotDate < _day_start(period_end(start, snapshot_type)))
+        .order_by(AnalyticsSnapshot.snapshotDate)
+    )
+    if company_id:
+        query = query.where(AnalyticsSnapshot.companyId == company_id)
+
+    metrics_by_key: Dict[SnapshotKey, SnapshotMetrics] = {}
+    for daily in session.exec(query).all():
+        key = (daily.companyId, daily.locationId)
+        daily_metrics = SnapshotMetrics.from_snapshot(daily)
+        metrics = metrics_by_key.setdefault(key, SnapshotMetrics())
+        inventory = daily_metrics.inventory
+        daily_metrics.inventory = None
+        metrics.merge(daily_metrics)
+        # Stock is not additive over time: keep the latest day's closing stock
+        if any(inventory.values()):
+            metrics.inventory = inventory
+
+    return _write_snapshots(session, snapshot_type, start, metrics_by_key, company_id)
+
+
+def build_analytics_snapshots(
+    session: Session,
+    now: Optional[datetime] = None,
+    company_id: Optional[UUID] = None,
+) -> dict:
+    """
+    Incrementally build snapshots up to yesterday.
+
+    Days after the last DAILY snapshot are built, and the last
+    ANALYTICS_SNAPSHOT_LOOKBACK_DAYS are rebuilt; the first run backfills
+    at most ANALYTICS_SNAPSHOT_BACKFILL_DAYS. The WEEKLY and MONTHLY periods
+    touched are rolled up again. Changes are not committed.
+    """
+    now = now or datetime.utcnow()
+    today = now.date()
+    last_day = today - timedelta(days=1)
+
+    latest_query = select(func.max(AnalyticsSnapshot.snapshotDate)).where(
+        AnalyticsSnapshot.snapshotType == "DAILY"
+    )
+    first_order_query = select(func.min(Order.orderDate))
+    if company_id:
+        latest_query = latest_query.where(AnalyticsSnapshot.companyId == company_id)
+        first_order_query = first_order_query.where(Order.companyId == company_id)
+    latest = session.exec(latest_query).first()
+    latest_day = latest.date() if latest else None
+
+    if latest_day:
+        first_day = min(
+            latest_day + timedelta(days=1),
+            today - timedelta(days=settings.ANALYTICS_SNAPSHOT_LOOKBACK_DAYS),
+        )
+    else:
+        first_order = session.exec(first_order_query).first()
+        first_day = max(
+            first_order.date() if first_order else last_day,
+            today - timedelta(days=settings.ANALYTICS_SNAPSHOT_BACKFILL_DAYS),
+        )
+
+    days = [
+        first_day + timedelta(days=offset)
+        for offset in range((last_day - first_day).days + 1)
+    ]
+    written = 0
+    periods = set()
+    for day in days:
+        # Stock can't be reconstructed for past days; record it once, as
+        # closing stock of the newest day when that day is first built
+        capture_inventory = day == last_day and (latest_day is None or day > latest_day)
+        metrics = _collect_daily_metrics(session, day, now, capture_inventory, company_id)
+        written += _write_snapshots(session, "DAILY", day, metrics, company_id)
+        periods.add(("WEEKLY", period_start(day, "WEEKLY")))
+        periods.add(("MONTHLY", period_start(day, "MONTHLY")))
+
+    # Rollups read the DAILY rows written above
+    session.flush()
+    for snapshot_type, start in sorted(periods):
+        written += rollup_snapshots(session, snapshot_type, start, company_id)
+
+    return {
+        "days": len(days),
+        "from": days[0].isoformat() if days else None,
+        "to": days[-1].isoformat() if days else None,
+        "snapshots": written,
+    }
+
+
+# =============================================================================
+# READ PATH
+# =============================================================================
+
+def _snapshot_scope(company_id: Optional[UUID], location_id: Optional[UUID]) -> list:
+    """DAILY rows of a location, or company totals when no location is given."""
+    filters = [AnalyticsSnapshot.snapshotType == "DAILY"]
+    if company_id:
+        filters.append(AnalyticsSnapshot.companyId == company_id)
+    if location_id:
+        filters.append(AnalyticsSnapshot.locationId == location_id)
+    else:
+        filters.append(AnalyticsSnapshot.locationId.is_(None))
+    return filters
+
+
+def _order_scope(company_id: Optional[UUID], location_id: Optional[UUID]) -> list:
+    filters = []
+    if company_id:
+        filters.append(Order.companyId == company_id)
+    if location_id:
+        filters.append(Order.locationId == location_id)
+    return filters
+
+
+def snapshot_cutoff(
+    session: Session,
+    company_id: Optional[UUID] = None,
+    location_id: Optional[UUID] = None,
+) -> Optional[datetime]:
+    """Start of the first day not covered by DAILY snapshots, or None if none exist."""
+    latest = session.exec(
+        select(func.max(AnalyticsSnapshot.snapshotDate))
+        .where(*_snapshot_scope(company_id, location_id))
+    ).first()
+    return _day_start(latest.date() + timedelta(days=1)) if latest else None
+
+
+def get_daily_order_trend(
+    session: Session,
+    start: datetime,
+    company_id: Optional[UUID] = None,
+    location_id: Optional[UUID] = None,
+) -> List[dict]:
+    """Orders and revenue per day since start: DAILY snapshots, then live days."""
+    cutoff = snapshot_cutoff(session, company_id, location_id)
+    trend: Dict[str, dict] = {}
+
+    def add(day, orders, revenue) -> None:
+        point = trend.setdefault(str(day), {"orders": 0, "revenue": 0.0})
+        point["orders"] += int(orders or 0)
+        point["revenue"] += float(revenue or 0)
+
+    if cutoff and cutoff > start:
+        rows = session.exec(
+            select(
+                AnalyticsSnapshot.snapshotDate,
+                func.sum(AnalyticsSnapshot.totalOrders),
+                func.sum(AnalyticsSnapshot.totalRevenue),
+            )
+            .where(*_snapshot_scope(company_id, location_id))
+            .where(AnalyticsSnapshot.snapshotDate >= start)
+            .where(AnalyticsSnapshot.totalOrders > 0)
+            .group_by(AnalyticsSnapshot.snapshotDate)
+        ).all()
+        for snapshot_date, orders, revenue in rows:
+            add(snapshot_date.date(), orders, revenue)
+
+    live_start = max(start, cutoff) if cutoff else start
+    live_rows = session.exec(
+        select(
+            func.date(Order.orderDate),
+            func.count(Order.id),
+            func.sum(Order.totalAmount),
+        )
+        .where(Order.orderDate >= live_start, *_order_scope(company_id, location_id))
+        .group_by(func.date(Order.orderDate))
+    ).all()
+    for day, orders, revenue in live_rows:
+        add(day, orders, revenue)
+
+    return [{"date": day, **trend[day]} for day in sorted(trend)]
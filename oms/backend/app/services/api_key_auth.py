@@ -0,0 +1,156 @@
+"""
+API Key Authenticator
+Authenticates external API calls against a per-process index of API keys, so
+a webhook-style request neither queries APIKey nor commits a write before the
+order logic runs.
+
+Keys are indexed by their SHA-256 digest, never the raw key. Entries (including
+unknown keys) live in a TTLCache with a short TTL; the api-keys API
+invalidates a key when it is updated, revoked or regenerated. Active, expiry
+and channel checks run against the cached snapshot.
+
+lastUsedAt is recorded in memory and written in one batched UPDATE by the
+scheduler every API_KEY_LAST_USED_FLUSH_SECONDS (and on shutdown).
+"""
+import hashlib
+import threading
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Dict, Optional
+from uuid import UUID
+
+from sqlalchemy import bindparam, update
+from sqlmodel import Session, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.core.cache import MISSING, TTLCache
+from app.core.config import settings
+from app.models.api_key import APIKey
+
+
+@dataclass(frozen=True)
+class APIKeyIdentity:
+    """The fields of an APIKey that authentication and handlers need."""
+    id: UUID
+    name: str
+    companyId: UUID
+    channel: Optional[str]
+    permissions: Optional[str]
+    rateLimit: int
+    isActive: bool
+    expiresAt: Optional[datetime]  # naive UTC
+
+    @classmethod
+    def from_api_key(cls, api_key: APIKey) -> "APIKeyIdentity":
+        expires_at = api_key.expiresAt
+        if expires_at and expires_at.tzinfo:
+            expires_at = expires_at.astimezone(timezone.utc).replace(tzinfo=None)
+        return cls(
+            id=api_key.id,
+            name=api_key.name,
+            companyId=api_key.companyId,
+            channel=api_key.channel,
+            permissions=api_key.permissions,
+            rateLimit=api_key.rateLimit,
+            isActive=bool(api_key.isActive),
+            expiresAt=expires_at,
+        )
+
+    def is_expired(self, now: Optional[datetime] = None) -> bool:
+        return bool(self.expiresAt and self.expiresAt < (now or datetime.utcnow()))
+
+    def allows_channel(self, channel: Optional[str]) -> bool:
+        return not channel or not self.channel or self.channel == channel
+
+
+def hash_api_key(raw_key: str) -> str:
+    return hashlib.sha256(raw_key.encode("utf-8")).hexdigest()
+
+
+class APIKeyAuthenticator:
+    """Per-process index of API keys by key digest."""
+
+    def __init__(self, ttl_seconds: int, max_keys: int):
+        # key digest -> identity, or None for an unknown key
+        self._cache: TTLCache[str, Optional[APIKeyIdentity]] = TTLCache(ttl_seconds, max_keys)
+        # key id -> last use not yet written
+        self._last_used: Dict[UUID, datetime] = {}
+        self._lock = threading.Lock()
+
+    async def lookup(self, session: AsyncSession, raw_key: str) -> Optional[APIKeyIdentity]:
+        """Identity of raw_key, loading misses (None if no such key)."""
+        digest = hash_api_key(raw_key)
+        identity = self._cache.peek(digest)
+        if identity is not MISSING:
+            return identity
+
+        ticket = self._cache.ticket()
+        api_key = (await session.exec(select(APIKey).where(APIKey.key == raw_key))).first()
+        identity = APIKeyIdentity.from_api_key(api_key) if api_key else None
+        if api_key:
+            session.expunge(api_key)
+        self._cache.put(digest, identity, ticket)
+        return identity
+
+    def invalidate(self, key_id: UUID, discard_uses: bool = False) -> None:
+        """
+        Drop a key after it was changed, revoked or regenerated. discard_uses
+        also drops its unwritten uses (a regenerated key starts unused).
+        """
+        if discard_uses:
+            with self._lock:
+                self._last_used.pop(key_id, None)
+        self._cache.invalidate_where(
+            lambda _, identity: identity is not None and identity.id == key_id
+        )
+
+    def clear(self) -> None:
+        self._cache.clear()
+
+    # =========================================================================
+    # lastUsedAt
+    # =========================================================================
+
+    def touch(self, key_id: UUID, at: Optional[datetime] = None) -> None:
+        """Record a use of key_id; written by the next flush."""
+        at = at or datetime.utcnow()
+        with self._lock:
+            if at > self._last_used.get(key_id, datetime.min):
+                self._last_used[key_id] = at
+
+    def flush_last_used(self, session: Session) -> int:
+        """
+        Write recorded uses to APIKey.lastUsedAt in one batched UPDATE.
+        Commits. Returns the number of uses flushed.
+
+        The UPDATE is a Core executemany, so uses of keys deleted since they
+        were recorded match no row and are dropped instead of failing the
+        batch (an ORM bulk update by primary key raises StaleDataError).
+        """
+        with self._lock:
+            pending, self._last_used = self._last_used, {}
+        if not pending:
+            return 0
+        table = APIKey.__table__
+        try:
+            session.execute(
+                update(table)
+                .where(table.c.id == bindparam("key_id"))
+                .values(lastUsedAt=bindparam("last_used_at")),
+                [{"key_id": key_id, "last_used_at": at} for key_id, at in pending.items()],
+            )
+            session.commit()
+        except Exception:
+            # Put the uses back for the next flush, keeping newer ones
+            with self._lock:
+                for key_id, at in pending.items():
+                    if at > self._last_used.get(key_id, datetime.min):
+                        self._last_used[key_id] = at
+            raise
+        return len(pending)
+
+
+api_key_authenticator = APIKeyAuthenticator(
+    ttl_seconds=settings.API_KEY_CACHE_TTL_SECONDS,
+    max_keys=settings.API_KEY_CACHE_MAX_KEYS,
+)
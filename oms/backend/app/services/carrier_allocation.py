@@ -0,0 +1,690 @@
+"""
+Carrier Allocation Engine
+Picks the transporter for each shipment from ShippingAllocationRule and
+CSRScoreConfig, and records the decision in AllocationAudit.
+
+Active rules are tried in priority order (lower first); the first rule whose
+shipmentType and conditions match decides:
+    transporterId, if it services the shipment         -> RULE_MATCHED
+    else, without useCSRScoring, fallbackTransporterId -> FALLBACK
+    else CSR scoring with the rule's csrConfigId (or the default config),
+    and fallbackTransporterId if no candidate is eligible
+The transporters must service the shipment. A shipment no rule matches is
+CSR scored with the company's default config for its shipment type (then the
+general default, then CSRScoreConfig's 0.50/0.30/0.20 weights).
+
+CSR scoring quotes every serviceable transporter of the company on the rate
+engine and scores each 0-100 on
+    cost          cheapest quote / its quote
+    speed         fastest expected days / its expected days
+    reliability   reliabilityScore from the performance tables
+weighted by the config. Expected days and reliability come from
+PincodePerformance (destination pincode), else LanePerformance (origin and
+destination city), else CarrierPerformance, using rows of the last
+PERFORMANCE_LOOKBACK_DAYS once they cover PERFORMANCE_MIN_SHIPMENTS
+shipments; otherwise the quote's estimatedDays and a neutral reliability.
+Candidates under minReliabilityScore or over maxCostThreshold are not
+eligible. Decisions under a MANUAL or HYBRID config are suggestions: they are
+audited but not assigned.
+
+Rule conditions: channel and paymentMode (a value or a list), weightMin /
+weightMax (chargeable kg), orderValueMin / orderValueMax, and destination
+pincodes / pincodePrefixes. A rule with any other condition never matches, so
+a condition the engine can't evaluate doesn't route every shipment.
+
+Rules, configs and performance are compiled per company and cached in memory,
+so allocating a batch costs the rate engine's batch quote plus one pass over
+the candidates; audit rows are inserted in one statement.
+"""
+import logging
+from collections import defaultdict
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Dict, FrozenSet, Iterable, List, Optional, Sequence, Tuple
+from uuid import UUID, uuid4
+
+from sqlalchemy import insert, update
+from sqlmodel import Session, select
+
+from app.core.config import settings
+from app.models import (
+    AllocationAudit, AllocationShipment, CarrierPerformance, CSRScoreConfig, Delivery,
+    LanePerformance, Location, Order, PincodePerformance, ShippingAllocationRule, Transporter,
+)
+from app.models.enums import (
+    AllocationDecisionReason, AllocationMode, DeliveryStatus, OrderType, PaymentMode, ShipmentType,
+)
+from app.services.company_index import CompanyIndexCache
+from app.services.rate_engine import chargeable_weight, quote_shipments
+from app.services.serviceability import PincodeService, normalize_pincode, serviceability_index
+
+logger = logging.getLogger(__name__)
+
+# Reliability of a transporter without enough history, and speed score
+# without expected days
+NEUTRAL_SCORE = 50.0
+
+CONDITION_KEYS = frozenset({
+    "channel", "paymentMode", "weightMin", "weightMax",
+    "orderValueMin", "orderValueMax", "pincodes", "pincodePrefixes",
+})
+
+# Deliveries a carrier can still be (re)assigned to
+ALLOCATABLE_STATUSES = {DeliveryStatus.PENDING.value, DeliveryStatus.PACKED.value}
+
+
+def _values(value) -> FrozenSet[str]:
+    if isinstance(value, (list, tuple, set)):
+        return frozenset(str(v).strip().upper() for v in value)
+    return frozenset([str(value).strip().upper()])
+
+
+def _value(value) -> Optional[str]:
+    """Enum value or plain string, as columns typed with an enum return either."""
+    return getattr(value, "value", value)
+
+
+def _float(value) -> Optional[float]:
+    return float(value) if value is not None else None
+
+
+def _city(service: Optional[PincodeService]) -> Optional[str]:
+    if not service:
+        return None
+    return next((area.city for area in service.areas.values() if area.city), None)
+
+
+# =============================================================================
+# COMPILED POLICY
+# =============================================================================
+
+@dataclass(frozen=True)
+class CompiledCSR:
+    id: Optional[UUID]
+    cost_weight: float
+    speed_weight: float
+    reliability_weight: float
+    min_reliability: Optional[float]
+    max_cost: Optional[float]
+    mode: str
+
+    @classmethod
+    def from_config(cls, config: CSRScoreConfig) -> "CompiledCSR":
+        return cls(
+            id=config.id,
+            cost_weight=float(config.costWeight or 0),
+            speed_weight=float(config.speedWeight or 0),
+            reliability_weight=float(config.reliabilityWeight or 0),
+            min_reliability=_float(config.minReliabilityScore),
+            max_cost=_float(config.maxCostThreshold),
+            mode=_value(config.defaultMode) or AllocationMode.AUTO.value,
+        )
+
+
+# CSRScoreConfig's column defaults, for companies without a config
+BUILTIN_CSR = CompiledCSR(
+    id=None, cost_weight=0.5, speed_weight=0.3, reliability_weight=0.2,
+    min_reliability=None, max_cost=None, mode=AllocationMode.AUTO.value,
+)
+
+
+@dataclass
+class CompiledRule:
+    id: UUID
+    code: str
+    shipment_type: Optional[str]
+    transporter_id: Optional[UUID]
+    fallback_transporter_id: Optional[UUID]
+    use_csr: bool
+    csr_config_id: Optional[UUID]
+    channels: Optional[FrozenSet[str]] = None
+    payment_modes: Optional[FrozenSet[str]] = None
+    weight_min: Optional[float] = None
+    weight_max: Optional[float] = None
+    value_min: Optional[float] = None
+    value_max: Optional[float] = None
+    pincodes: Optional[FrozenSet[str]] = None
+    pincode_prefixes: Tuple[str, ...] = ()
+
+    @classmethod
+    def from_rule(cls, rule: ShippingAllocationRule) -> Optional["CompiledRule"]:
+        conditions = rule.conditions or {}
+        unknown = set(conditions) - CONDITION_KEYS
+        if unknown:
+            logger.warning(f"Allocation rule {rule.code} skipped: unsupported conditions {sorted(unknown)}")
+            return None
+        compiled = cls(
+            id=rule.id,
+            code=rule.code,
+            shipment_type=_value(rule.shipmentType),
+            transporter_id=rule.transporterId,
+            fallback_transporter_id=rule.fallbackTransporterId,
+            use_csr=bool(rule.useCSRScoring),
+            csr_config_id=rule.csrConfigId,
+            weight_min=_float(conditions.get("weightMin")),
+            weight_max=_float(conditions.get("weightMax")),
+            value_min=_float(conditions.get("orderValueMin")),
+            value_max=_float(conditions.get("orderValueMax")),
+        )
+        if conditions.get("channel"):
+            compiled.channels = _values(conditions["channel"])
+        if conditions.get("paymentMode"):
+            compiled.payment_modes = _values(conditions["paymentMode"])
+        if conditions.get("pincodes"):
+            compiled.pincodes = _values(conditions["pincodes"])
+        if conditions.get("pincodePrefixes"):
+            compiled.pincode_prefixes = tuple(_values(conditions["pincodePrefixes"]))
+        return compiled
+
+    def matches(self, shipment: AllocationShipment, weight: float) -> bool:
+        if self.shipment_type and self.shipment_type != shipment.shipmentType.value:
+            return False
+        if self.channels is not None and (shipment.channel or "").upper() not in self.channels:
+            return False
+        if self.payment_modes is not None and shipment.paymentMode.upper() not in self.payment_modes:
+            return False
+        if self.weight_min is not None and weight < self.weight_min:
+            return False
+        if self.weight_max is not None and weight > self.weight_max:
+            return False
+        if self.value_min is not None or self.value_max is not None:
+            value = _float(shipment.orderValue)
+            if value is None:
+                return False
+            if self.value_min is not None and value < self.value_min:
+                return False
+            if self.value_max is not None and value > self.value_max:
+                return False
+        destination = normalize_pincode(shipment.destinationPincode)
+        if self.pincodes is not None and destination not in self.pincodes:
+            return False
+        if self.pincode_prefixes and not destination.startswith(self.pincode_prefixes):
+            return False
+        return True
+
+
+@dataclass
+class AllocationPolicy:
+    # Active rules, highest priority first
+    rules: List[CompiledRule] = field(default_factory=list)
+    configs: Dict[UUID, CompiledCSR] = field(default_factory=dict)
+    # shipmentType (None for all types) -> default config
+    defaults: Dict[Optional[str], CompiledCSR] = field(default_factory=dict)
+
+    def default_config(self, shipment_type: str) -> CompiledCSR:
+        return self.defaults.get(shipment_type) or self.defaults.get(None) or next(
+            iter(self.defaults.values()), BUILTIN_CSR
+        )
+
+    def config(self, config_id: Optional[UUID], shipment_type: str) -> CompiledCSR:
+        return self.configs.get(config_id) or self.default_config(shipment_type)
+
+
+def build_allocation_policy(session: Session, company_id: Optional[UUID]) -> AllocationPolicy:
+    """Compile a company's active rules and CSR configs (none without a company)."""
+    policy = AllocationPolicy()
+    if not company_id:
+        return policy
+
+    for config in session.exec(
+        select(CSRScoreConfig).where(CSRScoreConfig.companyId == company_id)
+    ).all():
+        compiled = CompiledCSR.from_config(config)
+        policy.configs[config.id] = compiled
+        if config.isDefault:
+            policy.defaults[_value(config.shipmentType)] = compiled
+
+    rules = session.exec(
+        select(ShippingAllocationRule)
+        .where(ShippingAllocationRule.companyId == company_id, ShippingAllocationRule.isActive == True)
+        .order_by(ShippingAllocationRule.priority, ShippingAllocationRule.code)
+    ).all()
+    policy.rules = [compiled for compiled in map(CompiledRule.from_rule, rules) if compiled]
+    return policy
+
+
+# =============================================================================
+# PERFORMANCE
+# =============================================================================
+
+@dataclass(frozen=True)
+class Performance:
+    shipments: int
+    reliability: Optional[float]
+    tat_days: Optional[float]
+
+
+class _Accumulator:
+    """Shipment-weighted averages over a key's performance rows."""
+
+    __slots__ = ("shipments", "reliability", "reliability_n", "tat", "tat_n")
+
+    def __init__(self):
+        self.shipments = self.reliability_n = self.tat_n = 0
+        self.reliability = self.tat = 0.0
+
+    def add(self, total, delivered, reliability, tat) -> None:
+        total, delivered = total or 0, delivered or 0
+        self.shipments += total
+        if reliability is not None and total:
+            self.reliability += float(reliability) * total
+            self.reliability_n += total
+        if tat is not None and delivered:
+            self.tat += float(tat) * delivered
+            self.tat_n += delivered
+
+    def result(self) -> Performance:
+        return Performance(
+            shipments=self.shipments,
+            reliability=self.reliability / self.reliability_n if self.reliability_n else None,
+            tat_days=self.tat / self.tat_n if self.tat_n else None,
+        )
+
+
+@dataclass
+class CompanyPerformance:
+    # (transporterId, shipmentType) -> Performance
+    carriers: Dict[Tuple[UUID, str], Performance] = field(default_factory=dict)
+    # (pincode, transporterId) -> Performance
+    pincodes: Dict[Tuple[str, UUID], Performance] = field(default_factory=dict)
+    # (originCity, destinationCity, transporterId) -> Performance
+    lanes: Dict[Tuple[str, str, UUID], Performance] = field(default_factory=dict)
+
+    def lookup(
+        self,
+        transporter_id: UUID,
+        shipment_type: str,
+        pincode: str,
+        origin_city: Optional[str],
+        destination_city: Optional[str],
+    ) -> Tuple[Optional[Performance], Optional[str]]:
+        """The most specific performance with enough shipments, and its level."""
+        candidates = [("PINCODE", self.pincodes.get((pincode, transporter_id)))]
+        if origin_city and destination_city:
+            candidates.append(("LANE", self.lanes.get((origin_city, destination_city, transporter_id))))
+        candidates.append(("CARRIER", self.carriers.get((transporter_id, shipment_type))))
+        for level, performance in candidates:
+            if performance and performance.shipments >= settings.PERFORMANCE_MIN_SHIPMENTS:
+                return performance, level
+        return None, None
+
+
+def build_company_performance(session: Session, company_id: Optional[UUID]) -> CompanyPerformance:
+    """Aggregate a company's performance rows of the lookback window."""
+    index = CompanyPerformance()
+    if not company_id:
+        return index
+    since = datetime.utcnow() - timedelta(days=settings.PERFORMANCE_LOOKBACK_DAYS)
+
+    carriers: Dict[Tuple[UUID, str], _Accumulator] = defaultdict(_Accumulator)
+    for transporter_id, shipment_type, total, delivered, reliability, tat in session.execute(
+        select(
+            CarrierPerformance.transporterId, CarrierPerformance.shipmentType,
+            CarrierPerformance.totalShipments, CarrierPerformance.deliveredShipments,
+            CarrierPerformance.reliabilityScore, CarrierPerformance.avgTATDays,
+        ).where(CarrierPerformance.companyId == company_id, CarrierPerformance.periodEnd >= since)
+    ):
+        carriers[(transporter_id, _value(shipment_type))].add(total, delivered, reliability, tat)
+
+    pincodes: Dict[Tuple[str, UUID], _Accumulator] = defaultdict(_Accumulator)
+    for pincode, transporter_id, total, delivered, reliability, tat in session.execute(
+        select(
+            PincodePerformance.pincode, PincodePerformance.transporterId,
+            PincodePerformance.totalShipments, PincodePerformance.deliveredShipments,
+            PincodePerformance.reliabilityScore, PincodePerformance.avgTATDays,
+        ).where(PincodePerformance.companyId == company_id, PincodePerformance.periodEnd >= since)
+    ):
+        pincodes[(normalize_pincode(pincode), transporter_id)].add(total, delivered, reliability, tat)
+
+    lanes: Dict[Tuple[str, str, UUID], _Accumulator] = defaultdict(_Accumulator)
+    for origin, destination, transporter_id, total, delivered, reliability, tat in session.execute(
+        select(
+            LanePerformance.originCity, LanePerformance.destinationCity, LanePerformance.transporterId,
+            LanePerformance.totalShipments, LanePerformance.deliveredShipments,
+            LanePerformance.reliabilityScore, LanePerformance.avgTATDays,
+        ).where(LanePerformance.companyId == company_id, LanePerformance.periodEnd >= since)
+    ):
+        key = (origin.strip().lower(), destination.strip().lower(), transporter_id)
+        lanes[key].add(total, delivered, reliability, tat)
+
+    index.carriers = {key: acc.result() for key, acc in carriers.items()}
+    index.pincodes = {key: acc.result() for key, acc in pincodes.items()}
+    index.lanes = {key: acc.result() for key, acc in lanes.items()}
+    return index
+
+
+allocation_policy: CompanyIndexCache[AllocationPolicy] = CompanyIndexCache(
+    build_allocation_policy,
+    ttl_seconds=settings.CARRIER_ALLOCATION_CACHE_TTL_SECONDS,
+    max_keys=settings.CARRIER_ALLOCATION_CACHE_MAX_COMPANIES,
+)
+
+performance_index: CompanyIndexCache[CompanyPerformance] = CompanyIndexCache(
+    build_company_performance,
+    ttl_seconds=settings.CARRIER_ALLOCATION_CACHE_TTL_SECONDS,
+    max_keys=settings.CARRIER_ALLOCATION_CACHE_MAX_COMPANIES,
+)
+
+
+# =============================================================================
+# ALLOCATION
+# =============================================================================
+
+@dataclass
+class AllocationDecision:
+    """The carrier chosen for one shipment and why."""
+    transporter_id: Optional[UUID] = None
+    transporter_name: Optional[str] = None
+    reason: Optional[AllocationDecisionReason] = None
+    mode: str = AllocationMode.AUTO.value
+    rule_id: Optional[UUID] = None
+    csr_config_id: Optional[UUID] = None
+    rate: Optional[float] = None
+    scores: Optional[dict] = None
+    candidates: List[dict] = field(default_factory=list)
+    error: Optional[str] = None
+
+    def as_dict(self) -> dict:
+        return {
+            "allocated": self.transporter_id is not None,
+            "transporterId": str(self.transporter_id) if self.transporter_id else None,
+            "transporterName": self.transporter_name,
+            "decisionReason": self.reason.value if self.reason else None,
+            "allocationMode": self.mode,
+            "matchedRuleId": str(self.rule_id) if self.rule_id else None,
+            "csrConfigId": str(self.csr_config_id) if self.csr_config_id else None,
+            "calculatedRate": self.rate,
+            "scores": self.scores,
+            "candidates": self.candidates,
+            "error": self.error,
+        }
+
+    def audit_row(
+        self,
+        company_id: UUID,
+        shipment_type: str,
+        order_id: Optional[UUID] = None,
+        delivery_id: Optional[UUID] = None,
+        allocated_by_id: Optional[UUID] = None,
+    ) -> dict:
+        scores = self.scores or {}
+        return {
+            "id": uuid4(),
+            "companyId": company_id,
+            "shipmentType": shipment_type,
+            "orderId": order_id,
+            "deliveryId": delivery_id,
+            "allocationMode": self.mode,
+            "selectedTransporterId": self.transporter_id,
+            "decisionReason": self.reason.value,
+            "costScore": scores.get("cost"),
+            "speedScore": scores.get("speed"),
+            "reliabilityScore": scores.get("reliability"),
+            "overallScore": scores.get("overall"),
+            "calculatedRate": self.rate,
+            "candidatesConsidered": {"candidates": self.candidates},
+            "matchedRuleId": self.rule_id,
+            "allocatedById": allocated_by_id,
+        }
+
+
+def _score_candidates(
+    quotes: List[dict],
+    csr: CompiledCSR,
+    performance: CompanyPerformance,
+    shipment_type: str,
+    pincode: str,
+    origin_city: Optional[str],
+    destination_city: Optional[str],
+) -> List[dict]:
+    """CSR scores of each quoted transporter, best first."""
+    candidates = []
+    for quote in quotes:
+        transporter_id = UUID(quote["transporterId"])
+        measured, level = performance.lookup(
+            transporter_id, shipment_type, pincode, origin_city, destination_city
+        )
+        days = measured.tat_days if measured and measured.tat_days else quote["estimatedDays"]
+        reliability = measured.reliability if measured and measured.reliability is not None else NEUTRAL_SCORE
+        candidates.append({
+            "transporterId": quote["transporterId"],
+            "courierName": quote["courierName"],
+            "rate": quote["totalRate"],
+            "expectedDays": round(days, 2) if days else None,
+            "performanceLevel": level,
+            "reliabilityScore": round(reliability, 2),
+        })
+    if not candidates:
+        return candidates
+
+    cheapest = min(c["rate"] for c in candidates)
+    fastest = min((c["expectedDays"] for c in candidates if c["expectedDays"]), default=None)
+    for c in candidates:
+        cost = 100 * cheapest / c["rate"] if c["rate"] > 0 else 100.0
+        speed = 100 * fastest / c["expectedDays"] if fastest and c["expectedDays"] else NEUTRAL_SCORE
+        c["costScore"] = round(cost, 2)
+        c["speedScore"] = round(speed, 2)
+        c["overallScore"] = round(
+            csr.cost_weight * cost + csr.speed_weight * speed + csr.reliability_weight * c["reliabilityScore"], 2
+        )
+        c["eligible"] = True
+        if csr.min_reliability is not None and c["reliabilityScore"] < csr.min_reliability:
+            c["eligible"], c["excludedReason"] = False, "BELOW_MIN_RELIABILITY"
+        elif csr.max_cost is not None and c["rate"] > csr.max_cost:
+            c["eligible"], c["excludedReason"] = False, "ABOVE_MAX_COST"
+
+    candidates.sort(key=lambda c: (not c["eligible"], -c["overallScore"], c["rate"]))
+    return candidates
+
+
+def allocate_shipments(
+    session: Session,
+    company_id: Optional[UUID],
+    shipments: Sequence[AllocationShipment],
+    now: Optional[datetime] = None,
+) -> List[AllocationDecision]:
+    """Allocate a carrier to each shipment (nothing is written)."""
+    policy = allocation_policy.get(session, company_id)
+    performance = performance_index.get(session, company_id)
+    quotes = quote_shipments(session, company_id, shipments, now=now)
+    services = serviceability_index.lookup(
+        session, {p for s in shipments for p in (s.originPincode, s.destinationPincode)}
+    )
+    allowed = serviceability_index.company_mask(session, company_id)
+
+    decisions = []
+    for shipment, shipment_quotes in zip(shipments, quotes):
+        shipment_type = shipment.shipmentType.value
+        cod = shipment.paymentMode.upper() == "COD"
+        destination = services[shipment.destinationPincode]
+        origin = services[shipment.originPincode]
+
+        serviceable = destination.available(cod) & allowed if destination else 0
+        if origin:
+            # Transporters that list the origin must service it
+            serviceable &= origin.serviceable | ~origin.listed
+        shipment_quotes = [
+            q for q in shipment_quotes
+            if serviceable & serviceability_index.bit(UUID(q["transporterId"]))
+        ]
+        quote_by_transporter = {UUID(q["transporterId"]): q for q in shipment_quotes}
+
+        def direct(transporter_id: UUID, reason: AllocationDecisionReason, rule_id: UUID) -> AllocationDecision:
+            quote = quote_by_transporter.get(transporter_id)
+            return AllocationDecision(
+                transporter_id=transporter_id,
+                transporter_name=quote["courierName"] if quote else None,
+                reason=reason,
+                rule_id=rule_id,
+                rate=quote["totalRate"] if quote else None,
+            )
+
+        weight = chargeable_weight(shipment)
+        rule = next((r for r in policy.rules if r.matches(shipment, weight)), None)
+        if rule and rule.transporter_id and serviceable & serviceability_index.bit(rule.transporter_id):
+            decisions.append(direct(rule.transporter_id, AllocationDecisionReason.RULE_MATCHED, rule.id))
+            continue
+        if rule and rule.fallback_transporter_id and not rule.use_csr and (
+            serviceable & serviceability_index.bit(rule.fallback_transporter_id)
+        ):
+            decisions.append(direct(rule.fallback_transporter_id, AllocationDecisionReason.FALLBACK, rule.id))
+            continue
+
+        csr = policy.config(rule.csr_config_id if rule else None, shipment_type)
+        candidates = _score_candidates(
+            shipment_quotes, csr, performance, shipment_type,
+            normalize_pincode(shipment.destinationPincode), _city(origin), _city(destination),
+        )
+        decision = AllocationDecision(
+            mode=csr.mode, rule_id=rule.id if rule else None, csr_config_id=csr.id, candidates=candidates,
+        )
+        eligible = [c for c in candidates if c["eligible"]]
+        if eligible:
+            best = eligible[0]
+            decision.transporter_id = UUID(best["transporterId"])
+            decision.transporter_name = best["courierName"]
+            decision.reason = (
+                AllocationDecisionReason.ONLY_SERVICEABLE if len(eligible) == 1
+                else AllocationDecisionReason.BEST_CSR_SCORE
+            )
+            decision.rate = best["rate"]
+            decision.scores = {
+                "cost": best["costScore"],
+                "speed": best["speedScore"],
+                "reliability": best["reliabilityScore"],
+                "overall": best["overallScore"],
+            }
+        elif rule and rule.fallback_transporter_id and (
+            serviceable & serviceability_index.bit(rule.fallback_transporter_id)
+        ):
+            fallback = direct(rule.fallback_transporter_id, AllocationDecisionReason.FALLBACK, rule.id)
+            fallback.mode, fallback.candidates = csr.mode, candidates
+            decision = fallback
+        else:
+            decision.error = (
+                "No eligible carrier" if candidates else "No serviceable carrier with an active rate card"
+            )
+        decisions.append(decision)
+
+    # Carriers picked by a rule without a quote of their own
+    unnamed = {d.transporter_id for d in decisions if d.transporter_id and not d.transporter_name}
+    if unnamed:
+        names = dict(session.execute(
+            select(Transporter.id, Transporter.name).where(Transporter.id.in_(list(unnamed)))
+        ).all())
+        for decision in decisions:
+            if decision.transporter_id in unnamed:
+                decision.transporter_name = names.get(decision.transporter_id)
+    return decisions
+
+
+def allocate_deliveries(
+    session: Session,
+    company_id: Optional[UUID],
+    delivery_ids: Iterable[UUID],
+    allocated_by_id: Optional[UUID] = None,
+    dry_run: bool = False,
+) -> List[dict]:
+    """
+    Allocate carriers to deliveries in one pass: assign the chosen transporter
+    to deliveries decided under an AUTO config and write an AllocationAudit
+    row per decision (neither on a dry run). The caller commits.
+    """
+    delivery_ids = list(dict.fromkeys(delivery_ids))
+    query = select(
+        Delivery.id, Delivery.deliveryNo, Delivery.orderId, Delivery.companyId, Delivery.status,
+        Delivery.awbNo, Delivery.weight, Delivery.length, Delivery.width, Delivery.height,
+    ).where(Delivery.id.in_(delivery_ids))
+    if company_id:
+        query = query.where(Delivery.companyId == company_id)
+    deliveries = {row.id: row for row in session.execute(query)}
+
+    orders = {}
+    if deliveries:
+        orders = {row.id: row for row in session.execute(
+            select(
+                Order.id, Order.channel, Order.orderType, Order.paymentMode,
+                Order.totalAmount, Order.shippingAddress, Order.locationId,
+            ).where(Order.id.in_({d.orderId for d in deliveries.values()}))
+        )}
+    origins = {}
+    if orders:
+        origins = {
+            location_id: (address or {}).get("pincode")
+            for location_id, address in session.execute(
+                select(Location.id, Location.address).where(
+                    Location.id.in_({o.locationId for o in orders.values()})
+                )
+            )
+        }
+
+    results: Dict[UUID, dict] = {}
+    # companyId -> [(delivery, shipment)]
+    batches: Dict[UUID, List[tuple]] = defaultdict(list)
+    for delivery_id in delivery_ids:
+        delivery = deliveries.get(delivery_id)
+        result = results[delivery_id] = {
+            "deliveryId": str(delivery_id),
+            "deliveryNo": delivery.deliveryNo if delivery else None,
+            "allocated": False,
+            "applied": False,
+            "error": None,
+        }
+        if not delivery:
+            result["error"] = "Delivery not found"
+            continue
+        order = orders.get(delivery.orderId)
+        status = _value(delivery.status)
+        if status not in ALLOCATABLE_STATUSES:
+            result["error"] = f"Delivery is {status}"
+            continue
+        if delivery.awbNo:
+            result["error"] = "AWB already assigned"
+            continue
+        origin = origins.get(order.locationId) if order else None
+        destination = (order.shippingAddress or {}).get("pincode") if order else None
+        if not origin or not destination:
+            result["error"] = "Origin or destination pincode missing"
+            continue
+        if not delivery.weight or delivery.weight <= 0:
+            result["error"] = "Delivery weight missing"
+            continue
+
+        cod = _value(order.paymentMode) == PaymentMode.COD.value
+        batches[delivery.companyId].append((delivery, order, AllocationShipment(
+            reference=delivery.deliveryNo,
+            originPincode=str(origin),
+            destinationPincode=str(destination),
+            weight=delivery.weight,
+            length=delivery.length,
+            width=delivery.width,
+            height=delivery.height,
+            paymentMode="COD" if cod else "PREPAID",
+            codAmount=order.totalAmount if cod else 0,
+            shipmentType=ShipmentType.B2B_PTL if _value(order.orderType) == OrderType.B2B.value else ShipmentType.B2C,
+            channel=_value(order.channel),
+            orderValue=order.totalAmount,
+        )))
+
+    assignments, audits = [], []
+    for batch_company_id, batch in batches.items():
+        decisions = allocate_shipments(session, batch_company_id, [shipment for _, _, shipment in batch])
+        for (delivery, order, shipment), decision in zip(batch, decisions):
+            result = results[delivery.id]
+            result.update(decision.as_dict())
+            if not decision.transporter_id or dry_run:
+                continue
+            audits.append(decision.audit_row(
+                batch_company_id, shipment.shipmentType.value,
+                order_id=order.id, delivery_id=delivery.id, allocated_by_id=allocated_by_id,
+            ))
+            if decision.mode == AllocationMode.AUTO.value:
+                assignments.append({"id": delivery.id, "transporterId": decision.transporter_id})
+                result["applied"] = True
+
+    if assignments:
+        session.execute(update(Delivery), assignments)
+    if audits:
+        # NULL scores inline, so rule and CSR decisions go in one batch
+        session.execute(insert(AllocationAudit).execution_options(render_nulls=True), audits)
+    return [results[delivery_id] for delivery_id in delivery_ids]
@@ -0,0 +1,33 @@
+"""
+Company Index Cache
+Read-mostly indexes built per company (rate tables, serviceability), kept in
+a TTLCache and shared by the services that serve them from memory.
+
+An index is built with the caller's session on first use. Writers invalidate
+the company whose rows they changed.
+"""
+from typing import Callable, Generic, Hashable, Optional, TypeVar
+
+from sqlmodel import Session
+
+from app.core.cache import TTLCache
+
+T = TypeVar("T")
+
+
+class CompanyIndexCache(Generic[T]):
+    """Indexes by company id (None for all companies)."""
+
+    def __init__(self, build: Callable[[Session, Optional[Hashable]], T], ttl_seconds: int, max_keys: int):
+        self.build = build
+        self._cache: TTLCache[Optional[Hashable], T] = TTLCache(ttl_seconds, max_keys)
+
+    def get(self, session: Session, company_id: Optional[Hashable] = None) -> T:
+        return self._cache.get_or_load(company_id, lambda: self.build(session, company_id))
+
+    def invalidate(self, company_id: Optional[Hashable]) -> None:
+        """Drop a company's index (and the all-companies one) after its rows changed."""
+        self._cache.invalidate(company_id, None)
+
+    def clear(self) -> None:
+        self._cache.clear()
@@ -0,0 +1,107 @@
+"""
+Dashboard Stats Service
+Order aggregates for dashboards, computed in one grouped query and served
+through a short-lived per-process result cache.
+
+Results are cached per (widget, company, location, filters) for
+DASHBOARD_CACHE_TTL_SECONDS. Concurrent requests for a key that is being
+computed wait for that computation instead of running their own, so any
+number of polling clients cost one query per key per TTL.
+"""
+import threading
+from datetime import datetime
+from typing import Any, Callable, Dict, Hashable, List, Optional
+
+from sqlalchemy import case
+from sqlmodel import Session, select, func
+
+from app.core.cache import MISSING, TTLCache
+from app.core.config import settings
+from app.models import Order, OrderStatus
+
+
+class ResultCache:
+    """TTLCache with single-flight computation per key."""
+
+    def __init__(self, ttl_seconds: float, max_keys: int, wait_seconds: float = 30):
+        self.wait_seconds = wait_seconds
+        self._cache: TTLCache[Hashable, Any] = TTLCache(ttl_seconds, max_keys)
+        self._inflight: Dict[Hashable, threading.Event] = {}
+        self._lock = threading.Lock()
+
+    def get_or_compute(self, key: Hashable, compute: Callable[[], Any]) -> Any:
+        while True:
+            with self._lock:
+                # Checked under the lock so a leader finishing now isn't repeated
+                value = self._cache.peek(key)
+                if value is not MISSING:
+                    return value
+                event = self._inflight.get(key)
+                leader = event is None
+                if leader:
+                    event = self._inflight[key] = threading.Event()
+
+            if not leader:
+                # Another request is computing this key; if it stalls, compute
+                # uncached rather than queueing behind it indefinitely
+                if not event.wait(self.wait_seconds):
+                    return compute()
+                continue
+
+            try:
+                ticket = self._cache.ticket()
+                value = compute()
+                self._cache.put(key, value, ticket)
+                return value
+            finally:
+                with self._lock:
+                    self._inflight.pop(key, None)
+                event.set()
+
+    def clear(self) -> None:
+        self._cache.clear()
+
+
+dashboard_cache = ResultCache(
+    ttl_seconds=settings.DASHBOARD_CACHE_TTL_SECONDS,
+    max_keys=settings.DASHBOARD_CACHE_MAX_KEYS,
+)
+
+
+def order_status_summary(
+    session: Session,
+    filters: List[Any],
+    today_start: Optional[datetime] = None,
+) -> dict:
+    """
+    Order count and amount per status, totals, and orders placed since
+    today_start, from one query grouped by status.
+    """
+    today_start = today_start or datetime.combine(datetime.utcnow().date(), datetime.min.time())
+    rows = session.exec(
+        select(
+            Order.status,
+            func.count(Order.id),
+            func.coalesce(func.sum(Order.totalAmount), 0),
+            func.coalesce(func.sum(case((Order.orderDate >= today_start, 1), else_=0)), 0),
+        )
+        .where(*filters)
+        .group_by(Order.status)
+    ).all()
+
+    status_counts = {s.value: 0 for s in OrderStatus}
+    status_amounts = {s.value: 0.0 for s in OrderStatus}
+    today_orders = 0
+    for status, count, amount, today_count in rows:
+        status = getattr(status, "value", status)
+        status_counts[status] = status_counts.get(status, 0) + count
+        status_amounts[status] = status_amounts.get(status, 0.0) + float(amount)
+        today_orders += today_count
+
+    return {
+        "statusCounts": status_counts,
+        "statusAmounts": status_amounts,
+        "totalOrders": sum(status_counts.values()),
+        "totalAmount": sum(status_amounts.values()),
+        "todayOrders": today_orders,
+    }
@@ -0,0 +1,283 @@
+"""
+Demand Forecast Service
+Batch job that fits baseline demand models for every (sku, location) with
+order history and writes daily DemandForecast rows for the next
+FORECAST_HORIZON_DAYS.
+
+History is read with one aggregated query into a dense NumPy matrix
+(series x days). Moving average, simple exponential smoothing and Croston
+(SBA) for intermittent demand are fitted for all series at once by stepping
+through time, never per SKU. Each series uses the model with the lowest
+error on a holdout of its last HOLDOUT_DAYS.
+"""
+import time
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+from uuid import UUID, uuid4
+
+import numpy as np
+from sqlalchemy import delete, insert
+from sqlmodel import Session, select, func
+
+from app.core.config import settings
+from app.models import DemandForecast, Inventory, Location, Order, OrderItem, OrderStatus
+
+MODEL_VERSION = "baseline-1"
+MODELS = ("MOVING_AVERAGE", "EXP_SMOOTHING", "CROSTON")
+
+MA_WINDOW_DAYS = 28
+SMOOTHING_ALPHA = 0.2
+HOLDOUT_DAYS = 14
+# Rows per INSERT batch
+INSERT_BATCH_SIZE = 5000
+
+SeriesKey = Tuple[UUID, UUID, UUID]  # (companyId, locationId, skuId)
+
+
+def _as_date(value) -> date:
+    # func.date() comes back as a string on SQLite
+    return date.fromisoformat(value) if isinstance(value, str) else value
+
+
+def load_demand_history(
+    session: Session,
+    start: date,
+    days: int,
+    company_id: Optional[UUID] = None,
+) -> Tuple[List[SeriesKey], np.ndarray]:
+    """Daily units ordered per (company, location, sku) as a (series x days) matrix."""
+    query = (
+        select(
+            Order.companyId, Order.locationId, OrderItem.skuId,
+            func.date(Order.orderDate), func.sum(OrderItem.quantity),
+        )
+        .join(Order, OrderItem.orderId == Order.id)
+        .where(Order.orderDate >= datetime.combine(start, datetime.min.time()))
+        .where(Order.orderDate < datetime.combine(start + timedelta(days=days), datetime.min.time()))
+        .where(Order.status != OrderStatus.CANCELLED)
+        .group_by(Order.companyId, Order.locationId, OrderItem.skuId, func.date(Order.orderDate))
+    )
+    if company_id:
+        query = query.where(Order.companyId == company_id)
+
+    index: Dict[SeriesKey, int] = {}
+    series, offsets, quantities = [], [], []
+    result = session.execute(query.execution_options(yield_per=50000))
+    for partition in result.partitions():
+        for company, location, sku, day, qty in partition:
+            series.append(index.setdefault((company, location, sku), len(index)))
+            offsets.append((_as_date(day) - start).days)
+            quantities.append(qty or 0)
+
+    history = np.zeros((len(index), days), dtype=np.float32)
+    if index:
+        np.add.at(history, (np.array(series), np.array(offsets)), np.array(quantities))
+    return list(index), history
+
+
+# =============================================================================
+# MODELS (all series at once; each returns a daily demand rate per series)
+# =============================================================================
+
+def moving_average(history: np.ndarray, window: int = MA_WINDOW_DAYS) -> np.ndarray:
+    return history[:, -window:].mean(axis=1, dtype=np.float64)
+
+
+def exp_smoothing(history: np.ndarray, alpha: float = SMOOTHING_ALPHA) -> np.ndarray:
+    level = history[:, :7].mean(axis=1, dtype=np.float64)
+    for t in range(history.shape[1]):
+        level += alpha * (history[:, t] - level)
+    return level
+
+
+def croston(history: np.ndarray, alpha: float = SMOOTHING_ALPHA) -> np.ndarray:
+    """Croston with the Syntetos-Boylan bias correction."""
+    n = history.shape[0]
+    size = np.zeros(n)       # smoothed non-zero demand size
+    interval = np.ones(n)    # smoothed interval between demands
+    since = np.ones(n)       # days since the last demand
+    seen = np.zeros(n, dtype=bool)
+    for t in range(history.shape[1]):
+        demand = history[:, t]
+        hit = demand > 0
+        first = hit & ~seen
+        size = np.where(first, demand, np.where(hit, size + alpha * (demand - size), size))
+        interval = np.where(
+            first, since, np.where(hit, interval + alpha * (since - interval), interval)
+        )
+        seen |= hit
+        since = np.where(hit, 1, since + 1)
+    return np.where(seen, (1 - alpha / 2) * size / interval, 0.0)
+
+
+MODEL_FUNCTIONS = (moving_average, exp_smoothing, croston)
+
+
+def fit_forecasts(history: np.ndarray) -> dict:
+    """
+    Pick the best model per series on the holdout, then refit on the full
+    history. Returns per-series arrays: rate, sigma, model index, confidence.
+    Histories too short to hold out a day (under 4 days) use the moving
+    average with zero confidence.
+    """
+    holdout = min(HOLDOUT_DAYS, history.shape[1] // 4)
+    series = np.arange(history.shape[0])
+    if holdout:
+        actual = history[:, -holdout:].sum(axis=1, dtype=np.float64)
+        errors = np.stack([
+            np.abs(fit(history[:, :-holdout]) * holdout - actual) for fit in MODEL_FUNCTIONS
+        ])
+        best = errors.argmin(axis=0)
+        rates = np.stack([fit(history) for fit in MODEL_FUNCTIONS])[best, series]
+        error = errors[best, series]
+        scale = np.maximum(np.maximum(actual, rates * holdout), 1.0)
+        confidence = 1.0 - np.clip(error / scale, 0.0, 1.0)
+    else:
+        best = np.zeros(history.shape[0], dtype=np.int64)
+        rates = moving_average(history)
+        confidence = np.zeros(history.shape[0])
+
+    demand_days = np.count_nonzero(history, axis=1)
+    return {
+        "rate": np.maximum(rates, 0.0),
+        "sigma": history.std(axis=1, dtype=np.float64),
+        "model": best,
+        "confidence": confidence,
+        "adi": history.shape[1] / np.maximum(demand_days, 1),
+    }
+
+
+def _available_stock(
+    session: Session,
+    keys: List[SeriesKey],
+    company_id: Optional[UUID] = None,
+) -> np.ndarray:
+    """Unreserved stock of each series' (sku, location)."""
+    query = select(
+        Inventory.skuId, Inventory.locationId,
+        func.sum(Inventory.quantity - Inventory.reservedQty),
+    ).group_by(Inventory.skuId, Inventory.locationId)
+    if company_id:
+        # Inventory has no companyId; it belongs to its Location's company
+        query = query.where(
+            Inventory.locationId.in_(select(Location.id).where(Location.companyId == company_id))
+        )
+    rows = session.exec(query).all()
+    stock = {(sku, location): qty or 0 for sku, location, qty in rows}
+    return np.array([stock.get((sku, location), 0) for _, location, sku in keys], dtype=np.float64)
+
+
+# =============================================================================
+# BATCH JOB
+# =============================================================================
+
+def run_demand_forecast(
+    session: Session,
+    now: Optional[datetime] = None,
+    company_id: Optional[UUID] = None,
+) -> dict:
+    """
+    Forecast every series with history and replace this model version's
+    future forecasts. Changes are not committed.
+    """
+    started = time.monotonic()
+    now = now or datetime.utcnow()
+    today = now.date()
+    history_days = settings.FORECAST_HISTORY_DAYS
+    horizon = settings.FORECAST_HORIZON_DAYS
+    lead_time = settings.FORECAST_LEAD_TIME_DAYS
+    z = settings.FORECAST_SERVICE_LEVEL_Z
+
+    keys, history = load_demand_history(
+        session, today - timedelta(days=history_days), history_days, company_id
+    )
+    horizon_start = datetime.combine(today + timedelta(days=1), datetime.min.time())
+
+    stale = delete(DemandForecast).where(
+        DemandForecast.modelVersion == MODEL_VERSION,
+        DemandForecast.forecastFor >= horizon_start,
+    )
+    if company_id:
+        stale = stale.where(DemandForecast.companyId == company_id)
+    session.execute(stale)
+
+    if not keys:
+        return {"series": 0, "forecasts": 0, "duration_ms": int((time.monotonic() - started) * 1000)}
+
+    fitted = fit_forecasts(history)
+    rate, sigma = fitted["rate"], fitted["sigma"]
+
+    # Whole units per day that add up to the horizon total
+    cumulative = np.rint(rate[:, None] * np.arange(1, horizon + 1))
+    daily = np.diff(cumulative, axis=1, prepend=0).astype(np.int64)
+    lower = np.floor(np.maximum(rate - z * sigma, 0)).astype(np.int64)
+    upper = np.ceil(rate + z * sigma).astype(np.int64)
+
+    # (s, S) policy: reorder up to cover lead time + horizon once at or below s
+    safety_stock = np.ceil(z * sigma * np.sqrt(lead_time)).astype(np.int64)
+    reorder_point = np.ceil(rate * lead_time).astype(np.int64) + safety_stock
+    available = _available_stock(session, keys, company_id)
+    order_up_to = np.ceil(rate * (lead_time + horizon)) + safety_stock
+    suggested = np.where(
+        available <= reorder_point, np.maximum(order_up_to - available, 0), 0
+    ).astype(np.int64)
+
+    forecast_days = [horizon_start + timedelta(days=d) for d in range(horizon)]
+    columns = {
+        "daily": daily.tolist(),
+        "lower": lower.tolist(),
+        "upper": upper.tolist(),
+        "safety": safety_stock.tolist(),
+        "reorder": reorder_point.tolist(),
+        "suggested": suggested.tolist(),
+        "confidence": np.round(fitted["confidence"], 4).tolist(),
+        "rate": np.round(rate, 4).tolist(),
+        "sigma": np.round(sigma, 4).tolist(),
+        "adi": np.round(fitted["adi"], 2).tolist(),
+        "model": fitted["model"].tolist(),
+    }
+
+    batch = []
+    written = 0
+    for i, (company, location, sku) in enumerate(keys):
+        features = {
+            "model": MODELS[columns["model"][i]],
+            "dailyRate": columns["rate"][i],
+            "sigma": columns["sigma"][i],
+            "adi": columns["adi"][i],
+            "historyDays": history_days,
+        }
+        for d, forecast_for in enumerate(forecast_days):
+            batch.append({
+                "id": uuid4(),
+                "forecastDate": now,
+                "forecastFor": forecast_for,
+                "companyId": company,
+                "locationId": location,
+                "skuId": sku,
+                "predictedDemand": columns["daily"][i][d],
+                "lowerBound": columns["lower"][i],
+                "upperBound": columns["upper"][i],
+                "confidenceScore": columns["confidence"][i],
+                "suggestedReorder": columns["suggested"][i],
+                "reorderPoint": columns["reorder"][i],
+                "safetyStock": columns["safety"][i],
+                "modelVersion": MODEL_VERSION,
+                "features": features,
+                "createdAt": now,
+                "updatedAt": now,
+            })
+        if len(batch) >= INSERT_BATCH_SIZE:
+            session.execute(insert(DemandForecast), batch)
+            written += len(batch)
+            batch = []
+    if batch:
+        session.execute(insert(DemandForecast), batch)
+        written += len(batch)
+
+    return {
+        "series": len(keys),
+        "forecasts": written,
+        "models": {name: int((fitted["model"] == m).sum()) for m, name in enumerate(MODELS)},
+        "duration_ms": int((time.monotonic() - started) * 1000),
+    }
@@ -0,0 +1,1077 @@
+"""
+Detection Engine Service
+Compiles DetectionRule conditions and severity rules into SQL so the database
+returns only matching rows (with their computed severity) instead of every
+entity of the rule's type. Operators that cannot be expressed in SQL fall back
+to the Python evaluator.
+
+Matches are reconciled against open exceptions in bulk: one query loads the
+open exceptions for a rule, and creates/updates/resolves are written with a
+constant number of statements. The auto-resolve pass likewise checks open
+exceptions with one IN (...) query per entity type and one bulk UPDATE.
+Both keep the per-company ExceptionCounter rows in step in the same
+transaction.
+"""
+import logging
+import math
+import re
+from datetime import datetime, date, time, timedelta
+from decimal import Decimal
+from typing import Any, Dict, List, Optional, Tuple, get_args
+from uuid import UUID, uuid4
+
+from sqlalchemy import and_, or_, case, literal, false, func, insert, update, text
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.types import NullType, TypeDecorator
+from sqlmodel import Session, select
+
+from app.models.company import Location
+from app.models.order import Order, Delivery
+from app.models.ndr import NDR, AIActionLog
+from app.models.returns import Return
+from app.models.inventory import Inventory
+from app.models.system import Exception as ExceptionModel
+from app.services.exception_counters import (
+    ExceptionCounterDeltas,
+    apply_exception_counter_deltas,
+    status_entered_at,
+)
+
+logger = logging.getLogger(__name__)
+
+
+SEVERITY_ORDER = ["CRITICAL", "HIGH", "MEDIUM", "LOW"]
+
+NUMERIC_TYPES = (int, float, Decimal)
+
+OPEN_EXCEPTION_STATUSES = ["OPEN", "IN_PROGRESS"]
+
+# Predicate of the uq_exception_open_entity_type partial unique index
+OPEN_EXCEPTION_INDEX_WHERE = text("status IN ('OPEN', 'IN_PROGRESS')")
+
+# Map detection rule action types to database enum values
+AI_ACTION_TYPE_MAP = {
+    "RECOMMEND": "NDR_CLASSIFICATION",
+    "AUTO_CLASSIFY": "NDR_CLASSIFICATION",
+    "AUTO_OUTREACH": "NDR_RESOLUTION",
+    "AUTO_ESCALATE": "NDR_RESOLUTION",
+    "AUTO_RESOLVE": "NDR_RESOLUTION",
+    "PREDICT": "DEMAND_FORECAST",
+}
+
+# Wording used on exceptions/AI actions, per detection source
+SOURCE_TEXT = {
+    "SCHEDULER": {
+        "description": "Auto-detected by scheduler using rule '{rule.ruleCode}'",
+        "decision": "Auto-triggered by scheduler rule: {rule.ruleCode} ({rule.aiActionType})",
+        "reasoning": "Rule '{rule.name}' detected an issue requiring {rule.aiActionType}",
+        "resolution": "Auto-resolved by scheduler: Rule conditions no longer met",
+        "auto_resolution": "Auto-resolved by scheduler: Issue has been addressed",
+    },
+    "RULE_ENGINE": {
+        "description": "Detected by rule '{rule.ruleCode}'. {description}",
+        "decision": "Triggered by rule: {rule.ruleCode} ({rule.aiActionType})",
+        "reasoning": "Rule '{rule.name}' detected an issue that requires {rule.aiActionType}",
+        "resolution": "Auto-resolved: Rule conditions no longer met",
+        "auto_resolution": "Auto-resolved: Issue has been addressed",
+    },
+}
+
+
+# =============================================================================
+# PYTHON EVALUATOR (fallback for conditions that cannot be compiled)
+# =============================================================================
+
+def calculate_age_hours(timestamp: datetime) -> float:
+    """Calculate hours since timestamp."""
+    if not timestamp:
+        return 0
+    return (datetime.utcnow() - timestamp).total_seconds() / 3600
+
+
+def calculate_age_days(dt) -> int:
+    """Calculate days since date."""
+    if not dt:
+        return 0
+    if isinstance(dt, datetime):
+        dt = dt.date()
+    return (datetime.utcnow().date() - dt).days
+
+
+def get_entity_model(entity_type: str):
+    """Get SQLModel class for entity type."""
+    models = {
+        "Order": Order,
+        "Delivery": Delivery,
+        "NDR": NDR,
+        "Return": Return,
+        "Inventory": Inventory,
+    }
+    return models.get(entity_type)
+
+
+def company_scope(Model, company_id: UUID):
+    """
+    Filter restricting an entity query to one company. Entities without a
+    companyId column (Inventory) belong to the company of their Location.
+    """
+    if hasattr(Model, "companyId"):
+        return Model.companyId == company_id
+    return Model.locationId.in_(select(Location.id).where(Location.companyId == company_id))
+
+
+def evaluate_condition(entity, condition: Dict[str, Any], now: datetime) -> bool:
+    """Evaluate a single condition against an entity."""
+    field = condition.get("field")
+    operator = condition.get("operator")
+    value = condition.get("value")
+
+    if not hasattr(entity, field):
+        return False
+
+    entity_value = getattr(entity, field)
+
+    # Handle enum values
+    if hasattr(entity_value, 'value'):
+        entity_value = entity_value.value
+
+    try:
+        if operator == "=":
+            return str(entity_value) == str(value)
+        elif operator == "!=":
+            return str(entity_value) != str(value)
+        elif operator == ">":
+            return float(entity_value or 0) > float(value)
+        elif operator == "<":
+            return float(entity_value or 0) < float(value)
+        elif operator == ">=":
+            return float(entity_value or 0) >= float(value)
+        elif operator == "<=":
+            return float(entity_value or 0) <= float(value)
+        elif operator == "IN":
+            return str(entity_value) in value
+        elif operator == "NOT_IN":
+            return str(entity_value) not in value
+        elif operator == "IS_NULL":
+            return entity_value is None
+        elif operator == "IS_NOT_NULL":
+            return entity_value is not None
+        elif operator == "AGE_HOURS":
+            if entity_value:
+                age = calculate_age_hours(entity_value)
+                return age >= float(value)
+            return False
+        elif operator == "AGE_DAYS":
+            if entity_value:
+                age = calculate_age_days(entity_value)
+                return age >= int(value)
+            return False
+    except (ValueError, TypeError):
+        return False
+
+    return False
+
+
+def evaluate_conditions(entity, conditions: List[Dict[str, Any]], now: datetime) -> bool:
+    """
+    Evaluate all conditions against an entity.
+    Conditions are folded left to right; each condition's logicalOperator
+    (AND/OR, default AND) joins it to the next one.
+    """
+    if not conditions:
+        return False
+
+    final_result = evaluate_condition(entity, conditions[0], now)
+    for i in range(1, len(conditions)):
+        result = evaluate_condition(entity, conditions[i], now)
+        if conditions[i - 1].get("logicalOperator", "AND") == "OR":
+            final_result = final_result or result
+        else:
+            final_result = final_result and result
+
+    return final_result
+
+
+def calculate_severity(entity, rule, now: datetime) -> str:
+    """Calculate severity based on rule configuration."""
+    severity_rules = rule.severityRules or {}
+    severity_field = rule.severityField or "createdAt"
+    severity_unit = rule.severityUnit or "hours"
+    default_severity = rule.defaultSeverity or "MEDIUM"
+
+    if not severity_rules:
+        return default_severity
+
+    field_value = getattr(entity, severity_field, None)
+    if not field_value:
+        return default_severity
+
+    # Calculate the metric value
+    if severity_unit == "hours":
+        metric_value = calculate_age_hours(field_value)
+    elif severity_unit == "days":
+        metric_value = calculate_age_days(field_value)
+    else:
+        metric_value = float(field_value) if field_value else 0
+
+    # Determine severity based on thresholds (highest first)
+    for severity in SEVERITY_ORDER:
+        threshold = severity_rules.get(severity)
+        if threshold is not None and metric_value >= threshold:
+            return severity
+
+    return default_severity
+
+
+def get_priority(severity: str) -> int:
+    """Convert severity to numeric priority."""
+    return {"CRITICAL": 1, "HIGH": 2, "MEDIUM": 3, "LOW": 4}.get(severity, 5)
+
+
+# Column holding the identifier stored in Exception.entityId, per entity type
+ENTITY_IDENTIFIER_FIELDS = {
+    "Order": "orderNo",
+    "Delivery": "deliveryNo",
+    "NDR": "ndrCode",
+    "Return": "returnNo",
+    "Inventory": "skuId",
+}
+
+
+def get_entity_identifier(entity, entity_type: str) -> str:
+    """Get the identifier field for an entity."""
+    if entity_type == "Order":
+        return entity.orderNo
+    elif entity_type == "Delivery":
+        return entity.deliveryNo
+    elif entity_type == "NDR":
+        return entity.ndrCode
+    elif entity_type == "Return":
+        return getattr(entity, 'returnNo', str(entity.id))
+    elif entity_type == "Inventory":
+        return str(entity.skuId)
+    return str(entity.id)
+
+
+# =============================================================================
+# SQL COMPILER
+# =============================================================================
+
+def _column_type(Model, field: Optional[str]):
+    """Return the Python type of a mapped column, or None if not a plain column."""
+    table = getattr(Model, "__table__", None)
+    if not field or table is None or field not in table.c:
+        return None
+
+    sa_type = table.c[field].type
+    if isinstance(sa_type, TypeDecorator):
+        sa_type = sa_type.impl
+    if not isinstance(sa_type, NullType):
+        try:
+            return sa_type.python_type
+        except NotImplementedError:
+            return None
+
+    # Untyped sa_column: fall back to the model annotation (Optional[X] -> X)
+    model_field = Model.model_fields.get(field)
+    annotation = model_field.annotation if model_field else None
+    args = [arg for arg in get_args(annotation) if arg is not type(None)]
+    if len(args) == 1:
+        annotation = args[0]
+    return annotation if isinstance(annotation, type) else None
+
+
+def _day_cutoff(now: datetime, days: int) -> datetime:
+    """First instant of the day after (today - days): datetimes before it are >= days old."""
+    return datetime.combine(now.date() - timedelta(days=days - 1), time.min)
+
+
+def _aged_clause(column, col_type, unit: str, amount, at: datetime):
+    """
+    SQL for "age of column >= amount (hours/days) as of `at`", or None.
+    Mirrors calculate_age_hours/calculate_age_days.
+    """
+    if unit == "hours":
+        if col_type is not datetime:
+            return None
+        return column <= at - timedelta(hours=float(amount))
+    if unit == "days":
+        days = int(amount)
+        if col_type is datetime:
+            return column < _day_cutoff(at, days)
+        if col_type is date:
+            return column <= at.date() - timedelta(days=days)
+    return None
+
+
+def _not_aged_clause(column, col_type, unit: str, amount, at: datetime):
+    """Complement of _aged_clause() for non-NULL values: still younger as of `at`."""
+    if unit == "hours":
+        if col_type is not datetime:
+            return None
+        return column > at - timedelta(hours=float(amount))
+    if unit == "days":
+        days = int(amount)
+        if col_type is datetime:
+            return column >= _day_cutoff(at, days)
+        if col_type is date:
+            return column > at.date() - timedelta(days=days)
+    return None
+
+
+def compile_condition(Model, condition: Dict[str, Any], now: datetime):
+    """
+    Compile a single condition into a SQL expression that selects exactly the
+    rows evaluate_condition() would accept.
+    Returns None when the condition has no faithful SQL equivalent.
+    """
+    field = condition.get("field")
+    operator = condition.get("operator")
+    value = condition.get("value")
+
+    col_type = _column_type(Model, field)
+    if col_type is None:
+        return None
+    column = getattr(Model, field)
+
+    try:
+        if operator in ("=", "!="):
+            if issubclass(col_type, str):
+                clause = column == str(value)
+            elif col_type is bool and isinstance(value, bool):
+                clause = column == value
+            elif col_type is int and re.fullmatch(r"-?(0|[1-9][0-9]*)", str(value)):
+                clause = column == int(value)
+            else:
+                return None
+            if operator == "=":
+                return clause
+            # str(None) != value holds in Python, so NULLs match "!="
+            return or_(~clause, column.is_(None))
+
+        if operator in (">", "<", ">=", "<="):
+            if not issubclass(col_type, NUMERIC_TYPES) or col_type is bool:
+                return None
+            metric = func.coalesce(column, 0)
+            threshold = float(value)
+            return {
+                ">": metric > threshold,
+                "<": metric < threshold,
+                ">=": metric >= threshold,
+                "<=": metric <= threshold,
+            }[operator]
+
+        if operator in ("IN", "NOT_IN"):
+            if not issubclass(col_type, str) or not isinstance(value, (list, tuple)):
+                return None
+            if not all(isinstance(v, str) for v in value):
+                return None
+            values = list(value)
+            if operator == "IN":
+                return column.in_(values)
+            return or_(column.notin_(values), column.is_(None))
+
+        if operator == "IS_NULL":
+            return column.is_(None)
+        if operator == "IS_NOT_NULL":
+            return column.is_not(None)
+
+        if operator == "AGE_HOURS":
+            return _aged_clause(column, col_type, "hours", value, now)
+        if operator == "AGE_DAYS":
+            return _aged_clause(column, col_type, "days", value, now)
+    except (ValueError, TypeError):
+        return None
+
+    return None
+
+
+def compile_severity(Model, rule, now: datetime):
+    """
+    Compile the rule's severityRules into a SQL CASE expression mirroring
+    calculate_severity(). Returns None when it must be computed in Python.
+    """
+    severity_rules = rule.severityRules or {}
+    severity_field = rule.severityField or "createdAt"
+    severity_unit = rule.severityUnit or "hours"
+    default_severity = rule.defaultSeverity or "MEDIUM"
+
+    if not severity_rules:
+        return literal(default_severity)
+
+    col_type = _column_type(Model, severity_field)
+    if col_type is None:
+        return None
+    column = getattr(Model, severity_field)
+
+    thresholds = []
+    try:
+        for severity in SEVERITY_ORDER:
+            threshold = severity_rules.get(severity)
+            if threshold is not None:
+                thresholds.append((severity, float(threshold)))
+    except (ValueError, TypeError):
+        return None
+
+    whens = []
+    if severity_unit in ("hours", "days"):
+        if col_type not in (datetime, date):
+            return None
+        whens.append((column.is_(None), default_severity))
+        for severity, threshold in thresholds:
+            if severity_unit == "days":
+                # Age in days is an integer, so ">= 1.5" means ">= 2"
+                threshold = math.ceil(threshold)
+            clause = _aged_clause(column, col_type, severity_unit, threshold, now)
+            if clause is None:
+                return None
+            whens.append((clause, severity))
+    else:
+        if not issubclass(col_type, NUMERIC_TYPES) or col_type is bool:
+            return None
+        whens.append((or_(column.is_(None), column == 0), default_severity))
+        for severity, threshold in thresholds:
+            whens.append((column >= threshold, severity))
+
+    return case(*whens, else_=default_severity)
+
+
+class CompiledRule:
+    """
+    A DetectionRule compiled against its entity model.
+
+    where:     SQL filter for the conditions (None means "no SQL filter")
+    residual:  conditions that still need the Python evaluator
+    severity:  SQL CASE expression for severity (None means Python)
+    """
+
+    def __init__(
+        self,
+        rule,
+        Model,
+        where,
+        residual: List[Dict[str, Any]],
+        fold_residual: bool,
+        severity,
+        now: datetime,
+    ):
+        self.rule = rule
+        self.Model = Model
+        self.where = where
+        self.residual = residual
+        self.fold_residual = fold_residual
+        self.severity = severity
+        self.now = now
+
+    @property
+    def fully_compiled(self) -> bool:
+        """True when matching and severity run entirely in the database."""
+        return not self.residual and self.severity is not None
+
+    def statement(self, *filters):
+        """Build the SELECT for matching rows, with severity when compiled."""
+        if self.severity is not None:
+            query = select(self.Model, self.severity.label("severity"))
+        else:
+            query = select(self.Model)
+        if self.where is not None:
+            query = query.where(self.where)
+        for clause in filters:
+            query = query.where(clause)
+        return query
+
+    @property
+    def identifier_column(self):
+        """Column whose value is stored in Exception.entityId."""
+        return getattr(self.Model, ENTITY_IDENTIFIER_FIELDS[self.rule.entityType])
+
+    def _threshold_windows(self, since: datetime) -> list:
+        """
+        Rows that were still younger than an AGE condition or age-based
+        severity threshold at `since`; only these can have crossed one since.
+        """
+        terms = []
+        for cond in (self.rule.conditions if isinstance(self.rule.conditions, list) else []):
+            unit = {"AGE_HOURS": "hours", "AGE_DAYS": "days"}.get(cond.get("operator"))
+            if unit:
+                terms.append((cond.get("field"), unit, cond.get("value")))
+
+        severity_unit = self.rule.severityUnit or "hours"
+        if severity_unit in ("hours", "days"):
+            for severity in SEVERITY_ORDER:
+                threshold = (self.rule.severityRules or {}).get(severity)
+                if threshold is not None:
+                    if severity_unit == "days":
+                        threshold = math.ceil(float(threshold))
+                    terms.append((self.rule.severityField or "createdAt", severity_unit, threshold))
+
+        windows = []
+        for field, unit, amount in terms:
+            col_type = _column_type(self.Model, field)
+            if col_type is None:
+                continue
+            try:
+                clause = _not_aged_clause(getattr(self.Model, field), col_type, unit, amount, since)
+            except (ValueError, TypeError):
+                continue
+            if clause is not None:
+                windows.append(clause)
+        return windows
+
+    def changed_since(self, since: datetime):
+        """Identifiers of entities updated after `since` (as a subquery)."""
+        return select(self.identifier_column).where(self.Model.updatedAt > since)
+
+    def incremental_filter(self, changed_since: datetime, crossed_since: datetime):
+        """
+        Restrict a scan to entities updated after `changed_since` plus rows
+        whose AGE_HOURS/AGE_DAYS (or age-based severity) thresholds were
+        crossed between `crossed_since` and now. Unchanged rows can only
+        flip by ageing, so this is exact for incremental scans.
+
+        Changed rows are selected by identifier so sibling rows sharing it
+        (e.g. Inventory by SKU) are re-evaluated together.
+        """
+        clauses = [self.identifier_column.in_(self.changed_since(changed_since))]
+        clauses.extend(self._threshold_windows(crossed_since))
+        return or_(*clauses)
+
+    def changed_identifiers(self, session: Session, since: datetime, *filters) -> set:
+        """Identifiers (as Exception.entityId strings) of entities updated after `since`."""
+        query = self.changed_since(since).distinct()
+        for clause in filters:
+            query = query.where(clause)
+        return {str(value) for value in session.exec(query).all()}
+
+    def _residual_match(self, entity) -> bool:
+        if not self.residual:
+            return True
+        if self.fold_residual:
+            return evaluate_conditions(entity, self.residual, self.now)
+        return all(evaluate_condition(entity, cond, self.now) for cond in self.residual)
+
+    def matches(self, session: Session, *filters) -> Tuple[List[Tuple[Any, str]], int]:
+        """
+        Run the compiled rule and return ([(entity, severity), ...], rows_scanned).
+        rows_scanned is the number of rows the database returned.
+        """
+        rows = session.exec(self.statement(*filters)).all()
+        results = []
+        for row in rows:
+            if self.severity is not None:
+                entity, severity = row
+            else:
+                entity, severity = row, None
+            if not self._residual_match(entity):
+                continue
+            if severity is None:
+                severity = calculate_severity(entity, self.rule, self.now)
+            results.append((entity, severity))
+        return results, len(rows)
+
+
+def compile_conditions(Model, conditions: List[Dict[str, Any]], now: datetime):
+    """
+    Compile a condition list into (where, residual, fold_residual).
+
+    where:          SQL filter (None means "no SQL filter")
+    residual:       conditions left for the Python evaluator
+    fold_residual:  evaluate residual with AND/OR folding instead of all()
+    """
+    if not conditions:
+        # An empty condition list never matches
+        return false(), [], False
+
+    compiled = [compile_condition(Model, cond, now) for cond in conditions]
+    uses_or = any(
+        cond.get("logicalOperator", "AND") == "OR" for cond in conditions[:-1]
+    )
+
+    if all(clause is not None for clause in compiled):
+        where = compiled[0]
+        for i in range(1, len(compiled)):
+            if conditions[i - 1].get("logicalOperator", "AND") == "OR":
+                where = or_(where, compiled[i])
+            else:
+                where = and_(where, compiled[i])
+        return where, [], False
+
+    if uses_or:
+        # Mixed AND/OR with an uncompilable term: evaluate everything in Python
+        return None, conditions, True
+
+    # Pure AND: push what we can into SQL, finish the rest in Python
+    sql_parts = [clause for clause in compiled if clause is not None]
+    residual = [cond for cond, clause in zip(conditions, compiled) if clause is None]
+    where = and_(*sql_parts) if sql_parts else None
+    return where, residual, False
+
+
+def compile_rule(rule, now: datetime) -> Optional[CompiledRule]:
+    """
+    Compile a DetectionRule into a CompiledRule.
+    Returns None if the rule targets an unknown entity type.
+    """
+    Model = get_entity_model(rule.entityType)
+    if not Model:
+        return None
+
+    conditions = rule.conditions if isinstance(rule.conditions, list) else []
+    where, residual, fold_residual = compile_conditions(Model, conditions, now)
+    severity = compile_severity(Model, rule, now)
+    return CompiledRule(rule, Model, where, residual, fold_residual, severity, now)
+
+
+# =============================================================================
+# BULK EXCEPTION RECONCILIATION
+# =============================================================================
+
+def _dialect_insert(session: Session, Model):
+    """INSERT construct for the session's dialect (ON CONFLICT where supported)."""
+    dialect = session.get_bind().dialect.name
+    if dialect == "postgresql":
+        return postgresql.insert(Model)
+    if dialect == "sqlite":
+        return sqlite.insert(Model)
+    return insert(Model)
+
+
+def single_rule_keys(rules) -> set:
+    """
+    (entityType, ruleType) pairs covered by exactly one rule.
+    Exceptions are keyed by entity and type, not by rule, so "no longer
+    matches" can only resolve an exception when a single rule owns that key.
+    """
+    counts: Dict[Tuple[str, str], int] = {}
+    for rule in rules:
+        key = (rule.entityType, rule.ruleType)
+        counts[key] = counts.get(key, 0) + 1
+    return {key for key, count in counts.items() if count == 1}
+
+
+def _resolve_company_ids(
+    session: Session,
+    rule,
+    to_create: Dict[str, Dict[str, Any]],
+    entities: Dict[str, Any],
+) -> None:
+    """
+    Fill in companyId for new exceptions on entities without one (Inventory)
+    from their Location. Exceptions whose company can't be found are dropped.
+    """
+    location_ids = {
+        entity_id: entities[entity_id].locationId
+        for entity_id, row in to_create.items()
+        if row["companyId"] is None and getattr(entities[entity_id], "locationId", None)
+    }
+    companies = {}
+    if location_ids:
+        companies = dict(session.exec(
+            select(Location.id, Location.companyId).where(Location.id.in_(set(location_ids.values())))
+        ).all())
+    for entity_id in list(to_create):
+        if to_create[entity_id]["companyId"] is not None:
+            continue
+        company = companies.get(location_ids.get(entity_id))
+        if company is None:
+            logger.warning(
+                f"Rule {rule.ruleCode}: no company for {rule.entityType} {entity_id}, exception skipped"
+            )
+            del to_create[entity_id]
+        else:
+            to_create[entity_id]["companyId"] = company
+
+
+def reconcile_exceptions(
+    session: Session,
+    rule,
+    matches: List[Tuple[Any, str]],
+    now: datetime,
+    source: str,
+    company_id: Optional[UUID] = None,
+    resolve_missing: bool = False,
+    resolve_scope: Optional[set] = None,
+) -> Dict[str, int]:
+    """
+    Reconcile a rule's matches against its open exceptions in bulk.
+
+    Loads the open exceptions for (entityType, ruleType) in one query, diffs
+    them against the matches in memory, then writes:
+    - new exceptions with one INSERT ... ON CONFLICT DO NOTHING on the
+      partial unique index (entityType, entityId, type) WHERE status is open
+    - AI actions for the newly created exceptions with one INSERT
+    - severity changes with one UPDATE ... WHERE id IN per (status, old
+      severity, new severity)
+    - resolutions (when resolve_missing) with one UPDATE ... WHERE id IN
+    - the resulting ExceptionCounter changes with one upsert
+
+    Updates are guarded on the status and severity read in step 1 and only
+    the rows they return are counted, so an exception changed concurrently
+    (e.g. by an overlapping scan) is neither overwritten nor counted twice.
+
+    For incremental scans pass resolve_scope, the identifiers that were
+    actually re-evaluated; only those can be resolved as "no longer matching".
+
+    Returns {"created", "updated", "resolved"} counts.
+    """
+    wording = SOURCE_TEXT[source]
+
+    # 1. Open exceptions for this rule, keyed by entityId
+    query = select(
+        ExceptionModel.id,
+        ExceptionModel.entityId,
+        ExceptionModel.severity,
+        ExceptionModel.status,
+        ExceptionModel.autoResolvable,
+        ExceptionModel.companyId,
+        ExceptionModel.createdAt,
+        ExceptionModel.updatedAt,
+        ExceptionModel.resolvedAt,
+    ).where(
+        ExceptionModel.entityType == rule.entityType,
+        ExceptionModel.type == rule.ruleType,
+        ExceptionModel.status.in_(OPEN_EXCEPTION_STATUSES),
+    )
+    if company_id:
+        query = query.where(ExceptionModel.companyId == company_id)
+
+    existing = {}
+    for row in session.exec(query).all():
+        existing.setdefault(row.entityId, row)
+
+    # 2. Diff matches against open exceptions
+    to_create: Dict[str, Dict[str, Any]] = {}
+    # entityId -> new severity
+    to_update: Dict[str, str] = {}
+    entities: Dict[str, Any] = {}
+    matched_ids = set()
+
+    for entity, severity in matches:
+        entity_id = get_entity_identifier(entity, rule.entityType)
+        matched_ids.add(entity_id)
+        current = existing.get(entity_id)
+
+        if current is None:
+            if entity_id in to_create:
+                # Several rows share the identifier (e.g. Inventory by SKU)
+                to_create[entity_id]["severity"] = severity
+                to_create[entity_id]["priority"] = get_priority(severity)
+                continue
+
+            order_id = None
+            if hasattr(entity, 'id') and rule.entityType == "Order":
+                order_id = entity.id
+            elif hasattr(entity, 'orderId'):
+                order_id = entity.orderId
+
+            entities[entity_id] = entity
+            to_create[entity_id] = {
+                "id": uuid4(),
+                "exceptionCode": f"EXC-{rule.ruleType[:3]}-{str(uuid4())[:8].upper()}",
+                "type": rule.ruleType,
+                "source": source,
+                "severity": severity,
+                "entityType": rule.entityType,
+                "entityId": entity_id,
+                "orderId": order_id,
+                "title": f"{rule.name}: {entity_id}",
+                "description": wording["description"].format(
+                    rule=rule, description=rule.description or ''
+                ),
+                "autoResolvable": rule.autoResolveEnabled,
+                "status": "OPEN",
+                "priority": get_priority(severity),
+                # Inventory has no companyId; filled in from its Location below
+                "companyId": getattr(entity, 'companyId', None),
+                "createdAt": now,
+                "updatedAt": now,
+            }
+        elif current.severity != severity:
+            to_update[entity_id] = severity
+        else:
+            to_update.pop(entity_id, None)
+
+    _resolve_company_ids(session, rule, to_create, entities)
+
+    to_resolve = []
+    if resolve_missing:
+        to_resolve = [
+            row for entity_id, row in existing.items()
+            if entity_id not in matched_ids and row.status == "OPEN" and row.autoResolvable
+            and (resolve_scope is None or entity_id in resolve_scope)
+        ]
+
+    # 3. Write
+    created_ids: List[str] = []
+    if to_create:
+        stmt = _dialect_insert(session, ExceptionModel)
+        if hasattr(stmt, "on_conflict_do_nothing"):
+            stmt = stmt.on_conflict_do_nothing(
+                index_elements=["entityType", "entityId", "type"],
+                index_where=OPEN_EXCEPTION_INDEX_WHERE,
+            )
+        result = session.execute(
+            stmt.returning(ExceptionModel.entityId), list(to_create.values())
+        )
+        created_ids = [row[0] for row in result]
+
+    if created_ids and rule.aiActionEnabled and rule.aiActionType:
+        mapped_action_type = AI_ACTION_TYPE_MAP.get(rule.aiActionType, "NDR_CLASSIFICATION")
+        session.execute(insert(AIActionLog), [
+            {
+                "id": uuid4(),
+                "actionType": mapped_action_type,
+                "entityType": rule.entityType,
+                "entityId": entity_id,
+                "companyId": to_create[entity_id]["companyId"],
+                "ndrId": entities[entity_id].id if rule.entityType == "NDR" else None,
+                "decision": wording["decision"].format(rule=rule),
+                "reasoning": wording["reasoning"].format(rule=rule),
+                "confidence": 0.85,
+                "riskLevel": to_create[entity_id]["severity"],
+                "status": "PENDING_APPROVAL",
+                "approvalRequired": True,
+                "recommendations": rule.aiActionConfig,
+                "createdAt": now,
+                "updatedAt": now,
+            }
+            for entity_id in created_ids
+        ])
+
+    updated_ids: List[str] = []
+    if to_update:
+        severity_changes: Dict[Tuple[str, str, str], List[UUID]] = {}
+        for entity_id, severity in to_update.items():
+            row = existing[entity_id]
+            severity_changes.setdefault((row.status, row.severity, severity), []).append(row.id)
+        for (status, old_severity, severity), ids in severity_changes.items():
+            result = session.execute(
+                update(ExceptionModel)
+                .where(
+                    ExceptionModel.id.in_(ids),
+                    ExceptionModel.status == status,
+                    ExceptionModel.severity == old_severity,
+                )
+                .values(severity=severity, priority=get_priority(severity), updatedAt=now)
+                .returning(ExceptionModel.entityId)
+                .execution_options(synchronize_session=False)
+            )
+            updated_ids.extend(row[0] for row in result)
+
+    resolved = []
+    if to_resolve:
+        resolved = session.execute(
+            update(ExceptionModel)
+            .where(
+                ExceptionModel.id.in_([row.id for row in to_resolve]),
+                ExceptionModel.status == "OPEN",
+            )
+            .values(
+                status="RESOLVED",
+                resolution=wording["resolution"],
+                resolvedAt=now,
+                resolvedBy=source,
+                updatedAt=now,
+            )
+            .returning(ExceptionModel.companyId, ExceptionModel.severity, ExceptionModel.createdAt)
+            .execution_options(synchronize_session=False)
+        ).all()
+
+    # 4. Counters, for the rows actually written
+    deltas = ExceptionCounterDeltas(now.date())
+    for entity_id in created_ids:
+        created = to_create[entity_id]
+        deltas.add(created["companyId"], rule.ruleType, created["severity"], "OPEN")
+    for entity_id in updated_ids:
+        row = existing[entity_id]
+        deltas.move(
+            row.companyId, rule.ruleType, row.severity, row.status, row.status,
+            to_severity=to_update[entity_id], entered_at=status_entered_at(row),
+        )
+    for company, severity, created_at in resolved:
+        deltas.move(company, rule.ruleType, severity, "OPEN", "RESOLVED", entered_at=created_at)
+    apply_exception_counter_deltas(session, deltas, now)
+
+    return {
+        "created": len(created_ids),
+        "updated": len(updated_ids),
+        "resolved": len(resolved),
+    }
+
+
+# =============================================================================
+# BATCHED AUTO-RESOLVE
+# =============================================================================
+
+NDR_EXCEPTION_TYPES = [
+    "NDR_AGING", "NDR_MULTI_ATTEMPT", "NDR_NO_RESPONSE", "NDR_HIGH_VALUE",
+    "NDR_COD_RISK", "NDR_ADDRESS_ISSUE", "NDR_RTO_CANDIDATE", "NDR_ESCALATION",
+]
+
+# Built-in "issue has been addressed" checks per exception type, expressed as
+# rule conditions so they go through the same compiler as detection rules.
+# A rule's autoResolveConditions take precedence over these.
+AUTO_RESOLVE_CONDITIONS = {
+    "STUCK_ORDER": [{"field": "status", "operator": "!=", "value": "CREATED"}],
+    "SLA_BREACH": [{"field": "status", "operator": "=", "value": "DELIVERED"}],
+    "CARRIER_DELAY": [
+        {"field": "status", "operator": "IN", "value": ["DELIVERED", "OUT_FOR_DELIVERY"]}
+    ],
+    **{
+        exc_type: [{"field": "status", "operator": "IN", "value": ["RESOLVED", "RTO", "CLOSED"]}]
+        for exc_type in NDR_EXCEPTION_TYPES
+    },
+    "RETURN_AGING": [
+        {"field": "status", "operator": "IN", "value": ["COMPLETED", "REFUNDED", "REJECTED"]}
+    ],
+}
+
+# Upper bound on identifiers per IN (...) lookup
+IN_BATCH_SIZE = 5000
+
+
+def get_auto_resolve_conditions(rule) -> Optional[List[Dict[str, Any]]]:
+    """A rule's autoResolveConditions as a condition list (list or {"conditions": [...]})."""
+    conditions = rule.autoResolveConditions
+    if isinstance(conditions, dict):
+        conditions = conditions.get("conditions")
+    return conditions if isinstance(conditions, list) and conditions else None
+
+
+def _identifier_values(Model, field: str, entity_ids) -> list:
+    """Convert Exception.entityId strings to the identifier column's type."""
+    if _column_type(Model, field) is not UUID:
+        return list(entity_ids)
+    values = []
+    for entity_id in entity_ids:
+        try:
+            values.append(UUID(entity_id))
+        except (ValueError, TypeError):
+            continue
+    return values
+
+
+def auto_resolve_exceptions(
+    session: Session,
+    now: datetime,
+    source: str,
+    company_id: Optional[UUID] = None,
+    rules=(),
+) -> int:
+    """
+    Resolve open auto-resolvable exceptions whose underlying issue is fixed.
+
+    Exceptions are grouped by entityType; the referenced entities are checked
+    with one IN (...) query per type, each exception type's resolve conditions
+    compiled to a boolean column. Conditions that cannot be compiled are
+    checked with the Python evaluator on the fetched rows. All resolutions
+    are written with a single UPDATE guarded on the status, and the counter
+    changes of the rows it returns with one upsert. Returns the number
+    resolved.
+    """
+    overrides = {}
+    for rule in rules:
+        conditions = get_auto_resolve_conditions(rule)
+        if conditions:
+            overrides.setdefault((rule.entityType, rule.ruleType), conditions)
+
+    query = select(
+        ExceptionModel.id,
+        ExceptionModel.entityType,
+        ExceptionModel.entityId,
+        ExceptionModel.type,
+    ).where(
+        ExceptionModel.status == "OPEN",
+        ExceptionModel.autoResolvable == True,
+    )
+    if company_id:
+        query = query.where(ExceptionModel.companyId == company_id)
+
+    # entityType -> exception type -> entityId -> [exception ids]
+    groups: Dict[str, Dict[str, Dict[str, List[UUID]]]] = {}
+    for row in session.exec(query).all():
+        groups.setdefault(row.entityType, {}).setdefault(row.type, {}) \
+            .setdefault(row.entityId, []).append(row.id)
+
+    to_resolve: List[UUID] = []
+    for entity_type, by_type in groups.items():
+        Model = get_entity_model(entity_type)
+        if not Model:
+            continue
+
+        checks = {}
+        for exc_type in by_type:
+            conditions = overrides.get((entity_type, exc_type)) or AUTO_RESOLVE_CONDITIONS.get(exc_type)
+            if conditions:
+                checks[exc_type] = (conditions, compile_conditions(Model, conditions, now))
+        if not checks:
+            continue
+
+        field = ENTITY_IDENTIFIER_FIELDS[entity_type]
+        ident = getattr(Model, field)
+        in_python = any(
+            where is None or residual for _, (where, residual, _) in checks.values()
+        )
+        exc_types = list(checks)
+        if in_python:
+            columns = [Model]
+        else:
+            columns = [ident] + [
+                case((checks[exc_type][1][0], True), else_=False).label(f"resolve_{i}")
+                for i, exc_type in enumerate(exc_types)
+            ]
+
+        entity_ids = set()
+        for exc_type in exc_types:
+            entity_ids.update(by_type[exc_type])
+        values = _identifier_values(Model, field, entity_ids)
+
+        fixed: Dict[str, set] = {exc_type: set() for exc_type in exc_types}
+        for start in range(0, len(values), IN_BATCH_SIZE):
+            batch = values[start:start + IN_BATCH_SIZE]
+            for row in session.exec(select(*columns).where(ident.in_(batch))).all():
+                if in_python:
+                    entity = row
+                    entity_id = get_entity_identifier(entity, entity_type)
+                    for exc_type in exc_types:
+                        if evaluate_conditions(entity, checks[exc_type][0], now):
+                            fixed[exc_type].add(entity_id)
+                else:
+                    entity_id = str(row[0])
+                    for i, exc_type in enumerate(exc_types):
+                        if row[i + 1]:
+                            fixed[exc_type].add(entity_id)
+
+        for exc_type, entity_ids in fixed.items():
+            for entity_id in entity_ids:
+                to_resolve.extend(by_type[exc_type].get(entity_id, []))
+
+    if not to_resolve:
+        return 0
+
+    # Guarded on the status, so exceptions resolved concurrently are counted
+    # by whoever resolved them
+    resolved = session.execute(
+        update(ExceptionModel)
+        .where(ExceptionModel.id.in_(to_resolve), ExceptionModel.status == "OPEN")
+        .values(
+            status="RESOLVED",
+            resolution=SOURCE_TEXT[source]["auto_resolution"],
+            resolvedAt=now,
+            resolvedBy=source,
+            updatedAt=now,
+        )
+        .returning(
+            ExceptionModel.companyId,
+            ExceptionModel.type,
+            ExceptionModel.severity,
+            ExceptionModel.createdAt,
+        )
+        .execution_options(synchronize_session=False)
+    ).all()
+
+    deltas = ExceptionCounterDeltas(now.date())
+    for company, exc_type, severity, created_at in resolved:
+        deltas.move(company, exc_type, severity, "OPEN", "RESOLVED", entered_at=created_at)
+    apply_exception_counter_deltas(session, deltas, now)
+    return len(resolved)
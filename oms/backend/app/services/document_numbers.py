@@ -0,0 +1,180 @@
+"""
+Document Number Service
+Collision-free document numbering backed by per-series counters in the
+Sequence table, with an in-process block allocator.
+
+Each process claims a block of numbers with one atomic
+UPDATE ... RETURNING on the series' counter row and then hands them out from
+memory, so generating a number is O(1) and never scans the document table.
+Blocks are claimed in their own short transaction (like a database sequence),
+so the counter row is not held locked for the caller's transaction; numbers
+of rolled-back documents, and the unused rest of a block when a process
+stops, are skipped rather than reused.
+"""
+import asyncio
+import threading
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+from uuid import uuid4
+
+from sqlalchemy import BigInteger, and_, cast, not_, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlmodel import Session, select, func
+
+from app.core.config import settings
+from app.core.database import engine
+from app.models.goods_receipt import GoodsReceipt
+from app.models.system import Sequence
+
+
+@dataclass(frozen=True)
+class NumberSeries:
+    """
+    A document number series, e.g. ALLOC-00000042.
+
+    name is the counter's Sequence.name. seed returns the last number already
+    in use; it is only called when the counter row is first created, so
+    existing documents numbered by the old scheme are never reissued.
+    """
+    name: str
+    prefix: str
+    width: int
+    seed: Callable[[Session], int]
+    block_size: Optional[int] = None
+
+    def format(self, value: int) -> str:
+        return f"{self.prefix}{value:0{self.width}d}"
+
+
+def max_suffix_seed(column, prefix: str, *filters) -> Callable[[Session], int]:
+    """
+    Seed from the highest number after prefix in column. Values whose suffix
+    is not all digits (e.g. legacy UUID-suffixed numbers) are ignored, and
+    suffixes are compared numerically, so padding widths may differ.
+    """
+    def seed(session: Session) -> int:
+        suffix = func.substr(column, len(prefix) + 1)
+        if session.get_bind().dialect.name == "postgresql":
+            numeric = suffix.op("~")("^[0-9]+$")
+        else:
+            numeric = and_(suffix != "", not_(suffix.op("GLOB")("*[^0-9]*")))
+        query = (
+            select(func.max(cast(suffix, BigInteger)))
+            .where(column.like(f"{prefix}%"), numeric)
+        )
+        for condition in filters:
+            query = query.where(condition)
+        return session.exec(query).first() or 0
+    return seed
+
+
+class DocumentNumberAllocator:
+    """Hands out numbers from blocks claimed per series."""
+
+    def __init__(self, block_size: int):
+        self.block_size = block_size
+        # series name -> [next value, last value of the block]
+        self._blocks: Dict[str, List[int]] = {}
+        # One lock per series, so a block claim only waits on its own series
+        self._series_locks: Dict[str, threading.Lock] = {}
+        self._lock = threading.Lock()
+
+    def _series_lock(self, name: str) -> threading.Lock:
+        with self._lock:
+            lock = self._series_locks.get(name)
+            if lock is None:
+                lock = self._series_locks[name] = threading.Lock()
+            return lock
+
+    def _claim(self, session: Session, series: NumberSeries, size: int) -> int:
+        """Reserve size numbers on the counter row; returns the last one."""
+        bind = session.get_bind()
+        # SQLite has a single writer, so a second connection would wait on
+        # the caller's own transaction; claim inside it instead
+        own_transaction = bind.dialect.name != "sqlite"
+        claim_session = Session(bind) if own_transaction else session
+        try:
+            last = self._increment(claim_session, series.name, size)
+            if last is None:
+                insert = (postgresql if bind.dialect.name == "postgresql" else sqlite).insert
+                now = datetime.utcnow()
+                claim_session.execute(
+                    insert(Sequence)
+                    .values(
+                        id=uuid4(), name=series.name, prefix=series.prefix,
+                        currentValue=series.seed(claim_session), increment=1,
+                        createdAt=now, updatedAt=now,
+                    )
+                    .on_conflict_do_nothing(index_elements=["name"])
+                )
+                last = self._increment(claim_session, series.name, size)
+            if own_transaction:
+                claim_session.commit()
+            return last
+        finally:
+            if own_transaction:
+                claim_session.close()
+
+    @staticmethod
+    def _increment(session: Session, name: str, size: int) -> Optional[int]:
+        return session.execute(
+            update(Sequence)
+            .where(Sequence.name == name)
+            .values(currentValue=Sequence.currentValue + size, updatedAt=datetime.utcnow())
+            .returning(Sequence.currentValue)
+            .execution_options(synchronize_session=False)
+        ).scalar()
+
+    def next_values(self, session: Session, series: NumberSeries, n: int) -> List[int]:
+        """Take n values of a series, claiming new blocks as needed."""
+        values: List[int] = []
+        block_size = series.block_size or self.block_size
+        with self._series_lock(series.name):
+            block = self._blocks.get(series.name)
+            while len(values) < n:
+                if not block or block[0] > block[1]:
+                    # Large requests claim what they need in one go
+                    size = max(block_size, n - len(values))
+                    last = self._claim(session, series, size)
+                    block = self._blocks[series.name] = [last - size + 1, last]
+                take = min(n - len(values), block[1] - block[0] + 1)
+                values.extend(range(block[0], block[0] + take))
+                block[0] += take
+        return values
+
+
+document_numbers = DocumentNumberAllocator(settings.DOCUMENT_NUMBER_BLOCK_SIZE)
+
+# Goods receipts are numbered by both the goods receipt and the stock
+# transfer APIs, which must share one counter
+GR_SERIES = NumberSeries(
+    name="GR",
+    prefix="GR-",
+    width=6,
+    seed=max_suffix_seed(GoodsReceipt.grNo, "GR-"),
+)
+
+
+def next_number(session: Session, series: NumberSeries) -> str:
+    """Generate the next document number of a series."""
+    return series.format(document_numbers.next_values(session, series, 1)[0])
+
+
+def next_numbers(session: Session, series: NumberSeries, n: int) -> List[str]:
+    """Generate n document numbers of a series."""
+    return [series.format(v) for v in document_numbers.next_values(session, series, n)]
+
+
+async def next_numbers_async(series: NumberSeries, n: int) -> List[str]:
+    """
+    next_numbers for async handlers. Blocks are claimed on the sync engine in
+    a worker thread so the allocator's locks are never held on the event loop.
+    """
+    def claim() -> List[str]:
+        with Session(engine) as session:
+            numbers = next_numbers(session, series, n)
+            session.commit()
+            return numbers
+
+    return await asyncio.to_thread(claim)
@@ -0,0 +1,239 @@
+"""
+Exception Counters
+Per-company exception counts by (type, severity, status), kept in the
+ExceptionCounter table so the control tower reads a few dozen counter rows
+instead of the exception history.
+
+Writers of Exception (detection engine, exception API) collect the status and
+severity transitions they make in an ExceptionCounterDeltas and apply them in
+the same transaction with one INSERT ... ON CONFLICT DO UPDATE, so counters
+commit or roll back together with the exceptions. Transitions are only
+counted for the rows an UPDATE guarded on the previous status actually
+changed, so concurrent writers never count the same transition twice.
+rebuild_exception_counters recomputes them from Exception for bootstrap and
+drift repair.
+"""
+from datetime import date, datetime
+from typing import Dict, List, Optional, Tuple
+from uuid import UUID, uuid4
+
+from sqlalchemy import case, delete, insert, text
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlmodel import Session, select, func
+
+from app.models.system import Exception as ExceptionModel, ExceptionCounter
+
+CounterKey = Tuple[UUID, str, str, str]  # (companyId, type, severity, status)
+
+
+def status_entered_at(exception) -> Optional[datetime]:
+    """When an exception entered its current status, as rebuild_exception_counters counts it."""
+    if exception.status in ("RESOLVED", "CLOSED"):
+        return exception.resolvedAt
+    if exception.status == "OPEN":
+        return exception.createdAt
+    return exception.updatedAt
+
+
+class ExceptionCounterDeltas:
+    """Counter changes accumulated while writing exceptions."""
+
+    def __init__(self, today: Optional[date] = None):
+        self.today = today or datetime.utcnow().date()
+        # key -> [count delta, periodCount delta]
+        self._deltas: Dict[CounterKey, List[int]] = {}
+
+    def add(
+        self,
+        company_id: UUID,
+        exc_type: str,
+        severity: str,
+        status: str,
+        n: int = 1,
+        entered: bool = True,
+    ) -> None:
+        """
+        n exceptions entering (n < 0: leaving) a counter. entered means they
+        enter the status today, or are leaving it on the day they entered it,
+        so today's periodCount changes as well.
+        """
+        delta = self._deltas.setdefault((company_id, exc_type, severity, status), [0, 0])
+        delta[0] += n
+        if entered:
+            delta[1] += n
+
+    def move(
+        self,
+        company_id: UUID,
+        exc_type: str,
+        severity: str,
+        from_status: str,
+        to_status: str,
+        to_severity: Optional[str] = None,
+        n: int = 1,
+        entered_at: Optional[datetime] = None,
+    ) -> None:
+        """
+        Exceptions changing status and/or severity. entered_at is when they
+        entered from_status (see status_entered_at); if that was today they
+        also leave today's periodCount of the old counter.
+        """
+        to_severity = to_severity or severity
+        if (severity, from_status) == (to_severity, to_status):
+            return
+        left_today = entered_at is not None and entered_at.date() == self.today
+        self.add(company_id, exc_type, severity, from_status, -n, entered=left_today)
+        self.add(
+            company_id, exc_type, to_severity, to_status, n,
+            entered=from_status != to_status or left_today,
+        )
+
+    def rows(self) -> List[dict]:
+        return [
+            {
+                "id": uuid4(),
+                "companyId": company_id,
+                "type": exc_type,
+                "severity": severity,
+                "status": status,
+                "count": count,
+                "periodDate": self.today,
+                "periodCount": period,
+            }
+            for (company_id, exc_type, severity, status), (count, period) in self._deltas.items()
+            if count or period
+        ]
+
+
+def apply_exception_counter_deltas(
+    session: Session,
+    deltas: ExceptionCounterDeltas,
+    now: Optional[datetime] = None,
+) -> None:
+    """Add deltas to the counters in one upsert. Changes are not committed."""
+    now = now or datetime.utcnow()
+    rows = deltas.rows()
+    if not rows:
+        return
+
+    bind = session.get_bind()
+    stmt = (postgresql if bind.dialect.name == "postgresql" else sqlite).insert(ExceptionCounter)
+    current, new = ExceptionCounter.__table__.c, stmt.excluded
+    session.execute(
+        stmt.on_conflict_do_update(
+            index_elements=["companyId", "type", "severity", "status"],
+            set_={
+                "count": current["count"] + new["count"],
+                # Entries roll over to a new period on the first change of a
+                # new day; nothing entered on the new day can have left it yet
+                "periodCount": case(
+                    (new.periodCount == 0, current.periodCount),
+                    (current.periodDate == new.periodDate, current.periodCount + new.periodCount),
+                    (new.periodCount > 0, new.periodCount),
+                    else_=0,
+                ),
+                "periodDate": case(
+                    (new.periodCount == 0, current.periodDate),
+                    else_=new.periodDate,
+                ),
+                "updatedAt": now,
+            },
+        ),
+        [{**row, "createdAt": now, "updatedAt": now} for row in rows],
+    )
+
+
+def rebuild_exception_counters(
+    session: Session,
+    company_id: Optional[UUID] = None,
+    now: Optional[datetime] = None,
+) -> int:
+    """
+    Recompute counters from Exception. Blocks concurrent counter updates on
+    PostgreSQL until the transaction ends. Changes are not committed.
+    Returns the number of counter rows written.
+    """
+    now = now or datetime.utcnow()
+    today = now.date()
+    today_start = datetime.combine(today, datetime.min.time())
+
+    if session.get_bind().dialect.name == "postgresql":
+        session.execute(text('LOCK TABLE "ExceptionCounter" IN EXCLUSIVE MODE'))
+
+    clear = delete(ExceptionCounter)
+    if company_id:
+        clear = clear.where(ExceptionCounter.companyId == company_id)
+    session.execute(clear)
+
+    # When an exception entered its current status
+    entered_at = case(
+        (ExceptionModel.status.in_(["RESOLVED", "CLOSED"]), ExceptionModel.resolvedAt),
+        (ExceptionModel.status == "OPEN", ExceptionModel.createdAt),
+        else_=ExceptionModel.updatedAt,
+    )
+    query = select(
+        ExceptionModel.companyId,
+        ExceptionModel.type,
+        ExceptionModel.severity,
+        ExceptionModel.status,
+        func.count(ExceptionModel.id),
+        func.count(case((entered_at >= today_start, 1))),
+    ).group_by(
+        ExceptionModel.companyId,
+        ExceptionModel.type,
+        ExceptionModel.severity,
+        ExceptionModel.status,
+    )
+    if company_id:
+        query = query.where(ExceptionModel.companyId == company_id)
+
+    rows = [
+        {
+            "id": uuid4(),
+            "companyId": company,
+            "type": exc_type,
+            "severity": severity,
+            "status": status,
+            "count": count,
+            "periodDate": today,
+            "periodCount": entered_today,
+            "createdAt": now,
+            "updatedAt": now,
+        }
+        for company, exc_type, severity, status, count, entered_today in session.exec(query).all()
+    ]
+    if rows:
+        session.execute(insert(ExceptionCounter), rows)
+    return len(rows)
+
+
+def exception_counter_summary(
+    session: Session,
+    company_id: Optional[UUID] = None,
+    today: Optional[date] = None,
+) -> dict:
+    """Open/in-progress/critical/resolved-today counts and open by type."""
+    today = today or datetime.utcnow().date()
+    query = select(
+        ExceptionCounter.type,
+        ExceptionCounter.severity,
+        ExceptionCounter.status,
+        func.sum(ExceptionCounter.count),
+        func.sum(case((ExceptionCounter.periodDate == today, ExceptionCounter.periodCount), else_=0)),
+    ).group_by(ExceptionCounter.type, ExceptionCounter.severity, ExceptionCounter.status)
+    if company_id:
+        query = query.where(ExceptionCounter.companyId == company_id)
+
+    summary = {"critical": 0, "open": 0, "inProgress": 0, "resolvedToday": 0, "byType": {}}
+    for exc_type, severity, status, count, entered_today in session.exec(query).all():
+        if status == "OPEN":
+            summary["open"] += count
+            if severity == "CRITICAL":
+                summary["critical"] += count
+        elif status == "IN_PROGRESS":
+            summary["inProgress"] += count
+        elif status == "RESOLVED":
+            summary["resolvedToday"] += entered_today
+        if status in ("OPEN", "IN_PROGRESS") and count:
+            summary["byType"][exc_type] = summary["byType"].get(exc_type, 0) + count
+    return summary
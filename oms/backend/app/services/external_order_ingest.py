@@ -0,0 +1,339 @@
+"""
+External Order Ingestion
+Creates a batch of orders pushed through the External Orders API with a fixed
+number of statements, however many orders the batch holds.
+
+The batch is validated up front: duplicate externalOrderIds (in the batch and
+already stored), SKUs, warehouses and customers are resolved with a few
+IN-queries. Order numbers for the accepted orders are claimed as one block,
+then new customers, orders and order items are written with one bulk INSERT
+each, in the caller's transaction. Rejected orders are reported per index and
+don't affect the rest of the batch.
+"""
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from decimal import Decimal
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+from uuid import UUID, uuid4
+
+from fastapi import status
+from sqlalchemy import insert
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.models.company import Location
+from app.models.customer import Customer
+from app.models.external_order import ExternalAddress, ExternalOrderCreate, ExternalOrderResponse
+from app.models.order import Order, OrderItem, OrderStatus
+from app.models.sku import SKU
+from app.services.document_numbers import NumberSeries, max_suffix_seed, next_numbers_async
+
+# Values per IN-list
+LOOKUP_CHUNK_SIZE = 1000
+
+
+@dataclass
+class IngestFailure:
+    """An order of the batch that was rejected."""
+    index: int
+    externalOrderId: str
+    status_code: int
+    detail: str
+
+    def as_error(self) -> dict:
+        return {
+            "index": self.index,
+            "externalOrderId": self.externalOrderId,
+            "error": self.detail,
+            "errorCode": f"HTTP_{self.status_code}",
+        }
+
+
+def order_number_series(day: datetime) -> NumberSeries:
+    """Daily order number series, e.g. ORD-20240115-0001."""
+    prefix = f"ORD-{day.strftime('%Y%m%d')}"
+    return NumberSeries(
+        name=prefix,
+        prefix=f"{prefix}-",
+        width=4,
+        seed=max_suffix_seed(Order.orderNo, f"{prefix}-"),
+    )
+
+
+def _chunks(values: Iterable, size: int = LOOKUP_CHUNK_SIZE) -> Iterable[list]:
+    values = list(values)
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+def _address_json(address: ExternalAddress, phone: Optional[str] = None) -> dict:
+    address_json = {
+        "name": address.name,
+        "line1": address.line1,
+        "line2": address.line2,
+        "city": address.city,
+        "state": address.state,
+        "pincode": address.pincode,
+        "country": address.country,
+    }
+    if phone is not None:
+        address_json["phone"] = phone
+    return address_json
+
+
+def _order_lines(order_data: ExternalOrderCreate, skus: Dict[str, SKU]) -> Tuple[List[dict], Decimal]:
+    """Order item rows (without ids) and their subtotal."""
+    lines = []
+    subtotal = Decimal("0.00")
+    for item_data in order_data.items:
+        sku = skus[item_data.sku]
+        item_total = (item_data.unitPrice * item_data.quantity) - item_data.discount
+        tax = item_total * (item_data.taxRate / 100)
+        subtotal += item_total
+        lines.append({
+            "skuId": sku.id,
+            "quantity": item_data.quantity,
+            "unitPrice": item_data.unitPrice,
+            "discount": item_data.discount,
+            "taxAmount": tax,
+            "totalPrice": item_total + tax,
+        })
+    return lines, subtotal
+
+
+def _order_amounts(order_data: ExternalOrderCreate, lines: List[dict], calculated_subtotal: Decimal) -> dict:
+    if order_data.charges:
+        charges = order_data.charges
+        return {
+            "subtotal": charges.subtotal,
+            "discount": charges.discount,
+            "shippingCharges": charges.shippingCharges,
+            "codCharges": charges.codCharges,
+            "taxAmount": charges.taxAmount,
+            "totalAmount": charges.totalAmount,
+        }
+
+    # Auto-calculate
+    cod_charges = Decimal("50.00") if order_data.paymentMode == "COD" else Decimal("0.00")
+    tax_amount = sum((Decimal(str(line["taxAmount"])) for line in lines), Decimal("0.00"))
+    return {
+        "subtotal": calculated_subtotal,
+        "discount": Decimal("0.00"),
+        "shippingCharges": Decimal("0.00"),
+        "codCharges": cod_charges,
+        "taxAmount": tax_amount,
+        "totalAmount": calculated_subtotal + cod_charges + tax_amount,
+    }
+
+
+# =============================================================================
+# LOOKUPS (one IN-query per chunk of values)
+# =============================================================================
+
+async def _existing_external_ids(
+    session: AsyncSession, company_id: UUID, external_ids: Iterable[str]
+) -> set:
+    existing = set()
+    for chunk in _chunks(set(external_ids)):
+        rows = (await session.exec(
+            select(Order.externalOrderNo, Order.channel).where(
+                Order.companyId == company_id,
+                Order.externalOrderNo.in_(chunk),
+            )
+        )).all()
+        existing.update((external_id, channel) for external_id, channel in rows)
+    return existing
+
+
+async def _skus_by_code(session: AsyncSession, company_id: UUID, codes: Iterable[str]) -> Dict[str, SKU]:
+    skus: Dict[str, SKU] = {}
+    for chunk in _chunks(set(codes)):
+        for sku in (await session.exec(
+            select(SKU).where(SKU.companyId == company_id, SKU.code.in_(chunk))
+        )).all():
+            skus.setdefault(sku.code, sku)
+    return skus
+
+
+async def _locations_by_code(
+    session: AsyncSession, company_id: UUID, codes: Iterable[str]
+) -> Dict[str, Location]:
+    locations: Dict[str, Location] = {}
+    for chunk in _chunks(set(codes)):
+        for location in (await session.exec(
+            select(Location).where(Location.companyId == company_id, Location.code.in_(chunk))
+        )).all():
+            locations.setdefault(location.code, location)
+    return locations
+
+
+async def _default_warehouse(session: AsyncSession, company_id: UUID) -> Optional[Location]:
+    return (await session.exec(
+        select(Location).where(
+            Location.companyId == company_id,
+            Location.type == "WAREHOUSE",
+        ).limit(1)
+    )).first()
+
+
+async def _customers_by_phone(
+    session: AsyncSession, company_id: UUID, phones: Iterable[str]
+) -> Dict[str, Tuple[UUID, str, Optional[str]]]:
+    """(id, name, email) of existing customers by phone."""
+    customers: Dict[str, Tuple[UUID, str, Optional[str]]] = {}
+    for chunk in _chunks(set(phones)):
+        rows = (await session.exec(
+            select(Customer.id, Customer.phone, Customer.name, Customer.email).where(
+                Customer.companyId == company_id,
+                Customer.phone.in_(chunk),
+            )
+        )).all()
+        for customer_id, phone, name, email in rows:
+            customers.setdefault(phone, (customer_id, name, email))
+    return customers
+
+
+# =============================================================================
+# INGESTION
+# =============================================================================
+
+async def ingest_external_orders(
+    session: AsyncSession,
+    company_id: UUID,
+    orders: Sequence[ExternalOrderCreate],
+) -> Tuple[List[ExternalOrderResponse], List[IngestFailure]]:
+    """
+    Validate and insert a batch of external orders. Returns the created
+    orders and the rejected ones, in batch order. Changes are not committed.
+    """
+    failures: Dict[int, IngestFailure] = {}
+
+    def reject(index: int, status_code: int, detail: str) -> None:
+        failures[index] = IngestFailure(index, orders[index].externalOrderId, status_code, detail)
+
+    # 1. Duplicates, within the batch and against stored orders
+    existing = await _existing_external_ids(session, company_id, (o.externalOrderId for o in orders))
+    seen = set()
+    for index, order_data in enumerate(orders):
+        key = (order_data.externalOrderId, order_data.channel)
+        if key in existing or key in seen:
+            reject(
+                index, status.HTTP_409_CONFLICT,
+                f"Order with externalOrderId '{order_data.externalOrderId}' already exists for this channel",
+            )
+        seen.add(key)
+
+    # 2. SKUs and warehouses
+    pending = [i for i in range(len(orders)) if i not in failures]
+    skus = await _skus_by_code(
+        session, company_id, (item.sku for i in pending for item in orders[i].items)
+    )
+    for index in pending:
+        missing = next((item.sku for item in orders[index].items if item.sku not in skus), None)
+        if missing:
+            reject(index, status.HTTP_400_BAD_REQUEST, f"SKU not found: {missing}")
+
+    pending = [i for i in pending if i not in failures]
+    locations = await _locations_by_code(
+        session, company_id,
+        (orders[i].preferredWarehouse for i in pending if orders[i].preferredWarehouse),
+    )
+    default_location = None
+    if any(orders[i].preferredWarehouse not in locations for i in pending):
+        default_location = await _default_warehouse(session, company_id)
+    order_locations: Dict[int, UUID] = {}
+    for index in pending:
+        location = locations.get(orders[index].preferredWarehouse) or default_location
+        if not location:
+            reject(index, status.HTTP_400_BAD_REQUEST, "No warehouse configured. Please contact admin.")
+        else:
+            order_locations[index] = location.id
+
+    accepted = [i for i in pending if i not in failures]
+    if not accepted:
+        return [], [failures[i] for i in sorted(failures)]
+
+    # 3. Customers: existing by phone; the first order of a new phone creates it
+    customers = await _customers_by_phone(
+        session, company_id, (orders[i].customer.phone for i in accepted)
+    )
+    new_customers = []
+    for index in accepted:
+        order_data = orders[index]
+        phone = order_data.customer.phone
+        if phone in customers:
+            continue
+        customer_id = uuid4()
+        customers[phone] = (customer_id, order_data.customer.name, order_data.customer.email)
+        new_customers.append({
+            "id": customer_id,
+            "code": f"EXT-{phone}",
+            "name": order_data.customer.name,
+            "email": order_data.customer.email,
+            "phone": phone,
+            "billingAddress": (order_data.billingAddress or order_data.shippingAddress).model_dump(),
+            "companyId": company_id,
+        })
+
+    # 4. Order numbers, claimed as one block before the first write so the
+    # transaction isn't held open while the block is claimed
+    now = datetime.now(timezone.utc)
+    order_numbers = await next_numbers_async(order_number_series(now), len(accepted))
+
+    # 5. Rows
+    order_rows, item_rows, created = [], [], []
+    for index, order_no in zip(accepted, order_numbers):
+        order_data = orders[index]
+        customer_id, customer_name, customer_email = customers[order_data.customer.phone]
+        customer_phone = order_data.customer.phone
+        lines, calculated_subtotal = _order_lines(order_data, skus)
+        order_id = uuid4()
+
+        order_rows.append({
+            "id": order_id,
+            "orderNo": order_no,
+            "externalOrderNo": order_data.externalOrderId,
+            "channel": order_data.channel,
+            "status": OrderStatus.CREATED,
+            "paymentMode": order_data.paymentMode,
+            "orderDate": order_data.orderDate or now,
+            "customerId": customer_id,
+            "customerName": customer_name,
+            "customerEmail": customer_email,
+            "customerPhone": customer_phone,
+            "shippingAddress": _address_json(
+                order_data.shippingAddress, order_data.shippingAddress.phone or customer_phone
+            ),
+            "billingAddress": _address_json(order_data.billingAddress or order_data.shippingAddress),
+            **_order_amounts(order_data, lines, calculated_subtotal),
+            "remarks": order_data.notes,
+            "tags": order_data.tags or [],
+            "priority": 1 if order_data.isPriority else 0,
+            "locationId": order_locations[index],
+            "companyId": company_id,
+            "createdAt": now,
+            "updatedAt": now,
+        })
+        item_rows.extend(
+            {**line, "id": uuid4(), "orderId": order_id, "createdAt": now, "updatedAt": now}
+            for line in lines
+        )
+        created.append(ExternalOrderResponse(
+            success=True,
+            orderId=order_id,
+            orderNo=order_no,
+            externalOrderId=order_data.externalOrderId,
+            status=OrderStatus.CREATED,
+            message="Order created successfully",
+            createdAt=now,
+        ))
+
+    # 6. Bulk inserts
+    if new_customers:
+        await session.execute(
+            insert(Customer), [{**row, "createdAt": now, "updatedAt": now} for row in new_customers]
+        )
+    await session.execute(insert(Order), order_rows)
+    await session.execute(insert(OrderItem), item_rows)
+
+    return created, [failures[i] for i in sorted(failures)]
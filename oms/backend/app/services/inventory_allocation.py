@@ -4,19 +4,43 @@ Implements FIFO/LIFO/FEFO allocation strategies for inventory picking
 """
 from datetime import datetime
 from decimal import Decimal
-from typing import List, Optional, Tuple
-from uuid import UUID
+from typing import Dict, Iterable, List, Optional, Tuple
+from uuid import UUID, uuid4
 
+from sqlalchemy import case, tuple_, update
 from sqlmodel import Session, select, func
 
 from app.models import (
-    Inventory, SKU, Bin, Zone, Location, Company,
+    Inventory, SKU, Bin, Zone, Company,
     InventoryAllocation, InventoryAllocationBrief,
     AllocationRequest, AllocationResult,
     BulkAllocationRequest, BulkAllocationResult,
     ChannelInventory, Order,
 )
+from app.services.document_numbers import (
+    NumberSeries, max_suffix_seed, next_number, next_numbers,
+)
 from app.services.fifo_sequence import FifoSequenceService
+from app.services.reservation_ledger import (
+    Lot, Reservation, lot_columns, reservation_ledger, sort_lots,
+)
+from app.services.valuation_policy import valuation_policy
+
+# (sku, location) pairs per prefetch query in batch allocation
+PREFETCH_BATCH_SIZE = 500
+
+ALLOCATION_SERIES = NumberSeries(
+    name="ALLOC",
+    prefix="ALLOC-",
+    width=8,
+    seed=max_suffix_seed(InventoryAllocation.allocationNo, "ALLOC-"),
+    block_size=100,
+)
+
+
+def _released(reserved_column, qty: int):
+    """reservedQty - qty, floored at zero, as a SQL expression."""
+    return case((reserved_column > qty, reserved_column - qty), else_=0)
 
 
 class InventoryAllocationService:
@@ -31,10 +55,11 @@ class InventoryAllocationService:
 
     def generate_allocation_no(self) -> str:
         """Generate unique allocation number."""
-        count = self.session.exec(
-            select(func.count(InventoryAllocation.id))
-        ).one()
-        return f"ALLOC-{count + 1:08d}"
+        return next_number(self.session, ALLOCATION_SERIES)
+
+    def generate_allocation_numbers(self, n: int) -> List[str]:
+        """Generate n unique allocation numbers."""
+        return next_numbers(self.session, ALLOCATION_SERIES, n)
 
     def get_valuation_method(
         self,
@@ -44,127 +69,22 @@ class InventoryAllocationService:
     ) -> str:
         """
         Determine the valuation method to use for allocation.
-        Priority: SKU override > Location override > Company default
-        Falls back to FIFO if no overrides are set or if columns don't exist.
+        Priority: SKU override > Location override > FIFO.
+        Company.defaultValuationMethod is optional and may not be migrated,
+        so it is not consulted. Resolved through the cached policy resolver.
         """
-        try:
-            # Check SKU override
-            sku = self.session.exec(
-                select(SKU).where(SKU.id == sku_id)
-            ).first()
-            if sku and hasattr(sku, 'valuationMethod') and sku.valuationMethod:
-                return sku.valuationMethod
-        except Exception:
-            pass  # Column might not exist
-
-        try:
-            # Check Location override
-            location = self.session.exec(
-                select(Location).where(Location.id == location_id)
-            ).first()
-            if location and hasattr(location, 'valuationMethod') and location.valuationMethod:
-                return location.valuationMethod
-        except Exception:
-            pass  # Column might not exist
-
-        # Skip Company query as the column may not exist in database
-        # Company.defaultValuationMethod is optional and may not be migrated
-
-        # Ultimate fallback - FIFO is the industry standard
-        return "FIFO"
+        return valuation_policy.resolve(self.session, sku_id, location_id, company_id)
 
-    def get_available_inventory(
+    def get_valuation_methods(
         self,
-        sku_id: UUID,
-        location_id: UUID,
-        valuation_method: str,
-        preferred_bin_id: Optional[UUID] = None
-    ) -> List[Inventory]:
-        """
-        Get available inventory records ordered by valuation method.
-        - FIFO: Order by fifoSequence ASC (oldest first)
-        - LIFO: Order by fifoSequence DESC (newest first)
-        - FEFO: Order by expiryDate ASC (earliest expiry first)
-        """
-        # Base query for available inventory
-        query = (
-            select(Inventory)
-            .where(Inventory.skuId == sku_id)
-            .where(Inventory.locationId == location_id)
-            .where((Inventory.quantity - Inventory.reservedQty) > 0)
-        )
-
-        # Prefer specific bin if provided
-        if preferred_bin_id:
-            # Get inventory from preferred bin first, then others
-            preferred = self.session.exec(
-                query.where(Inventory.binId == preferred_bin_id)
-            ).all()
-            others = self.session.exec(
-                query.where(Inventory.binId != preferred_bin_id)
-            ).all()
-            inventory_records = list(preferred) + list(others)
-        else:
-            inventory_records = list(self.session.exec(query).all())
-
-        # Sort by valuation method
-        if valuation_method == "FIFO":
-            inventory_records.sort(key=lambda x: x.fifoSequence or 0)
-        elif valuation_method == "LIFO":
-            inventory_records.sort(key=lambda x: x.fifoSequence or 0, reverse=True)
-        elif valuation_method == "FEFO":
-            # Sort by expiry date (earliest first), nulls last
-            inventory_records.sort(
-                key=lambda x: (x.expiryDate is None, x.expiryDate or datetime.max)
-            )
-        # WAC doesn't require specific ordering, use FIFO as default
-
-        return inventory_records
-
-    def get_channel_inventory(
-        self,
-        sku_id: UUID,
-        location_id: UUID,
-        channel: str,
-        valuation_method: str,
-        preferred_bin_id: Optional[UUID] = None
-    ) -> List[ChannelInventory]:
+        pairs: Iterable[Tuple[UUID, UUID]],
+        company_id: UUID
+    ) -> Dict[Tuple[UUID, UUID], str]:
         """
-        Get channel-specific inventory records ordered by valuation method.
-        Used for channel-wise allocation before falling back to general inventory.
+        Batch version of get_valuation_method for (sku, location) pairs;
+        pairs not cached yet are resolved in one query.
         """
-        # Base query for available channel inventory
-        query = (
-            select(ChannelInventory)
-            .where(ChannelInventory.skuId == sku_id)
-            .where(ChannelInventory.locationId == location_id)
-            .where(ChannelInventory.channel == channel)
-            .where((ChannelInventory.quantity - ChannelInventory.reservedQty) > 0)
-        )
-
-        # Prefer specific bin if provided
-        if preferred_bin_id:
-            preferred = self.session.exec(
-                query.where(ChannelInventory.binId == preferred_bin_id)
-            ).all()
-            others = self.session.exec(
-                query.where(ChannelInventory.binId != preferred_bin_id)
-            ).all()
-            channel_records = list(preferred) + list(others)
-        else:
-            channel_records = list(self.session.exec(query).all())
-
-        # Sort by valuation method
-        if valuation_method == "FIFO":
-            channel_records.sort(key=lambda x: x.fifoSequence or 0)
-        elif valuation_method == "LIFO":
-            channel_records.sort(key=lambda x: x.fifoSequence or 0, reverse=True)
-        elif valuation_method == "FEFO":
-            channel_records.sort(
-                key=lambda x: (x.expiryDate is None, x.expiryDate or datetime.max)
-            )
-
-        return channel_records
+        return valuation_policy.resolve_many(self.session, pairs, company_id)
 
     def get_order_channel(self, order_id: Optional[UUID]) -> Optional[str]:
         """Get channel from order if order_id is provided."""
@@ -179,6 +99,19 @@ class InventoryAllocationService:
             return channel.value if hasattr(channel, 'value') else str(channel)
         return None
 
+    def get_order_channels(self, order_ids: Iterable[UUID]) -> Dict[UUID, str]:
+        """Get the channel of each order in one query."""
+        order_ids = set(order_ids)
+        if not order_ids:
+            return {}
+        return {
+            order_id: channel.value if hasattr(channel, 'value') else str(channel)
+            for order_id, channel in self.session.exec(
+                select(Order.id, Order.channel).where(Order.id.in_(order_ids))
+            ).all()
+            if channel
+        }
+
     def allocate_from_channel_inventory(
         self,
         sku_id: UUID,
@@ -187,35 +120,16 @@ class InventoryAllocationService:
         required_qty: int,
         valuation_method: str,
         preferred_bin_id: Optional[UUID] = None
-    ) -> Tuple[int, List[ChannelInventory]]:
+    ) -> Tuple[int, List[Reservation]]:
         """
         Allocate from channel-specific inventory.
-        Returns (allocated_qty, list of channel_inventory records used)
+        Returns (allocated_qty, list of reservations made)
         """
-        channel_inventory = self.get_channel_inventory(
-            sku_id, location_id, channel, valuation_method, preferred_bin_id
+        reservations = reservation_ledger.reserve(
+            self.session, ChannelInventory, sku_id, location_id, required_qty,
+            valuation_method, preferred_bin_id, channel=channel
         )
-
-        allocated_qty = 0
-        used_records = []
-
-        for ch_inv in channel_inventory:
-            if required_qty <= 0:
-                break
-
-            available = ch_inv.quantity - ch_inv.reservedQty
-            if available <= 0:
-                continue
-
-            qty_to_reserve = min(available, required_qty)
-            ch_inv.reservedQty += qty_to_reserve
-            self.session.add(ch_inv)
-
-            allocated_qty += qty_to_reserve
-            required_qty -= qty_to_reserve
-            used_records.append(ch_inv)
-
-        return (allocated_qty, used_records)
+        return (sum(r.qty for r in reservations), reservations)
 
     def allocate_inventory(
         self,
@@ -231,6 +145,9 @@ class InventoryAllocationService:
         1. First allocate from channel-specific inventory (based on order's channel)
         2. Then from UNALLOCATED channel pool
         3. Finally from general inventory if needed
+
+        Lots come from the in-process reservation ledger; each reservation is
+        a guarded UPDATE, so concurrent allocations cannot over-reserve.
         """
         # Determine valuation method
         valuation_method = request.valuationMethod or self.get_valuation_method(
@@ -244,118 +161,111 @@ class InventoryAllocationService:
         # Get order channel if order_id is provided
         order_channel = self.get_order_channel(request.orderId)
 
-        # ================================================================
-        # STEP 1: Try to allocate from channel-specific inventory first
-        # ================================================================
-        if order_channel and remaining_qty > 0:
-            channel_allocated, _ = self.allocate_from_channel_inventory(
-                request.skuId,
-                request.locationId,
-                order_channel,
-                remaining_qty,
-                valuation_method,
-                request.preferredBinId
-            )
-            allocated_qty += channel_allocated
-            remaining_qty -= channel_allocated
-
-        # ================================================================
-        # STEP 2: Try UNALLOCATED channel pool if still need more
-        # ================================================================
-        if remaining_qty > 0:
-            unalloc_allocated, _ = self.allocate_from_channel_inventory(
-                request.skuId,
-                request.locationId,
-                "UNALLOCATED",
-                remaining_qty,
-                valuation_method,
-                request.preferredBinId
-            )
-            allocated_qty += unalloc_allocated
-            remaining_qty -= unalloc_allocated
-
-        # ================================================================
-        # STEP 3: Allocate from general inventory (unified pool)
-        # ================================================================
-        # Get available inventory from unified Inventory table
-        available_inventory = self.get_available_inventory(
-            request.skuId,
-            request.locationId,
-            valuation_method,
-            request.preferredBinId
-        )
-
-        for inventory in available_inventory:
-            if remaining_qty <= 0:
-                break
-
-            available = inventory.quantity - inventory.reservedQty
-            if available <= 0:
-                continue
-
-            # Determine how much to allocate from this inventory record
-            qty_to_allocate = min(available, remaining_qty)
-
-            # Create allocation record
-            allocation = InventoryAllocation(
-                allocationNo=self.generate_allocation_no(),
-                orderId=request.orderId,
-                orderItemId=request.orderItemId,
-                waveId=request.waveId,
-                picklistId=request.picklistId,
-                picklistItemId=request.picklistItemId,
-                skuId=request.skuId,
-                inventoryId=inventory.id,
-                binId=inventory.binId,
-                batchNo=inventory.batchNo,
-                lotNo=inventory.lotNo,
-                allocatedQty=qty_to_allocate,
-                valuationMethod=valuation_method,
-                fifoSequence=inventory.fifoSequence,
-                expiryDate=inventory.expiryDate,
-                costPrice=inventory.costPrice,
-                status="ALLOCATED",
-                allocatedById=allocated_by_id,
-                allocatedAt=datetime.utcnow(),
-                locationId=request.locationId,
-                companyId=company_id,
-            )
-            self.session.add(allocation)
-
-            # Update reserved quantity on inventory
-            inventory.reservedQty += qty_to_allocate
-            self.session.add(inventory)
-
-            # Track allocation
-            allocated_qty += qty_to_allocate
-            remaining_qty -= qty_to_allocate
-
-            # Get bin code for response
-            bin_obj = self.session.exec(
-                select(Bin).where(Bin.id == inventory.binId)
-            ).first()
-
-            # Get SKU code for response
-            sku_obj = self.session.exec(
-                select(SKU).where(SKU.id == request.skuId)
-            ).first()
-
-            allocations.append(InventoryAllocationBrief(
-                id=allocation.id,
-                allocationNo=allocation.allocationNo,
-                skuId=allocation.skuId,
-                skuCode=sku_obj.code if sku_obj else None,
-                binId=allocation.binId,
-                binCode=bin_obj.code if bin_obj else None,
-                allocatedQty=allocation.allocatedQty,
-                pickedQty=0,
-                status=allocation.status,
-                valuationMethod=allocation.valuationMethod,
-                fifoSequence=allocation.fifoSequence,
-            ))
-
-        # Commit changes
-        self.session.commit()
+        try:
+            # ================================================================
+            # STEP 1: Try to allocate from channel-specific inventory first
+            # ================================================================
+            if order_channel and remaining_qty > 0:
+                channel_allocated, _ = self.allocate_from_channel_inventory(
+                    request.skuId,
+                    request.locationId,
+                    order_channel,
+                    remaining_qty,
+                    valuation_method,
+                    request.preferredBinId
+                )
+                allocated_qty += channel_allocated
+                remaining_qty -= channel_allocated
+
+            # ================================================================
+            # STEP 2: Try UNALLOCATED channel pool if still need more
+            # ================================================================
+            if remaining_qty > 0:
+                unalloc_allocated, _ = self.allocate_from_channel_inventory(
+                    request.skuId,
+                    request.locationId,
+                    "UNALLOCATED",
+                    remaining_qty,
+                    valuation_method,
+                    request.preferredBinId
+                )
+                allocated_qty += unalloc_allocated
+                remaining_qty -= unalloc_allocated
+
+            # ================================================================
+            # STEP 3: Allocate from general inventory (unified pool)
+            # ================================================================
+            reservations = []
+            if remaining_qty > 0:
+                reservations = reservation_ledger.reserve(
+                    self.session, Inventory, request.skuId, request.locationId,
+                    remaining_qty, valuation_method, request.preferredBinId
+                )
+
+            # Codes for the response, looked up once per request
+            sku_code = None
+            bin_codes = {}
+            if reservations:
+                sku_code = self.session.exec(
+                    select(SKU.code).where(SKU.id == request.skuId)
+                ).first()
+                bin_ids = {r.lot.binId for r in reservations}
+                bin_codes = dict(self.session.exec(
+                    select(Bin.id, Bin.code).where(Bin.id.in_(bin_ids))
+                ).all())
+
+            now = datetime.utcnow()
+            for reservation in reservations:
+                lot = reservation.lot
+                allocation = InventoryAllocation(
+                    allocationNo=self.generate_allocation_no(),
+                    orderId=request.orderId,
+                    orderItemId=request.orderItemId,
+                    waveId=request.waveId,
+                    picklistId=request.picklistId,
+                    picklistItemId=request.picklistItemId,
+                    skuId=request.skuId,
+                    inventoryId=lot.id,
+                    binId=lot.binId,
+                    batchNo=lot.batchNo,
+                    lotNo=lot.lotNo,
+                    allocatedQty=reservation.qty,
+                    valuationMethod=valuation_method,
+                    fifoSequence=lot.fifoSequence,
+                    expiryDate=lot.expiryDate,
+                    costPrice=lot.costPrice,
+                    status="ALLOCATED",
+                    allocatedById=allocated_by_id,
+                    allocatedAt=now,
+                    locationId=request.locationId,
+                    companyId=company_id,
+                )
+                self.session.add(allocation)
+
+                allocated_qty += reservation.qty
+                remaining_qty -= reservation.qty
+
+                allocations.append(InventoryAllocationBrief(
+                    id=allocation.id,
+                    allocationNo=allocation.allocationNo,
+                    skuId=allocation.skuId,
+                    skuCode=sku_code,
+                    binId=allocation.binId,
+                    binCode=bin_codes.get(allocation.binId),
+                    allocatedQty=allocation.allocatedQty,
+                    pickedQty=0,
+                    status=allocation.status,
+                    valuationMethod=allocation.valuationMethod,
+                    fifoSequence=allocation.fifoSequence,
+                ))
+
+            # Commit changes
+            self.session.commit()
+        except Exception:
+            # The ledger already counted these reservations
+            self.session.rollback()
+            reservation_ledger.invalidate(request.skuId, request.locationId)
+            raise
 
         shortfall = request.requiredQty - allocated_qty
         return AllocationResult(
@@ -368,6 +278,226 @@ class InventoryAllocationService:
             message=None if shortfall == 0 else f"Shortfall of {shortfall} units"
         )
 
+    def _prefetch_lots(
+        self,
+        Model,
+        pairs: Iterable[Tuple[UUID, UUID]],
+        channels: Optional[Iterable[str]] = None
+    ) -> Dict[Tuple[UUID, UUID, Optional[str]], List[Lot]]:
+        """
+        Load the allocatable lots of every (sku, location) pair, keyed by
+        (sku, location, channel). Rows are locked (FOR UPDATE, in id order)
+        so the in-memory allocation is authoritative for this transaction.
+        """
+        pairs = sorted(pairs)
+        extra = [Model.channel] if channels is not None else []
+        lots: Dict[Tuple[UUID, UUID, Optional[str]], List[Lot]] = {}
+
+        for start in range(0, len(pairs), PREFETCH_BATCH_SIZE):
+            query = (
+                select(Model.skuId, Model.locationId, *extra, *lot_columns(Model))
+                .where(tuple_(Model.skuId, Model.locationId).in_(pairs[start:start + PREFETCH_BATCH_SIZE]))
+                .where((Model.quantity - Model.reservedQty) > 0)
+                .order_by(Model.id)
+                .with_for_update()
+            )
+            if channels is not None:
+                query = query.where(Model.channel.in_(set(channels)))
+
+            for row in self.session.exec(query).all():
+                channel = row[2] if extra else None
+                lots.setdefault((row[0], row[1], channel), []).append(
+                    Lot(*row[2 + len(extra):])
+                )
+        return lots
+
+    @staticmethod
+    def _take(
+        lots: List[Lot],
+        required_qty: int,
+        preferred_bin_id: Optional[UUID],
+        touched: Dict[UUID, Lot]
+    ) -> List[Reservation]:
+        """Reserve up to required_qty from lots already in consumption order."""
+        if preferred_bin_id:
+            lots = sorted(lots, key=lambda lot: lot.binId != preferred_bin_id)
+
+        reservations = []
+        for lot in lots:
+            if required_qty <= 0:
+                break
+            qty = min(lot.available, required_qty)
+            if qty <= 0:
+                continue
+            lot.reservedQty += qty
+            touched[lot.id] = lot
+            reservations.append(Reservation(lot=lot, qty=qty))
+            required_qty -= qty
+        return reservations
+
+    def allocate_batch(
+        self,
+        requests: List[AllocationRequest],
+        company_id: UUID,
+        allocated_by_id: Optional[UUID] = None,
+        commit: bool = True
+    ) -> List[AllocationResult]:
+        """
+        Allocate many lines (a wave, an order or a bulk request) at once.
+
+        Inventory and channel inventory for every distinct (sku, location)
+        are prefetched and locked up front, lines are allocated in memory in
+        the given (priority) order with the same channel priority as
+        allocate_inventory, and all reservedQty changes and InventoryAllocation
+        rows are written together. Commits unless commit=False, in which case
+        the caller owns the transaction. Results are in request order.
+        """
+        if not requests:
+            return []
+
+        pairs = {(r.skuId, r.locationId) for r in requests}
+        valuation_methods = self.get_valuation_methods(
+            {(r.skuId, r.locationId) for r in requests if not r.valuationMethod}, company_id
+        )
+        order_channels = self.get_order_channels(r.orderId for r in requests if r.orderId)
+
+        channel_lots = self._prefetch_lots(
+            ChannelInventory, pairs, set(order_channels.values()) | {"UNALLOCATED"}
+        )
+        inventory_lots = self._prefetch_lots(Inventory, pairs)
+
+        # Lots sorted once per (sku, location, channel, method)
+        ordered: Dict[tuple, List[Lot]] = {}
+
+        def lots_for(source, key, method):
+            if (key, method) not in ordered:
+                ordered[(key, method)] = sort_lots(source.get(key, []), method)
+            return ordered[(key, method)]
+
+        touched = {ChannelInventory: {}, Inventory: {}}
+        planned = []
+        now = datetime.utcnow()
+
+        for request in requests:
+            valuation_method = (
+                request.valuationMethod
+                or valuation_methods[(request.skuId, request.locationId)]
+            )
+            remaining_qty = request.requiredQty
+            allocated_qty = 0
+
+            # Channel-specific inventory, then the UNALLOCATED pool
+            for channel in (order_channels.get(request.orderId), "UNALLOCATED"):
+                if not channel or remaining_qty <= 0:
+                    continue
+                key = (request.skuId, request.locationId, channel)
+                taken = sum(r.qty for r in self._take(
+                    lots_for(channel_lots, key, valuation_method),
+                    remaining_qty, request.preferredBinId, touched[ChannelInventory]
+                ))
+                allocated_qty += taken
+                remaining_qty -= taken
+
+            # General inventory
+            allocations = []
+            key = (request.skuId, request.locationId, None)
+            for reservation in self._take(
+                lots_for(inventory_lots, key, valuation_method),
+                remaining_qty, request.preferredBinId, touched[Inventory]
+            ):
+                lot = reservation.lot
+                allocations.append(InventoryAllocation(
+                    id=uuid4(),
+                    orderId=request.orderId,
+                    orderItemId=request.orderItemId,
+                    waveId=request.waveId,
+                    picklistId=request.picklistId,
+                    picklistItemId=request.picklistItemId,
+                    skuId=request.skuId,
+                    inventoryId=lot.id,
+                    binId=lot.binId,
+                    batchNo=lot.batchNo,
+                    lotNo=lot.lotNo,
+                    allocatedQty=reservation.qty,
+                    valuationMethod=valuation_method,
+                    fifoSequence=lot.fifoSequence,
+                    expiryDate=lot.expiryDate,
+                    costPrice=lot.costPrice,
+                    status="ALLOCATED",
+                    allocatedById=allocated_by_id,
+                    allocatedAt=now,
+                    locationId=request.locationId,
+                    companyId=company_id,
+                ))
+                allocated_qty += reservation.qty
+                remaining_qty -= reservation.qty
+
+            planned.append((request, allocated_qty, allocations))
+
+        all_allocations = [a for _, _, allocations in planned for a in allocations]
+        for allocation, allocation_no in zip(
+            all_allocations, self.generate_allocation_numbers(len(all_allocations))
+        ):
+            allocation.allocationNo = allocation_no
+
+        try:
+            for Model, lots in touched.items():
+                if lots:
+                    self.session.execute(update(Model), [
+                        {"id": lot.id, "reservedQty": lot.reservedQty, "updatedAt": now}
+                        for lot in lots.values()
+                    ])
+            self.session.add_all(all_allocations)
+            self.session.flush()
+            if commit:
+                self.session.commit()
+        except Exception:
+            if commit:
+                self.session.rollback()
+            raise
+        finally:
+            # Ledger entries for these keys no longer match the rows
+            for sku_id, location_id in pairs:
+                reservation_ledger.invalidate(sku_id, location_id)
+
+        # Codes for the response, looked up once per batch
+        sku_codes = dict(self.session.exec(
+            select(SKU.id, SKU.code).where(SKU.id.in_({sku_id for sku_id, _ in pairs}))
+        ).all())
+        bin_ids = {a.binId for a in all_allocations}
+        bin_codes = dict(self.session.exec(
+            select(Bin.id, Bin.code).where(Bin.id.in_(bin_ids))
+        ).all()) if bin_ids else {}
+
+        results = []
+        for request, allocated_qty, allocations in planned:
+            shortfall = request.requiredQty - allocated_qty
+            results.append(AllocationResult(
+                success=shortfall == 0,
+                skuId=request.skuId,
+                requestedQty=request.requiredQty,
+                allocatedQty=allocated_qty,
+                shortfallQty=shortfall,
+                allocations=[
+                    InventoryAllocationBrief(
+                        id=a.id,
+                        allocationNo=a.allocationNo,
+                        skuId=a.skuId,
+                        skuCode=sku_codes.get(a.skuId),
+                        binId=a.binId,
+                        binCode=bin_codes.get(a.binId),
+                        allocatedQty=a.allocatedQty,
+                        pickedQty=0,
+                        status=a.status,
+                        valuationMethod=a.valuationMethod,
+                        fifoSequence=a.fifoSequence,
+                    )
+                    for a in allocations
+                ],
+                message=None if shortfall == 0 else f"Shortfall of {shortfall} units"
+            ))
+        return results
+
     def bulk_allocate(
         self,
         request: BulkAllocationRequest,
@@ -375,12 +505,8 @@ class InventoryAllocationService:
         allocated_by_id: Optional[UUID] = None
     ) -> BulkAllocationResult:
         """
-        Allocate inventory for multiple SKUs at once.
+        Allocate inventory for multiple SKUs at once, in one transaction.
         """
-        results: List[AllocationResult] = []
-        total_requested = 0
-        total_allocated = 0
-
         for item in request.items:
             # Override location from bulk request
             item.locationId = request.locationId
@@ -389,10 +515,9 @@ class InventoryAllocationService:
             if request.waveId and not item.waveId:
                 item.waveId = request.waveId
 
-            result = self.allocate_inventory(item, company_id, allocated_by_id)
-            results.append(result)
-            total_requested += result.requestedQty
-            total_allocated += result.allocatedQty
+        results = self.allocate_batch(request.items, company_id, allocated_by_id)
+        total_requested = sum(r.requestedQty for r in results)
+        total_allocated = sum(r.allocatedQty for r in results)
 
         total_shortfall = total_requested - total_allocated
         return BulkAllocationResult(
@@ -426,14 +551,17 @@ class InventoryAllocationService:
         if allocation.status == "PICKED":
             return False  # Cannot deallocate picked inventory
 
-        # Restore reserved quantity on inventory
-        inventory = self.session.exec(
-            select(Inventory).where(Inventory.id == allocation.inventoryId)
-        ).first()
-
-        if inventory:
-            inventory.reservedQty = max(0, inventory.reservedQty - allocation.allocatedQty)
-            self.session.add(inventory)
+        # Restore reserved quantity on inventory (in SQL, so concurrent
+        # reservations on the same row are not overwritten)
+        self.session.execute(
+            update(Inventory)
+            .where(Inventory.id == allocation.inventoryId)
+            .values(
+                reservedQty=_released(Inventory.reservedQty, allocation.allocatedQty),
+                updatedAt=datetime.utcnow(),
+            )
+            .execution_options(synchronize_session=False)
+        )
 
         # Update allocation status
         allocation.status = "CANCELLED"
@@ -442,6 +570,7 @@ class InventoryAllocationService:
         self.session.add(allocation)
 
         self.session.commit()
+        reservation_ledger.invalidate(allocation.skuId, allocation.locationId)
         return True
 
     def deallocate_by_order(
@@ -508,22 +637,23 @@ class InventoryAllocationService:
         if allocation.status != "ALLOCATED":
             return False
 
-        # Get inventory record
-        inventory = self.session.exec(
-            select(Inventory).where(Inventory.id == allocation.inventoryId)
-        ).first()
-
-        if not inventory:
-            return False
-
         # Validate picked quantity
         if picked_qty > allocation.allocatedQty:
             picked_qty = allocation.allocatedQty
 
         # Update inventory - reduce quantity and reserved
-        inventory.quantity -= picked_qty
-        inventory.reservedQty = max(0, inventory.reservedQty - allocation.allocatedQty)
-        self.session.add(inventory)
+        result = self.session.execute(
+            update(Inventory)
+            .where(Inventory.id == allocation.inventoryId)
+            .values(
+                quantity=Inventory.quantity - picked_qty,
+                reservedQty=_released(Inventory.reservedQty, allocation.allocatedQty),
+                updatedAt=datetime.utcnow(),
+            )
+            .execution_options(synchronize_session=False)
+        )
+        if result.rowcount == 0:
+            return False
 
         # Update allocation
         allocation.pickedQty = picked_qty
@@ -533,6 +663,7 @@ class InventoryAllocationService:
         self.session.add(allocation)
 
         self.session.commit()
+        reservation_ledger.invalidate(allocation.skuId, allocation.locationId)
         return True
 
     def get_allocations_by_order(self, order_id: UUID) -> List[InventoryAllocation]:
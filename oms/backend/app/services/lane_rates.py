@@ -0,0 +1,310 @@
+"""
+Lane Rate Index
+Active PTL rate/TAT matrices and FTL lane rates per company, held in memory
+keyed by normalized (origin city, destination city), so rate comparisons run
+without database queries.
+
+Each lane keeps its rate rows as NumPy arrays: PTL weight slabs are a
+(rows x slabs) matrix with NaN for unconfigured slabs, so the cost of every
+transporter on a lane is computed in one vectorized step. Validity windows are
+stored with the rows and applied at query time.
+
+A company's index lives in a CompanyIndexCache: built on first use and
+rebuilt after the PTL/FTL APIs change its rate rows (or the vendors and
+vehicle types the FTL rows name).
+"""
+import re
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+from uuid import UUID
+
+import numpy as np
+from sqlmodel import Session, select
+
+from app.core.config import settings
+from app.models import (
+    FTLLaneRate, FTLVehicleTypeMaster, FTLVendor,
+    PTLRateMatrix, PTLTATMatrix, Transporter,
+)
+from app.services.company_index import CompanyIndexCache
+
+# Upper bounds (kg) of the PTL weight slabs; the last slab is open-ended
+PTL_SLAB_LIMITS = np.array([50, 100, 250, 500, 1000], dtype=np.float64)
+PTL_SLAB_COLUMNS = ("rate0to50", "rate50to100", "rate100to250", "rate250to500", "rate500to1000", "rate1000plus")
+PTL_SLAB_LABELS = ("0-50 kg", "50-100 kg", "100-250 kg", "250-500 kg", "500-1000 kg", "1000+ kg")
+
+LaneKey = Tuple[str, str]
+
+
+def normalize_city(city: str) -> str:
+    return re.sub(r"\s+", " ", (city or "").strip().lower())
+
+
+def _epoch(value: Optional[datetime], default: float) -> float:
+    if value is None:
+        return default
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
+
+
+def _num(value) -> float:
+    return float(value) if value is not None else np.nan
+
+
+@dataclass
+class PTLLane:
+    """PTL rate rows of one lane."""
+    ids: List[UUID]
+    transporter_ids: List[UUID]
+    slabs: np.ndarray          # (rows x 6) rate per kg, NaN if not configured
+    minimum: np.ndarray        # minimumCharge or 0
+    fod: np.ndarray
+    oda: np.ndarray
+    cod_percent: np.ndarray
+    valid_from: np.ndarray     # epoch seconds
+    valid_to: np.ndarray       # epoch seconds, inf if open-ended
+
+
+@dataclass
+class FTLLane:
+    """FTL lane rate rows of one lane."""
+    ids: List[UUID]
+    vendor_ids: List[UUID]
+    vehicle_type_ids: List[UUID]
+    base: np.ndarray
+    loading: np.ndarray
+    unloading: np.ndarray
+    toll: np.ndarray
+    transit_days: List[int]
+    valid_from: np.ndarray
+    valid_to: np.ndarray
+
+
+@dataclass
+class CompanyLaneRates:
+    ptl: Dict[LaneKey, PTLLane] = field(default_factory=dict)
+    # (origin, destination, transporterId) -> (transitDays, onTimeDeliveryPercent)
+    ptl_tat: Dict[Tuple[str, str, UUID], Tuple[int, Optional[float]]] = field(default_factory=dict)
+    transporter_names: Dict[UUID, str] = field(default_factory=dict)
+    ftl: Dict[LaneKey, FTLLane] = field(default_factory=dict)
+    # vendorId -> (name, code, reliabilityScore)
+    vendors: Dict[UUID, Tuple[str, str, Optional[float]]] = field(default_factory=dict)
+    # vehicleTypeId -> (name, capacityKg)
+    vehicle_types: Dict[UUID, Tuple[str, int]] = field(default_factory=dict)
+
+    # =========================================================================
+    # Lane matching
+    # =========================================================================
+
+    @staticmethod
+    def _lanes(lanes: dict, origin_city: str, destination_city: str) -> List[LaneKey]:
+        """The exact lane, else lanes whose cities contain the given ones."""
+        origin, destination = normalize_city(origin_city), normalize_city(destination_city)
+        if (origin, destination) in lanes:
+            return [(origin, destination)]
+        return [key for key in lanes if origin in key[0] and destination in key[1]]
+
+    # =========================================================================
+    # PTL
+    # =========================================================================
+
+    def ptl_quotes(
+        self,
+        origin_city: str,
+        destination_city: str,
+        weight_kg: float,
+        transporter_id: Optional[UUID] = None,
+        strict_slab: bool = False,
+        now: Optional[datetime] = None,
+    ) -> List[dict]:
+        """
+        Cost of every valid PTL rate row on the lane for weight_kg. The rate is
+        the weight's slab, or with strict_slab off the next configured slab
+        above it. Rows without a rate are returned with ratePerKg None.
+        """
+        at = _epoch(now or datetime.utcnow(), 0.0)
+        slab = int(np.searchsorted(PTL_SLAB_LIMITS, weight_kg, side="left"))
+        quotes = []
+        for key in self._lanes(self.ptl, origin_city, destination_city):
+            lane = self.ptl[key]
+            rows = (lane.valid_from <= at) & (lane.valid_to >= at)
+            if transporter_id:
+                rows &= np.array([t == transporter_id for t in lane.transporter_ids])
+            if not rows.any():
+                continue
+
+            if strict_slab:
+                rate = lane.slabs[:, slab]
+                slab_used = np.full(len(rate), slab)
+            else:
+                configured = ~np.isnan(lane.slabs[:, slab:])
+                slab_used = slab + configured.argmax(axis=1)
+                rate = np.where(
+                    configured.any(axis=1), lane.slabs[np.arange(len(slab_used)), slab_used], np.nan
+                )
+            base = rate * weight_kg
+            total = np.maximum(base + lane.fod + lane.oda, lane.minimum)
+
+            for i in np.flatnonzero(rows):
+                transporter = lane.transporter_ids[i]
+                tat = self.ptl_tat.get((key[0], key[1], transporter))
+                has_rate = not np.isnan(rate[i])
+                quotes.append({
+                    "rateMatrixId": str(lane.ids[i]),
+                    "transporterId": str(transporter),
+                    "transporterName": self.transporter_names.get(transporter, "Unknown"),
+                    "weightSlab": PTL_SLAB_LABELS[slab_used[i]],
+                    "ratePerKg": float(rate[i]) if has_rate else None,
+                    "weightKg": weight_kg,
+                    "baseCost": round(float(base[i]), 2) if has_rate else None,
+                    "fodCharge": float(lane.fod[i]),
+                    "odaCharge": float(lane.oda[i]),
+                    "totalCost": round(float(total[i]), 2) if has_rate else None,
+                    "minimumCharge": float(lane.minimum[i]),
+                    "minimumChargeApplied": bool(has_rate and total[i] == lane.minimum[i]),
+                    "codPercent": float(lane.cod_percent[i]),
+                    "transitDays": tat[0] if tat else None,
+                    "onTimeDeliveryPercent": tat[1] if tat else None,
+                })
+        return quotes
+
+    # =========================================================================
+    # FTL
+    # =========================================================================
+
+    def ftl_quotes(
+        self,
+        origin_city: str,
+        destination_city: str,
+        vehicle_type_id: Optional[UUID] = None,
+        now: Optional[datetime] = None,
+    ) -> List[dict]:
+        """Every valid FTL lane rate on the lane, cheapest base rate first."""
+        at = _epoch(now or datetime.utcnow(), 0.0)
+        quotes = []
+        for key in self._lanes(self.ftl, origin_city, destination_city):
+            lane = self.ftl[key]
+            rows = (lane.valid_from <= at) & (lane.valid_to >= at)
+            if vehicle_type_id:
+                rows &= np.array([v == vehicle_type_id for v in lane.vehicle_type_ids])
+            total = lane.base + lane.loading + lane.unloading + lane.toll
+
+            for i in np.flatnonzero(rows):
+                vendor = self.vendors.get(lane.vendor_ids[i])
+                vehicle_type = self.vehicle_types.get(lane.vehicle_type_ids[i])
+                quotes.append({
+                    "laneRateId": str(lane.ids[i]),
+                    "vendorId": str(lane.vendor_ids[i]),
+                    "vendorName": vendor[0] if vendor else "Unknown",
+                    "vendorCode": vendor[1] if vendor else "N/A",
+                    "vehicleTypeId": str(lane.vehicle_type_ids[i]),
+                    "vehicleTypeName": vehicle_type[0] if vehicle_type else "Unknown",
+                    "capacityKg": vehicle_type[1] if vehicle_type else 0,
+                    "baseRate": float(lane.base[i]),
+                    "loadingCharges": float(lane.loading[i]),
+                    "unloadingCharges": float(lane.unloading[i]),
+                    "tollCharges": float(lane.toll[i]),
+                    "totalRate": round(float(total[i]), 2),
+                    "transitDays": lane.transit_days[i],
+                    "reliabilityScore": vendor[2] if vendor else None,
+                })
+        quotes.sort(key=lambda q: q["baseRate"])
+        return quotes
+
+
+# =============================================================================
+# BUILD
+# =============================================================================
+
+def _group(rows, key) -> Dict[LaneKey, list]:
+    lanes: Dict[LaneKey, list] = {}
+    for row in rows:
+        lanes.setdefault(key(row), []).append(row)
+    return lanes
+
+
+def _lane_key(row) -> LaneKey:
+    return normalize_city(row.originCity), normalize_city(row.destinationCity)
+
+
+def build_company_lane_rates(session: Session, company_id: Optional[UUID] = None) -> CompanyLaneRates:
+    """Load active rate rows of a company (all companies if None)."""
+    index = CompanyLaneRates()
+
+    def scoped(query, model):
+        query = query.where(model.isActive == True)
+        return query.where(model.companyId == company_id) if company_id else query
+
+    ptl_rows = session.exec(scoped(select(PTLRateMatrix), PTLRateMatrix)).all()
+    for key, rows in _group(ptl_rows, _lane_key).items():
+        index.ptl[key] = PTLLane(
+            ids=[r.id for r in rows],
+            transporter_ids=[r.transporterId for r in rows],
+            slabs=np.array(
+                [[_num(getattr(r, column)) for column in PTL_SLAB_COLUMNS] for r in rows],
+                dtype=np.float64,
+            ),
+            minimum=np.array([float(r.minimumCharge or 0) for r in rows]),
+            fod=np.array([float(r.fodCharge or 0) for r in rows]),
+            oda=np.array([float(r.odaCharge or 0) for r in rows]),
+            cod_percent=np.array([float(r.codPercent or 0) for r in rows]),
+            valid_from=np.array([_epoch(r.validFrom, -np.inf) for r in rows]),
+            valid_to=np.array([_epoch(r.validTo, np.inf) for r in rows]),
+        )
+
+    for tat in session.exec(scoped(select(PTLTATMatrix), PTLTATMatrix)).all():
+        origin, destination = _lane_key(tat)
+        index.ptl_tat.setdefault((origin, destination, tat.transporterId), (
+            tat.transitDays,
+            float(tat.onTimeDeliveryPercent) if tat.onTimeDeliveryPercent else None,
+        ))
+
+    transporter_ids = {r.transporterId for r in ptl_rows}
+    if transporter_ids:
+        index.transporter_names = dict(session.exec(
+            select(Transporter.id, Transporter.name).where(Transporter.id.in_(transporter_ids))
+        ).all())
+
+    ftl_rows = session.exec(scoped(select(FTLLaneRate), FTLLaneRate)).all()
+    for key, rows in _group(ftl_rows, _lane_key).items():
+        index.ftl[key] = FTLLane(
+            ids=[r.id for r in rows],
+            vendor_ids=[r.vendorId for r in rows],
+            vehicle_type_ids=[r.vehicleTypeId for r in rows],
+            base=np.array([float(r.baseRate) for r in rows]),
+            loading=np.array([float(r.loadingCharges or 0) for r in rows]),
+            unloading=np.array([float(r.unloadingCharges or 0) for r in rows]),
+            toll=np.array([float(r.tollCharges or 0) for r in rows]),
+            transit_days=[r.transitDays for r in rows],
+            valid_from=np.array([_epoch(r.validFrom, -np.inf) for r in rows]),
+            valid_to=np.array([_epoch(r.validTo, np.inf) for r in rows]),
+        )
+
+    vendor_ids = {r.vendorId for r in ftl_rows}
+    if vendor_ids:
+        index.vendors = {
+            vendor_id: (name, code, float(score) if score else None)
+            for vendor_id, name, code, score in session.exec(
+                select(FTLVendor.id, FTLVendor.name, FTLVendor.code, FTLVendor.reliabilityScore)
+                .where(FTLVendor.id.in_(vendor_ids))
+            ).all()
+        }
+    vehicle_type_ids = {r.vehicleTypeId for r in ftl_rows}
+    if vehicle_type_ids:
+        index.vehicle_types = {
+            vehicle_type_id: (name, capacity or 0)
+            for vehicle_type_id, name, capacity in session.exec(
+                select(FTLVehicleTypeMaster.id, FTLVehicleTypeMaster.name, FTLVehicleTypeMaster.capacityKg)
+                .where(FTLVehicleTypeMaster.id.in_(vehicle_type_ids))
+            ).all()
+        }
+    return index
+
+
+lane_rate_index: CompanyIndexCache[CompanyLaneRates] = CompanyIndexCache(
+    build_company_lane_rates,
+    ttl_seconds=settings.LANE_RATE_INDEX_TTL_SECONDS,
+    max_keys=settings.LANE_RATE_INDEX_MAX_COMPANIES,
+)
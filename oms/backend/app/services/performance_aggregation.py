@@ -0,0 +1,581 @@
+"""
+Performance Aggregation
+Keeps CarrierPerformance, PincodePerformance and LanePerformance current from
+Delivery, Shipment and NDR outcomes without rescanning history.
+
+Each run reads only the rows updated since the source's watermark
+(PerformanceWatermark, less PERFORMANCE_WATERMARK_OVERLAP_SECONDS), in
+updatedAt order, PERFORMANCE_AGGREGATION_CHUNK_SIZE rows per transaction; a
+changed NDR re-reads its delivery. A delivery or shipment counts once it has a
+final outcome:
+    DELIVERED                                           delivered
+    RTO, RTO_INITIATED, RTO_IN_TRANSIT, RTO_DELIVERED   RTO
+in the month it shipped (was created, if it has no ship date), for its
+transporter and shipment type, destination pincode and origin-destination
+city lane. A delivered one is on time if it arrived by the order's promised
+date (a shipment's expected delivery date), and its ship-to-delivery days add
+to the transit time totals; one with an NDR counts as an NDR shipment.
+
+What each row contributes is recorded in PerformanceOutcome. Re-reading a row
+applies the difference between its new and recorded outcome, so overlapping
+reads, corrected statuses and changed ship dates move counters instead of
+counting twice. Counter changes go in with one INSERT ... ON CONFLICT DO
+UPDATE per table, then the touched buckets' rates are recomputed from their
+counters:
+    successRate       delivered / final outcomes
+    rtoRate           RTO / final outcomes
+    onTimeRate        on time / delivered with a promised date
+    avgTATDays        transit days / delivered with a ship date
+    reliabilityScore  0.60 success + 0.25 on-time (success rate without
+                      promised dates) + 0.15 first-attempt (no NDR) rate
+"""
+import logging
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from decimal import Decimal
+from typing import Dict, List, Optional, Set, Tuple
+from uuid import UUID, uuid4
+
+from sqlalchemy import and_, case, delete, func, or_, text, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlmodel import Session, select
+
+from app.core.config import settings
+from app.models import (
+    CarrierPerformance, Delivery, LanePerformance, Location, NDR, Order, PerformanceOutcome,
+    PerformanceWatermark, PincodePerformance, Shipment,
+)
+from app.models.enums import DeliveryStatus, OrderType, ShipmentType
+from app.services.carrier_allocation import performance_index
+
+logger = logging.getLogger(__name__)
+
+# Watermarked sources; NDR changes are aggregated as their deliveries
+DELIVERY_SOURCE = "DELIVERY"
+NDR_SOURCE = "NDR"
+SHIPMENT_SOURCE = "SHIPMENT"
+
+DELIVERED_STATUSES = {DeliveryStatus.DELIVERED.value}
+RTO_STATUSES = {
+    DeliveryStatus.RTO.value,
+    DeliveryStatus.RTO_INITIATED.value,
+    DeliveryStatus.RTO_IN_TRANSIT.value,
+    DeliveryStatus.RTO_DELIVERED.value,
+}
+
+COUNTERS = (
+    "totalShipments", "deliveredShipments", "rtoShipments", "onTimeShipments",
+    "lateShipments", "ndrShipments", "tatShipments", "tatDaysTotal",
+)
+
+CARRIER_KEY = ("companyId", "transporterId", "shipmentType", "periodStart")
+PINCODE_KEY = ("companyId", "pincode", "transporterId", "periodStart")
+LANE_KEY = ("companyId", "originCity", "destinationCity", "transporterId", "shipmentType", "periodStart")
+
+# Serializes aggregation transactions across processes on PostgreSQL, so two
+# runs never diff the same rows against the same ledger state
+ADVISORY_LOCK_KEY = 7_301_025
+
+SECONDS_PER_DAY = Decimal(86400)
+CENT = Decimal("0.01")
+
+
+def _value(value) -> Optional[str]:
+    """Enum value or plain string, as columns typed with an enum return either."""
+    return getattr(value, "value", value)
+
+
+def _naive(moment: Optional[datetime]) -> Optional[datetime]:
+    if moment is None or moment.tzinfo is None:
+        return moment
+    return moment.replace(tzinfo=None) - moment.utcoffset()
+
+
+def _month(moment: datetime) -> datetime:
+    return datetime(moment.year, moment.month, 1)
+
+
+def _next_month(period_start: datetime) -> datetime:
+    return datetime(period_start.year + period_start.month // 12, period_start.month % 12 + 1, 1)
+
+
+def _address_field(address, key: str) -> Optional[str]:
+    value = address.get(key) if isinstance(address, dict) else None
+    value = str(value).strip() if value is not None else ""
+    return value or None
+
+
+def _city(address) -> Optional[str]:
+    city = _address_field(address, "city")
+    return city.title()[:100] if city else None
+
+
+def _pincode(address) -> Optional[str]:
+    pincode = _address_field(address, "pincode")
+    return pincode[:10] if pincode else None
+
+
+# =============================================================================
+# OUTCOMES
+# =============================================================================
+
+@dataclass(frozen=True)
+class Outcome:
+    """What one delivery or shipment contributes to the performance tables."""
+    company_id: UUID
+    transporter_id: UUID
+    shipment_type: str
+    period_start: datetime
+    pincode: Optional[str]
+    origin_city: Optional[str]
+    destination_city: Optional[str]
+    delivered: bool
+    rto: bool
+    on_time: Optional[bool]
+    ndr: bool
+    tat_days: Optional[Decimal]
+
+    @classmethod
+    def from_ledger(cls, row) -> "Outcome":
+        return cls(
+            company_id=row.companyId,
+            transporter_id=row.transporterId,
+            shipment_type=row.shipmentType,
+            period_start=row.periodStart,
+            pincode=row.pincode,
+            origin_city=row.originCity,
+            destination_city=row.destinationCity,
+            delivered=bool(row.delivered),
+            rto=bool(row.rto),
+            on_time=None if row.onTime is None else bool(row.onTime),
+            ndr=bool(row.ndr),
+            tat_days=Decimal(row.tatDays).quantize(CENT) if row.tatDays is not None else None,
+        )
+
+    def counts(self) -> tuple:
+        """Values added to COUNTERS."""
+        return (
+            1,
+            int(self.delivered),
+            int(self.rto),
+            int(self.on_time is True),
+            int(self.on_time is False),
+            int(self.ndr),
+            int(self.tat_days is not None),
+            self.tat_days or Decimal(0),
+        )
+
+    def ledger_row(self, source_type: str, source_id: UUID, now: datetime) -> dict:
+        return {
+            "id": uuid4(),
+            "companyId": self.company_id,
+            "sourceType": source_type,
+            "sourceId": source_id,
+            "transporterId": self.transporter_id,
+            "shipmentType": self.shipment_type,
+            "periodStart": self.period_start,
+            "pincode": self.pincode,
+            "originCity": self.origin_city,
+            "destinationCity": self.destination_city,
+            "delivered": self.delivered,
+            "rto": self.rto,
+            "onTime": self.on_time,
+            "ndr": self.ndr,
+            "tatDays": self.tat_days,
+            "createdAt": now,
+            "updatedAt": now,
+        }
+
+
+def shipment_outcome(
+    company_id: UUID,
+    transporter_id: Optional[UUID],
+    status,
+    shipment_type: str,
+    shipped_at: Optional[datetime],
+    created_at: Optional[datetime],
+    delivered_at: Optional[datetime],
+    promised_at: Optional[datetime],
+    pincode: Optional[str],
+    origin_city: Optional[str],
+    destination_city: Optional[str],
+    ndr: bool,
+) -> Optional[Outcome]:
+    """The outcome of a delivery or shipment (None until it is final)."""
+    status = _value(status)
+    delivered = status in DELIVERED_STATUSES
+    shipped_at, delivered_at = _naive(shipped_at), _naive(delivered_at)
+    period = shipped_at or _naive(created_at)
+    if not transporter_id or period is None or not (delivered or status in RTO_STATUSES):
+        return None
+
+    on_time = tat_days = None
+    if delivered and delivered_at:
+        if promised_at:
+            on_time = delivered_at.date() <= _naive(promised_at).date()
+        if shipped_at:
+            seconds = max((delivered_at - shipped_at).total_seconds(), 0)
+            tat_days = (Decimal(seconds) / SECONDS_PER_DAY).quantize(CENT)
+
+    return Outcome(
+        company_id=company_id,
+        transporter_id=transporter_id,
+        shipment_type=shipment_type,
+        period_start=_month(period),
+        pincode=pincode,
+        origin_city=origin_city,
+        destination_city=destination_city,
+        delivered=delivered,
+        rto=not delivered,
+        on_time=on_time,
+        ndr=ndr,
+        tat_days=tat_days,
+    )
+
+
+class PerformanceDeltas:
+    """Counter changes per carrier, pincode and lane bucket."""
+
+    def __init__(self):
+        self.carriers: Dict[tuple, list] = {}
+        self.pincodes: Dict[tuple, list] = {}
+        self.lanes: Dict[tuple, list] = {}
+
+    def add(self, outcome: Outcome, sign: int = 1) -> None:
+        buckets = [(self.carriers, (
+            outcome.company_id, outcome.transporter_id, outcome.shipment_type, outcome.period_start,
+        ))]
+        if outcome.pincode:
+            buckets.append((self.pincodes, (
+                outcome.company_id, outcome.pincode, outcome.transporter_id, outcome.period_start,
+            )))
+        if outcome.origin_city and outcome.destination_city:
+            buckets.append((self.lanes, (
+                outcome.company_id, outcome.origin_city, outcome.destination_city,
+                outcome.transporter_id, outcome.shipment_type, outcome.period_start,
+            )))
+        counts = outcome.counts()
+        for deltas, key in buckets:
+            delta = deltas.setdefault(key, [0] * (len(COUNTERS) - 1) + [Decimal(0)])
+            for i, n in enumerate(counts):
+                delta[i] += sign * n
+
+    def move(self, old: Optional[Outcome], new: Optional[Outcome]) -> None:
+        if old:
+            self.add(old, -1)
+        if new:
+            self.add(new, 1)
+
+    def companies(self) -> Set[UUID]:
+        return {key[0] for key in self.carriers}
+
+    @staticmethod
+    def rows(deltas: Dict[tuple, list], key_columns: Tuple[str, ...], now: datetime) -> List[dict]:
+        return [
+            {
+                "id": uuid4(),
+                **dict(zip(key_columns, key)),
+                "periodEnd": _next_month(key[-1]),
+                **dict(zip(COUNTERS, delta)),
+                "createdAt": now,
+                "updatedAt": now,
+            }
+            for key, delta in deltas.items()
+            if any(delta)
+        ]
+
+
+# =============================================================================
+# COUNTER UPSERTS
+# =============================================================================
+
+def _insert(session: Session, model):
+    dialect = postgresql if session.get_bind().dialect.name == "postgresql" else sqlite
+    return dialect.insert(model)
+
+
+def _percent(part, whole):
+    return case((whole > 0, part * Decimal(100) / whole), else_=None)
+
+
+def _derived_rates(c) -> dict:
+    """Rates and reliability score of a bucket, from its counters."""
+    success = _percent(c.deliveredShipments, c.totalShipments)
+    on_time = _percent(c.onTimeShipments, c.onTimeShipments + c.lateShipments)
+    first_attempt = _percent(c.totalShipments - c.ndrShipments, c.totalShipments)
+    return {
+        "successRate": success,
+        "rtoRate": _percent(c.rtoShipments, c.totalShipments),
+        "onTimeRate": on_time,
+        "avgTATDays": case((c.tatShipments > 0, c.tatDaysTotal / c.tatShipments), else_=None),
+        "reliabilityScore": (
+            Decimal("0.60") * success
+            + Decimal("0.25") * func.coalesce(on_time, success)
+            + Decimal("0.15") * first_attempt
+        ),
+    }
+
+
+def _apply_counters(session: Session, model, key_columns: Tuple[str, ...], rows: List[dict], now: datetime) -> int:
+    if not rows:
+        return 0
+    stmt = _insert(session, model)
+    current, new = model.__table__.c, stmt.excluded
+    touched = session.execute(
+        stmt.on_conflict_do_update(
+            index_elements=list(key_columns),
+            set_={**{name: current[name] + new[name] for name in COUNTERS}, "updatedAt": now},
+        ).returning(model.id),
+        rows,
+    ).scalars().all()
+    session.execute(
+        update(model).where(model.id.in_(touched)).values(**_derived_rates(current))
+    )
+    return len(touched)
+
+
+def apply_performance_deltas(session: Session, deltas: PerformanceDeltas, now: datetime) -> int:
+    """Add deltas to the performance tables. Returns the buckets touched."""
+    return (
+        _apply_counters(session, CarrierPerformance, CARRIER_KEY, deltas.rows(deltas.carriers, CARRIER_KEY, now), now)
+        + _apply_counters(session, PincodePerformance, PINCODE_KEY, deltas.rows(deltas.pincodes, PINCODE_KEY, now), now)
+        + _apply_counters(session, LanePerformance, LANE_KEY, deltas.rows(deltas.lanes, LANE_KEY, now), now)
+    )
+
+
+# =============================================================================
+# LEDGER
+# =============================================================================
+
+def _record_outcomes(
+    session: Session,
+    source_type: str,
+    source_ids: List[UUID],
+    outcomes: Dict[UUID, Optional[Outcome]],
+    deltas: PerformanceDeltas,
+    now: datetime,
+) -> int:
+    """Diff outcomes against the ledger, collecting the changes in deltas."""
+    recorded = {
+        row.sourceId: Outcome.from_ledger(row)
+        for row in session.execute(
+            select(
+                PerformanceOutcome.sourceId, PerformanceOutcome.companyId,
+                PerformanceOutcome.transporterId, PerformanceOutcome.shipmentType,
+                PerformanceOutcome.periodStart, PerformanceOutcome.pincode,
+                PerformanceOutcome.originCity, PerformanceOutcome.destinationCity,
+                PerformanceOutcome.delivered, PerformanceOutcome.rto, PerformanceOutcome.onTime,
+                PerformanceOutcome.ndr, PerformanceOutcome.tatDays,
+            ).where(
+                PerformanceOutcome.sourceType == source_type,
+                PerformanceOutcome.sourceId.in_(source_ids),
+            )
+        )
+    }
+
+    written, removed = [], []
+    for source_id in source_ids:
+        old, new = recorded.get(source_id), outcomes.get(source_id)
+        if old == new:
+            continue
+        deltas.move(old, new)
+        if new:
+            written.append(new.ledger_row(source_type, source_id, now))
+        else:
+            removed.append(source_id)
+
+    if written:
+        stmt = _insert(session, PerformanceOutcome)
+        session.execute(
+            stmt.on_conflict_do_update(
+                index_elements=["sourceType", "sourceId"],
+                set_={
+                    name: stmt.excluded[name]
+                    for name in written[0]
+                    if name not in ("id", "sourceType", "sourceId", "createdAt")
+                },
+            ).execution_options(render_nulls=True),
+            written,
+        )
+    if removed:
+        session.execute(
+            delete(PerformanceOutcome).where(
+                PerformanceOutcome.sourceType == source_type,
+                PerformanceOutcome.sourceId.in_(removed),
+            )
+        )
+    return len(written) + len(removed)
+
+
+def _delivery_outcomes(session: Session, delivery_ids: List[UUID]) -> Dict[UUID, Optional[Outcome]]:
+    deliveries = session.execute(
+        select(
+            Delivery.id, Delivery.companyId, Delivery.orderId, Delivery.transporterId,
+            Delivery.status, Delivery.shipDate, Delivery.deliveryDate, Delivery.createdAt,
+        ).where(Delivery.id.in_(delivery_ids))
+    ).all()
+    orders = {}
+    if deliveries:
+        orders = {row.id: row for row in session.execute(
+            select(
+                Order.id, Order.orderType, Order.promisedDate, Order.shippingAddress, Order.locationId,
+            ).where(Order.id.in_({d.orderId for d in deliveries}))
+        )}
+    origins = {}
+    if orders:
+        origins = {
+            location_id: _city(address)
+            for location_id, address in session.execute(
+                select(Location.id, Location.address).where(
+                    Location.id.in_({o.locationId for o in orders.values() if o.locationId})
+                )
+            )
+        }
+    with_ndr = set(session.execute(
+        select(NDR.deliveryId).where(NDR.deliveryId.in_(delivery_ids)).distinct()
+    ).scalars())
+
+    outcomes = {}
+    for delivery in deliveries:
+        order = orders.get(delivery.orderId)
+        address = order.shippingAddress if order else None
+        b2b = order is not None and _value(order.orderType) == OrderType.B2B.value
+        outcomes[delivery.id] = shipment_outcome(
+            company_id=delivery.companyId,
+            transporter_id=delivery.transporterId,
+            status=delivery.status,
+            shipment_type=(ShipmentType.B2B_PTL if b2b else ShipmentType.B2C).value,
+            shipped_at=delivery.shipDate,
+            created_at=delivery.createdAt,
+            delivered_at=delivery.deliveryDate,
+            promised_at=order.promisedDate if order else None,
+            pincode=_pincode(address),
+            origin_city=origins.get(order.locationId) if order else None,
+            destination_city=_city(address),
+            ndr=delivery.id in with_ndr,
+        )
+    return outcomes
+
+
+def _shipment_outcomes(session: Session, shipment_ids: List[UUID]) -> Dict[UUID, Optional[Outcome]]:
+    shipments = session.execute(
+        select(
+            Shipment.id, Shipment.companyId, Shipment.transporterId, Shipment.status,
+            Shipment.shipDate, Shipment.deliveredDate, Shipment.expectedDeliveryDate,
+            Shipment.createdAt, Shipment.deliveryAddress, Shipment.pickupAddress,
+            Shipment.pickupAddressId,
+        ).where(Shipment.id.in_(shipment_ids))
+    ).all()
+    # Pickup city from the pickup location when the shipment has no address
+    pickup_ids = {s.pickupAddressId for s in shipments if s.pickupAddressId and not _city(s.pickupAddress)}
+    origins = {}
+    if pickup_ids:
+        origins = {
+            location_id: _city(address)
+            for location_id, address in session.execute(
+                select(Location.id, Location.address).where(Location.id.in_(pickup_ids))
+            )
+        }
+
+    return {
+        shipment.id: shipment_outcome(
+            company_id=shipment.companyId,
+            transporter_id=shipment.transporterId,
+            status=shipment.status,
+            shipment_type=ShipmentType.B2C.value,
+            shipped_at=shipment.shipDate,
+            created_at=shipment.createdAt,
+            delivered_at=shipment.deliveredDate,
+            promised_at=shipment.expectedDeliveryDate,
+            pincode=_pincode(shipment.deliveryAddress),
+            origin_city=_city(shipment.pickupAddress) or origins.get(shipment.pickupAddressId),
+            destination_city=_city(shipment.deliveryAddress),
+            ndr=False,
+        )
+        for shipment in shipments
+    }
+
+
+# =============================================================================
+# INCREMENTAL RUN
+# =============================================================================
+
+def _set_watermark(session: Session, source: str, watermark: datetime, now: datetime) -> None:
+    stmt = _insert(session, PerformanceWatermark)
+    session.execute(
+        stmt.on_conflict_do_update(
+            index_elements=["source"],
+            set_={"watermark": stmt.excluded.watermark, "updatedAt": now},
+        ),
+        [{"id": uuid4(), "source": source, "watermark": watermark, "createdAt": now, "updatedAt": now}],
+    )
+
+
+def _changed_rows(session: Session, model, since: Optional[datetime], after, until: datetime, limit: int):
+    """Rows of model updated in (since, until], after the (updatedAt, id) cursor."""
+    columns = [model.id, model.updatedAt]
+    if model is NDR:
+        columns.append(NDR.deliveryId)
+    query = select(*columns).where(model.updatedAt <= until)
+    if after:
+        query = query.where(or_(
+            model.updatedAt > after[0],
+            and_(model.updatedAt == after[0], model.id > after[1]),
+        ))
+    elif since:
+        query = query.where(model.updatedAt > since)
+    return session.execute(query.order_by(model.updatedAt, model.id).limit(limit)).all()
+
+
+def aggregate_performance(session: Session, now: Optional[datetime] = None) -> dict:
+    """
+    Fold deliveries, NDRs and shipments updated since the watermarks into the
+    performance tables. Commits after every chunk, so an interrupted run
+    resumes where it stopped. The first run (no watermark) reads everything.
+    """
+    now = now or datetime.utcnow()
+    overlap = timedelta(seconds=settings.PERFORMANCE_WATERMARK_OVERLAP_SECONDS)
+    chunk_size = settings.PERFORMANCE_AGGREGATION_CHUNK_SIZE
+    postgres = session.get_bind().dialect.name == "postgresql"
+    result = {"read": 0, "changed": 0, "buckets": 0, "companies": 0}
+    companies: Set[UUID] = set()
+
+    for source, model in ((DELIVERY_SOURCE, Delivery), (NDR_SOURCE, NDR), (SHIPMENT_SOURCE, Shipment)):
+        watermark = session.exec(
+            select(PerformanceWatermark.watermark).where(PerformanceWatermark.source == source)
+        ).first()
+        since = watermark - overlap if watermark else None
+        after = None
+        while True:
+            rows = _changed_rows(session, model, since, after, now, chunk_size)
+            if not rows:
+                break
+            if postgres:
+                session.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": ADVISORY_LOCK_KEY})
+
+            deltas = PerformanceDeltas()
+            if model is Shipment:
+                source_type, ids = SHIPMENT_SOURCE, [row.id for row in rows]
+                outcomes = _shipment_outcomes(session, ids)
+            else:
+                source_type = DELIVERY_SOURCE
+                ids = list(dict.fromkeys(row.deliveryId if model is NDR else row.id for row in rows))
+                outcomes = _delivery_outcomes(session, ids)
+            result["changed"] += _record_outcomes(session, source_type, ids, outcomes, deltas, now)
+            result["buckets"] += apply_performance_deltas(session, deltas, now)
+            result["read"] += len(rows)
+
+            after = (rows[-1].updatedAt, rows[-1].id)
+            _set_watermark(session, source, after[0], now)
+            session.commit()
+            companies |= deltas.companies()
+            if len(rows) < chunk_size:
+                break
+
+        _set_watermark(session, source, now, now)
+        session.commit()
+
+    for company_id in companies:
+        performance_index.invalidate(company_id)
+    result["companies"] = len(companies)
+    return result
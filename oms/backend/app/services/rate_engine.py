@@ -0,0 +1,311 @@
+"""
+Rate Engine
+Courier quotes from RateCard / RateCardSlab for B2C shipments.
+
+For each active transporter the destination (and origin, if listed) must be
+serviceable in ServicePincode for the payment mode. The shipment is rated on
+the transporter's active rate card (a company card before a global one) in
+the first zone the card has slabs for:
+    pincode-pair slabs (fromPincode/toPincode) -> LOCAL (same city)
+    -> REGIONAL (same state) -> the destination's zoneCode -> slabs without a zone
+on the chargeable weight, max(actual, L x W x H / 5000). Freight is the slab
+rate (plus additionalWeightRate per ADDITIONAL_WEIGHT_UNIT_KG above the last
+slab, at least minCharge) plus the card's baseCost; fuelSurcharge is a percent
+of freight, COD is codChargesPercent of the COD amount within
+[codChargesMin, codChargesCap], and awbCharges is added per shipment.
+
+Rate cards are compiled per company into NumPy slab tables and cached in
+memory, serviceability comes from the in-memory pincode serviceability index,
+and a batch of shipments is rated per (rate card, zone) group in one
+vectorized step.
+"""
+from collections import defaultdict
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Sequence, Tuple
+from uuid import UUID
+
+import numpy as np
+from sqlalchemy import or_
+from sqlmodel import Session, select
+
+from app.core.config import settings
+from app.models import RateCard, RateCardSlab, RateCheckShipment, Transporter
+from app.services.company_index import CompanyIndexCache
+from app.services.serviceability import ServiceArea, serviceability_index
+
+# Divisor for volumetric weight in kg from cm, as calculate_volumetric_weight
+VOLUMETRIC_DIVISOR = 5000
+# Weight step charged at additionalWeightRate above the last slab
+ADDITIONAL_WEIGHT_UNIT_KG = 0.5
+
+LOCAL_ZONE = "LOCAL"
+REGIONAL_ZONE = "REGIONAL"
+
+
+def _epoch(value: Optional[datetime], default: float) -> float:
+    if value is None:
+        return default
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
+
+
+def _num(value) -> float:
+    return float(value) if value is not None else np.nan
+
+
+def _zone(value: Optional[str]) -> Optional[str]:
+    return value.strip().upper() if value and value.strip() else None
+
+
+@dataclass
+class SlabTable:
+    """Weight slabs of one zone (or pincode pair), sorted by toWeight."""
+    to_weight: np.ndarray
+    rate: np.ndarray
+    additional: np.ndarray     # additionalWeightRate or 0
+    min_charge: np.ndarray     # minCharge or 0
+
+    @classmethod
+    def from_slabs(cls, slabs: List[RateCardSlab]) -> "SlabTable":
+        slabs = sorted(slabs, key=lambda s: s.toWeight)
+        return cls(
+            to_weight=np.array([float(s.toWeight) for s in slabs]),
+            rate=np.array([float(s.rate) for s in slabs]),
+            additional=np.nan_to_num(np.array([_num(s.additionalWeightRate) for s in slabs])),
+            min_charge=np.nan_to_num(np.array([_num(s.minCharge) for s in slabs])),
+        )
+
+    def charge(self, weights: np.ndarray) -> np.ndarray:
+        """Slab charge for each weight."""
+        last = len(self.to_weight) - 1
+        slab = np.minimum(np.searchsorted(self.to_weight, weights, side="left"), last)
+        extra_units = np.ceil(np.maximum(weights - self.to_weight[last], 0) / ADDITIONAL_WEIGHT_UNIT_KG)
+        return np.maximum(self.rate[slab] + extra_units * self.additional[slab], self.min_charge[slab])
+
+
+@dataclass
+class CompiledRateCard:
+    id: UUID
+    transporter_id: UUID
+    type: str                  # PREPAID, COD or BOTH
+    company_specific: bool
+    effective_from: float      # epoch seconds
+    effective_to: float
+    base_cost: float
+    fuel_percent: float
+    cod_percent: float
+    cod_min: float
+    cod_cap: float             # inf if uncapped
+    awb_charge: float
+    zones: Dict[Optional[str], SlabTable] = field(default_factory=dict)
+    lanes: Dict[Tuple[str, str], SlabTable] = field(default_factory=dict)
+
+    def accepts(self, cod: bool, at: float) -> bool:
+        return (
+            self.effective_from <= at <= self.effective_to
+            and (self.type == "BOTH" or self.type == ("COD" if cod else "PREPAID"))
+        )
+
+
+@dataclass
+class CompanyRateCards:
+    # transporterId -> cards, company cards first, latest effectiveFrom first
+    cards: Dict[UUID, List[CompiledRateCard]] = field(default_factory=dict)
+    # transporterId -> (name, type)
+    transporters: Dict[UUID, Tuple[str, str]] = field(default_factory=dict)
+
+
+# =============================================================================
+# BUILD
+# =============================================================================
+
+def build_company_rate_cards(session: Session, company_id: Optional[UUID] = None) -> CompanyRateCards:
+    """Compile ACTIVE rate cards of a company and global (company-less) cards."""
+    query = select(RateCard).join(Transporter, RateCard.transporterId == Transporter.id).where(
+        RateCard.status == "ACTIVE", Transporter.isActive == True
+    )
+    if company_id:
+        query = query.where(or_(RateCard.companyId == company_id, RateCard.companyId.is_(None)))
+    cards = session.exec(query).all()
+
+    slabs_by_card: Dict[UUID, List[RateCardSlab]] = defaultdict(list)
+    if cards:
+        for slab in session.exec(
+            select(RateCardSlab).where(RateCardSlab.rateCardId.in_([card.id for card in cards]))
+        ).all():
+            slabs_by_card[slab.rateCardId].append(slab)
+
+    index = CompanyRateCards()
+    for card in cards:
+        zone_slabs: Dict[Optional[str], List[RateCardSlab]] = defaultdict(list)
+        lane_slabs: Dict[Tuple[str, str], List[RateCardSlab]] = defaultdict(list)
+        for slab in slabs_by_card[card.id]:
+            if slab.fromPincode and slab.toPincode:
+                lane_slabs[(slab.fromPincode.strip(), slab.toPincode.strip())].append(slab)
+            else:
+                zone_slabs[_zone(slab.zone)].append(slab)
+        if not zone_slabs and not lane_slabs:
+            continue
+
+        index.cards.setdefault(card.transporterId, []).append(CompiledRateCard(
+            id=card.id,
+            transporter_id=card.transporterId,
+            type=(card.type or "BOTH").upper(),
+            company_specific=card.companyId is not None,
+            effective_from=_epoch(card.effectiveFrom, -np.inf),
+            effective_to=_epoch(card.effectiveTo, np.inf),
+            base_cost=float(card.baseCost or 0),
+            fuel_percent=float(card.fuelSurcharge or 0),
+            cod_percent=float(card.codChargesPercent or 0),
+            cod_min=float(card.codChargesMin or 0),
+            cod_cap=float(card.codChargesCap) if card.codChargesCap else np.inf,
+            awb_charge=float(card.awbCharges or 0),
+            zones={zone: SlabTable.from_slabs(slabs) for zone, slabs in zone_slabs.items()},
+            lanes={lane: SlabTable.from_slabs(slabs) for lane, slabs in lane_slabs.items()},
+        ))
+
+    for transporter_cards in index.cards.values():
+        transporter_cards.sort(key=lambda c: (not c.company_specific, -c.effective_from))
+    if index.cards:
+        index.transporters = {
+            transporter_id: (name, getattr(transporter_type, "value", transporter_type) or "COURIER")
+            for transporter_id, name, transporter_type in session.exec(
+                select(Transporter.id, Transporter.name, Transporter.type)
+                .where(Transporter.id.in_(list(index.cards)))
+            ).all()
+        }
+    return index
+
+
+rate_card_index: CompanyIndexCache[CompanyRateCards] = CompanyIndexCache(
+    build_company_rate_cards,
+    ttl_seconds=settings.RATE_CARD_CACHE_TTL_SECONDS,
+    max_keys=settings.RATE_CARD_CACHE_MAX_COMPANIES,
+)
+
+# =============================================================================
+# RATING
+# =============================================================================
+
+def chargeable_weight(shipment: RateCheckShipment) -> float:
+    weight = float(shipment.weight)
+    if shipment.length and shipment.width and shipment.height:
+        volumetric = float(shipment.length) * float(shipment.width) * float(shipment.height) / VOLUMETRIC_DIVISOR
+        weight = max(weight, volumetric)
+    return weight
+
+
+def _select_table(
+    card: CompiledRateCard,
+    origin: str,
+    destination: str,
+    origin_area: Optional[ServiceArea],
+    destination_area: ServiceArea,
+) -> Optional[Tuple[str, SlabTable]]:
+    """The card's slabs for this origin/destination, and the zone they are for."""
+    table = card.lanes.get((origin, destination))
+    if table:
+        return f"{origin}-{destination}", table
+
+    candidates = []
+    if origin_area and origin_area.city and origin_area.city == destination_area.city:
+        candidates.append(LOCAL_ZONE)
+    if origin_area and origin_area.state and origin_area.state == destination_area.state:
+        candidates.append(REGIONAL_ZONE)
+    candidates += [destination_area.zone, None]
+    for zone in candidates:
+        table = card.zones.get(zone)
+        if table:
+            return zone or "ALL", table
+    return None
+
+
+def quote_shipments(
+    session: Session,
+    company_id: Optional[UUID],
+    shipments: Sequence[RateCheckShipment],
+    now: Optional[datetime] = None,
+) -> List[List[dict]]:
+    """
+    Quotes of every transporter the company ships with that services the
+    shipment, cheapest first.
+    """
+    at = _epoch(now or datetime.utcnow(), 0.0)
+    rates = rate_card_index.get(session, company_id)
+    services = serviceability_index.lookup(
+        session, {p for s in shipments for p in (s.originPincode, s.destinationPincode)}
+    )
+    allowed = serviceability_index.company_mask(session, company_id)
+
+    # (card, zone) -> shipments rated on those slabs
+    groups: Dict[Tuple[UUID, str], dict] = {}
+    for i, shipment in enumerate(shipments):
+        origin, destination = shipment.originPincode.strip(), shipment.destinationPincode.strip()
+        cod = shipment.paymentMode.upper() == "COD"
+        destination_service = services[shipment.destinationPincode]
+        if not destination_service:
+            continue
+        origin_service = services[shipment.originPincode]
+        bits = destination_service.available(cod) & allowed
+        if origin_service:
+            # Transporters that list the origin must service it
+            bits &= origin_service.serviceable | ~origin_service.listed
+        for transporter_id in serviceability_index.transporters(bits):
+            area = destination_service.areas[transporter_id]
+            origin_area = origin_service.areas.get(transporter_id) if origin_service else None
+            card = next(
+                (c for c in rates.cards.get(transporter_id, ()) if c.accepts(cod, at)), None
+            )
+            if not card:
+                continue
+            selected = _select_table(card, origin, destination, origin_area, area)
+            if not selected:
+                continue
+
+            zone, table = selected
+            group = groups.setdefault((card.id, zone), {
+                "card": card, "zone": zone, "table": table,
+                "index": [], "weight": [], "cod_amount": [], "days": [],
+            })
+            group["index"].append(i)
+            group["weight"].append(chargeable_weight(shipment))
+            group["cod_amount"].append(float(shipment.codAmount) if cod else np.nan)
+            group["days"].append(area.estimated_days)
+
+    quotes: List[List[dict]] = [[] for _ in shipments]
+    for group in groups.values():
+        card: CompiledRateCard = group["card"]
+        weight = np.array(group["weight"])
+        cod_amount = np.array(group["cod_amount"])
+
+        freight = group["table"].charge(weight) + card.base_cost
+        fuel = freight * card.fuel_percent / 100
+        cod_charge = np.where(
+            np.isnan(cod_amount),
+            0.0,
+            np.minimum(np.maximum(np.nan_to_num(cod_amount) * card.cod_percent / 100, card.cod_min), card.cod_cap),
+        )
+        total = freight + fuel + cod_charge + card.awb_charge
+
+        name, service_type = rates.transporters.get(card.transporter_id, ("Unknown", "COURIER"))
+        for j, i in enumerate(group["index"]):
+            quotes[i].append({
+                "transporterId": str(card.transporter_id),
+                "courierName": name,
+                "serviceType": service_type,
+                "rateCardId": str(card.id),
+                "zone": group["zone"],
+                "estimatedDays": group["days"][j],
+                "chargeableWeight": round(float(weight[j]), 3),
+                "baseRate": round(float(freight[j]), 2),
+                "fuelSurcharge": round(float(fuel[j]), 2),
+                "codCharge": round(float(cod_charge[j]), 2),
+                "awbCharge": card.awb_charge,
+                "totalRate": round(float(total[j]), 2),
+            })
+
+    for shipment_quotes in quotes:
+        shipment_quotes.sort(key=lambda q: q["totalRate"])
+    return quotes
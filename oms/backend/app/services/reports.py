@@ -0,0 +1,548 @@
+"""
+Report Worker
+Runs ScheduledReport executions in the background and writes their output
+(CSV or XLSX) to REPORT_OUTPUT_DIR on local disk.
+
+Each tick of the scheduler job queues executions for reports whose nextRunAt
+is due, then claims PENDING executions and runs them on a bounded pool
+(REPORT_MAX_WORKERS), outside API workers. Query results are streamed
+through a server-side cursor in REPORT_CHUNK_SIZE partitions and written row
+by row, so memory use does not depend on the size of the report.
+"""
+import csv
+import json
+import logging
+import os
+import re
+import time
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from decimal import Decimal
+from typing import Any, Dict, List, Optional, Tuple
+from uuid import UUID, uuid4
+from xml.sax.saxutils import escape
+
+from dateutil.parser import parse as parse_date
+from dateutil.relativedelta import relativedelta
+from sqlalchemy import or_, update
+from sqlmodel import Session, select
+
+from app.core.config import settings
+from app.core.database import engine
+from app.models import (
+    ScheduledReport, ReportExecution,
+    Order, OrderItem, Delivery, Inventory, SKU, Location, Transporter,
+)
+
+logger = logging.getLogger(__name__)
+
+
+# =============================================================================
+# REPORT DEFINITIONS
+# =============================================================================
+
+@dataclass(frozen=True)
+class ReportDefinition:
+    """Columns (label -> expression, in default order) and scope of a report type."""
+    select_from: Any
+    columns: Dict[str, Any]
+    company_column: Any
+    # Filtered to the report window; None for point-in-time reports
+    date_column: Optional[Any] = None
+    joins: Tuple[tuple, ...] = field(default_factory=tuple)
+
+
+REPORT_DEFINITIONS: Dict[str, ReportDefinition] = {
+    "ORDERS": ReportDefinition(
+        select_from=Order,
+        columns={
+            "orderNo": Order.orderNo,
+            "externalOrderNo": Order.externalOrderNo,
+            "orderDate": Order.orderDate,
+            "channel": Order.channel,
+            "orderType": Order.orderType,
+            "paymentMode": Order.paymentMode,
+            "status": Order.status,
+            "customerName": Order.customerName,
+            "customerPhone": Order.customerPhone,
+            "totalAmount": Order.totalAmount,
+            "shipByDate": Order.shipByDate,
+            "promisedDate": Order.promisedDate,
+            "locationCode": Location.code,
+        },
+        joins=((Location, Order.locationId == Location.id),),
+        company_column=Order.companyId,
+        date_column=Order.orderDate,
+    ),
+    "SALES": ReportDefinition(
+        select_from=OrderItem,
+        columns={
+            "orderNo": Order.orderNo,
+            "orderDate": Order.orderDate,
+            "channel": Order.channel,
+            "status": Order.status,
+            "skuCode": SKU.code,
+            "skuName": SKU.name,
+            "category": SKU.category,
+            "quantity": OrderItem.quantity,
+            "unitPrice": OrderItem.unitPrice,
+            "taxAmount": OrderItem.taxAmount,
+            "discount": OrderItem.discount,
+            "totalPrice": OrderItem.totalPrice,
+        },
+        joins=(
+            (Order, OrderItem.orderId == Order.id),
+            (SKU, OrderItem.skuId == SKU.id),
+        ),
+        company_column=Order.companyId,
+        date_column=Order.orderDate,
+    ),
+    "FINANCE": ReportDefinition(
+        select_from=Order,
+        columns={
+            "orderNo": Order.orderNo,
+            "orderDate": Order.orderDate,
+            "status": Order.status,
+            "paymentMode": Order.paymentMode,
+            "subtotal": Order.subtotal,
+            "taxAmount": Order.taxAmount,
+            "shippingCharges": Order.shippingCharges,
+            "discount": Order.discount,
+            "codCharges": Order.codCharges,
+            "totalAmount": Order.totalAmount,
+        },
+        company_column=Order.companyId,
+        date_column=Order.orderDate,
+    ),
+    "LOGISTICS": ReportDefinition(
+        select_from=Delivery,
+        columns={
+            "deliveryNo": Delivery.deliveryNo,
+            "orderNo": Order.orderNo,
+            "awbNo": Delivery.awbNo,
+            "transporter": Transporter.name,
+            "status": Delivery.status,
+            "weight": Delivery.weight,
+            "boxes": Delivery.boxes,
+            "shipDate": Delivery.shipDate,
+            "deliveryDate": Delivery.deliveryDate,
+            "createdAt": Delivery.createdAt,
+        },
+        joins=(
+            (Order, Delivery.orderId == Order.id),
+            (Transporter, Delivery.transporterId == Transporter.id, True),
+        ),
+        company_column=Delivery.companyId,
+        date_column=Delivery.createdAt,
+    ),
+    "INVENTORY": ReportDefinition(
+        select_from=Inventory,
+        columns={
+            "skuCode": SKU.code,
+            "skuName": SKU.name,
+            "locationCode": Location.code,
+            "batchNo": Inventory.batchNo,
+            "lotNo": Inventory.lotNo,
+            "quantity": Inventory.quantity,
+            "reservedQty": Inventory.reservedQty,
+            "costPrice": Inventory.costPrice,
+            "expiryDate": Inventory.expiryDate,
+        },
+        joins=(
+            (SKU, Inventory.skuId == SKU.id),
+            (Location, Inventory.locationId == Location.id),
+        ),
+        company_column=Location.companyId,
+    ),
+}
+
+# Window covered by a run, and the interval until the next one
+FREQUENCY_PERIODS = {
+    "DAILY": relativedelta(days=1),
+    "WEEKLY": relativedelta(weeks=1),
+    "MONTHLY": relativedelta(months=1),
+    "QUARTERLY": relativedelta(months=3),
+}
+
+FORMAT_EXTENSIONS = {"CSV": "csv", "EXCEL": "xlsx", "XLSX": "xlsx"}
+
+
+def report_period(frequency: Optional[str]) -> relativedelta:
+    return FREQUENCY_PERIODS.get((frequency or "").upper(), FREQUENCY_PERIODS["DAILY"])
+
+
+def _parse_datetime(value) -> Optional[datetime]:
+    if value is None or isinstance(value, datetime):
+        return value
+    return parse_date(str(value))
+
+
+def build_report_query(report: ScheduledReport, now: datetime):
+    """
+    SELECT for a report: requested columns (default: all), scoped to its
+    company and window. filters may set dateFrom/dateTo and equality (or IN,
+    for lists) conditions on any column label.
+    """
+    definition = REPORT_DEFINITIONS.get((report.reportType or "").upper())
+    if not definition:
+        raise ValueError(f"Unknown report type: {report.reportType}")
+
+    labels = [c for c in (report.columns or []) if c in definition.columns]
+    labels = labels or list(definition.columns)
+
+    query = select(*(definition.columns[label].label(label) for label in labels))
+    query = query.select_from(definition.select_from)
+    for target, onclause, *outer in definition.joins:
+        query = query.join(target, onclause, isouter=bool(outer))
+    query = query.where(definition.company_column == report.companyId)
+
+    filters = dict(report.filters or {})
+    date_from = _parse_datetime(filters.pop("dateFrom", None))
+    date_to = _parse_datetime(filters.pop("dateTo", None))
+    if definition.date_column is not None:
+        query = query.where(
+            definition.date_column >= (date_from or now - report_period(report.frequency)),
+            definition.date_column < (date_to or now),
+        )
+    for label, value in filters.items():
+        column = definition.columns.get(label)
+        if column is None:
+            continue
+        query = query.where(column.in_(value) if isinstance(value, list) else column == value)
+
+    sort_column = definition.columns.get(report.sortBy or "")
+    if sort_column is None:
+        sort_column = definition.date_column if definition.date_column is not None \
+            else definition.columns[labels[0]]
+    descending = (report.sortOrder or "").lower() == "desc"
+    query = query.order_by(sort_column.desc() if descending else sort_column.asc())
+
+    return query, labels
+
+
+# =============================================================================
+# OUTPUT WRITERS
+# =============================================================================
+
+def _cell(value) -> Any:
+    """Plain value for a CSV/XLSX cell."""
+    value = getattr(value, "value", value)
+    if isinstance(value, datetime):
+        return value.isoformat(sep=" ", timespec="seconds")
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, default=str)
+    if isinstance(value, UUID):
+        return str(value)
+    return value
+
+
+class CsvReportWriter:
+    def __init__(self, path: str, header: List[str]):
+        self._file = open(path, "w", newline="", encoding="utf-8")
+        self._writer = csv.writer(self._file)
+        self._writer.writerow(header)
+
+    def write_rows(self, rows) -> None:
+        self._writer.writerows([_cell(v) for v in row] for row in rows)
+
+    def close(self) -> None:
+        self._file.close()
+
+
+# Characters not allowed in XML 1.0
+_XML_INVALID = re.compile("[\x00-\x08\x0b\x0c\x0e-\x1f]")
+
+_XLSX_PARTS = {
+    "[Content_Types].xml": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '</Types>'
+    ),
+    "_rels/.rels": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="xl/workbook.xml"/>'
+        '</Relationships>'
+    ),
+    "xl/workbook.xml": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+        '<sheets><sheet name="Report" sheetId="1" r:id="rId1"/></sheets>'
+        '</workbook>'
+    ),
+    "xl/_rels/workbook.xml.rels": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" Target="worksheets/sheet1.xml"/>'
+        '</Relationships>'
+    ),
+}
+
+
+class XlsxReportWriter:
+    """
+    Minimal single-sheet XLSX writer. The worksheet part is streamed into
+    the zip as rows arrive (inline strings, no shared string table), so the
+    workbook is never held in memory.
+    """
+
+    def __init__(self, path: str, header: List[str]):
+        self._zip = zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED)
+        for name, content in _XLSX_PARTS.items():
+            self._zip.writestr(name, content)
+        self._sheet = self._zip.open("xl/worksheets/sheet1.xml", "w", force_zip64=True)
+        self._sheet.write(
+            b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            b'<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+            b'<sheetData>'
+        )
+        self.write_rows([header])
+
+    @staticmethod
+    def _xml_cell(value) -> str:
+        value = _cell(value)
+        if value is None:
+            return "<c/>"
+        if isinstance(value, (int, float, Decimal)) and not isinstance(value, bool):
+            return f"<c><v>{value}</v></c>"
+        text = escape(_XML_INVALID.sub("", str(value)))
+        return f'<c t="inlineStr"><is><t xml:space="preserve">{text}</t></is></c>'
+
+    def write_rows(self, rows) -> None:
+        self._sheet.write("".join(
+            "<row>" + "".join(self._xml_cell(v) for v in row) + "</row>"
+            for row in rows
+        ).encode("utf-8"))
+
+    def close(self) -> None:
+        self._sheet.write(b"</sheetData></worksheet>")
+        self._sheet.close()
+        self._zip.close()
+
+
+REPORT_WRITERS = {"csv": CsvReportWriter, "xlsx": XlsxReportWriter}
+
+# How often a running execution bumps its updatedAt
+HEARTBEAT_SECONDS = 60
+
+
+# =============================================================================
+# EXECUTION
+# =============================================================================
+
+class ExecutionAbandoned(Exception):
+    """The execution is no longer RUNNING (e.g. failed as stale)."""
+
+
+def _heartbeat(execution_id: UUID) -> None:
+    """
+    Bump a RUNNING execution's updatedAt so fail_stale_executions leaves it
+    alone. Runs on its own connection: the report's transaction holds the
+    server-side cursor open and can't commit.
+    """
+    with engine.begin() as conn:
+        alive = conn.execute(
+            update(ReportExecution)
+            .where(ReportExecution.id == execution_id, ReportExecution.status == "RUNNING")
+            .values(updatedAt=datetime.utcnow())
+        ).rowcount
+    if not alive:
+        raise ExecutionAbandoned("Execution is no longer running")
+
+
+def execute_report(execution_id: UUID) -> dict:
+    """
+    Run one claimed execution in its own session and record the outcome.
+    Never raises, so one failing report cannot stop the worker.
+
+    updatedAt is bumped every HEARTBEAT_SECONDS while rows are written, and
+    the outcome is only recorded while the execution is still RUNNING, so an
+    execution failed as stale is never overwritten.
+    """
+    started = time.monotonic()
+    result = {"execution_id": execution_id, "status": "COMPLETED"}
+    path = None
+
+    with Session(engine) as session:
+        execution = session.get(ReportExecution, execution_id)
+        report = session.get(ScheduledReport, execution.scheduledReportId)
+        now = datetime.utcnow()
+        execution.startedAt = now
+        session.add(execution)
+        session.commit()
+
+        try:
+            extension = FORMAT_EXTENSIONS.get((report.format or "").upper())
+            if not extension:
+                raise ValueError(f"Unsupported report format: {report.format}")
+            query, labels = build_report_query(report, now)
+
+            directory = os.path.join(settings.REPORT_OUTPUT_DIR, str(report.companyId))
+            os.makedirs(directory, exist_ok=True)
+            path = os.path.join(directory, f"{report.id}-{execution.id}.{extension}")
+
+            # Server-side cursor; rows arrive REPORT_CHUNK_SIZE at a time
+            rows = session.execute(
+                query.execution_options(yield_per=settings.REPORT_CHUNK_SIZE)
+            )
+            row_count = 0
+            heartbeat = session.get_bind().dialect.name != "sqlite"
+            last_heartbeat = time.monotonic()
+            writer = REPORT_WRITERS[extension](path + ".part", labels)
+            try:
+                for chunk in rows.partitions():
+                    writer.write_rows(chunk)
+                    row_count += len(chunk)
+                    # SQLite's single writer would wait on this read; skip it there
+                    if heartbeat and time.monotonic() - last_heartbeat >= HEARTBEAT_SECONDS:
+                        _heartbeat(execution_id)
+                        last_heartbeat = time.monotonic()
+            finally:
+                writer.close()
+                rows.close()
+            os.replace(path + ".part", path)
+
+            outcome = {
+                "status": "COMPLETED",
+                "fileUrl": path,
+                "fileSize": os.path.getsize(path),
+                "rowCount": row_count,
+                "error": None,
+            }
+            result.update(rows=row_count, bytes=outcome["fileSize"])
+        except Exception as e:
+            session.rollback()
+            if path and os.path.exists(path + ".part"):
+                os.remove(path + ".part")
+            outcome = {"status": "FAILED", "error": str(e)[:1000]}
+            result.update(status="FAILED", error=str(e))
+
+        completed_at = datetime.utcnow()
+        recorded = session.execute(
+            update(ReportExecution)
+            .where(ReportExecution.id == execution_id, ReportExecution.status == "RUNNING")
+            .values(
+                **outcome,
+                completedAt=completed_at,
+                durationMs=int((time.monotonic() - started) * 1000),
+            )
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        if recorded:
+            report.lastRunAt = completed_at
+            report.lastRunStatus = outcome["status"]
+            report.lastRunError = outcome["error"]
+            session.add(report)
+        else:
+            # Failed as stale meanwhile; keep that outcome
+            if outcome["status"] == "COMPLETED":
+                os.remove(path)
+            result.update(status="FAILED", error="Execution was failed while running")
+        session.commit()
+
+    result["duration_ms"] = int((time.monotonic() - started) * 1000)
+    if result["status"] != "COMPLETED":
+        logger.error(f"Report execution {execution_id} failed: {result.get('error')}")
+    return result
+
+
+def queue_due_reports(session: Session, now: datetime) -> int:
+    """
+    Create PENDING executions for active reports whose nextRunAt has passed
+    and advance nextRunAt. Reports without nextRunAt are scheduled one period
+    from now. The guarded update keeps concurrent workers from queueing a
+    run twice.
+    """
+    due = session.exec(
+        select(ScheduledReport.id, ScheduledReport.frequency, ScheduledReport.nextRunAt)
+        .where(ScheduledReport.isActive == True)
+        .where(or_(ScheduledReport.nextRunAt.is_(None), ScheduledReport.nextRunAt <= now))
+    ).all()
+
+    queued = 0
+    for report_id, frequency, next_run_at in due:
+        condition = (
+            ScheduledReport.nextRunAt.is_(None) if next_run_at is None
+            else ScheduledReport.nextRunAt == next_run_at
+        )
+        claimed = session.execute(
+            update(ScheduledReport)
+            .where(ScheduledReport.id == report_id, condition)
+            .values(nextRunAt=now + report_period(frequency))
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        if claimed and next_run_at is not None:
+            session.add(ReportExecution(id=uuid4(), scheduledReportId=report_id, status="PENDING"))
+            queued += 1
+    session.commit()
+    return queued
+
+
+def claim_pending_executions(session: Session, limit: int) -> List[UUID]:
+    """Mark up to limit PENDING executions RUNNING, oldest first."""
+    pending = (
+        select(ReportExecution.id)
+        .where(ReportExecution.status == "PENDING")
+        .order_by(ReportExecution.createdAt)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+    )
+    claimed = session.execute(
+        update(ReportExecution)
+        .where(ReportExecution.id.in_(pending.scalar_subquery()))
+        .where(ReportExecution.status == "PENDING")
+        .values(status="RUNNING", updatedAt=datetime.utcnow())
+        .returning(ReportExecution.id)
+        .execution_options(synchronize_session=False)
+    ).scalars().all()
+    session.commit()
+    return claimed
+
+
+def fail_stale_executions(session: Session, now: datetime) -> int:
+    """Fail RUNNING executions abandoned by a worker that stopped."""
+    cutoff = now - timedelta(minutes=settings.REPORT_EXECUTION_TIMEOUT_MINUTES)
+    failed = session.execute(
+        update(ReportExecution)
+        .where(ReportExecution.status == "RUNNING")
+        .where(ReportExecution.updatedAt < cutoff)
+        .where(or_(ReportExecution.startedAt.is_(None), ReportExecution.startedAt < cutoff))
+        .values(status="FAILED", error="Execution timed out", completedAt=now)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    session.commit()
+    return failed
+
+
+def run_report_worker() -> dict:
+    """Queue due reports, then run PENDING executions until none are left."""
+    now = datetime.utcnow()
+    workers = max(1, settings.REPORT_MAX_WORKERS)
+    results = []
+
+    with Session(engine) as session:
+        stale = fail_stale_executions(session, now)
+        queued = queue_due_reports(session, now)
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="report-worker") as executor:
+        while True:
+            with Session(engine) as session:
+                claimed = claim_pending_executions(session, workers)
+            if not claimed:
+                break
+            results.extend(executor.map(execute_report, claimed))
+
+    return {
+        "queued": queued,
+        "stale": stale,
+        "executed": len(results),
+        "failed": sum(1 for r in results if r["status"] != "COMPLETED"),
+        "rows": sum(r.get("rows", 0) for r in results),
+    }
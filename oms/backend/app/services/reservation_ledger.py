@@ -0,0 +1,240 @@
+"""
+Reservation Ledger
+In-process availability index for inventory allocation. Keeps the allocatable
+lots of each (sku, location[, channel]) in memory, ordered by FIFO/LIFO/FEFO,
+so hot SKUs are allocated without reloading and re-sorting their rows on every
+request. Allocations for the same key are serialized on a per-key lock instead
+of contending on database rows.
+
+The index is advisory: every reservation is written back with a guarded
+UPDATE that only succeeds while the row still has enough free stock
+(quantity - reservedQty >= qty). A stale index or a concurrent writer in
+another process can therefore never over-reserve; a failed guard refreshes
+the entry from the database and re-plans.
+"""
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from datetime import datetime
+from decimal import Decimal
+from typing import Dict, List, Optional, Tuple
+from uuid import UUID
+
+from sqlalchemy import update
+from sqlmodel import Session, select
+
+from app.core.config import settings
+
+
+@dataclass
+class Lot:
+    """Snapshot of one Inventory/ChannelInventory row's allocatable stock."""
+    id: UUID
+    binId: Optional[UUID]
+    batchNo: Optional[str]
+    lotNo: Optional[str]
+    fifoSequence: Optional[int]
+    expiryDate: Optional[datetime]
+    costPrice: Optional[Decimal]
+    quantity: int
+    reservedQty: int
+
+    @property
+    def available(self) -> int:
+        return self.quantity - self.reservedQty
+
+
+@dataclass
+class Reservation:
+    """Quantity reserved against a lot."""
+    lot: Lot
+    qty: int
+
+
+def lot_columns(Model) -> tuple:
+    """Columns of Model that make up a Lot, in field order."""
+    return (
+        Model.id, Model.binId, Model.batchNo, Model.lotNo, Model.fifoSequence,
+        Model.expiryDate, Model.costPrice, Model.quantity, Model.reservedQty,
+    )
+
+
+def sort_lots(lots: List[Lot], valuation_method: str) -> List[Lot]:
+    """
+    Order lots for consumption.
+    - FIFO: fifoSequence ASC (oldest first)
+    - LIFO: fifoSequence DESC (newest first)
+    - FEFO: expiryDate ASC (earliest expiry first), nulls last
+    WAC doesn't require specific ordering, so it uses FIFO.
+    """
+    if valuation_method == "LIFO":
+        return sorted(lots, key=lambda lot: lot.fifoSequence or 0, reverse=True)
+    if valuation_method == "FEFO":
+        return sorted(
+            lots, key=lambda lot: (lot.expiryDate is None, lot.expiryDate or datetime.max)
+        )
+    return sorted(lots, key=lambda lot: lot.fifoSequence or 0)
+
+
+@dataclass
+class LedgerEntry:
+    """Lots of one (model, sku, location, channel) key."""
+    lots: List[Lot]
+    loaded_at: float
+    lock: threading.Lock = field(default_factory=threading.Lock)
+    _ordered: Dict[str, List[Lot]] = field(default_factory=dict)
+
+    def ordered(self, valuation_method: str) -> List[Lot]:
+        if valuation_method not in self._ordered:
+            self._ordered[valuation_method] = sort_lots(self.lots, valuation_method)
+        return self._ordered[valuation_method]
+
+
+LedgerKey = Tuple[str, UUID, UUID, Optional[str]]
+
+
+class ReservationLedger:
+    """
+    Process-wide LRU of LedgerEntry objects with a TTL.
+
+    Entries may lag the database (stock received by other processes, releases
+    elsewhere); a shortfall triggers one refresh before it is reported, and
+    the TTL bounds how long new lots can be missed.
+    """
+
+    def __init__(self, ttl_seconds: int, max_keys: int, max_retries: int):
+        self.ttl_seconds = ttl_seconds
+        self.max_keys = max_keys
+        self.max_retries = max_retries
+        self._entries: "OrderedDict[LedgerKey, LedgerEntry]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(Model, sku_id: UUID, location_id: UUID, channel: Optional[str]) -> LedgerKey:
+        return (Model.__tablename__, sku_id, location_id, channel)
+
+    def _load(
+        self,
+        session: Session,
+        Model,
+        sku_id: UUID,
+        location_id: UUID,
+        channel: Optional[str],
+    ) -> LedgerEntry:
+        query = (
+            select(*lot_columns(Model))
+            .where(Model.skuId == sku_id)
+            .where(Model.locationId == location_id)
+            .where((Model.quantity - Model.reservedQty) > 0)
+        )
+        if channel is not None:
+            query = query.where(Model.channel == channel)
+
+        lots = [Lot(*row) for row in session.exec(query).all()]
+        return LedgerEntry(lots=lots, loaded_at=time.monotonic())
+
+    def _entry(
+        self,
+        session: Session,
+        Model,
+        sku_id: UUID,
+        location_id: UUID,
+        channel: Optional[str],
+        refresh: bool = False,
+    ) -> LedgerEntry:
+        key = self._key(Model, sku_id, location_id, channel)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and not refresh and time.monotonic() - entry.loaded_at < self.ttl_seconds:
+                self._entries.move_to_end(key)
+                return entry
+
+        entry = self._load(session, Model, sku_id, location_id, channel)
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_keys:
+                self._entries.popitem(last=False)
+        return entry
+
+    def invalidate(self, sku_id: UUID, location_id: UUID) -> None:
+        """Drop every entry (any model or channel) for a SKU at a location."""
+        with self._lock:
+            for key in [k for k in self._entries if k[1] == sku_id and k[2] == location_id]:
+                del self._entries[key]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    @staticmethod
+    def _write_back(session: Session, Model, lot_id: UUID, qty: int) -> bool:
+        """Reserve qty on a row only if it still has that much free stock."""
+        result = session.execute(
+            update(Model)
+            .where(Model.id == lot_id)
+            .where((Model.quantity - Model.reservedQty) >= qty)
+            .values(reservedQty=Model.reservedQty + qty, updatedAt=datetime.utcnow())
+            .execution_options(synchronize_session=False)
+        )
+        return result.rowcount == 1
+
+    def reserve(
+        self,
+        session: Session,
+        Model,
+        sku_id: UUID,
+        location_id: UUID,
+        required_qty: int,
+        valuation_method: str,
+        preferred_bin_id: Optional[UUID] = None,
+        channel: Optional[str] = None,
+    ) -> List[Reservation]:
+        """
+        Reserve up to required_qty of a SKU at a location, in valuation order.
+
+        Writes go through the caller's session and are not committed here; if
+        the caller's transaction rolls back it must call invalidate().
+        """
+        reservations: List[Reservation] = []
+        remaining = required_qty
+        refreshes = 0
+        entry = self._entry(session, Model, sku_id, location_id, channel)
+
+        while remaining > 0:
+            conflict = False
+            with entry.lock:
+                lots = entry.ordered(valuation_method)
+                if preferred_bin_id:
+                    lots = sorted(lots, key=lambda lot: lot.binId != preferred_bin_id)
+                for lot in lots:
+                    if remaining <= 0:
+                        break
+                    qty = min(lot.available, remaining)
+                    if qty <= 0:
+                        continue
+                    if self._write_back(session, Model, lot.id, qty):
+                        lot.reservedQty += qty
+                        reservations.append(Reservation(lot=lot, qty=qty))
+                        remaining -= qty
+                    else:
+                        conflict = True
+
+            if remaining <= 0 or refreshes >= self.max_retries:
+                break
+            # Shortfall or lost race: re-read the rows once they may have changed.
+            # Without a conflict a single refresh is enough to confirm a shortfall.
+            if not conflict and refreshes > 0:
+                break
+            entry = self._entry(session, Model, sku_id, location_id, channel, refresh=True)
+            refreshes += 1
+
+        return reservations
+
+
+reservation_ledger = ReservationLedger(
+    ttl_seconds=settings.ALLOCATION_LEDGER_TTL_SECONDS,
+    max_keys=settings.ALLOCATION_LEDGER_MAX_KEYS,
+    max_retries=settings.ALLOCATION_LEDGER_MAX_RETRIES,
+)
@@ -3,22 +3,36 @@ Scheduler Service - APScheduler for automated background jobs
 Runs detection engine every 15 minutes for proactive monitoring
 """
 import logging
-from datetime import datetime
+import math
+import time
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
+from concurrent.futures import TimeoutError as FuturesTimeout
+from datetime import datetime, timedelta
 from typing import Optional
-from uuid import uuid4
+from uuid import UUID
 
 from apscheduler.schedulers.background import BackgroundScheduler
 from apscheduler.triggers.interval import IntervalTrigger
 from apscheduler.triggers.cron import CronTrigger
-from sqlmodel import Session, select, func
+from sqlmodel import Session, select, func, text
 
+from app.core.config import settings
 from app.core.database import engine
+from app.models.company import Company
 from app.models.detection_rule import DetectionRule
-from app.models.order import Order, Delivery
-from app.models.ndr import NDR, AIActionLog
-from app.models.returns import Return
-from app.models.inventory import Inventory
-from app.models.system import Exception as ExceptionModel
+from app.services.analytics_snapshots import build_analytics_snapshots
+from app.services.api_key_auth import api_key_authenticator
+from app.services.demand_forecast import run_demand_forecast
+from app.services.performance_aggregation import aggregate_performance
+from app.services.reports import run_report_worker
+from app.services.detection_engine import (
+    auto_resolve_exceptions,
+    company_scope,
+    compile_rule,
+    get_entity_model,
+    reconcile_exceptions,
+    single_rule_keys,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -32,6 +46,7 @@ last_scan_result = {
     "exceptions_created": 0,
     "exceptions_updated": 0,
     "auto_resolved": 0,
+    "full_rescan": False,
     "status": "NOT_RUN"
 }
 
@@ -42,165 +57,206 @@ def get_last_scan_result():
 
 
 # =============================================================================
-# DETECTION ENGINE HELPERS (duplicated from control_tower for independence)
+# DETECTION SHARDS
 # =============================================================================
 
-def calculate_age_hours(timestamp: datetime) -> float:
-    """Calculate hours since timestamp."""
-    if not timestamp:
-        return 0
-    return (datetime.utcnow() - timestamp).total_seconds() / 3600
-
-
-def calculate_age_days(dt) -> int:
-    """Calculate days since date."""
-    if not dt:
-        return 0
-    if isinstance(dt, datetime):
-        dt = dt.date()
-    return (datetime.utcnow().date() - dt).days
-
-
-def get_entity_model(entity_type: str):
-    """Get SQLModel class for entity type."""
-    models = {
-        "Order": Order,
-        "Delivery": Delivery,
-        "NDR": NDR,
-        "Return": Return,
-        "Inventory": Inventory,
+class ShardTimeout(Exception):
+    """Raised inside a shard that exceeded DETECTION_SHARD_TIMEOUT_SECONDS."""
+
+
+def _init_shard_process():
+    """Process-pool initializer: forked workers must not reuse the parent's connections."""
+    engine.dispose(close=False)
+
+
+def _create_shard_executor(workers: int):
+    """Bounded worker pool for detection shards (thread or process, per settings)."""
+    if settings.DETECTION_EXECUTOR == "process":
+        return ProcessPoolExecutor(max_workers=workers, initializer=_init_shard_process)
+    return ThreadPoolExecutor(max_workers=workers, thread_name_prefix="detection-shard")
+
+
+def run_detection_shard(
+    rule_id: UUID,
+    company_id: Optional[UUID],
+    now: datetime,
+    full_rescan: bool,
+    resolve_missing: bool,
+) -> dict:
+    """
+    Run one rule for one company in its own session and transaction.
+    Never raises: failures and timeouts are reported in the returned dict
+    so one shard cannot take down the rest of the cycle.
+    """
+    started = time.monotonic()
+    timeout = settings.DETECTION_SHARD_TIMEOUT_SECONDS
+    result = {
+        "rule_id": rule_id,
+        "company_id": company_id,
+        "rows_scanned": 0,
+        "created": 0,
+        "updated": 0,
+        "resolved": 0,
+        "status": "SUCCESS",
     }
-    return models.get(entity_type)
 
+    def check_deadline():
+        if time.monotonic() - started > timeout:
+            raise ShardTimeout(f"shard exceeded {timeout}s")
 
-def evaluate_condition(entity, condition: dict, now: datetime) -> bool:
-    """Evaluate a single condition against an entity."""
-    field = condition.get("field")
-    operator = condition.get("operator")
-    value = condition.get("value")
+    try:
+        with Session(engine) as session:
+            if session.get_bind().dialect.name == "postgresql":
+                # Hard bound on every statement of this shard's transaction
+                session.execute(text(f"SET LOCAL statement_timeout = {int(timeout * 1000)}"))
+
+            rule = session.get(DetectionRule, rule_id)
+            compiled = compile_rule(rule, now)
+
+            filters = []
+            if company_id:
+                filters.append(company_scope(compiled.Model, company_id))
+
+            resolve_scope = None
+            watermark = None if full_rescan else rule.scanWatermark
+            if watermark:
+                changed_since = watermark - timedelta(
+                    seconds=settings.DETECTION_WATERMARK_OVERLAP_SECONDS
+                )
+                if resolve_missing:
+                    resolve_scope = compiled.changed_identifiers(session, changed_since, *filters)
+                filters.append(compiled.incremental_filter(changed_since, watermark))
+
+            # Only matching rows (with severity) come back from the database
+            matches, result["rows_scanned"] = compiled.matches(session, *filters)
+            check_deadline()
+
+            # Reconcile against open exceptions in bulk
+            counts = reconcile_exceptions(
+                session, rule, matches, now,
+                source="SCHEDULER",
+                company_id=company_id,
+                resolve_missing=resolve_missing,
+                resolve_scope=resolve_scope,
+            )
+            check_deadline()
 
-    if not hasattr(entity, field):
-        return False
+            session.commit()
+            result.update(counts)
+
+    except ShardTimeout as e:
+        result["status"] = "TIMEOUT"
+        result["error"] = str(e)
+    except Exception as e:
+        result["status"] = "ERROR"
+        result["error"] = str(e)
 
-    entity_value = getattr(entity, field)
+    result["duration_ms"] = int((time.monotonic() - started) * 1000)
+    if result["status"] != "SUCCESS":
+        logger.error(
+            f"Detection shard rule={rule_id} company={company_id} "
+            f"{result['status']}: {result.get('error')}"
+        )
+    return result
 
-    # Handle enum values
-    if hasattr(entity_value, 'value'):
-        entity_value = entity_value.value
 
+def _run_shards(shards: list) -> list:
+    """
+    Run shards on the worker pool and collect their results. Shards check
+    their own budget only between steps (PostgreSQL also bounds each
+    statement), so the cycle stops waiting once every shard could have used
+    its full DETECTION_SHARD_TIMEOUT_SECONDS; shards still running or queued
+    then are reported as TIMEOUT and abandoned.
+    """
+    workers = max(1, settings.DETECTION_MAX_WORKERS)
+    timeout = settings.DETECTION_SHARD_TIMEOUT_SECONDS
+    deadline = math.ceil(len(shards) / workers) * timeout
+    started = time.monotonic()
+
+    results = []
+    executor = _create_shard_executor(workers)
+    futures = {executor.submit(run_detection_shard, *shard): shard for shard in shards}
+    collected = set()
+    timed_out = False
     try:
-        if operator == "=":
-            return str(entity_value) == str(value)
-        elif operator == "!=":
-            return str(entity_value) != str(value)
-        elif operator == ">":
-            return float(entity_value or 0) > float(value)
-        elif operator == "<":
-            return float(entity_value or 0) < float(value)
-        elif operator == ">=":
-            return float(entity_value or 0) >= float(value)
-        elif operator == "<=":
-            return float(entity_value or 0) <= float(value)
-        elif operator == "IN":
-            return str(entity_value) in value
-        elif operator == "NOT_IN":
-            return str(entity_value) not in value
-        elif operator == "IS_NULL":
-            return entity_value is None
-        elif operator == "IS_NOT_NULL":
-            return entity_value is not None
-        elif operator == "AGE_HOURS":
-            if entity_value:
-                age = calculate_age_hours(entity_value)
-                return age >= float(value)
-            return False
-        elif operator == "AGE_DAYS":
-            if entity_value:
-                age = calculate_age_days(entity_value)
-                return age >= int(value)
-            return False
-    except (ValueError, TypeError):
-        return False
-
-    return False
-
-
-def evaluate_conditions(entity, conditions: list, now: datetime) -> bool:
-    """Evaluate all conditions against an entity (AND logic)."""
-    if not conditions:
-        return False
-    return all(evaluate_condition(entity, cond, now) for cond in conditions)
-
-
-def calculate_severity(entity, rule, now: datetime) -> str:
-    """Calculate severity based on rule configuration."""
-    severity_rules = rule.severityRules or {}
-    severity_field = rule.severityField or "createdAt"
-    severity_unit = rule.severityUnit or "hours"
-    default_severity = rule.defaultSeverity or "MEDIUM"
-
-    if not severity_rules:
-        return default_severity
-
-    field_value = getattr(entity, severity_field, None)
-    if not field_value:
-        return default_severity
-
-    # Calculate the metric value
-    if severity_unit == "hours":
-        metric_value = calculate_age_hours(field_value)
-    elif severity_unit == "days":
-        metric_value = calculate_age_days(field_value)
-    else:
-        metric_value = float(field_value) if field_value else 0
-
-    # Determine severity based on thresholds (highest first)
-    for severity in ["CRITICAL", "HIGH", "MEDIUM", "LOW"]:
-        threshold = severity_rules.get(severity)
-        if threshold is not None and metric_value >= threshold:
-            return severity
-
-    return default_severity
-
-
-def get_priority(severity: str) -> int:
-    """Convert severity to numeric priority."""
-    return {"CRITICAL": 1, "HIGH": 2, "MEDIUM": 3, "LOW": 4}.get(severity, 5)
-
-
-def get_entity_identifier(entity, entity_type: str) -> str:
-    """Get the identifier field for an entity."""
-    if entity_type == "Order":
-        return entity.orderNo
-    elif entity_type == "Delivery":
-        return entity.deliveryNo
-    elif entity_type == "NDR":
-        return entity.ndrCode
-    elif entity_type == "Return":
-        return getattr(entity, 'returnNo', str(entity.id))
-    elif entity_type == "Inventory":
-        return str(entity.skuId)
-    return str(entity.id)
+        for future in as_completed(futures, timeout=deadline):
+            collected.add(future)
+            results.append(future.result())
+    except FuturesTimeout:
+        timed_out = True
+        duration_ms = int((time.monotonic() - started) * 1000)
+        for future, (rule_id, company_id, *_) in futures.items():
+            if future in collected:
+                continue
+            if future.done() and not future.cancelled():
+                results.append(future.result())
+                continue
+            future.cancel()
+            logger.error(f"Detection shard rule={rule_id} company={company_id} TIMEOUT: abandoned")
+            results.append({
+                "rule_id": rule_id,
+                "company_id": company_id,
+                "rows_scanned": 0,
+                "created": 0,
+                "updated": 0,
+                "resolved": 0,
+                "status": "TIMEOUT",
+                "error": f"shard did not finish within the {deadline}s scan deadline",
+                "duration_ms": duration_ms,
+            })
+    finally:
+        # Hung workers can't be interrupted; don't block the cycle on them
+        executor.shutdown(wait=not timed_out, cancel_futures=True)
+    return results
+
+
+def _shard_summary(result: dict) -> dict:
+    """JSON-friendly summary of a shard result for last_scan_result."""
+    summary = {
+        "ruleId": str(result["rule_id"]),
+        "companyId": str(result["company_id"]) if result["company_id"] else None,
+        "status": result["status"],
+        "rowsScanned": result["rows_scanned"],
+        "durationMs": result["duration_ms"],
+    }
+    if result.get("error"):
+        summary["error"] = result["error"]
+    return summary
 
 
 # =============================================================================
 # SCHEDULED JOB: RUN DETECTION ENGINE
 # =============================================================================
 
-def run_detection_engine():
+def run_detection_engine(full_rescan: bool = False):
     """
     Scheduled job that runs the detection engine.
     Executes every 15 minutes to detect exceptions proactively.
+
+    Work is split into (rule, companyId) shards executed on a bounded worker
+    pool (DETECTION_MAX_WORKERS, DETECTION_EXECUTOR). Each shard has its own
+    session, transaction and timeout, so a large tenant or slow rule only
+    delays its own shard.
+
+    Scans are incremental: each rule only re-evaluates entities updated since
+    its scanWatermark, plus rows whose age thresholds were crossed since then.
+    Rules without a watermark, or all rules when full_rescan is set, are
+    scanned in full. A rule's watermark only advances when all of its shards
+    succeed.
     """
     global last_scan_result
 
-    logger.info("=== SCHEDULED DETECTION ENGINE START ===")
+    logger.info(
+        f"=== SCHEDULED DETECTION ENGINE START ({'full' if full_rescan else 'incremental'}) ==="
+    )
     now = datetime.utcnow()
+    started = time.monotonic()
 
     exceptions_created = 0
     exceptions_updated = 0
     auto_resolved = 0
     rules_executed = 0
+    shard_results = []
 
     try:
         with Session(engine) as session:
@@ -220,191 +276,90 @@ def run_detection_engine():
                     "exceptions_created": 0,
                     "exceptions_updated": 0,
                     "auto_resolved": 0,
+                    "full_rescan": full_rescan,
                     "status": "NO_RULES"
                 }
                 return
 
-            logger.info(f"Found {len(rules)} active rules to execute")
+            company_ids = session.exec(
+                select(Company.id).where(Company.isActive == True)
+            ).all()
+            sole_rule_keys = single_rule_keys(rules)
 
+            shards = []
             for rule in rules:
-                try:
-                    Model = get_entity_model(rule.entityType)
-                    if not Model:
-                        logger.warning(f"Unknown entity type: {rule.entityType}")
-                        continue
-
-                    # Get all entities of this type
-                    entities = session.exec(select(Model)).all()
-                    conditions = rule.conditions if isinstance(rule.conditions, list) else []
-
-                    logger.info(f"Rule {rule.ruleCode}: Scanning {len(entities)} {rule.entityType} entities")
-
-                    for entity in entities:
-                        if evaluate_conditions(entity, conditions, now):
-                            entity_id = get_entity_identifier(entity, rule.entityType)
-                            severity = calculate_severity(entity, rule, now)
-
-                            # Check if exception already exists
-                            existing = session.exec(
-                                select(ExceptionModel).where(
-                                    ExceptionModel.entityType == rule.entityType,
-                                    ExceptionModel.entityId == entity_id,
-                                    ExceptionModel.type == rule.ruleType,
-                                    ExceptionModel.status.in_(["OPEN", "IN_PROGRESS"])
-                                )
-                            ).first()
-
-                            if not existing:
-                                # Create new exception
-                                order_id = None
-                                if hasattr(entity, 'id') and rule.entityType == "Order":
-                                    order_id = entity.id
-                                elif hasattr(entity, 'orderId'):
-                                    order_id = entity.orderId
-
-                                exception = ExceptionModel(
-                                    id=uuid4(),
-                                    exceptionCode=f"EXC-{rule.ruleType[:3]}-{str(uuid4())[:8].upper()}",
-                                    type=rule.ruleType,
-                                    source="SCHEDULER",
-                                    severity=severity,
-                                    entityType=rule.entityType,
-                                    entityId=entity_id,
-                                    orderId=order_id,
-                                    title=f"{rule.name}: {entity_id}",
-                                    description=f"Auto-detected by scheduler using rule '{rule.ruleCode}'",
-                                    autoResolvable=rule.autoResolveEnabled,
-                                    status="OPEN",
-                                    priority=get_priority(severity),
-                                    companyId=getattr(entity, 'companyId', None),
-                                    createdAt=now,
-                                    updatedAt=now
-                                )
-                                session.add(exception)
-                                exceptions_created += 1
-
-                                # Create AI Action if enabled (map rule action types to DB enum values)
-                                if rule.aiActionEnabled and rule.aiActionType:
-                                    # Map detection rule action types to database enum values
-                                    action_type_map = {
-                                        "RECOMMEND": "NDR_CLASSIFICATION",
-                                        "AUTO_CLASSIFY": "NDR_CLASSIFICATION",
-                                        "AUTO_OUTREACH": "NDR_RESOLUTION",
-                                        "AUTO_ESCALATE": "NDR_RESOLUTION",
-                                        "AUTO_RESOLVE": "NDR_RESOLUTION",
-                                        "PREDICT": "DEMAND_FORECAST",
-                                    }
-                                    mapped_action_type = action_type_map.get(rule.aiActionType, "NDR_CLASSIFICATION")
-
-                                    ai_action = AIActionLog(
-                                        id=uuid4(),
-                                        actionType=mapped_action_type,
-                                        entityType=rule.entityType,
-                                        entityId=entity_id,
-                                        companyId=getattr(entity, 'companyId', None),
-                                        ndrId=entity.id if rule.entityType == "NDR" else None,
-                                        decision=f"Auto-triggered by scheduler rule: {rule.ruleCode} ({rule.aiActionType})",
-                                        reasoning=f"Rule '{rule.name}' detected an issue requiring {rule.aiActionType}",
-                                        confidence=0.85,
-                                        riskLevel=severity,
-                                        status="PENDING_APPROVAL",
-                                        approvalRequired=True,
-                                        recommendations=rule.aiActionConfig,
-                                        createdAt=now,
-                                        updatedAt=now
-                                    )
-                                    session.add(ai_action)
-                            else:
-                                # Update severity if changed
-                                if existing.severity != severity:
-                                    existing.severity = severity
-                                    existing.priority = get_priority(severity)
-                                    existing.updatedAt = now
-                                    session.add(existing)
-                                    exceptions_updated += 1
-
-                    # Update rule execution stats
-                    rule.lastExecutedAt = now
-                    rule.executionCount = (rule.executionCount or 0) + 1
-                    session.add(rule)
-                    rules_executed += 1
-
-                except Exception as e:
-                    logger.error(f"Error executing rule {rule.ruleCode}: {str(e)}")
+                Model = get_entity_model(rule.entityType)
+                if not Model:
+                    logger.warning(f"Unknown entity type: {rule.entityType}")
                     continue
-
-            # Auto-resolve exceptions where underlying issue is fixed
-            open_exceptions = session.exec(
-                select(ExceptionModel).where(
-                    ExceptionModel.status == "OPEN",
-                    ExceptionModel.autoResolvable == True
+                # Entities without companyId (e.g. Inventory) run as one shard
+                tenants = company_ids if hasattr(Model, "companyId") else [None]
+                resolve_missing = (
+                    rule.autoResolveEnabled
+                    and (rule.entityType, rule.ruleType) in sole_rule_keys
                 )
-            ).all()
+                for company_id in tenants:
+                    shards.append((rule.id, company_id, now, full_rescan, resolve_missing))
 
-            for exc in open_exceptions:
-                Model = get_entity_model(exc.entityType)
-                if not Model:
+            logger.info(f"Found {len(rules)} active rules, {len(shards)} shards to execute")
+
+        # Execute shards on the worker pool
+        shard_results = _run_shards(shards)
+
+        # Merge shard results per rule
+        by_rule = {}
+        for res in shard_results:
+            by_rule.setdefault(res["rule_id"], []).append(res)
+            exceptions_created += res["created"]
+            exceptions_updated += res["updated"]
+            auto_resolved += res["resolved"]
+
+        with Session(engine) as session:
+            executed_rules = session.exec(
+                select(DetectionRule).where(DetectionRule.id.in_(list(by_rule)))
+            ).all()
+            for rule in executed_rules:
+                results = by_rule[rule.id]
+                if not any(res["status"] == "SUCCESS" for res in results):
                     continue
+                # Update rule execution stats
+                rule.lastExecutedAt = now
+                rule.executionCount = (rule.executionCount or 0) + 1
+                if all(res["status"] == "SUCCESS" for res in results):
+                    rule.scanWatermark = now
+                session.add(rule)
+                rules_executed += 1
 
-                # Find the entity
-                entity = None
-                if exc.entityType == "Order" and exc.orderId:
-                    entity = session.get(Model, exc.orderId)
-                else:
-                    id_field = {
-                        'Order': 'orderNo',
-                        'Delivery': 'deliveryNo',
-                        'NDR': 'ndrCode'
-                    }.get(exc.entityType, 'id')
-
-                    if hasattr(Model, id_field):
-                        entity = session.exec(
-                            select(Model).where(getattr(Model, id_field) == exc.entityId)
-                        ).first()
-
-                if entity:
-                    status = getattr(entity, 'status', None)
-                    if hasattr(status, 'value'):
-                        status = status.value
-
-                    should_resolve = False
-                    # Order/Delivery rules
-                    if exc.type == "STUCK_ORDER" and status != "CREATED":
-                        should_resolve = True
-                    elif exc.type == "SLA_BREACH" and status == "DELIVERED":
-                        should_resolve = True
-                    elif exc.type == "CARRIER_DELAY" and status in ["DELIVERED", "OUT_FOR_DELIVERY"]:
-                        should_resolve = True
-                    # NDR-specific rules - resolve when NDR is resolved/closed/RTO
-                    elif exc.type in ["NDR_AGING", "NDR_MULTI_ATTEMPT", "NDR_NO_RESPONSE",
-                                      "NDR_HIGH_VALUE", "NDR_COD_RISK", "NDR_ADDRESS_ISSUE",
-                                      "NDR_RTO_CANDIDATE", "NDR_ESCALATION"] and status in ["RESOLVED", "RTO", "CLOSED"]:
-                        should_resolve = True
-                    # Return rules
-                    elif exc.type == "RETURN_AGING" and status in ["COMPLETED", "REFUNDED", "REJECTED"]:
-                        should_resolve = True
-
-                    if should_resolve:
-                        exc.status = "RESOLVED"
-                        exc.resolution = "Auto-resolved by scheduler: Issue has been addressed"
-                        exc.resolvedAt = now
-                        exc.resolvedBy = "SCHEDULER"
-                        exc.updatedAt = now
-                        session.add(exc)
-                        auto_resolved += 1
+            # Auto-resolve exceptions where underlying issue is fixed
+            auto_resolved += auto_resolve_exceptions(
+                session, now, source="SCHEDULER", rules=executed_rules
+            )
 
             session.commit()
 
+            failed = [res for res in shard_results if res["status"] != "SUCCESS"]
+            slowest = sorted(shard_results, key=lambda res: res["duration_ms"], reverse=True)
             last_scan_result = {
                 "timestamp": now.isoformat(),
                 "rules_executed": rules_executed,
                 "exceptions_created": exceptions_created,
                 "exceptions_updated": exceptions_updated,
                 "auto_resolved": auto_resolved,
-                "status": "SUCCESS"
+                "full_rescan": full_rescan,
+                "duration_ms": int((time.monotonic() - started) * 1000),
+                "shards": {
+                    "total": len(shard_results),
+                    "failed": sum(1 for res in failed if res["status"] == "ERROR"),
+                    "timed_out": sum(1 for res in failed if res["status"] == "TIMEOUT"),
+                    "rows_scanned": sum(res["rows_scanned"] for res in shard_results),
+                    "slowest": [_shard_summary(res) for res in slowest[:5]],
+                    "errors": [_shard_summary(res) for res in failed[:20]],
+                },
+                "status": "PARTIAL" if failed else "SUCCESS"
             }
 
             logger.info(f"=== DETECTION ENGINE COMPLETE ===")
+            logger.info(f"Shards executed: {len(shard_results)} ({len(failed)} failed)")
             logger.info(f"Rules executed: {rules_executed}")
             logger.info(f"Exceptions created: {exceptions_created}")
             logger.info(f"Exceptions updated: {exceptions_updated}")
@@ -418,10 +373,113 @@ def run_detection_engine():
             "exceptions_created": exceptions_created,
             "exceptions_updated": exceptions_updated,
             "auto_resolved": auto_resolved,
+            "full_rescan": full_rescan,
             "status": f"ERROR: {str(e)}"
         }
 
 
+# =============================================================================
+# SCHEDULED JOB: BUILD ANALYTICS SNAPSHOTS
+# =============================================================================
+
+def run_analytics_snapshot_builder():
+    """
+    Scheduled job that materializes DAILY/WEEKLY/MONTHLY AnalyticsSnapshot
+    rows for closed days, so dashboards don't aggregate raw order history.
+    """
+    started = time.monotonic()
+    try:
+        with Session(engine) as session:
+            result = build_analytics_snapshots(session)
+            session.commit()
+        logger.info(
+            f"Analytics snapshots built: {result['days']} days "
+            f"({result['from']} to {result['to']}), {result['snapshots']} snapshots "
+            f"in {int((time.monotonic() - started) * 1000)}ms"
+        )
+    except Exception as e:
+        logger.error(f"Analytics snapshot builder error: {str(e)}")
+
+
+# =============================================================================
+# SCHEDULED JOB: DEMAND FORECAST
+# =============================================================================
+
+def run_demand_forecast_job(company_id: Optional[UUID] = None):
+    """
+    Scheduled job that refits demand forecasts for every (sku, location)
+    with order history and replaces the future DemandForecast rows.
+    """
+    try:
+        with Session(engine) as session:
+            result = run_demand_forecast(session, company_id=company_id)
+            session.commit()
+        logger.info(
+            f"Demand forecast: {result['series']} series, {result['forecasts']} forecasts "
+            f"in {result['duration_ms']}ms (models: {result.get('models', {})})"
+        )
+    except Exception as e:
+        logger.error(f"Demand forecast error: {str(e)}")
+
+
+# =============================================================================
+# SCHEDULED JOB: PERFORMANCE AGGREGATION
+# =============================================================================
+
+def run_performance_aggregation():
+    """
+    Scheduled job that folds deliveries, NDRs and shipments changed since
+    the last run into the carrier / pincode / lane performance tables.
+    """
+    try:
+        with Session(engine) as session:
+            result = aggregate_performance(session)
+        if result["read"]:
+            logger.info(
+                f"Performance aggregation: {result['read']} rows read, "
+                f"{result['changed']} outcomes changed, {result['buckets']} buckets updated "
+                f"for {result['companies']} companies"
+            )
+    except Exception as e:
+        logger.error(f"Performance aggregation error: {str(e)}")
+
+
+# =============================================================================
+# SCHEDULED JOB: REPORT WORKER
+# =============================================================================
+
+def run_scheduled_reports():
+    """
+    Scheduled job that queues due ScheduledReports and runs pending
+    ReportExecutions, writing their files in the background.
+    """
+    try:
+        result = run_report_worker()
+        if result["executed"] or result["queued"] or result["stale"]:
+            logger.info(
+                f"Report worker: {result['queued']} queued, {result['executed']} executed "
+                f"({result['failed']} failed, {result['rows']} rows), {result['stale']} timed out"
+            )
+    except Exception as e:
+        logger.error(f"Report worker error: {str(e)}")
+
+
+# =============================================================================
+# SCHEDULED JOB: API KEY USAGE FLUSH
+# =============================================================================
+
+def run_api_key_usage_flush():
+    """
+    Scheduled job that writes API key uses recorded by the authenticator
+    to APIKey.lastUsedAt.
+    """
+    try:
+        with Session(engine) as session:
+            api_key_authenticator.flush_last_used(session)
+    except Exception as e:
+        logger.error(f"API key usage flush error: {str(e)}")
+
+
 # =============================================================================
 # SCHEDULER LIFECYCLE
 # =============================================================================
@@ -442,6 +500,17 @@ def start_scheduler():
         max_instances=1,  # Prevent overlapping runs
     )
 
+    # Nightly full rescan - ignores watermarks to catch rows changed outside the ORM
+    scheduler.add_job(
+        run_detection_engine,
+        trigger=CronTrigger(hour=settings.DETECTION_FULL_RESCAN_HOUR, minute=0),
+        kwargs={"full_rescan": True},
+        id="detection_engine_full_rescan",
+        name="Detection Engine - Nightly Full Rescan",
+        replace_existing=True,
+        max_instances=1,
+    )
+
     # Run immediately on startup
     scheduler.add_job(
         run_detection_engine,
@@ -450,12 +519,69 @@ def start_scheduler():
         name="Detection Engine - Startup Run",
     )
 
+    # Analytics snapshots - closed days, rebuilt over the lookback window
+    scheduler.add_job(
+        run_analytics_snapshot_builder,
+        trigger=IntervalTrigger(minutes=settings.ANALYTICS_SNAPSHOT_INTERVAL_MINUTES),
+        id="analytics_snapshot_builder",
+        name="Analytics Snapshot Builder",
+        replace_existing=True,
+        max_instances=1,
+        next_run_time=datetime.now() + timedelta(minutes=1),
+    )
+
+    # Demand forecast - nightly refit of all series
+    scheduler.add_job(
+        run_demand_forecast_job,
+        trigger=CronTrigger(hour=settings.FORECAST_HOUR, minute=30),
+        id="demand_forecast",
+        name="Demand Forecast",
+        replace_existing=True,
+        max_instances=1,
+    )
+
+    # Performance aggregation - outcomes changed since the watermarks
+    scheduler.add_job(
+        run_performance_aggregation,
+        trigger=IntervalTrigger(minutes=settings.PERFORMANCE_AGGREGATION_INTERVAL_MINUTES),
+        id="performance_aggregation",
+        name="Carrier Performance Aggregation",
+        replace_existing=True,
+        max_instances=1,
+        next_run_time=datetime.now() + timedelta(minutes=2),
+    )
+
+    # Report worker - due scheduled reports and pending executions
+    scheduler.add_job(
+        run_scheduled_reports,
+        trigger=IntervalTrigger(seconds=settings.REPORT_WORKER_INTERVAL_SECONDS),
+        id="report_worker",
+        name="Report Worker",
+        replace_existing=True,
+        max_instances=1,
+    )
+
+    # API key lastUsedAt - batched writes of uses recorded in memory
+    scheduler.add_job(
+        run_api_key_usage_flush,
+        trigger=IntervalTrigger(seconds=settings.API_KEY_LAST_USED_FLUSH_SECONDS),
+        id="api_key_usage_flush",
+        name="API Key Usage Flush",
+        replace_existing=True,
+        max_instances=1,
+    )
+
     scheduler.start()
-    logger.info("Scheduler started with Detection Engine job (every 15 minutes)")
+    logger.info(
+        "Scheduler started with Detection Engine job (every 15 minutes, "
+        f"full rescan daily at {settings.DETECTION_FULL_RESCAN_HOUR:02d}:00 UTC)"
+    )
 
 
 def shutdown_scheduler():
     """Gracefully shutdown the scheduler."""
     if scheduler.running:
         scheduler.shutdown(wait=False)
+        # Write uses recorded since the last flush
+        run_api_key_usage_flush()
         logger.info("Scheduler shutdown complete")
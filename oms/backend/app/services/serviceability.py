@@ -0,0 +1,281 @@
+"""
+Pincode Serviceability Index
+ServicePincode held in memory: per pincode, bitsets over transporters for
+serviceable / COD / prepaid / reverse pickup, plus each transporter's zone
+code, city, state and estimated days there. Serviceability checks, rate
+quotes and carrier allocation read it instead of querying ServicePincode per
+pincode.
+
+ServicePincode rows aren't per company, so one index serves every company. A
+company's view is narrowed to the transporters it has active TransporterConfig
+rows for (all transporters if it has none).
+
+The index is loaded on first use. The service pincode endpoints apply the
+rows they write to it in place; a full reload every
+SERVICEABILITY_INDEX_TTL_SECONDS picks up changes made by other processes.
+One caller runs the reload while concurrent lookups keep reading the
+previous snapshot; only the first load makes callers wait.
+"""
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Dict, FrozenSet, Iterable, List, Optional
+from uuid import UUID
+
+from sqlmodel import Session, select
+
+from app.core.config import settings
+from app.models import ServicePincode, TransporterConfig
+from app.services.company_index import CompanyIndexCache
+
+# Mask with every transporter's bit set
+ALL_TRANSPORTERS = -1
+
+
+@dataclass(frozen=True)
+class ServiceArea:
+    """A transporter's service at one pincode."""
+    zone: Optional[str]
+    city: Optional[str]
+    state: Optional[str]
+    estimated_days: Optional[int]
+
+
+@dataclass
+class PincodeService:
+    """Transporters at one pincode, as bitsets over transporter slots."""
+    # Transporters with a ServicePincode row here, serviceable or not
+    listed: int = 0
+    serviceable: int = 0
+    cod: int = 0
+    prepaid: int = 0
+    reverse: int = 0
+    areas: Dict[UUID, ServiceArea] = field(default_factory=dict)
+
+    def available(self, cod: Optional[bool] = None) -> int:
+        """Transporters servicing the pincode (for COD or prepaid, if given)."""
+        if cod is None:
+            return self.serviceable
+        return self.serviceable & (self.cod if cod else self.prepaid)
+
+
+def normalize_pincode(pincode: str) -> str:
+    return (pincode or "").strip()
+
+
+def _zone(value: Optional[str]) -> Optional[str]:
+    return value.strip().upper() if value and value.strip() else None
+
+
+def _place(value: Optional[str]) -> Optional[str]:
+    return value.strip().lower() if value and value.strip() else None
+
+
+class ServiceabilityIndex:
+    """Per-process serviceability of every pincode."""
+
+    def __init__(self, ttl_seconds: int):
+        self.ttl_seconds = ttl_seconds
+        self._pincodes: Dict[str, PincodeService] = {}
+        # Transporter bit positions; slots are only ever added
+        self._slots: Dict[UUID, int] = {}
+        self._transporters: List[UUID] = []
+        self._loaded_at: Optional[float] = None
+        # Whether _pincodes holds a loaded snapshot (possibly due a reload)
+        self._ready = False
+        # Set while one caller (re)loads the index
+        self._loading: Optional[threading.Event] = None
+        # Bumped by writes so a load that raced one is reloaded early
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    # =========================================================================
+    # Loading and incremental updates
+    # =========================================================================
+
+    def _slot(self, transporter_id: UUID) -> int:
+        slot = self._slots.get(transporter_id)
+        if slot is None:
+            slot = self._slots[transporter_id] = len(self._transporters)
+            self._transporters.append(transporter_id)
+        return slot
+
+    def _apply(self, pincodes: Dict[str, PincodeService], row) -> None:
+        entry = pincodes.get(normalize_pincode(row.pincode))
+        if entry is None:
+            entry = pincodes[normalize_pincode(row.pincode)] = PincodeService()
+        # Area first: readers take a set bit to mean the area is there
+        entry.areas[row.transporterId] = ServiceArea(
+            zone=_zone(row.zoneCode),
+            city=_place(row.city),
+            state=_place(row.state),
+            estimated_days=row.estimatedDays,
+        )
+        bit = 1 << self._slot(row.transporterId)
+        entry.listed |= bit
+        for flag, value in (
+            ("serviceable", row.isServiceable),
+            ("cod", row.codAvailable),
+            ("prepaid", row.prepaidAvailable),
+            ("reverse", row.reverseAvailable),
+        ):
+            bits = getattr(entry, flag)
+            setattr(entry, flag, bits | bit if value else bits & ~bit)
+
+    def _ensure_loaded(self, session: Session) -> Dict[str, PincodeService]:
+        while True:
+            with self._lock:
+                if self._loaded_at is not None and time.monotonic() - self._loaded_at < self.ttl_seconds:
+                    return self._pincodes
+                loading = self._loading
+                if loading is None:
+                    loading = self._loading = threading.Event()
+                    generation = self._generation
+                    break
+                if self._ready:
+                    # Another caller is reloading; serve the previous snapshot
+                    return self._pincodes
+            # First load running in another thread; retry if it fails
+            loading.wait()
+
+        try:
+            started = time.monotonic()
+            rows = session.execute(
+                select(
+                    ServicePincode.pincode, ServicePincode.transporterId, ServicePincode.zoneCode,
+                    ServicePincode.city, ServicePincode.state, ServicePincode.isServiceable,
+                    ServicePincode.codAvailable, ServicePincode.prepaidAvailable,
+                    ServicePincode.reverseAvailable, ServicePincode.estimatedDays,
+                )
+            ).all()
+
+            with self._lock:
+                pincodes: Dict[str, PincodeService] = {}
+                for row in rows:
+                    self._apply(pincodes, row)
+                self._pincodes = pincodes
+                self._ready = True
+                # A write that landed during the load may be missing from it;
+                # keep the snapshot but reload it on the next lookup
+                self._loaded_at = started if generation == self._generation else None
+                return pincodes
+        finally:
+            with self._lock:
+                self._loading = None
+            loading.set()
+
+    def apply(self, rows: Iterable[ServicePincode]) -> None:
+        """Apply ServicePincode rows that were just created or updated."""
+        with self._lock:
+            self._generation += 1
+            if not self._ready:
+                return
+            for row in rows:
+                self._apply(self._pincodes, row)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._pincodes = {}
+            self._loaded_at = None
+            self._ready = False
+            self._generation += 1
+
+    # =========================================================================
+    # Lookups
+    # =========================================================================
+
+    def mask(self, transporter_ids: Iterable[UUID]) -> int:
+        """Bitset of the given transporters (ones not in the index are skipped)."""
+        bits = 0
+        for transporter_id in transporter_ids:
+            slot = self._slots.get(transporter_id)
+            if slot is not None:
+                bits |= 1 << slot
+        return bits
+
+    def bit(self, transporter_id: UUID) -> int:
+        slot = self._slots.get(transporter_id)
+        return 1 << slot if slot is not None else 0
+
+    def transporters(self, bits: int) -> List[UUID]:
+        """Transporters whose bits are set."""
+        found = []
+        while bits:
+            low = bits & -bits
+            found.append(self._transporters[low.bit_length() - 1])
+            bits ^= low
+        return found
+
+    def company_mask(self, session: Session, company_id: Optional[UUID]) -> int:
+        """Transporters a company ships with (all when it has none configured)."""
+        if not company_id:
+            return ALL_TRANSPORTERS
+        configured = company_transporters.get(session, company_id)
+        return self.mask(configured) if configured else ALL_TRANSPORTERS
+
+    def lookup(self, session: Session, pincodes: Iterable[str]) -> Dict[str, Optional[PincodeService]]:
+        """PincodeService of each pincode (None if no transporter lists it)."""
+        index = self._ensure_loaded(session)
+        return {pincode: index.get(normalize_pincode(pincode)) for pincode in pincodes}
+
+    def get(self, session: Session, pincode: str) -> Optional[PincodeService]:
+        return self._ensure_loaded(session).get(normalize_pincode(pincode))
+
+    def check(
+        self,
+        session: Session,
+        pincodes: Iterable[str],
+        company_id: Optional[UUID] = None,
+        transporter_id: Optional[UUID] = None,
+        payment_mode: Optional[str] = None,
+    ) -> List[dict]:
+        """
+        Serviceability of each pincode: the transporters servicing it (for
+        the payment mode, if given) with their COD/prepaid flags and zone.
+        """
+        index = self._ensure_loaded(session)
+        allowed = self.company_mask(session, company_id)
+        if transporter_id:
+            allowed &= self.bit(transporter_id)
+        cod = None if not payment_mode else payment_mode.upper() == "COD"
+
+        results = []
+        for pincode in pincodes:
+            service = index.get(normalize_pincode(pincode))
+            bits = service.available(cod) & allowed if service else 0
+            transporters = []
+            for transporter in self.transporters(bits):
+                bit = self.bit(transporter)
+                area = service.areas[transporter]
+                transporters.append({
+                    "transporterId": str(transporter),
+                    "codAvailable": bool(service.cod & bit),
+                    "prepaidAvailable": bool(service.prepaid & bit),
+                    "zoneCode": area.zone,
+                    "estimatedDays": area.estimated_days,
+                })
+            results.append({
+                "pincode": pincode,
+                "serviceable": bool(bits),
+                "transporters": transporters,
+            })
+        return results
+
+
+def build_company_transporters(session: Session, company_id: UUID) -> FrozenSet[UUID]:
+    """Transporters with an active TransporterConfig for the company."""
+    return frozenset(session.exec(
+        select(TransporterConfig.transporterId).where(
+            TransporterConfig.companyId == company_id,
+            TransporterConfig.isActive == True,
+        )
+    ).all())
+
+
+serviceability_index = ServiceabilityIndex(ttl_seconds=settings.SERVICEABILITY_INDEX_TTL_SECONDS)
+
+company_transporters: CompanyIndexCache[FrozenSet[UUID]] = CompanyIndexCache(
+    build_company_transporters,
+    ttl_seconds=settings.SERVICEABILITY_INDEX_TTL_SECONDS,
+    max_keys=settings.RATE_CARD_CACHE_MAX_COMPANIES,
+)
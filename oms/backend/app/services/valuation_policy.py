@@ -0,0 +1,119 @@
+"""
+Valuation Policy Resolver
+Resolves the valuation method (FIFO/LIFO/FEFO/WAC) used to allocate a SKU at a
+location. Priority: SKU override > Location override > FIFO.
+
+Results are kept in a TTLCache keyed by (sku, location, company), so
+allocation hot paths (waves, bulk allocation) don't query SKU and Location for
+pairs they have already seen. Misses of a whole batch are resolved with a
+single query. Settings, SKU and Location updates invalidate the affected keys.
+"""
+from typing import Dict, Iterable, Optional, Tuple
+from uuid import UUID
+
+from sqlalchemy import literal, union_all
+from sqlmodel import Session, select
+
+from app.core.cache import MISSING, TTLCache
+from app.core.config import settings
+from app.models import SKU, Location
+
+DEFAULT_VALUATION_METHOD = "FIFO"
+
+PolicyKey = Tuple[UUID, UUID, Optional[UUID]]
+
+
+class ValuationPolicyResolver:
+    """Process-wide cache of resolved valuation methods."""
+
+    def __init__(self, ttl_seconds: int, max_keys: int):
+        self._cache: TTLCache[PolicyKey, str] = TTLCache(ttl_seconds, max_keys)
+
+    @staticmethod
+    def _load(
+        session: Session,
+        pairs: Iterable[Tuple[UUID, UUID]],
+    ) -> Dict[Tuple[UUID, UUID], str]:
+        """SKU and Location overrides of pairs in one round trip."""
+        pairs = set(pairs)
+        sku_ids = {sku_id for sku_id, _ in pairs}
+        location_ids = {location_id for _, location_id in pairs}
+
+        overrides = union_all(
+            select(literal("SKU").label("level"), SKU.id, SKU.valuationMethod)
+            .where(SKU.id.in_(sku_ids))
+            .where(SKU.valuationMethod.isnot(None)),
+            select(literal("LOCATION").label("level"), Location.id, Location.valuationMethod)
+            .where(Location.id.in_(location_ids))
+            .where(Location.valuationMethod.isnot(None)),
+        )
+        sku_methods: Dict[UUID, str] = {}
+        location_methods: Dict[UUID, str] = {}
+        for level, entity_id, method in session.execute(overrides).all():
+            if level == "SKU":
+                sku_methods[entity_id] = method
+            else:
+                location_methods[entity_id] = method
+
+        return {
+            (sku_id, location_id): (
+                sku_methods.get(sku_id)
+                or location_methods.get(location_id)
+                or DEFAULT_VALUATION_METHOD
+            )
+            for sku_id, location_id in pairs
+        }
+
+    def resolve_many(
+        self,
+        session: Session,
+        pairs: Iterable[Tuple[UUID, UUID]],
+        company_id: Optional[UUID],
+    ) -> Dict[Tuple[UUID, UUID], str]:
+        """Valuation method of each (sku, location) pair; misses take one query."""
+        pairs = set(pairs)
+        resolved: Dict[Tuple[UUID, UUID], str] = {}
+        for sku_id, location_id in pairs:
+            method = self._cache.peek((sku_id, location_id, company_id))
+            if method is not MISSING:
+                resolved[(sku_id, location_id)] = method
+
+        missing = pairs - resolved.keys()
+        if not missing:
+            return resolved
+
+        ticket = self._cache.ticket()
+        loaded = self._load(session, missing)
+        resolved.update(loaded)
+        for (sku_id, location_id), method in loaded.items():
+            self._cache.put((sku_id, location_id, company_id), method, ticket)
+        return resolved
+
+    def resolve(
+        self,
+        session: Session,
+        sku_id: UUID,
+        location_id: UUID,
+        company_id: Optional[UUID],
+    ) -> str:
+        """Valuation method of a single (sku, location) pair."""
+        return self.resolve_many(session, [(sku_id, location_id)], company_id)[
+            (sku_id, location_id)
+        ]
+
+    def invalidate_sku(self, sku_id: UUID) -> None:
+        """Drop cached methods of a SKU after its valuationMethod changed."""
+        self._cache.invalidate_where(lambda key, _: key[0] == sku_id)
+
+    def invalidate_location(self, location_id: UUID) -> None:
+        """Drop cached methods at a location after its valuationMethod changed."""
+        self._cache.invalidate_where(lambda key, _: key[1] == location_id)
+
+    def clear(self) -> None:
+        self._cache.clear()
+
+
+valuation_policy = ValuationPolicyResolver(
+    ttl_seconds=settings.VALUATION_POLICY_TTL_SECONDS,
+    max_keys=settings.VALUATION_POLICY_MAX_KEYS,
+)
@@ -0,0 +1,504 @@
+"""
+Detection Engine Benchmark
+Seeds a database with synthetic multi-company Orders, Deliveries, NDRs,
+Returns and Inventory, then runs the scheduler's run_detection_engine and the
+control tower's detect_exceptions against it. Reports rows scanned, queries
+issued, wall time and peak memory per rule, so engine changes can be checked
+for regressions against realistic volumes.
+
+Usage:
+    python scripts/benchmark_detection.py
+    python scripts/benchmark_detection.py --companies 50 --orders 5000
+    python scripts/benchmark_detection.py --database-url postgresql://localhost/oms_bench
+
+SQLite (the default, a temporary file) gets the required tables created.
+A Postgres target must be a throwaway database with the OMS schema already
+migrated: the benchmark deletes all exceptions between runs.
+"""
+import argparse
+import json
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+from pathlib import Path
+from uuid import uuid4
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+
+# Tables the engine reads or writes
+BENCHMARK_TABLES = [
+    "Company", "Location", "Zone", "Bin", "SKU", "Order", "Delivery", "NDR",
+    "Return", "Inventory", "DetectionRule", "Exception", "ExceptionCounter", "AIActionLog",
+]
+
+BENCHMARK_RULES = [
+    {
+        "name": "Stuck Order",
+        "ruleCode": "BENCH-STUCK-ORDER",
+        "ruleType": "STUCK_ORDER",
+        "entityType": "Order",
+        "conditions": [
+            {"field": "status", "operator": "=", "value": "CREATED"},
+            {"field": "createdAt", "operator": "AGE_HOURS", "value": 24},
+        ],
+        "severityRules": {"CRITICAL": 96, "HIGH": 48, "MEDIUM": 24, "LOW": 0},
+        "severityField": "createdAt",
+        "severityUnit": "hours",
+    },
+    {
+        "name": "High Value COD Order",
+        "ruleCode": "BENCH-PAYMENT-ISSUE",
+        "ruleType": "PAYMENT_ISSUE",
+        "entityType": "Order",
+        "conditions": [
+            {"field": "paymentMode", "operator": "=", "value": "COD"},
+            {"field": "totalAmount", "operator": ">", "value": 8000},
+        ],
+        "severityRules": {},
+    },
+    {
+        "name": "Carrier Delay",
+        "ruleCode": "BENCH-CARRIER-DELAY",
+        "ruleType": "CARRIER_DELAY",
+        "entityType": "Delivery",
+        "conditions": [
+            {"field": "status", "operator": "=", "value": "IN_TRANSIT"},
+            {"field": "shipDate", "operator": "AGE_DAYS", "value": 5},
+        ],
+        "severityRules": {"CRITICAL": 10, "HIGH": 7, "MEDIUM": 5, "LOW": 0},
+        "severityField": "shipDate",
+        "severityUnit": "days",
+    },
+    {
+        "name": "NDR Aging Alert",
+        "ruleCode": "BENCH-NDR-AGING",
+        "ruleType": "NDR_AGING",
+        "entityType": "NDR",
+        "conditions": [
+            {"field": "status", "operator": "=", "value": "OPEN"},
+            {"field": "createdAt", "operator": "AGE_HOURS", "value": 4},
+        ],
+        "severityRules": {"CRITICAL": 24, "HIGH": 12, "MEDIUM": 4, "LOW": 0},
+        "severityField": "createdAt",
+        "severityUnit": "hours",
+    },
+    {
+        "name": "Multi-Attempt NDR",
+        "ruleCode": "BENCH-NDR-MULTI",
+        "ruleType": "NDR_MULTI_ATTEMPT",
+        "entityType": "NDR",
+        "conditions": [
+            {"field": "attemptNumber", "operator": ">=", "value": 2},
+            {"field": "status", "operator": "IN", "value": ["OPEN", "ACTION_REQUESTED"]},
+        ],
+        "severityRules": {"CRITICAL": 4, "HIGH": 3, "MEDIUM": 2, "LOW": 0},
+        "severityField": "attemptNumber",
+        "severityUnit": "count",
+    },
+    {
+        "name": "Return Aging",
+        "ruleCode": "BENCH-RETURN-AGING",
+        "ruleType": "RETURN_AGING",
+        "entityType": "Return",
+        "conditions": [
+            {"field": "status", "operator": "IN", "value": ["INITIATED", "PICKUP_SCHEDULED"]},
+            {"field": "createdAt", "operator": "AGE_DAYS", "value": 7},
+        ],
+        "severityRules": {"CRITICAL": 21, "HIGH": 14, "MEDIUM": 7, "LOW": 0},
+        "severityField": "createdAt",
+        "severityUnit": "days",
+    },
+    {
+        "name": "Low Stock",
+        "ruleCode": "BENCH-INVENTORY-ISSUE",
+        "ruleType": "INVENTORY_ISSUE",
+        "entityType": "Inventory",
+        "conditions": [
+            {"field": "quantity", "operator": "<=", "value": 5},
+        ],
+        "severityRules": {},
+    },
+]
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark the detection engine")
+    parser.add_argument("--database-url", help="Target database (default: temporary SQLite file)")
+    parser.add_argument("--companies", type=int, default=10)
+    parser.add_argument("--orders", type=int, default=1000, help="Orders per company")
+    parser.add_argument("--ndr-ratio", type=float, default=0.1, help="NDRs per delivery")
+    parser.add_argument("--return-ratio", type=float, default=0.05, help="Returns per order")
+    parser.add_argument("--inventory", type=int, default=500, help="Inventory rows per company")
+    parser.add_argument("--days", type=int, default=30, help="Spread of createdAt into the past")
+    parser.add_argument("--workers", type=int, help="Override DETECTION_MAX_WORKERS")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--skip-seed", action="store_true", help="Reuse previously seeded data")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    return parser.parse_args()
+
+
+# =============================================================================
+# INSTRUMENTATION
+# =============================================================================
+
+class QueryCounter:
+    """Counts statements sent to the database, across worker threads."""
+
+    def __init__(self):
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, conn, cursor, statement, parameters, context, executemany):
+        with self._lock:
+            self.count += 1
+
+
+def measure(counter: QueryCounter, fn):
+    """Run fn, returning (result, metrics) with queries, wall time and peak memory."""
+    counter.count = 0
+    tracemalloc.start()
+    started = time.perf_counter()
+    try:
+        result = fn()
+    except Exception as e:
+        result = {"rows_scanned": 0, "created": 0, "resolved": 0, "errors": [str(e).splitlines()[0]]}
+    finally:
+        wall_ms = (time.perf_counter() - started) * 1000
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    return result, {
+        "queries": counter.count,
+        "wall_ms": round(wall_ms, 1),
+        "peak_kb": round(peak / 1024, 1),
+    }
+
+
+# =============================================================================
+# SCHEMA AND SEED DATA
+# =============================================================================
+
+def create_sqlite_schema(engine):
+    """Create the benchmark tables on SQLite, without foreign-key constraints."""
+    from sqlalchemy.dialects.postgresql import ARRAY
+    from sqlalchemy.ext.compiler import compiles
+    from sqlalchemy.schema import CreateIndex, CreateTable
+    from sqlalchemy.types import NullType
+    from sqlmodel import SQLModel
+
+    # Postgres-only column types have no SQLite DDL
+    compiles(ARRAY, "sqlite")(lambda type_, compiler, **kw: "JSON")
+    compiles(NullType, "sqlite")(lambda type_, compiler, **kw: "TIMESTAMP")
+    sqlite3.register_adapter(list, json.dumps)
+
+    # Parent tables outside the benchmark set do not exist, so only
+    # referential integrity of the seeded data is assumed
+    with engine.begin() as conn:
+        for name in BENCHMARK_TABLES:
+            table = SQLModel.metadata.tables[name]
+            conn.execute(CreateTable(table, include_foreign_key_constraints=[], if_not_exists=True))
+            for index in table.indexes:
+                conn.execute(CreateIndex(index, if_not_exists=True))
+
+
+def _insert(session, Model, rows, batch_size=5000):
+    from sqlalchemy import insert
+
+    for start in range(0, len(rows), batch_size):
+        session.execute(insert(Model), rows[start:start + batch_size])
+
+
+def seed_data(engine, args, now):
+    """Insert synthetic tenants and their operational data. Returns row counts."""
+    from sqlmodel import Session
+    from app.models.company import Company, Location, Zone, Bin
+    from app.models.detection_rule import DetectionRule
+    from app.models.inventory import Inventory
+    from app.models.ndr import NDR
+    from app.models.order import Order, Delivery
+    from app.models.returns import Return
+    from app.models.sku import SKU
+
+    rng = random.Random(args.seed)
+    counts = {"Company": 0, "Order": 0, "Delivery": 0, "NDR": 0, "Return": 0, "Inventory": 0}
+
+    def past(max_days=args.days):
+        return now - timedelta(seconds=rng.randint(0, max_days * 86400))
+
+    with Session(engine) as session:
+        for c in range(args.companies):
+            company_id, location_id, zone_id, bin_id = uuid4(), uuid4(), uuid4(), uuid4()
+            code = f"BENCH{c:04d}"
+            _insert(session, Company, [{
+                "id": company_id, "code": code, "name": f"Benchmark Tenant {c}",
+                "isActive": True, "createdAt": now, "updatedAt": now,
+            }])
+            _insert(session, Location, [{
+                "id": location_id, "code": f"{code}-WH", "name": "Benchmark Warehouse",
+                "type": "WAREHOUSE", "companyId": company_id, "createdAt": now, "updatedAt": now,
+            }])
+            _insert(session, Zone, [{
+                "id": zone_id, "code": "Z1", "name": "Saleable", "type": "SALEABLE",
+                "locationId": location_id, "createdAt": now, "updatedAt": now,
+            }])
+            _insert(session, Bin, [{
+                "id": bin_id, "code": "B1", "zoneId": zone_id, "createdAt": now, "updatedAt": now,
+            }])
+
+            skus, inventory = [], []
+            for i in range(args.inventory):
+                sku_id = uuid4()
+                created = past()
+                skus.append({
+                    "id": sku_id, "code": f"{code}-SKU{i:06d}", "name": f"SKU {i}",
+                    "companyId": company_id, "createdAt": created, "updatedAt": created,
+                })
+                inventory.append({
+                    "id": uuid4(), "skuId": sku_id, "binId": bin_id, "locationId": location_id,
+                    "quantity": rng.randint(0, 200), "reservedQty": 0, "serialNumbers": [],
+                    "createdAt": created, "updatedAt": past((now - created).days),
+                })
+            _insert(session, SKU, skus)
+            _insert(session, Inventory, inventory)
+
+            orders, deliveries, ndrs, returns = [], [], [], []
+            for i in range(args.orders):
+                order_id = uuid4()
+                created = past()
+                status = rng.choice(["CREATED", "CONFIRMED", "PACKED", "SHIPPED", "IN_TRANSIT", "DELIVERED"])
+                amount = rng.randint(200, 10000)
+                orders.append({
+                    "id": order_id, "orderNo": f"{code}-ORD{i:07d}", "channel": "WEBSITE",
+                    "paymentMode": rng.choice(["PREPAID", "COD"]), "status": status,
+                    "customerName": "Benchmark Customer", "customerPhone": "9999999999",
+                    "shippingAddress": {"city": "Mumbai", "pincode": "400001"},
+                    "subtotal": amount, "taxAmount": 0, "totalAmount": amount,
+                    "orderDate": created, "locationId": location_id, "companyId": company_id,
+                    "tags": [], "createdAt": created, "updatedAt": created,
+                })
+                if status in ("CREATED", "CONFIRMED"):
+                    continue
+
+                delivery_id = uuid4()
+                ship_date = created + timedelta(hours=rng.randint(2, 48))
+                deliveries.append({
+                    "id": delivery_id, "deliveryNo": f"{code}-DEL{i:07d}", "orderId": order_id,
+                    "companyId": company_id, "status": status, "shipDate": ship_date,
+                    "createdAt": created, "updatedAt": max(ship_date, created),
+                })
+                if rng.random() < args.ndr_ratio:
+                    ndr_created = min(ship_date + timedelta(days=1), now)
+                    ndrs.append({
+                        "id": uuid4(), "ndrCode": f"{code}-NDR{i:07d}", "deliveryId": delivery_id,
+                        "orderId": order_id, "companyId": company_id,
+                        "attemptNumber": rng.randint(1, 4), "attemptDate": ndr_created,
+                        "reason": rng.choice(["CUSTOMER_UNAVAILABLE", "WRONG_ADDRESS", "COD_NOT_READY"]),
+                        "status": rng.choice(["OPEN", "ACTION_REQUESTED", "RESOLVED", "RTO"]),
+                        "priority": rng.choice(["LOW", "MEDIUM", "HIGH", "CRITICAL"]),
+                        "createdAt": ndr_created, "updatedAt": ndr_created,
+                    })
+                if status == "DELIVERED" and rng.random() < args.return_ratio:
+                    return_created = min(ship_date + timedelta(days=3), now)
+                    returns.append({
+                        "id": uuid4(), "returnNo": f"{code}-RET{i:07d}", "type": "CUSTOMER_RETURN",
+                        "status": rng.choice(["INITIATED", "PICKUP_SCHEDULED", "RECEIVED", "COMPLETED"]),
+                        "orderId": order_id, "companyId": company_id,
+                        "initiatedAt": return_created, "createdAt": return_created,
+                        "updatedAt": return_created,
+                    })
+
+            _insert(session, Order, orders)
+            _insert(session, Delivery, deliveries)
+            _insert(session, NDR, ndrs)
+            _insert(session, Return, returns)
+
+            counts["Company"] += 1
+            counts["Order"] += len(orders)
+            counts["Delivery"] += len(deliveries)
+            counts["NDR"] += len(ndrs)
+            counts["Return"] += len(returns)
+            counts["Inventory"] += len(inventory)
+
+        _insert(session, DetectionRule, [
+            {
+                "id": uuid4(), "description": None, "severityField": "createdAt",
+                "severityUnit": "hours", "defaultSeverity": "MEDIUM", "defaultPriority": 3,
+                "aiActionEnabled": False, "autoResolveEnabled": True, "isActive": True,
+                "isGlobal": True, "createdAt": now, "updatedAt": now, **rule,
+            }
+            for rule in BENCHMARK_RULES
+        ])
+        session.commit()
+
+    return counts
+
+
+# =============================================================================
+# RUNS
+# =============================================================================
+
+def reset_state(engine, active_rule_ids):
+    """Clear exceptions and watermarks and activate only the given rules."""
+    from sqlalchemy import delete, update
+    from sqlmodel import Session
+    from app.models.detection_rule import DetectionRule
+    from app.models.ndr import AIActionLog
+    from app.models.system import Exception as ExceptionModel
+
+    with Session(engine) as session:
+        session.execute(delete(AIActionLog))
+        session.execute(delete(ExceptionModel))
+        session.execute(
+            update(DetectionRule).values(
+                isActive=DetectionRule.id.in_(active_rule_ids),
+                scanWatermark=None,
+                lastExecutedAt=None,
+            )
+        )
+        session.commit()
+
+
+def run_scheduler(full_rescan: bool):
+    from app.services.scheduler import run_detection_engine, get_last_scan_result
+
+    run_detection_engine(full_rescan=full_rescan)
+    result = get_last_scan_result()
+    if result.get("status") == "ERROR":
+        raise RuntimeError(result.get("error"))
+    shards = result["shards"]
+    return {
+        "rows_scanned": shards["rows_scanned"],
+        "created": result["exceptions_created"],
+        "resolved": result["auto_resolved"],
+        "errors": [err.get("error") or err.get("status") for err in shards["errors"]],
+    }
+
+
+def run_control_tower(engine, company_id=None):
+    from types import SimpleNamespace
+    from fastapi import BackgroundTasks
+    from sqlmodel import Session
+    from app.api.v1.control_tower import detect_exceptions
+    from app.core.deps import CompanyFilter
+
+    principal = SimpleNamespace(
+        id=uuid4(),
+        role="ADMIN" if company_id else "SUPER_ADMIN",
+        companyId=company_id,
+    )
+    with Session(engine) as session:
+        result = detect_exceptions(
+            BackgroundTasks(), CompanyFilter(principal), session, principal
+        )
+    details = result.get("scan_details", [])
+    return {
+        "rows_scanned": sum(d["entitiesScanned"] for d in details),
+        "created": result["summary"]["exceptions_created"],
+        "resolved": result["summary"]["exceptions_auto_resolved"],
+        "errors": [d["error"] for d in details if d.get("error")],
+    }
+
+
+def benchmark(engine, counter, rules, sample_company_id):
+    """Run every scenario once per rule, then once with all rules active."""
+    scenarios = [
+        ("scheduler full", lambda: run_scheduler(full_rescan=True)),
+        ("scheduler incremental", lambda: run_scheduler(full_rescan=False)),
+        ("control tower (all)", lambda: run_control_tower(engine)),
+        ("control tower (tenant)", lambda: run_control_tower(engine, sample_company_id)),
+    ]
+    targets = [(rule.ruleCode, [rule.id]) for rule in rules]
+    targets.append(("ALL RULES", [rule.id for rule in rules]))
+
+    report = []
+    for label, rule_ids in targets:
+        reset_state(engine, rule_ids)
+        for scenario, fn in scenarios:
+            result, metrics = measure(counter, fn)
+            report.append({"rule": label, "scenario": scenario, **result, **metrics})
+    return report
+
+
+def print_report(seeded, report):
+    if seeded:
+        print("Seeded: " + ", ".join(f"{name}={count}" for name, count in seeded.items()))
+    header = (
+        f"{'rule':<24} {'scenario':<24} {'rows':>9} {'created':>8} {'resolved':>8} "
+        f"{'queries':>8} {'wall ms':>10} {'peak KB':>10}"
+    )
+    print(header)
+    print("-" * len(header))
+    for row in report:
+        print(
+            f"{row['rule']:<24} {row['scenario']:<24} {row['rows_scanned']:>9} "
+            f"{row['created']:>8} {row['resolved']:>8} {row['queries']:>8} "
+            f"{row['wall_ms']:>10} {row['peak_kb']:>10}"
+        )
+        for error in row["errors"]:
+            print(f"    ERROR: {str(error).splitlines()[0]}")
+
+
+def main():
+    args = parse_args()
+
+    database_url = args.database_url
+    if not database_url:
+        database_url = f"sqlite:///{tempfile.mkstemp(suffix='.db', prefix='detection_bench_')[1]}"
+    # Settings are read at import time, so configure them before importing app
+    os.environ["DATABASE_URL"] = database_url
+    os.environ.pop("DIRECT_URL", None)
+    os.environ["DEBUG"] = "false"
+    # Worker memory and queries are only visible in-process
+    os.environ["DETECTION_EXECUTOR"] = "thread"
+    if args.workers:
+        os.environ["DETECTION_MAX_WORKERS"] = str(args.workers)
+
+    from sqlalchemy import event
+    from sqlmodel import Session, select
+    import app.models  # noqa: F401
+    from app.core.database import engine
+    from app.models.company import Company
+    from app.models.detection_rule import DetectionRule
+    # Import the routers up front so module loading is not measured
+    import app.api.v1.control_tower  # noqa: F401
+    import app.services.scheduler  # noqa: F401
+
+    print(f"Benchmark database: {engine.url.render_as_string(hide_password=True)}")
+    now = datetime.utcnow()
+
+    seeded = None
+    if not args.skip_seed:
+        if engine.dialect.name == "sqlite":
+            create_sqlite_schema(engine)
+        started = time.perf_counter()
+        seeded = seed_data(engine, args, now)
+        print(f"Seeded in {time.perf_counter() - started:.1f}s")
+
+    with Session(engine) as session:
+        rules = session.exec(
+            select(DetectionRule).where(DetectionRule.ruleCode.like("BENCH-%"))
+        ).all()
+        sample_company_id = session.exec(
+            select(Company.id).where(Company.code.like("BENCH%")).order_by(Company.code)
+        ).first()
+        session.expunge_all()
+
+    counter = QueryCounter()
+    event.listen(engine, "before_cursor_execute", counter)
+    report = benchmark(engine, counter, rules, sample_company_id)
+
+    if args.json:
+        print(json.dumps({"seeded": seeded, "results": report}, indent=2))
+    else:
+        print_report(seeded, report)
+
+
+if __name__ == "__main__":
+    main()